@@ -12,11 +12,18 @@ def main():
     args = sys.argv
     
     parser = argparse.ArgumentParser()
-    parser.add_argument("populate", type = str, default = "localhost", help = "Populate the database.")
+    parser.add_argument("populate", type = str, default = "localhost", help = "Command. populate: create and populate the database. migrate: apply the schema migrations to an existing database. maintenance: roll up and delete expired candles.")
     parser.add_argument("-l", "--hostname", type = str, default = "localhost", help = "Hostname of computer where the DBMS is located.(default = localhost)")
     parser.add_argument("-u", "--user", type = str, default = "admin", help = "DBMS username.")
     parser.add_argument("-p", "--pass", type = str, default="root", help="DBMS password.")
     parser.add_argument("-d", "--db", type = str, default = "alchemist_lib", help = "Database name.")
+    parser.add_argument("--driver", type = str, default = "mysqlconnector", help = "MySQL driver, mysqldb is faster if mysqlclient is installed. (default = mysqlconnector)")
+    parser.add_argument("--pool-size", type = int, default = 5, help = "Number of connections kept open. (default = 5)")
+    parser.add_argument("--max-overflow", type = int, default = 10, help = "Connections allowed beyond the pool size. (default = 10)")
+    parser.add_argument("--pool-recycle", type = int, default = 3600, help = "Seconds after which a connection is replaced. (default = 3600)")
+    parser.add_argument("--no-pre-ping", dest = "pool_pre_ping", action = "store_false", help = "Don't test connections before using them.")
+    parser.add_argument("--partition", action = "store_true", help = "maintenance: partition ohlcv by month (MySQL only) and drop the expired partitions.")
+    parser.add_argument("--months-ahead", type = int, default = 3, help = "maintenance: number of future months that must have a partition. (default = 3)")
     
     parsed_args = parser.parse_args()
 
@@ -24,34 +31,28 @@ def main():
     path = os.path.dirname(__file__)
     
     config = configparser.ConfigParser()
+    #The RETENTION and ROLLUP sections are written by hand, keep them.
+    config.read(path + "/config.ini")
     
     if parsed_args.populate == "populate":
         config["DATABASE"] = {}
         for key, value in parsed_args.__dict__.items():
+            if key in ["partition", "months_ahead"]:
+                continue
             config["DATABASE"][key] = str(value)
 
         with open(path + "/config.ini", "w") as configfile:
             config.write(configfile)
 
         from . import database
-        from .database import Engine, Session
-        from .database.asset import Asset
-        from .database.aum_history import AumHistory
-        from .database.broker import Broker
-        from .database.price_data_source import PriceDataSource
-        from .database.exchange import Exchange
-        from .database.instrument import Instrument
-        from .database.ohlcv import Ohlcv
-        from .database.ptf_allocation import PtfAllocation
-        from .database.timeframe import Timeframe
-        from .database.timetable import Timetable
-        from .database.ts import Ts
-        from .database.executed_order import ExecutedOrder
+        from .database import Session
+        from .database import migrations
 
         from . import populate
         
         
-        database.Base.metadata.create_all(database.Engine)
+        database.create_all()
+        migrations.upgrade()
         
         #https://stackoverflow.com/questions/10455547/delimiter-creating-a-trigger-in-sqlalchemy
         trigger_text = "CREATE TRIGGER aum_history_saver \
@@ -61,14 +62,41 @@ def main():
                         INSERT INTO aum_history(aum_datetime, aum, ts_name) VALUES (CURRENT_TIMESTAMP, NEW.aum, NEW.ts_name); \
                         END"
         
-        Engine.execute("DROP TRIGGER IF EXISTS aum_history_saver")
-        Engine.execute(trigger_text)
+        engine = database.get_engine()
+        engine.execute("DROP TRIGGER IF EXISTS aum_history_saver")
+        engine.execute(trigger_text)
 
         session = Session()
         populate.populate_all(session = session)
         session.close()
 
         print("Database populated.")
+
+    elif parsed_args.populate == "migrate":
+        from .database import migrations
+
+        applied = migrations.upgrade()
+        if len(applied) > 0:
+            print("Migrations applied: {}.".format(", ".join([str(version) for version in applied])))
+        print("Schema version: {}.".format(migrations.current_version()))
+
+    elif parsed_args.populate == "maintenance":
+        from .database import session_scope
+
+        from . import maintenance
+
+        if parsed_args.partition:
+            created = maintenance.partition(months_ahead = parsed_args.months_ahead)
+            print("Partitions created: {}.".format(", ".join(created) if len(created) > 0 else "none"))
+
+        with session_scope() as session:
+            report = maintenance.run(session = session)
+        for timeframe, counts in report.items():
+            print("{}: {} candles rolled up, {} candles deleted.".format(timeframe, counts["rolled_up"], counts["deleted"]))
+
+        if parsed_args.partition:
+            dropped = maintenance.drop_partitions()
+            print("Partitions dropped: {}.".format(", ".join(dropped) if len(dropped) > 0 else "none"))
         
     else:
         print("Unknown command.")
@@ -1,15 +1,21 @@
-from bittrex.bittrex import Bittrex, API_V1_1, SELL_ORDERBOOK, BUY_ORDERBOOK
+from bittrex.bittrex import Bittrex, API_V1_1, BOTH_ORDERBOOK
 
 from decimal import Decimal
 
 import datetime as dt
 
 from .broker import BrokerBaseClass
+from .orderbook import OrderBook
+from .execution import OrderStatus
 
 from ..exchange import BittrexExchange
+from ..exchange.markets import MarketStore
 
 from ..database.executed_order import ExecutedOrder
 
+from .. import ratelimit
+from .. import resilience
+
 import logging
 
 
@@ -27,8 +33,11 @@ class BittrexBroker(BrokerBaseClass):
 
     Attributes:
         session (sqlalchemy.orm.session.Session): Database connection.
+        markets (alchemist_lib.exchange.markets.MarketStore): Minimum size, step size and state of the markets, refreshed every market_ttl seconds.
         bittrex (bittrex.bittrex.Bittrex): Communication object.
     """
+
+    name = "bittrex"
     
     def __init__(self, api_key = None, secret_key = None):
 
@@ -45,46 +54,176 @@ class BittrexBroker(BrokerBaseClass):
         """
         
         BrokerBaseClass.__init__(self)
+        self.markets = MarketStore(exchange = BittrexExchange(), exchange_name = "bittrex", ttl = type(self).market_ttl)
         self.bittrex = Bittrex(api_key = api_key, api_secret = secret_key, api_version = API_V1_1)
 
 
-    def get_best_rate(self, asset, amount, field):
+    def get_order_books(self, tickers):
 
         """
-        Bittrex doesn't allow to place market orders submitted via API so we need to get the best bid/ask price for every order.
+        Downloads the order books of the BTC markets, Bittrex has no bulk endpoint so it's a call for every ticker.
 
         Args:
-            asset (alchemist_lib.database.asset.Asset): The asset we want to exchange for BTC or vice versa.
-            amount (decimal.Decimal): The amount we want to exchange.
-            field (str): Must be "ask" or "bid".
+            tickers (list[str]): List of tickers.
 
         Return:
-            price (decimal.Decimal): The best bid/ask, executing an order at this price is like submit a market order. If the book is too thin the return value is 0.
+            books (dict): Dictionary {ticker : alchemist_lib.broker.orderbook.OrderBook}. The books that can't be downloaded are missing.
+        """
+
+        order_books = {}
+        for ticker in tickers:
+            pair = "BTC-{}".format(ticker)
+            try:
+                book = resilience.call(func = lambda : self.bittrex.get_orderbook(market = pair, depth_type = BOTH_ORDERBOOK), exchange = "bittrex",
+                                       endpoint = "getorderbook.{}".format(pair), is_failure = resilience.bittrex_failed)
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Bittrex order book not retrieved. get_order_books() method. Asset: {}. {}".format(ticker, e))
+                continue
+
+            depth = BittrexBroker.order_book_depth
+            asks = [(level["Rate"], level["Quantity"]) for level in book["result"]["sell"][:depth]]
+            bids = [(level["Rate"], level["Quantity"]) for level in book["result"]["buy"][:depth]]
+            order_books[ticker] = OrderBook(ticker = ticker, asks = asks, bids = bids)
+
+        return order_books
+    
+	
+    def get_order_status(self, order_id, asset):
+
+        """
+        Returns the state of an order.
+
+        Args:
+            order_id (str): Order identifier.
+            asset (alchemist_lib.database.asset.Asset): The asset of the order.
+
+        Return:
+            status (alchemist_lib.broker.execution.OrderStatus): State of the order, the fee is in BTC.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the state can't be retrieved.
+        """
+
+        order = resilience.call(func = lambda : self.bittrex.get_order(uuid = order_id), exchange = "bittrex", endpoint = "getorder",
+                                endpoint_class = ratelimit.PRIVATE, is_failure = resilience.bittrex_failed)
+        order = order["result"]
+
+        filled = Decimal(str(order["Quantity"])) - Decimal(str(order["QuantityRemaining"]))
+        price = Decimal(str(order["PricePerUnit"])) if order["PricePerUnit"] != None else Decimal(0)
+
+        return OrderStatus(order_id = order_id, filled = filled, price = price, fee = Decimal(str(order["CommissionPaid"])), is_open = order["IsOpen"])
+
+
+    def cancel_order(self, order_id, asset):
+
+        """
+        Removes an open order from the book.
+
+        Args:
+            order_id (str): Order identifier.
+            asset (alchemist_lib.database.asset.Asset): The asset of the order.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the order can't be cancelled.
+        """
+
+        resilience.call(func = lambda : self.bittrex.cancel(uuid = order_id), exchange = "bittrex", endpoint = "cancel",
+                        endpoint_class = ratelimit.PRIVATE, is_failure = lambda response : response == None or response.get("success") == False)
+        logging.info("Order {} of {} cancelled.".format(order_id, asset.ticker))
+
+
+    def get_traded_volume(self, asset, since):
+
+        """
+        Returns the amount traded on the market since a datetime.
+
+        Args:
+            asset (alchemist_lib.database.asset.Asset): The asset.
+            since (datetime.datetime): Start datetime, UTC.
+
+        Return:
+            volume (decimal.Decimal): Amount traded, in units of the asset.
+
+        Note:
+            Bittrex returns only the last 100 trades, on very active markets the volume is underestimated.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the trades can't be retrieved.
         """
 
-        amount = abs(amount)
         pair = "BTC-{}".format(asset.ticker)
-        if field == "ask":
-            book = self.bittrex.get_orderbook(market = pair, depth_type = SELL_ORDERBOOK)
-            if book["success"] == False or book["result"] == None:
-                logging.debug("Bittrex api result is None or success is False. get_best_rate() method. Asset: {}".format(asset.ticker))
-                return Decimal(0)
-            
-        else:
-            book = self.bittrex.get_orderbook(market = pair, depth_type = BUY_ORDERBOOK)
-            if book["success"] == False or book["result"] == None:
-                logging.debug("Bittrex api result is None or success is False. get_best_rate() method. Asset: {}".format(asset.ticker))
-                return Decimal(0)
-            
-        values = book["result"]
-        
-        orders_sum = Decimal(0)
-        for book_item in values:
-            orders_sum += Decimal(book_item["Quantity"])
-            if orders_sum > amount:
-                return Decimal(book_item["Rate"])
-        
-        return Decimal(0)
+        trades = resilience.call(func = lambda : self.bittrex.get_market_history(market = pair), exchange = "bittrex",
+                                 endpoint = "getmarkethistory.{}".format(pair), is_failure = resilience.bittrex_failed)
+
+        volume = Decimal(0)
+        for trade in trades["result"]:
+            if dt.datetime.strptime(trade["TimeStamp"][:19], "%Y-%m-%dT%H:%M:%S") >= since:
+                volume += Decimal(str(trade["Quantity"]))
+
+        return volume
+    
+	
+    def get_orders_status(self, orders):
+
+        """
+        Returns the state of many orders with two calls: the open orders and the order history of the account.
+        Orders in neither list are asked one at a time.
+
+        Args:
+            orders (list[alchemist_lib.database.executed_order.ExecutedOrder]): Orders placed on Bittrex.
+
+        Return:
+            statuses (dict): Dictionary {order_id (str) : alchemist_lib.broker.execution.OrderStatus}.
+        """
+
+        if len(orders) == 0:
+            return {}
+
+        try:
+            open_orders = resilience.call(func = self.bittrex.get_open_orders, exchange = "bittrex", endpoint = "getopenorders",
+                                          endpoint_class = ratelimit.PRIVATE, is_failure = resilience.bittrex_failed)
+            history = resilience.call(func = self.bittrex.get_order_history, exchange = "bittrex", endpoint = "getorderhistory",
+                                      endpoint_class = ratelimit.PRIVATE, is_failure = resilience.bittrex_failed)
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Bittrex orders not retrieved. get_orders_status() method. {}".format(e))
+            return {}
+
+        known = {}
+        for item, is_open in [(item, True) for item in open_orders["result"]] + [(item, False) for item in history["result"]]:
+            filled = Decimal(str(item["Quantity"])) - Decimal(str(item["QuantityRemaining"]))
+            price = Decimal(str(item["PricePerUnit"])) if item.get("PricePerUnit") != None else Decimal(0)
+            fee = Decimal(str(item.get("Commission", item.get("CommissionPaid", 0)) or 0))
+            known[str(item["OrderUuid"])] = OrderStatus(order_id = item["OrderUuid"], filled = filled, price = price, fee = fee, is_open = is_open)
+
+        statuses = {}
+        for order in orders:
+            order_id = str(order.order_id)
+            if order_id in known:
+                statuses[order_id] = known[order_id]
+                continue
+            try:
+                statuses[order_id] = self.get_order_status(order_id = order.order_id, asset = order.asset)
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Status of order {} not retrieved. {}".format(order.order_id, e))
+
+        return statuses
+
+
+    def get_balances(self):
+
+        """
+        Returns the balances of the account with a single call.
+
+        Return:
+            balances (dict): Dictionary {ticker : decimal.Decimal}.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the balances can't be retrieved.
+        """
+
+        balances = resilience.call(func = self.bittrex.get_balances, exchange = "bittrex", endpoint = "getbalances",
+                                   endpoint_class = ratelimit.PRIVATE, is_failure = resilience.bittrex_failed)
+        return {item["Currency"] : Decimal(str(item["Balance"])) for item in balances["result"]}
     
 	
     def place_order(self, asset, amount, order_type):
@@ -103,13 +242,10 @@ class BittrexBroker(BrokerBaseClass):
         
         pair = "BTC-{}".format(asset.ticker)
         
-        min_order_size = BittrexExchange().get_min_order_size(asset = asset)
-        logging.debug("Min order size for {} is {}".format(asset, min_order_size))
-        
-        if amount > min_order_size:
+        if amount > 0:
             field = "ask"
             operation = "buy"
-        elif amount < (min_order_size * (-1)):
+        elif amount < 0:
             field = "bid"
             operation = "sell"
         else:
@@ -121,15 +257,29 @@ class BittrexBroker(BrokerBaseClass):
             logging.critical("Unknown order type. NotImplemented raised.")
             raise NotImplemented("Unknown order type. NotImplemented raised.")
 
+        if rate == 0:
+            logging.warning("No price for {}, order not placed.".format(pair))
+            return -1
+
+        #Price rounded to the tick and amount to the step size of the market, orders below the minimums would be rejected.
+        rate = self.markets.round_price(ticker = asset.ticker, price = rate, amount = amount)
+        amount = self.markets.round_amount(ticker = asset.ticker, amount = amount, price = rate)
+        if amount == 0:
+            logging.warning("Order of {} below the minimum size of the market, not placed.".format(pair))
+            return -1
+
         logging.debug("Order: Pair: {}. Amount: {}. Operation: {}".format(pair, amount, operation))
         
-        if operation == "buy":
-            order_return_dict = self.bittrex.buy_limit(market = pair, rate = rate, quantity = amount)
-        else:
-            order_return_dict = self.bittrex.sell_limit(market = pair, rate = rate, quantity = abs(amount))
-        
-        if order_return_dict["result"] == None:
-            logging.warning("Bittrex api result is None or success is False. place_order() method. Order id will be -1. Asset: {}".format(asset.ticker))
+        try:
+            #An order is never sent twice.
+            if operation == "buy":
+                order_return_dict = resilience.call(func = lambda : self.bittrex.buy_limit(market = pair, rate = rate, quantity = amount), exchange = "bittrex",
+                                                    endpoint = "buylimit.{}".format(pair), endpoint_class = ratelimit.PRIVATE, attempts = 1, is_failure = resilience.bittrex_failed)
+            else:
+                order_return_dict = resilience.call(func = lambda : self.bittrex.sell_limit(market = pair, rate = rate, quantity = abs(amount)), exchange = "bittrex",
+                                                    endpoint = "selllimit.{}".format(pair), endpoint_class = ratelimit.PRIVATE, attempts = 1, is_failure = resilience.bittrex_failed)
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Bittrex order failed. place_order() method. Order id will be -1. Asset: {}. {}".format(asset.ticker, e))
             return -1
 
         order_id = str(order_return_dict["result"]["uuid"])
@@ -145,7 +295,8 @@ class BittrexBroker(BrokerBaseClass):
                               operation = operation,
                               order_type = order_type,
                               broker_name = "bittrex",
-                              exchange_name = "bittrex"
+                              exchange_name = "bittrex",
+                              ts_name = self.ts_name
                               )
         
         self.session.add(order)
@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
 
+from decimal import Decimal
+
 from ..database.instrument import Instrument
 from ..database.ptf_allocation import PtfAllocation
 
+from .orderbook import OrderBookCache
+
 from .. import utils
+from .. import values
+from .. import resilience
 
 import logging
 
@@ -17,9 +23,30 @@ class BrokerBaseClass(ABC):
     Abstract methods:
         - place_order(allocs, amount, operation, order_type): It has to place an order based on parameters.
 
+    Optional methods, the defaults report that nothing is known:
+        - get_order_books(tickers): It has to download the order books of the markets and return a dictionary {ticker : alchemist_lib.broker.orderbook.OrderBook}.
+        - get_order_status(order_id, asset): It has to return the state of an order (alchemist_lib.broker.execution.OrderStatus).
+        - cancel_order(order_id, asset): It has to remove an open order from the book.
+        - get_traded_volume(asset, since): It has to return the amount traded on the market since a datetime.
+        - get_balances(): It has to return the balances of the account, with a single call if the exchange allows it.
+    Without get_order_status() and cancel_order() the orders are not followed after they are placed (see ``tracks_orders()``).
+
     Attributes:
+        name (str): Class attribute. Name of the broker, as saved in the database.
         session (sqlalchemy.orm.session.Session): Database connection. Default is None.
+        ts_name (str): Trading system the orders are placed for, saved with them. Default is None.
+        order_books (alchemist_lib.broker.orderbook.OrderBookCache): Order books downloaded recently.
+        algorithm (alchemist_lib.broker.execution.ExecutionAlgorithm): Algorithm that splits the orders of execute(). If None every order is sent at once. Default is None.
+        order_book_ttl (float): Class attribute. Seconds an order book is valid for.
+        order_book_depth (int): Class attribute. Number of levels downloaded for every side of a book.
+        markets (alchemist_lib.exchange.markets.MarketStore): Trading rules of the markets of the exchange, None if unknown.
+        market_ttl (float): Class attribute. Seconds the trading rules are valid for.
     """
+
+    name = None
+    order_book_ttl = 2
+    order_book_depth = 100
+    market_ttl = 3600
     
     def __init__(self):
 
@@ -28,6 +55,10 @@ class BrokerBaseClass(ABC):
         """
         
         self.session = None
+        self.ts_name = None
+        self.order_books = OrderBookCache(fetch = self.get_order_books, ttl = type(self).order_book_ttl)
+        self.algorithm = None
+        self.markets = None
 
 
     def set_session(self, session):
@@ -42,11 +73,205 @@ class BrokerBaseClass(ABC):
         self.session = session
 
 
+    def set_ts_name(self, ts_name):
+
+        """
+        Setter method.
+
+        Args:
+            ts_name (str): Trading system the next orders are placed for, None if they don't belong to one.
+        """
+
+        self.ts_name = ts_name
+
+
     @abstractmethod
     def place_order(self, asset, amount, operation, order_type):
         pass
 
 
+    def get_order_books(self, tickers):
+        logging.debug("{} doesn't download order books.".format(type(self).__name__))
+        return {}
+
+
+    def get_order_status(self, order_id, asset):
+        logging.warning("{} can't read the state of order {}.".format(type(self).__name__, order_id))
+        return None
+
+
+    def cancel_order(self, order_id, asset):
+        logging.warning("{} can't cancel order {}.".format(type(self).__name__, order_id))
+
+
+    def get_traded_volume(self, asset, since):
+        logging.debug("{} doesn't know the volume traded on {}.".format(type(self).__name__, asset.ticker))
+        return Decimal(0)
+
+
+    def get_balances(self):
+        logging.warning("{} can't read the balances of the account.".format(type(self).__name__))
+        return None
+
+
+    def tracks_orders(self):
+
+        """
+        Return:
+            tracks (bool): True if the broker has a name and implements get_order_status() and cancel_order(), so its orders can be followed by a FillTracker.
+        """
+
+        return self.name != None and type(self).get_order_status != BrokerBaseClass.get_order_status and type(self).cancel_order != BrokerBaseClass.cancel_order
+
+
+    def get_orders_status(self, orders):
+
+        """
+        Returns the state of many orders. This implementation asks for one order at a time, brokers override it with batched calls.
+
+        Args:
+            orders (list[alchemist_lib.database.executed_order.ExecutedOrder]): Orders placed by this broker.
+
+        Return:
+            statuses (dict): Dictionary {order_id (str) : alchemist_lib.broker.execution.OrderStatus}. Orders whose state can't be retrieved are missing.
+        """
+
+        statuses = {}
+        for order in orders:
+            try:
+                status = self.get_order_status(order_id = order.order_id, asset = order.asset)
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Status of order {} not retrieved. {}".format(order.order_id, e))
+                continue
+            if status != None:
+                statuses[str(order.order_id)] = status
+
+        return statuses
+
+
+    def set_algorithm(self, algorithm):
+
+        """
+        Setter method.
+
+        Args:
+            algorithm (alchemist_lib.broker.execution.ExecutionAlgorithm): Algorithm that splits the orders of execute(), None to send every order at once.
+        """
+
+        self.algorithm = algorithm
+
+
+    def idle(self, ts_name):
+
+        """
+        Called by a trading system in the ticks it doesn't send orders. Brokers shared by many trading systems use it to stop waiting for this one.
+
+        Args:
+            ts_name (str): Name of the trading system.
+        """
+
+        pass
+
+
+    def get_account_ts_names(self, ts_name):
+
+        """
+        Returns the trading systems that trade on the account of the broker, used to reconcile the portfolios with the balances.
+
+        Args:
+            ts_name (str): Name of the trading system that asks.
+
+        Return:
+            ts_names (list[str]): Only ts_name, unless the broker is shared.
+        """
+
+        return [ts_name]
+
+
+    def send_orders(self, allocs, orders_type = "MKT"):
+
+        """
+        Sends the orders of the allocations, at once or through the execution algorithm.
+
+        Args:
+            allocs (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): Allocations to execute.
+            orders_type (str, optional): Type of order. Default is MKT.
+
+        Return:
+            results (list[tuple]): List of (allocation, order_id). With an algorithm the allocation has the executed amount and the realized price, order_id is the one of the first child order and -1 if nothing was executed.
+        """
+
+        if self.algorithm == None:
+            return [(alloc, self.place_order(asset = alloc.asset, amount = alloc.amount, order_type = orders_type)) for alloc in allocs]
+
+        reports = self.algorithm.run(broker = self, orders = [(alloc.asset, Decimal(alloc.amount)) for alloc in allocs], order_type = orders_type)
+
+        results = []
+        for alloc in allocs:
+            report = None
+            for r in reports:
+                if r.asset == alloc.asset:
+                    report = r
+
+            if report == None or report.filled == 0:
+                results.append((alloc, -1))
+                continue
+
+            executed = alloc.deepcopy()
+            executed.amount = report.filled
+            executed.base_currency_amount = report.filled * report.price
+            executed.asset = alloc.asset
+            results.append((executed, report.order_ids[0]))
+
+        return results
+
+
+    def estimate_execution(self, asset, amount):
+
+        """
+        Estimates the execution of a market order walking the whole visible book.
+
+        Args:
+            asset (alchemist_lib.database.asset.Asset): The asset we want to exchange for BTC or vice versa.
+            amount (decimal.Decimal): The amount we want to exchange, positive to buy and negative to sell.
+
+        Return:
+            estimate (alchemist_lib.broker.orderbook.ExecutionEstimate): The expected execution, None if the book can't be downloaded.
+        """
+
+        book = self.order_books.get(ticker = asset.ticker)
+        if book == None:
+            return None
+        return book.estimate(amount = amount)
+
+
+    def get_best_rate(self, asset, amount, field):
+
+        """
+        The exchanges don't allow to place market orders so we need to get a limit price that fills the whole amount at once.
+
+        Args:
+            asset (alchemist_lib.database.asset.Asset): The asset we want to exchange for BTC or vice versa.
+            amount (decimal.Decimal): The amount we want to exchange.
+            field (str): Must be "ask" or "bid".
+
+        Return:
+            price (decimal.Decimal): Price of the last level of the book needed to fill the amount. If the book is too thin it's the price of the last visible level, so the rest of the order stays on the book. If the book can't be downloaded the return value is 0.
+        """
+
+        amount = abs(amount) if field == "ask" else abs(amount) * (-1)
+        estimate = self.estimate_execution(asset = asset, amount = amount)
+        if estimate == None:
+            return Decimal(0)
+
+        logging.debug("{} {} {}: expected vwap {}, slippage {}.".format(estimate.side, estimate.amount, asset.ticker, estimate.vwap, estimate.slippage))
+
+        if estimate.filled < estimate.amount:
+            logging.warning("The {} book is too thin to fill {}, {} will stay on the book.".format(asset.ticker, estimate.amount, estimate.amount - estimate.filled))
+        
+        return estimate.worst_price
+
+
     def execute(self, allocs, ts_name, curr_ptf, orders_type = "MKT"):
 
         """
@@ -61,6 +286,9 @@ class BrokerBaseClass(ABC):
         
         allocs = utils.to_list(allocs)
 
+        #One bulk download, place_order() finds the books in the cache.
+        self.order_books.get_many(tickers = [alloc.ticker for alloc in allocs if alloc.ticker != "BTC"])
+
         cryptocurrency_id = self.session.query(Instrument).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
         
         btc = PtfAllocation(ticker = "BTC",
@@ -78,31 +306,32 @@ class BrokerBaseClass(ABC):
 
         new_curr_ptf = []
 
+        #Current positions by (ticker, instrument_id), every order finds its position without scanning the portfolio.
+        positions = utils.KeyedCollection(items = curr_ptf)
+
         logging.debug("Currently in the execute() method.")
         logging.debug("Initial BTC balance: {}".format(btc.base_currency_amount))
         
-        for alloc in allocs:
+        for alloc, order_id in self.send_orders(allocs = [alloc for alloc in allocs if alloc.amount < 0], orders_type = orders_type):
             if alloc.amount < 0:
-                order_id = self.place_order(asset = alloc.asset, amount = alloc.amount, order_type = orders_type)
 
                 logging.debug("<SELL> Asset: {} -> {}".format(alloc.asset, order_id))
 
+                ptf_alloc = positions.get(alloc)
+
                 if order_id == -1:
                     #If I can't sell it, the amount is the same of the one in curr_ptf.
-                    for curr_ptf_alloc in curr_ptf:
-                        if curr_ptf_alloc.asset == alloc.asset:
-                            new_curr_ptf.append(curr_ptf_alloc.deepcopy())
+                    if ptf_alloc != None:
+                        new_curr_ptf.append(ptf_alloc.deepcopy())
                 else:
-                    if alloc.asset in [ptf_alloc.asset for ptf_alloc in curr_ptf]:
-                        for ptf_alloc in curr_ptf:
-                            if ptf_alloc.asset == alloc.asset:
-                                new_curr_ptf_alloc = ptf_alloc.deepcopy()
-                                new_curr_ptf_alloc.amount = ptf_alloc.amount - abs(alloc.amount)
-                                new_curr_ptf_alloc.base_currency_amount = ptf_alloc.base_currency_amount - abs(alloc.base_currency_amount)
-                                
-                                new_curr_ptf.append(new_curr_ptf_alloc)
+                    if ptf_alloc != None:
+                        new_curr_ptf_alloc = ptf_alloc.deepcopy()
+                        new_curr_ptf_alloc.amount = ptf_alloc.amount - abs(alloc.amount)
+                        new_curr_ptf_alloc.base_currency_amount = ptf_alloc.base_currency_amount - abs(alloc.base_currency_amount)
+                        
+                        new_curr_ptf.append(new_curr_ptf_alloc)
                     else:
-                        new_curr_ptf.append(alloc)
+                        new_curr_ptf.append(values.to_mapped(obj = alloc))
 
                     btc.amount += abs(alloc.base_currency_amount)
                     btc.base_currency_amount += abs(alloc.base_currency_amount)
@@ -110,29 +339,26 @@ class BrokerBaseClass(ABC):
                     logging.debug("After I've sold {} the BTC balance is {}".format(alloc.asset.ticker, btc.amount))
                     
 
-        for alloc in allocs:
+        for alloc, order_id in self.send_orders(allocs = [alloc for alloc in allocs if alloc.amount > 0], orders_type = orders_type):
             if alloc.amount > 0:
-                order_id = self.place_order(asset = alloc.asset, amount = alloc.amount, order_type = orders_type)
                 
                 logging.debug("<BUY> Asset: {} -> {}".format(alloc.asset, order_id))
                 
+                ptf_alloc = positions.get(alloc)
+
                 if order_id == -1:
-                    if alloc.asset in [ptf_alloc.asset for ptf_alloc in curr_ptf]:
-                        for curr_ptf_alloc in curr_ptf:
-                            if curr_ptf_alloc.asset == alloc.asset:
-                                new_curr_ptf.append(curr_ptf_alloc.deepcopy())
+                    if ptf_alloc != None:
+                        new_curr_ptf.append(ptf_alloc.deepcopy())
                             
                 else:
-                    if alloc.asset in [ptf_alloc.asset for ptf_alloc in curr_ptf]:
-                        for ptf_alloc in curr_ptf:
-                            if ptf_alloc.asset == alloc.asset:
-                                new_curr_ptf_alloc = ptf_alloc.deepcopy()
-                                new_curr_ptf_alloc.amount = ptf_alloc.amount + alloc.amount
-                                new_curr_ptf_alloc.base_currency_amount = ptf_alloc.base_currency_amount + alloc.base_currency_amount
-                                
-                                new_curr_ptf.append(new_curr_ptf_alloc)
+                    if ptf_alloc != None:
+                        new_curr_ptf_alloc = ptf_alloc.deepcopy()
+                        new_curr_ptf_alloc.amount = ptf_alloc.amount + alloc.amount
+                        new_curr_ptf_alloc.base_currency_amount = ptf_alloc.base_currency_amount + alloc.base_currency_amount
+                        
+                        new_curr_ptf.append(new_curr_ptf_alloc)
                     else:
-                        new_curr_ptf.append(alloc)
+                        new_curr_ptf.append(values.to_mapped(obj = alloc))
 
                     
                     btc.amount -= alloc.base_currency_amount
@@ -141,6 +367,11 @@ class BrokerBaseClass(ABC):
                     logging.debug("After I've bought {} the BTC balance is {}".format(alloc.asset.ticker, btc.amount))
                     
 
+        #Positions without an order (inside the no-trade band or below the minimums of the market) are kept as they are.
+        for curr_ptf_alloc in positions.subtract([alloc for alloc in allocs if alloc.amount != 0]):
+            if curr_ptf_alloc.ticker != "BTC":
+                new_curr_ptf.append(curr_ptf_alloc.deepcopy())
+
         logging.debug("BTC balance at the end of execute() is {}".format(btc.amount))
 
         #Shouldn't go inside the following statetement.
@@ -0,0 +1,391 @@
+from abc import ABC, abstractmethod
+
+from collections import namedtuple
+
+from decimal import Decimal
+
+import datetime as dt
+
+import math
+
+import time
+
+import logging
+
+from ..database.executed_order import ExecutedOrder
+
+from .. import resilience
+
+
+
+#State of an order on the exchange.
+#    order_id (str, int): Order identifier.
+#    filled (decimal.Decimal): Amount executed, always positive.
+#    price (decimal.Decimal): Average execution price, 0 if nothing is executed.
+#    fee (decimal.Decimal): Fee paid, in BTC.
+#    is_open (bool): True if the order is still on the book.
+OrderStatus = namedtuple("OrderStatus", ["order_id", "filled", "price", "fee", "is_open"])
+
+#Result of a parent order.
+#    asset (alchemist_lib.database.asset.Asset): The asset.
+#    amount (decimal.Decimal): Amount requested, positive to buy and negative to sell.
+#    filled (decimal.Decimal): Amount executed, with the sign of amount.
+#    price (decimal.Decimal): Volume weighted average price of the child orders, 0 if nothing is executed.
+#    fee (decimal.Decimal): Fees paid by the child orders, in BTC.
+#    order_ids (list): Identifiers of the child orders.
+ExecutionReport = namedtuple("ExecutionReport", ["asset", "amount", "filled", "price", "fee", "order_ids"])
+
+
+class ChildOrder():
+
+    """
+    An order sent to the exchange by an execution algorithm.
+
+    Attributes:
+        order_id (str, int): Order identifier.
+        amount (decimal.Decimal): Amount of the order, always positive.
+        filled (decimal.Decimal): Amount executed.
+        price (decimal.Decimal): Average execution price.
+        fee (decimal.Decimal): Fee paid, in BTC.
+        is_open (bool): True if the order is still on the book.
+    """
+
+    def __init__(self, order_id, amount):
+        self.order_id = order_id
+        self.amount = amount
+        self.filled = Decimal(0)
+        self.price = Decimal(0)
+        self.fee = Decimal(0)
+        self.is_open = True
+
+
+    def __repr__(self):
+        return "<ChildOrder(order_id={}, amount={}, filled={}, price={}, is_open={})>".format(self.order_id, self.amount, self.filled, self.price, self.is_open)
+
+
+class ParentOrder():
+
+    """
+    An allocation delta split by an execution algorithm.
+
+    Attributes:
+        asset (alchemist_lib.database.asset.Asset): The asset.
+        amount (decimal.Decimal): Amount to exchange, positive to buy and negative to sell.
+        children (list[ChildOrder]): Orders sent so far.
+        done (bool): True if nothing else will be sent.
+        market_volume (decimal.Decimal): Volume traded on the market since the start, used by participation algorithms.
+    """
+
+    def __init__(self, asset, amount):
+        self.asset = asset
+        self.amount = Decimal(amount)
+        self.children = []
+        self.done = False
+        self.market_volume = Decimal(0)
+
+
+    @property
+    def sign(self):
+        return 1 if self.amount > 0 else -1
+
+
+    @property
+    def filled(self):
+        return sum([child.filled for child in self.children], Decimal(0))
+
+
+    @property
+    def working(self):
+        #Amount on the book and not executed yet.
+        return sum([child.amount - child.filled for child in self.children if child.is_open], Decimal(0))
+
+
+    @property
+    def remaining(self):
+        #Amount not sent yet.
+        return max(Decimal(0), abs(self.amount) - self.filled - self.working)
+
+
+    def report(self):
+        filled = self.filled
+        notional = sum([child.filled * child.price for child in self.children], Decimal(0))
+        return ExecutionReport(asset = self.asset,
+                               amount = self.amount,
+                               filled = filled * self.sign,
+                               price = notional / filled if filled > 0 else Decimal(0),
+                               fee = sum([child.fee for child in self.children], Decimal(0)),
+                               order_ids = [child.order_id for child in self.children])
+
+
+class ExecutionAlgorithm(ABC):
+
+    """
+    Abstract class used by the algorithms that split an order in child orders over a time window.
+    Every child order is a marketable limit order sent by ``place_order()`` of the broker.
+    At the end of the window the child orders still open are cancelled and the average execution price of every child is saved in ``ExecutedOrder.price``.
+
+    Abstract methods:
+        - child_amount(parent, elapsed): It has to return the amount (always positive) to send now for the parent order, 0 to wait.
+
+    Attributes:
+        duration (float): Length of the window in seconds. If the deadline of the tick comes first, the window and the poll interval are shortened in proportion.
+        poll_interval (float): Seconds between two checks of the child orders.
+        min_amount (decimal.Decimal): Child orders smaller than this are not sent.
+        settle_margin (float): Seconds kept before the deadline of the tick to cancel and check the child orders still open.
+    """
+
+    def __init__(self, duration, poll_interval = 10, min_amount = 0, settle_margin = 5, sleep = time.sleep, clock = time.time):
+
+        """
+        Costructor method.
+
+        Args:
+            duration (float): Length of the window in seconds.
+            poll_interval (float, optional): Seconds between two checks of the child orders. Default is 10.
+            min_amount (decimal.Decimal, optional): Child orders smaller than this are not sent. Default is 0.
+            settle_margin (float, optional): Seconds kept before the deadline to cancel and check the child orders. Default is 5.
+            sleep (callable, optional): Function used to wait. Default is time.sleep.
+            clock (callable, optional): Returns the current time in seconds. Default is time.time.
+        """
+
+        assert duration > 0, "The duration must be > 0."
+        assert poll_interval > 0, "The poll interval must be > 0."
+        assert settle_margin >= 0, "The settle margin must be >= 0."
+
+        self.duration = duration
+        self.poll_interval = poll_interval
+        self.min_amount = Decimal(min_amount)
+        self.settle_margin = settle_margin
+        self._sleep = sleep
+        self._clock = clock
+
+
+    @abstractmethod
+    def child_amount(self, parent, elapsed):
+        pass
+
+
+    def before_poll(self, broker, parents, start, now):
+        pass
+
+
+    def _update(self, broker, parent):
+        for child in parent.children:
+            if child.is_open == False:
+                continue
+            try:
+                status = broker.get_order_status(order_id = child.order_id, asset = parent.asset)
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Status of order {} not retrieved. {}".format(child.order_id, e))
+                continue
+            if status == None:
+                continue
+            child.filled = status.filled
+            child.price = status.price
+            child.fee = status.fee
+            child.is_open = status.is_open
+
+
+    def _send(self, broker, parent, amount, order_type):
+        order_id = broker.place_order(asset = parent.asset, amount = amount * parent.sign, order_type = order_type)
+        if order_id == -1:
+            logging.warning("Child order of {} for {} failed, the parent order is stopped.".format(parent.asset.ticker, amount))
+            parent.done = True
+            return
+        parent.children.append(ChildOrder(order_id = order_id, amount = amount))
+
+
+    def _save_prices(self, broker, parents):
+        if broker.session == None:
+            return
+        for parent in parents:
+            for child in parent.children:
+                values = {"filled" : child.filled * parent.sign,
+                          "status" : "open" if child.is_open else ("filled" if child.filled >= child.amount else "cancelled"),
+                          "updated_datetime" : dt.datetime.utcnow()}
+                if child.filled > 0:
+                    values["price"] = child.price
+                    values["paid_fee"] = child.fee
+                broker.session.query(ExecutedOrder).filter(ExecutedOrder.order_id == str(child.order_id)).update(values)
+        broker.session.commit()
+
+
+    def run(self, broker, orders, order_type = "MKT"):
+
+        """
+        Executes the orders at the same time, every one split in child orders.
+
+        Args:
+            broker (alchemist_lib.broker.*): The broker that places the child orders.
+            orders (list[tuple]): List of (asset, amount), positive amounts are buys and negative ones are sells.
+            order_type (str, optional): Type of the child orders. Default is MKT.
+
+        Return:
+            reports (list[ExecutionReport]): One report for every order, in the same order.
+        """
+
+        parents = [ParentOrder(asset = asset, amount = amount) for asset, amount in orders if amount != 0]
+
+        #A window longer than the time left before the deadline is compressed, with the whole schedule.
+        #It ends settle_margin seconds before the deadline, so the child orders still open can be cancelled and checked in time.
+        start = self._clock()
+        duration = self.duration
+        left = resilience.remaining()
+        if left != None and left - self.settle_margin < duration:
+            duration = left - self.settle_margin
+        if duration <= 0:
+            logging.warning("No time left before the deadline to execute {} orders, nothing is sent.".format(len(parents)))
+            return [parent.report() for parent in parents]
+        poll_interval = self.poll_interval * duration / self.duration
+        end = start + duration
+
+        while True:
+            now = self._clock()
+            self.before_poll(broker = broker, parents = parents, start = start, now = now)
+
+            for parent in parents:
+                self._update(broker = broker, parent = parent)
+                if parent.done:
+                    continue
+
+                if parent.remaining <= 0 or parent.remaining < self.min_amount:
+                    parent.done = parent.working == 0
+                    continue
+
+                amount = min(self.child_amount(parent = parent, elapsed = (now - start) / duration), parent.remaining)
+                if amount > 0 and amount >= self.min_amount:
+                    self._send(broker = broker, parent = parent, amount = amount, order_type = order_type)
+
+            now = self._clock()
+            if now >= end or all([parent.done for parent in parents]):
+                break
+            self._sleep(min(poll_interval, end - now))
+
+        for parent in parents:
+            for child in parent.children:
+                if child.is_open:
+                    try:
+                        broker.cancel_order(order_id = child.order_id, asset = parent.asset)
+                    except resilience.ExchangeUnavailable as e:
+                        logging.warning("Order {} not cancelled. {}".format(child.order_id, e))
+            self._update(broker = broker, parent = parent)
+
+        self._save_prices(broker = broker, parents = parents)
+
+        reports = [parent.report() for parent in parents]
+        for report in reports:
+            logging.info("{}: {} of {} executed at {}.".format(report.asset.ticker, report.filled, report.amount, report.price))
+
+        return reports
+
+
+class TWAP(ExecutionAlgorithm):
+
+    """
+    Time weighted average price: the order is split in equal slices sent at regular intervals.
+    A slice that isn't filled is added to the next one.
+
+    Attributes:
+        slices (int): Number of child orders.
+    """
+
+    def __init__(self, duration, slices = 10, **kwargs):
+
+        """
+        Costructor method.
+
+        Args:
+            duration (float): Length of the window in seconds.
+            slices (int, optional): Number of child orders. Default is 10.
+            kwargs: See ExecutionAlgorithm. The poll interval is the length of a slice.
+        """
+
+        assert slices > 0, "The number of slices must be > 0."
+
+        kwargs.setdefault("poll_interval", float(duration) / slices)
+        ExecutionAlgorithm.__init__(self, duration = duration, **kwargs)
+        self.slices = slices
+
+
+    def child_amount(self, parent, elapsed):
+        #The first slice is sent at once, the last one at (slices - 1) / slices of the window.
+        #The poll interval is a slice, so the clock is on the boundary: the tolerance avoids skipping a slice for a rounding error.
+        sent_slices = min(self.slices, math.floor(elapsed * self.slices + 1e-6) + 1)
+        target = abs(parent.amount) * sent_slices / self.slices
+        return max(Decimal(0), target - parent.filled - parent.working)
+
+
+class Iceberg(ExecutionAlgorithm):
+
+    """
+    Only a small part of the order is on the book, the next part is sent when the previous one is filled.
+
+    Attributes:
+        visible_amount (decimal.Decimal): Size of every child order.
+    """
+
+    def __init__(self, duration, visible_amount, **kwargs):
+
+        """
+        Costructor method.
+
+        Args:
+            duration (float): Length of the window in seconds.
+            visible_amount (decimal.Decimal): Size of every child order.
+            kwargs: See ExecutionAlgorithm.
+        """
+
+        assert visible_amount > 0, "The visible amount must be > 0."
+
+        ExecutionAlgorithm.__init__(self, duration = duration, **kwargs)
+        self.visible_amount = Decimal(visible_amount)
+
+
+    def child_amount(self, parent, elapsed):
+        if parent.working > 0:
+            return Decimal(0)
+        return self.visible_amount
+
+
+class POV(ExecutionAlgorithm):
+
+    """
+    Participation of volume: the executed amount follows a fraction of the volume traded on the market since the start.
+
+    Attributes:
+        participation (float): Fraction of the market volume, between 0 and 1.
+    """
+
+    def __init__(self, duration, participation = 0.1, **kwargs):
+
+        """
+        Costructor method.
+
+        Args:
+            duration (float): Length of the window in seconds.
+            participation (float, optional): Fraction of the market volume. Default is 0.1.
+            kwargs: See ExecutionAlgorithm.
+        """
+
+        assert 0 < participation <= 1, "The participation must be between 0 and 1."
+
+        ExecutionAlgorithm.__init__(self, duration = duration, **kwargs)
+        self.participation = Decimal(str(participation))
+
+
+    def before_poll(self, broker, parents, start, now):
+        since = dt.datetime.utcfromtimestamp(start)
+        for parent in parents:
+            if parent.done:
+                continue
+            try:
+                parent.market_volume = broker.get_traded_volume(asset = parent.asset, since = since)
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Traded volume of {} not retrieved. {}".format(parent.asset.ticker, e))
+
+
+    def child_amount(self, parent, elapsed):
+        #Our own child orders are part of the market volume.
+        others = max(Decimal(0), parent.market_volume - parent.filled)
+        target = others * self.participation / (1 - self.participation) if self.participation < 1 else others
+        return max(Decimal(0), target - parent.filled - parent.working)
@@ -0,0 +1,250 @@
+from decimal import Decimal
+
+import datetime as dt
+
+import threading
+
+import logging
+
+import pandas as pd
+
+from ..database import session_scope
+from ..database.executed_order import ExecutedOrder
+from ..database.ptf_allocation import PtfAllocation
+
+from .. import resilience
+
+
+
+class FillTracker():
+
+    """
+    Follows the orders placed by a broker until they are filled or cancelled, and keeps the portfolios in line with the balances of the account.
+    Only the orders of the trading systems on the account of the broker are followed (see ``get_account_ts_names()``), other trading systems can share the database and the exchange.
+
+    The state of the open orders is read in batches (see ``get_orders_status()`` of the brokers), in a background thread started by ``start()`` or with an explicit ``poll()``.
+    Before a new tick ``settle()`` cancels the orders still open, or sends their unfilled part again at a fresh price, and ``reconcile()`` corrects the allocations with the balances read in a single call.
+
+    Attributes:
+        broker (alchemist_lib.broker.*): The broker that placed the orders.
+        ts_name (str): Name of the trading system whose orders are followed.
+        poll_interval (float): Seconds between two polls of the background thread.
+        reprice (bool): If True settle() sends the unfilled part of a cancelled order again, otherwise it's left to the next rebalance.
+        tolerance (decimal.Decimal): Relative difference between balance and allocations below which nothing is corrected.
+    """
+
+    def __init__(self, broker, ts_name, poll_interval = 10, reprice = False, tolerance = "0.001"):
+
+        """
+        Costructor method.
+
+        Args:
+            broker (alchemist_lib.broker.*): The broker that placed the orders.
+            ts_name (str): Name of the trading system whose orders are followed.
+            poll_interval (float, optional): Seconds between two polls of the background thread. Default is 10.
+            reprice (bool, optional): Send again the unfilled part of the orders cancelled by settle(). Default is False.
+            tolerance (str, decimal.Decimal, optional): Relative difference ignored by reconcile(). Default is 0.001.
+        """
+
+        assert broker.name != None, "The broker must have a name."
+
+        self.broker = broker
+        self.ts_name = ts_name
+        self.poll_interval = poll_interval
+        self.reprice = reprice
+        self.tolerance = Decimal(tolerance)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def open_orders(self, session):
+
+        """
+        Args:
+            session (sqlalchemy.orm.session.Session): Connection to the database.
+
+        Return:
+            orders (list[alchemist_lib.database.executed_order.ExecutedOrder]): Orders of the broker placed for the trading systems of the account and not filled or cancelled yet.
+        """
+
+        ts_names = self.broker.get_account_ts_names(ts_name = self.ts_name)
+        return session.query(ExecutedOrder).filter(ExecutedOrder.broker_name == self.broker.name,
+                                                   ExecutedOrder.ts_name.in_(ts_names),
+                                                   ExecutedOrder.status == "open").all()
+
+
+    def _apply(self, order, status):
+        sign = 1 if order.amount > 0 else -1
+        order.filled = status.filled * sign
+        if status.filled > 0:
+            order.price = status.price
+            order.paid_fee = status.fee
+        if status.is_open:
+            order.status = "open"
+        else:
+            order.status = "filled" if status.filled >= abs(order.amount) else "cancelled"
+        order.updated_datetime = dt.datetime.utcnow()
+
+
+    def poll(self, session):
+
+        """
+        Reads the state of the open orders and saves fill amount, price, fee and status.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): Connection to the database.
+
+        Return:
+            orders (list[alchemist_lib.database.executed_order.ExecutedOrder]): Orders updated.
+        """
+
+        with self._lock:
+            orders = self.open_orders(session = session)
+            if len(orders) == 0:
+                return []
+
+            statuses = self.broker.get_orders_status(orders = orders)
+
+            updated = []
+            for order in orders:
+                status = statuses.get(str(order.order_id))
+                if status == None:
+                    continue
+                self._apply(order = order, status = status)
+                updated.append(order)
+                if order.status != "open":
+                    logging.info("Order {} of {} {}: {} of {} at {}.".format(order.order_id, order.ticker, order.status, order.filled, order.amount, order.price))
+
+            session.commit()
+            return updated
+
+
+    def settle(self, session):
+
+        """
+        Cancels the orders still open. If reprice is True the unfilled part is sent again at the current price of the book.
+        The broker must have a session, the new orders are saved with it.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): Connection to the database.
+
+        Return:
+            cancelled (list[alchemist_lib.database.executed_order.ExecutedOrder]): Orders cancelled.
+        """
+
+        self.poll(session = session)
+
+        cancelled = []
+        with self._lock:
+            for order in self.open_orders(session = session):
+                try:
+                    self.broker.cancel_order(order_id = order.order_id, asset = order.asset)
+                except resilience.ExchangeUnavailable as e:
+                    logging.warning("Order {} not cancelled, it will be tried again. {}".format(order.order_id, e))
+                    continue
+                cancelled.append(order)
+
+        #The final fills of the cancelled orders.
+        self.poll(session = session)
+
+        if self.reprice:
+            for order in cancelled:
+                remaining = order.amount - (order.filled if order.filled != None else 0)
+                if remaining != 0:
+                    logging.info("Order {} of {} sent again for {}.".format(order.order_id, order.ticker, remaining))
+                    self.broker.place_order(asset = order.asset, amount = remaining, order_type = order.order_type)
+
+        return cancelled
+
+
+    def reconcile(self, session, ts_names = None):
+
+        """
+        Compares the balances of the account with the allocations of the trading systems and scales the allocations of every asset to its balance.
+        The balance of an asset held by many trading systems is split pro rata. Assets without allocations are ignored.
+
+        Args:
+            session (sqlalchemy.orm.session.Session): Connection to the database.
+            ts_names (list[str], optional): Trading systems that trade on the account of the broker. Default is every trading system.
+
+        Return:
+            df (pandas.DataFrame): A dataframe with the following columns:
+                * ticker (str): Must be the index.
+                * expected (decimal.Decimal): Sum of the allocations.
+                * actual (decimal.Decimal): Balance of the account.
+            Only assets with a difference above the tolerance are present. Empty if the balances can't be retrieved or the broker doesn't know them.
+
+        Note:
+            The account must be dedicated to the trading systems, every unit of an asset they hold is assigned to them.
+        """
+
+        df = pd.DataFrame(columns = ["ticker", "expected", "actual"]).set_index("ticker")
+
+        try:
+            balances = self.broker.get_balances()
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Balances not retrieved, portfolios not reconciled. {}".format(e))
+            return df
+        if balances == None:
+            return df
+
+        query = session.query(PtfAllocation)
+        if ts_names != None:
+            query = query.filter(PtfAllocation.ts_name.in_(ts_names))
+
+        by_ticker = {}
+        for alloc in query.all():
+            by_ticker.setdefault(alloc.ticker, []).append(alloc)
+
+        for ticker, allocs in by_ticker.items():
+            expected = sum([Decimal(alloc.amount) for alloc in allocs], Decimal(0))
+            actual = balances.get(ticker, Decimal(0))
+            if expected == 0 or abs(actual - expected) <= abs(expected) * self.tolerance:
+                continue
+
+            logging.warning("{}: the portfolios hold {}, the balance is {}.".format(ticker, expected, actual))
+            df.loc[ticker] = [expected, actual]
+
+            ratio = actual / expected
+            for alloc in allocs:
+                alloc.amount = Decimal(alloc.amount) * ratio
+                alloc.base_currency_amount = Decimal(alloc.base_currency_amount) * ratio
+
+        session.commit()
+        return df
+
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with session_scope() as session:
+                    self.poll(session = session)
+            except Exception as e:
+                logging.exception("Fill tracking failed: {}".format(e))
+            self._stop.wait(self.poll_interval)
+
+
+    def start(self):
+
+        """
+        Starts polling the open orders in a background thread.
+        """
+
+        if self._thread != None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run, name = "FillTracker-{}".format(self.broker.name), daemon = True)
+        self._thread.start()
+
+
+    def stop(self):
+
+        """
+        Stops the background thread and waits for it.
+        """
+
+        self._stop.set()
+        if self._thread != None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,309 @@
+from decimal import Decimal
+
+import threading
+
+import time
+
+import logging
+
+from .broker import BrokerBaseClass
+
+from .. import resilience
+from .. import utils
+
+
+
+#Order identifier of the allocations executed entirely against other trading systems.
+NETTED = "netted"
+
+
+class _Batch():
+
+    #Orders of the trading systems due in the same tick.
+
+    def __init__(self, opened_at):
+        self.opened_at = opened_at
+        self.submissions = {}
+        self.closed = False
+        self.done = False
+        self.results = {}
+        self.error = None
+
+
+class NettingBroker(BrokerBaseClass):
+
+    """
+    Broker shared by many trading systems that trade on the same account.
+    In every tick it waits for the orders of all the trading systems, nets them asset by asset and sends only the residual to the exchange through the wrapped broker.
+    Every trading system gets back its own executed allocations: the side of an asset that is netted out is filled entirely, the other side shares the residual fill pro rata.
+
+    Example:
+        broker = NettingBroker(broker = PoloniexBroker(api_key = "...", secret_key = "..."), participants = ["ts_a", "ts_b"])
+        TradingSystem(name = "ts_a", broker = broker, ...)
+        TradingSystem(name = "ts_b", broker = broker, ...)
+
+    Attributes:
+        broker (alchemist_lib.broker.*): The broker that sends the residual orders.
+        participants (list[str]): Names of the trading systems that share the account.
+        window (float): Maximum seconds to wait for the other trading systems, then the orders received so far are executed.
+    """
+
+    def __init__(self, broker, participants, window = 30):
+
+        """
+        Costructor method.
+
+        Args:
+            broker (alchemist_lib.broker.*): The broker that sends the residual orders.
+            participants (list[str]): Names of the trading systems that share the account.
+            window (float, optional): Maximum seconds to wait for the other trading systems. Default is 30.
+        """
+
+        assert len(participants) > 0, "At least one trading system must use the broker."
+
+        self._local = threading.local()
+        BrokerBaseClass.__init__(self)
+        self.broker = broker
+        self.participants = list(participants)
+        self.window = window
+        #Books downloaded by a trading system are found by the others.
+        self.order_books = broker.order_books
+        self.markets = broker.markets
+        self._cond = threading.Condition()
+        self._batch = None
+
+
+    @property
+    def name(self):
+        return self.broker.name
+
+
+    @property
+    def session(self):
+        #Every trading system runs its ticks in its own thread, with its own session.
+        return getattr(self._local, "session", None)
+
+
+    @session.setter
+    def session(self, session):
+        self._local.session = session
+
+
+    @property
+    def ts_name(self):
+        return getattr(self._local, "ts_name", None)
+
+
+    @ts_name.setter
+    def ts_name(self, ts_name):
+        self._local.ts_name = ts_name
+
+
+    @property
+    def algorithm(self):
+        return self.broker.algorithm
+
+
+    @algorithm.setter
+    def algorithm(self, algorithm):
+        if hasattr(self, "broker"):
+            self.broker.set_algorithm(algorithm = algorithm)
+
+
+    def place_order(self, asset, amount, order_type):
+        self.broker.set_session(session = self.session)
+        self.broker.set_ts_name(ts_name = self.ts_name)
+        return self.broker.place_order(asset = asset, amount = amount, order_type = order_type)
+
+
+    def get_order_books(self, tickers):
+        return self.broker.get_order_books(tickers = tickers)
+
+
+    def get_order_status(self, order_id, asset):
+        return self.broker.get_order_status(order_id = order_id, asset = asset)
+
+
+    def get_orders_status(self, orders):
+        return self.broker.get_orders_status(orders = orders)
+
+
+    def cancel_order(self, order_id, asset):
+        return self.broker.cancel_order(order_id = order_id, asset = asset)
+
+
+    def get_traded_volume(self, asset, since):
+        return self.broker.get_traded_volume(asset = asset, since = since)
+
+
+    def get_balances(self):
+        return self.broker.get_balances()
+
+
+    def tracks_orders(self):
+        return self.broker.tracks_orders()
+
+
+    def get_account_ts_names(self, ts_name):
+        return list(self.participants)
+
+
+    def _join(self, ts_name, allocs):
+        #Adds the orders of a trading system to the batch of the tick.
+        #Returns the batch and True if this thread has to execute it. allocs is None for a trading system that doesn't trade in this tick.
+        with self._cond:
+            now = time.time()
+            if self._batch == None or self._batch.closed or now - self._batch.opened_at > self.window:
+                self._batch = _Batch(opened_at = now)
+            batch = self._batch
+            batch.submissions[ts_name] = allocs
+            self._cond.notify_all()
+
+            if allocs == None:
+                return batch, False
+
+            window = self.window
+            left = resilience.remaining()
+            if left != None:
+                window = min(window, left)
+            wait_until = now + window
+
+            while not batch.closed and not set(self.participants).issubset(batch.submissions.keys()):
+                timeout = wait_until - time.time()
+                if timeout <= 0:
+                    missing = set(self.participants) - set(batch.submissions.keys())
+                    logging.warning("Netting window expired without the orders of {}.".format(sorted(missing)))
+                    break
+                self._cond.wait(timeout = timeout)
+
+            if batch.closed:
+                return batch, False
+            batch.closed = True
+            return batch, True
+
+
+    def _net(self, batch):
+        #Executes the residual of every asset and splits the fills among the trading systems.
+        by_asset = {}
+        for ts_name, allocs in batch.submissions.items():
+            if allocs == None:
+                continue
+            for alloc in allocs:
+                if alloc.amount != 0:
+                    by_asset.setdefault((alloc.ticker, alloc.instrument_id), []).append((ts_name, alloc))
+
+        residuals = []
+        for key, items in by_asset.items():
+            net = sum([Decimal(alloc.amount) for ts_name, alloc in items], Decimal(0))
+            if net == 0:
+                continue
+            residual = items[0][1].deepcopy()
+            residual.asset = items[0][1].asset
+            residual.amount = net
+            residual.base_currency_amount = sum([Decimal(alloc.base_currency_amount) for ts_name, alloc in items], Decimal(0))
+            residuals.append(residual)
+
+        logging.info("Netting: {} orders of {} trading systems, {} sent to the exchange.".format(sum([len(items) for items in by_asset.values()]), len(batch.submissions), len(residuals)))
+
+        self.broker.set_session(session = self.session)
+        #The residual orders are saved with the trading system that sends them, the others of the account follow them too.
+        self.broker.set_ts_name(ts_name = self.ts_name)
+        executed = self.broker.send_orders(allocs = [alloc for alloc in residuals if alloc.amount < 0])
+        executed += self.broker.send_orders(allocs = [alloc for alloc in residuals if alloc.amount > 0])
+
+        fills = {}
+        for (alloc, order_id), residual in zip(executed, [alloc for alloc in residuals if alloc.amount < 0] + [alloc for alloc in residuals if alloc.amount > 0]):
+            fraction = Decimal(0) if order_id == -1 else Decimal(alloc.amount) / residual.amount
+            fills[(residual.ticker, residual.instrument_id)] = (fraction, order_id)
+
+        results = {ts_name : {} for ts_name in batch.submissions.keys()}
+        for key, items in by_asset.items():
+            net = sum([Decimal(alloc.amount) for ts_name, alloc in items], Decimal(0))
+            fraction, order_id = fills.get(key, (Decimal(1), NETTED))
+
+            #The side with the sign of the residual is filled by the other side and by the exchange.
+            majority = sum([Decimal(alloc.amount) for ts_name, alloc in items if Decimal(alloc.amount) * net > 0], Decimal(0))
+            ratio = (abs(majority) - abs(net) + fraction * abs(net)) / abs(majority) if majority != 0 else Decimal(1)
+
+            for ts_name, alloc in items:
+                if Decimal(alloc.amount) * net > 0:
+                    #Filled only by the other side if the residual failed.
+                    filled_ratio, alloc_order_id = ratio, order_id if order_id != -1 else NETTED
+                else:
+                    filled_ratio, alloc_order_id = Decimal(1), NETTED
+
+                if filled_ratio == 0:
+                    results[ts_name][key] = (alloc, -1)
+                    continue
+
+                executed_alloc = alloc.deepcopy()
+                executed_alloc.asset = alloc.asset
+                executed_alloc.amount = Decimal(alloc.amount) * filled_ratio
+                executed_alloc.base_currency_amount = Decimal(alloc.base_currency_amount) * filled_ratio
+                results[ts_name][key] = (executed_alloc, alloc_order_id)
+
+        return results
+
+
+    def send_orders(self, allocs, orders_type = "MKT"):
+
+        """
+        Returns the results of the netted batch for the allocations of the current trading system.
+
+        Args:
+            allocs (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): Allocations of the trading system.
+            orders_type (str, optional): Ignored, the residual orders are sent by the wrapped broker.
+
+        Return:
+            results (list[tuple]): List of (executed allocation, order_id). The order_id is NETTED for allocations executed entirely against other trading systems.
+        """
+
+        results = getattr(self._local, "results", {})
+        return [results.get((alloc.ticker, alloc.instrument_id), (alloc, -1)) for alloc in allocs]
+
+
+    def execute(self, allocs, ts_name, curr_ptf, orders_type = "MKT"):
+
+        """
+        Waits for the orders of the other trading systems, then returns the new portfolio of this one.
+        See ``BrokerBaseClass.execute()``.
+        """
+
+        allocs = utils.to_list(allocs)
+
+        batch, leader = self._join(ts_name = ts_name, allocs = [alloc for alloc in allocs if alloc.ticker != "BTC"])
+
+        if leader:
+            try:
+                batch.results = self._net(batch = batch)
+            except Exception as e:
+                batch.error = e
+                raise
+            finally:
+                with self._cond:
+                    batch.done = True
+                    self._cond.notify_all()
+        else:
+            with self._cond:
+                while not batch.done:
+                    self._cond.wait()
+            if batch.error != None:
+                raise Exception("Netted execution failed: {}".format(batch.error))
+
+        self._local.results = batch.results.get(ts_name, {})
+        try:
+            return BrokerBaseClass.execute(self, allocs = allocs, ts_name = ts_name, curr_ptf = curr_ptf, orders_type = orders_type)
+        finally:
+            self._local.results = {}
+
+
+    def idle(self, ts_name):
+
+        """
+        Tells the other trading systems not to wait for this one in the current tick.
+
+        Args:
+            ts_name (str): Name of the trading system.
+        """
+
+        self._join(ts_name = ts_name, allocs = None)
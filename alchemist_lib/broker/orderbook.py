@@ -0,0 +1,187 @@
+from collections import namedtuple
+
+from decimal import Decimal
+
+import threading
+
+import time
+
+import logging
+
+
+
+#Expected result of a market order that walks the book.
+#    ticker (str): Ticker of the asset.
+#    side (str): "buy" or "sell".
+#    amount (decimal.Decimal): Amount requested, always positive.
+#    filled (decimal.Decimal): Amount the visible book can fill, lower than amount if the book is too thin.
+#    vwap (decimal.Decimal): Volume weighted average price of the filled amount.
+#    best_price (decimal.Decimal): Price of the first level.
+#    worst_price (decimal.Decimal): Price of the last level needed, a limit order at this price fills the whole amount at once.
+#    mid_price (decimal.Decimal): Average of best bid and best ask.
+#    slippage (decimal.Decimal): Relative distance between vwap and mid_price, always >= 0.
+#    cost (decimal.Decimal): Slippage in base currency, filled * abs(vwap - mid_price).
+ExecutionEstimate = namedtuple("ExecutionEstimate", ["ticker", "side", "amount", "filled", "vwap", "best_price", "worst_price", "mid_price", "slippage", "cost"])
+
+
+class OrderBook():
+
+    """
+    Snapshot of the order book of a market quoted in BTC.
+
+    Attributes:
+        ticker (str): Ticker of the asset.
+        asks (list[tuple]): List of (price, size) sorted by ascending price.
+        bids (list[tuple]): List of (price, size) sorted by descending price.
+        timestamp (float): When the book was downloaded, as returned by time.time().
+    """
+
+    def __init__(self, ticker, asks, bids, timestamp = None):
+
+        """
+        Costructor method.
+
+        Args:
+            ticker (str): Ticker of the asset.
+            asks (list): List of (price, size), prices and sizes can be anything Decimal accepts.
+            bids (list): List of (price, size).
+            timestamp (float, optional): When the book was downloaded. Default is time.time().
+        """
+
+        self.ticker = ticker
+        self.asks = sorted([(Decimal(str(price)), Decimal(str(size))) for price, size in asks], key = lambda level : level[0])
+        self.bids = sorted([(Decimal(str(price)), Decimal(str(size))) for price, size in bids], key = lambda level : level[0], reverse = True)
+        self.timestamp = timestamp if timestamp != None else time.time()
+
+
+    def __repr__(self):
+        return "<OrderBook(ticker={}, asks={}, bids={})>".format(self.ticker, len(self.asks), len(self.bids))
+
+
+    @property
+    def mid_price(self):
+        if len(self.asks) > 0 and len(self.bids) > 0:
+            return (self.asks[0][0] + self.bids[0][0]) / 2
+        if len(self.asks) > 0:
+            return self.asks[0][0]
+        if len(self.bids) > 0:
+            return self.bids[0][0]
+        return Decimal(0)
+
+
+    def estimate(self, amount):
+
+        """
+        Walks the book as a market order of the given size would do.
+
+        Args:
+            amount (decimal.Decimal): Amount to exchange, positive to buy and negative to sell.
+
+        Return:
+            estimate (ExecutionEstimate): The expected execution. If the book is empty every price is 0.
+        """
+
+        amount = Decimal(amount)
+        side = "buy" if amount > 0 else "sell"
+        levels = self.asks if side == "buy" else self.bids
+        amount = abs(amount)
+
+        filled = Decimal(0)
+        notional = Decimal(0)
+        worst_price = Decimal(0)
+        for price, size in levels:
+            if filled >= amount:
+                break
+            take = min(size, amount - filled)
+            filled += take
+            notional += take * price
+            worst_price = price
+
+        best_price = levels[0][0] if len(levels) > 0 else Decimal(0)
+        mid_price = self.mid_price
+        vwap = notional / filled if filled > 0 else Decimal(0)
+
+        if filled > 0 and mid_price > 0:
+            slippage = abs(vwap - mid_price) / mid_price
+            cost = filled * abs(vwap - mid_price)
+        else:
+            slippage = Decimal(0)
+            cost = Decimal(0)
+
+        if filled < amount:
+            logging.debug("The {} book is too thin: {} of {} can be filled.".format(self.ticker, filled, amount))
+
+        return ExecutionEstimate(ticker = self.ticker, side = side, amount = amount, filled = filled, vwap = vwap, best_price = best_price,
+                                 worst_price = worst_price, mid_price = mid_price, slippage = slippage, cost = cost)
+
+
+class OrderBookCache():
+
+    """
+    Keeps the order books of an exchange for a few seconds, so the books needed by a rebalance are downloaded once and in bulk.
+
+    Attributes:
+        fetch (callable): Takes a list of tickers and returns a dictionary {ticker : OrderBook}. It can return more books than requested, they are cached too.
+        ttl (float): Seconds a book is valid for.
+    """
+
+    def __init__(self, fetch, ttl = 2, clock = time.time):
+
+        """
+        Costructor method.
+
+        Args:
+            fetch (callable): Function that downloads the books.
+            ttl (float, optional): Seconds a book is valid for. Default is 2.
+            clock (callable, optional): Returns the current time in seconds. Default is time.time.
+        """
+
+        self.fetch = fetch
+        self.ttl = ttl
+        self._clock = clock
+        self._books = {}
+        self._lock = threading.Lock()
+
+
+    def _is_fresh(self, book):
+        return book != None and self._clock() - book.timestamp < self.ttl
+
+
+    def get_many(self, tickers):
+
+        """
+        Returns the books of the tickers, only the missing or expired ones are downloaded, with a single call.
+
+        Args:
+            tickers (list[str]): List of tickers.
+
+        Return:
+            books (dict): Dictionary {ticker : OrderBook}. The books that can't be downloaded are missing.
+        """
+
+        with self._lock:
+            missing = [ticker for ticker in tickers if not self._is_fresh(self._books.get(ticker))]
+            if len(missing) > 0:
+                for ticker, book in self.fetch(missing).items():
+                    book.timestamp = self._clock()
+                    self._books[ticker] = book
+
+            return {ticker : self._books[ticker] for ticker in tickers if self._is_fresh(self._books.get(ticker))}
+
+
+    def get(self, ticker):
+
+        """
+        Args:
+            ticker (str): Ticker of the asset.
+
+        Return:
+            book (OrderBook): The book, None if it can't be downloaded.
+        """
+
+        return self.get_many(tickers = [ticker]).get(ticker)
+
+
+    def clear(self):
+        with self._lock:
+            self._books = {}
@@ -2,10 +2,22 @@ from poloniex import Poloniex, PoloniexError
 
 import datetime as dt
 
+import calendar
+
+import time
+
 from .broker import BrokerBaseClass
+from .orderbook import OrderBook
+from .execution import OrderStatus
+
+from ..exchange import PoloniexExchange
+from ..exchange.markets import MarketStore
 
 from ..database.executed_order import ExecutedOrder
 
+from .. import ratelimit
+from .. import resilience
+
 from decimal import Decimal
 
 import logging
@@ -25,8 +37,11 @@ class PoloniexBroker(BrokerBaseClass):
 
     Attributes:
         session (sqlalchemy.orm.session.Session): Database connection.
+        markets (alchemist_lib.exchange.markets.MarketStore): Minimum size, step size and state of the markets, refreshed every market_ttl seconds.
         polo (poloniex.Poloniex): Communication object.
     """
+
+    name = "poloniex"
     
     def __init__(self, api_key = None, secret_key = None):
 
@@ -43,37 +58,190 @@ class PoloniexBroker(BrokerBaseClass):
         """
         
         BrokerBaseClass.__init__(self)
+        self.markets = MarketStore(exchange = PoloniexExchange(), exchange_name = "poloniex", ttl = type(self).market_ttl)
         self.polo = Poloniex(key = api_key, secret = secret_key)
 	
 		
-    def get_best_rate(self, asset, amount, field):
+    def get_order_books(self, tickers):
 
         """
-        Poloniex doesn't allow to place market orders so we need to get the best bid/ask price for every order.
+        Downloads the order books of the BTC markets. More than one book is downloaded with a single call (currencyPair=all).
 
         Args:
-            asset (alchemist_lib.database.asset.Asset): The asset we want to exchange for BTC.
-            amount (decimal.Decimal): The amount we want to exchange.
-            field (str): Must be "ask" or "bid".
+            tickers (list[str]): List of tickers.
 
         Return:
-            price (decimal.Decimal): The best bid/ask, executing an order at this price is like execute a market order. If the book is too thin the return value is 0.
+            books (dict): Dictionary {ticker : alchemist_lib.broker.orderbook.OrderBook}. With more than one ticker it contains every BTC market.
         """
 
-        amount = abs(amount)
-        pair = "BTC_{}".format(asset.ticker)
-        book = self.polo.returnOrderBook(currencyPair = pair, depth = 20)
-        values = book["{}s".format(field)]
-        
-        orders_sum = Decimal(0)
-        for book_item in values:
-            orders_sum += Decimal(book_item[1])
-            if orders_sum > amount:
-                return Decimal(book_item[0])
-        
-        return Decimal(0)
+        depth = PoloniexBroker.order_book_depth
+        try:
+            if len(tickers) == 1:
+                pair = "BTC_{}".format(tickers[0])
+                books = {pair : resilience.call(func = lambda : self.polo.returnOrderBook(currencyPair = pair, depth = depth), exchange = "poloniex",
+                                                endpoint = "returnOrderBook.{}".format(pair))}
+            else:
+                books = resilience.call(func = lambda : self.polo.returnOrderBook(currencyPair = "all", depth = depth), exchange = "poloniex",
+                                        endpoint = "returnOrderBook.all")
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Poloniex order books not retrieved. get_order_books() method. Tickers: {}. {}".format(tickers, e))
+            return {}
+
+        order_books = {}
+        for pair, book in books.items():
+            if pair.startswith("BTC_"):
+                ticker = pair[len("BTC_"):]
+                order_books[ticker] = OrderBook(ticker = ticker, asks = book["asks"], bids = book["bids"])
+
+        return order_books
 				
 	
+    def get_order_status(self, order_id, asset):
+
+        """
+        Returns the state of an order.
+
+        Args:
+            order_id (int): Order identifier.
+            asset (alchemist_lib.database.asset.Asset): The asset of the order.
+
+        Return:
+            status (alchemist_lib.broker.execution.OrderStatus): State of the order, the fee is in BTC.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the state can't be retrieved.
+        """
+
+        pair = "BTC_{}".format(asset.ticker)
+
+        def order_trades():
+            try:
+                return self.polo.returnOrderTrades(orderNumber = order_id)
+            except PoloniexError as e:
+                #Poloniex answers with an error if the order has no trades yet.
+                if "Order not found" in str(e):
+                    return []
+                raise
+
+        trades = resilience.call(func = order_trades, exchange = "poloniex", endpoint = "returnOrderTrades", endpoint_class = ratelimit.PRIVATE)
+        open_orders = resilience.call(func = lambda : self.polo.returnOpenOrders(currencyPair = pair), exchange = "poloniex",
+                                      endpoint = "returnOpenOrders", endpoint_class = ratelimit.PRIVATE)
+
+        filled = sum([Decimal(trade["amount"]) for trade in trades], Decimal(0))
+        notional = sum([Decimal(trade["total"]) for trade in trades], Decimal(0))
+        fee = sum([Decimal(trade["total"]) * Decimal(trade["fee"]) for trade in trades], Decimal(0))
+        is_open = str(order_id) in [str(order["orderNumber"]) for order in open_orders]
+
+        return OrderStatus(order_id = order_id, filled = filled, price = notional / filled if filled > 0 else Decimal(0), fee = fee, is_open = is_open)
+
+
+    def cancel_order(self, order_id, asset):
+
+        """
+        Removes an open order from the book.
+
+        Args:
+            order_id (int): Order identifier.
+            asset (alchemist_lib.database.asset.Asset): The asset of the order.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the order can't be cancelled.
+        """
+
+        resilience.call(func = lambda : self.polo.cancelOrder(orderNumber = order_id), exchange = "poloniex", endpoint = "cancelOrder", endpoint_class = ratelimit.PRIVATE)
+        logging.info("Order {} of {} cancelled.".format(order_id, asset.ticker))
+
+
+    def get_traded_volume(self, asset, since):
+
+        """
+        Returns the amount traded on the market since a datetime.
+
+        Args:
+            asset (alchemist_lib.database.asset.Asset): The asset.
+            since (datetime.datetime): Start datetime, UTC.
+
+        Return:
+            volume (decimal.Decimal): Amount traded, in units of the asset.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the trades can't be retrieved.
+        """
+
+        pair = "BTC_{}".format(asset.ticker)
+        start = calendar.timegm(since.timetuple())
+        trades = resilience.call(func = lambda : self.polo.marketTradeHist(currencyPair = pair, start = start, end = int(time.time())), exchange = "poloniex",
+                                 endpoint = "returnTradeHistory.{}".format(pair))
+
+        return sum([Decimal(trade["amount"]) for trade in trades], Decimal(0))
+
+	
+    def get_orders_status(self, orders):
+
+        """
+        Returns the state of many orders with two calls: the open orders and the trades of every market.
+
+        Args:
+            orders (list[alchemist_lib.database.executed_order.ExecutedOrder]): Orders placed on Poloniex.
+
+        Return:
+            statuses (dict): Dictionary {order_id (str) : alchemist_lib.broker.execution.OrderStatus}, empty if the calls fail.
+        """
+
+        if len(orders) == 0:
+            return {}
+
+        start = calendar.timegm(min([order.order_datetime for order in orders]).timetuple()) - 60
+        try:
+            open_orders = resilience.call(func = lambda : self.polo.returnOpenOrders(currencyPair = "all"), exchange = "poloniex",
+                                          endpoint = "returnOpenOrders", endpoint_class = ratelimit.PRIVATE)
+            trades = resilience.call(func = lambda : self.polo.returnTradeHistory(currencyPair = "all", start = start, end = int(time.time())), exchange = "poloniex",
+                                     endpoint = "returnTradeHistory", endpoint_class = ratelimit.PRIVATE)
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Poloniex orders not retrieved. get_orders_status() method. {}".format(e))
+            return {}
+
+        open_ids = set()
+        for pair_orders in open_orders.values():
+            open_ids.update([str(order["orderNumber"]) for order in pair_orders])
+
+        #Without trades Poloniex answers with an empty list instead of a dictionary.
+        trades = trades if isinstance(trades, dict) else {}
+
+        fills = {}
+        for pair_trades in trades.values():
+            for trade in pair_trades:
+                filled, notional, fee = fills.get(str(trade["orderNumber"]), (Decimal(0), Decimal(0), Decimal(0)))
+                fills[str(trade["orderNumber"])] = (filled + Decimal(trade["amount"]),
+                                                    notional + Decimal(trade["total"]),
+                                                    fee + Decimal(trade["total"]) * Decimal(trade["fee"]))
+
+        statuses = {}
+        for order in orders:
+            order_id = str(order.order_id)
+            filled, notional, fee = fills.get(order_id, (Decimal(0), Decimal(0), Decimal(0)))
+            statuses[order_id] = OrderStatus(order_id = order_id, filled = filled, price = notional / filled if filled > 0 else Decimal(0),
+                                             fee = fee, is_open = order_id in open_ids)
+
+        return statuses
+
+
+    def get_balances(self):
+
+        """
+        Returns the balances of the account with a single call.
+
+        Return:
+            balances (dict): Dictionary {ticker : decimal.Decimal}.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the balances can't be retrieved.
+        """
+
+        balances = resilience.call(func = self.polo.returnBalances, exchange = "poloniex", endpoint = "returnBalances", endpoint_class = ratelimit.PRIVATE)
+        return {ticker : Decimal(amount) for ticker, amount in balances.items()}
+
+	
     def place_order(self, asset, amount, order_type):
 
         """
@@ -103,13 +271,27 @@ class PoloniexBroker(BrokerBaseClass):
             logging.critical("Unknown order type. NotImplemented raised.")
             raise NotImplemented("Unknown order type. NotImplemented raised.")
 
+        if rate == 0:
+            logging.warning("No price for {}, order not placed.".format(pair))
+            return -1
+
+        #Price rounded to the tick and amount to the step size of the market, orders below the minimums would be rejected.
+        rate = self.markets.round_price(ticker = asset.ticker, price = rate, amount = amount)
+        amount = self.markets.round_amount(ticker = asset.ticker, amount = amount, price = rate)
+        if amount == 0:
+            logging.warning("Order of {} below the minimum size of the market, not placed.".format(pair))
+            return -1
+
         logging.debug("Order: Pair: {}. Amount: {}. Operation: {}".format(pair, amount, operation))
 
         try:
+            #An order is never sent twice.
             if operation == "buy":
-                order_dict = self.polo.buy(currencyPair = pair, rate = rate, amount = amount)
+                order_dict = resilience.call(func = lambda : self.polo.buy(currencyPair = pair, rate = rate, amount = amount),
+                                             exchange = "poloniex", endpoint = "buy.{}".format(pair), endpoint_class = ratelimit.PRIVATE, attempts = 1)
             else:
-                order_dict = self.polo.sell(currencyPair = pair, rate = rate, amount = abs(amount))
+                order_dict = resilience.call(func = lambda : self.polo.sell(currencyPair = pair, rate = rate, amount = abs(amount)),
+                                             exchange = "poloniex", endpoint = "sell.{}".format(pair), endpoint_class = ratelimit.PRIVATE, attempts = 1)
             order_id = int(order_dict["orderNumber"])
 
             order = ExecutedOrder(order_id = order_id,
@@ -120,7 +302,8 @@ class PoloniexBroker(BrokerBaseClass):
                                   operation = operation,
                                   order_type = order_type,
                                   broker_name = "poloniex",
-                                  exchange_name = "poloniex"
+                                  exchange_name = "poloniex",
+                                  ts_name = self.ts_name
                                   )
 
             logging.info("{} order placed for {}. Amount: {}. Order id: {}.".format(operation.upper(), asset.ticker, amount, order_id))
@@ -129,8 +312,8 @@ class PoloniexBroker(BrokerBaseClass):
             self.session.add(order)
             self.session.commit()
         
-        except PoloniexError:
-            logging.debug("Order failed for {}.".format(asset.ticker))
+        except resilience.ExchangeUnavailable as e:
+            logging.debug("Order failed for {}. {}".format(asset.ticker, e))
             order_id = -1
 
         return order_id
@@ -0,0 +1,331 @@
+from decimal import Decimal
+
+import datetime as dt
+
+import threading
+
+import time
+
+import logging
+
+from .broker import BrokerBaseClass
+from .execution import OrderStatus
+from .orderbook import OrderBook
+
+from ..database.executed_order import ExecutedOrder
+from ..database.broker import Broker
+
+
+
+class BookReplay():
+
+    """
+    Order books recorded earlier, returned as they were at the time of the clock.
+    It can be the source of a SimulatedBroker in place of a real broker.
+
+    Attributes:
+        name (str): Name of the exchange the books were recorded from.
+    """
+
+    def __init__(self, books, name = "simulated", clock = time.time):
+
+        """
+        Costructor method.
+
+        Args:
+            books (list[alchemist_lib.broker.orderbook.OrderBook]): Snapshots of any market, with their timestamp.
+            name (str, optional): Name of the exchange the books were recorded from. Default is "simulated".
+            clock (callable, optional): Returns the current time in seconds. Default is time.time.
+        """
+
+        self.name = name
+        self._clock = clock
+        self._books = {}
+        for book in books:
+            self._books.setdefault(book.ticker, []).append(book)
+        for snapshots in self._books.values():
+            snapshots.sort(key = lambda book : book.timestamp)
+
+
+    def get_order_books(self, tickers):
+
+        """
+        Args:
+            tickers (list[str]): List of tickers.
+
+        Return:
+            books (dict): Dictionary {ticker : alchemist_lib.broker.orderbook.OrderBook}, the last snapshot before the clock. Tickers without one are missing.
+        """
+
+        now = self._clock()
+        books = {}
+        for ticker in tickers:
+            recorded = [book for book in self._books.get(ticker, []) if book.timestamp <= now]
+            if len(recorded) > 0:
+                #A copy, the cache of the broker changes the timestamp of the books it receives.
+                book = recorded[-1]
+                books[ticker] = OrderBook(ticker = ticker, asks = book.asks, bids = book.bids, timestamp = book.timestamp)
+        return books
+
+
+class _SimulatedOrder():
+
+    #State of an order placed on the simulated book.
+
+    def __init__(self, order_id, asset, amount, limit):
+        self.order_id = order_id
+        self.asset = asset
+        self.amount = abs(amount)
+        self.sign = 1 if amount > 0 else -1
+        self.limit = limit
+        self.filled = Decimal(0)
+        self.notional = Decimal(0)
+        self.fee = Decimal(0)
+        self.is_open = True
+        self.book_timestamp = None
+
+    @property
+    def price(self):
+        return self.notional / self.filled if self.filled > 0 else Decimal(0)
+
+
+class SimulatedBroker(BrokerBaseClass):
+
+    """
+    Broker that doesn't send anything to the exchange: the orders are filled against the order books of a source, a real broker (its public books) or a BookReplay.
+    Every order is a marketable limit order at the price of the book when it's decided, it reaches the book after the latency
+    and takes the levels within the limit, so the book can move in the meantime and thin books fill partially.
+    The part not filled stays open and is matched against every new book until it's cancelled.
+    Orders are saved in ExecutedOrder like the ones of a real broker, with the simulated price, fee and fill.
+    As for a real broker, the later fills are saved by ``FillTracker.poll()``, get_order_status() and cancel_order() don't write to the database.
+
+    Attributes:
+        source (alchemist_lib.broker.*, BookReplay): Where the order books come from.
+        exchange_name (str): Name of the exchange saved in the orders.
+        latency (float): Seconds between the decision and the arrival of an order on the book.
+        fee (decimal.Decimal): Fee rate paid on the value of every fill, in BTC.
+        participation (decimal.Decimal): Fraction of every level of the book available to us, the rest is taken by other traders.
+        balances (dict): Dictionary {ticker : decimal.Decimal}, changes of the balances caused by the simulated fills.
+    """
+
+    name = "simulated"
+
+    def __init__(self, source, exchange_name = None, latency = 0.5, fee = "0.0025", participation = 1, sleep = time.sleep):
+
+        """
+        Costructor method.
+
+        Args:
+            source (alchemist_lib.broker.*, BookReplay): Where the order books come from. No order is sent through it.
+            exchange_name (str, optional): Name of the exchange saved in the orders. Default is the name of the source.
+            latency (float, optional): Seconds between the decision and the arrival of an order. Default is 0.5.
+            fee (str, decimal.Decimal, optional): Fee rate, 0.0025 is 0.25%. Default is 0.0025.
+            participation (float, optional): Fraction of every level available to us, between 0 and 1. Default is 1.
+            sleep (callable, optional): Function used to wait the latency. Default is time.sleep.
+        """
+
+        assert 0 < participation <= 1, "The participation must be between 0 and 1."
+
+        BrokerBaseClass.__init__(self)
+        self.source = source
+        self.exchange_name = exchange_name if exchange_name != None else source.name
+        self.latency = latency
+        self.fee = Decimal(str(fee))
+        self.participation = Decimal(str(participation))
+        self.markets = getattr(source, "markets", None)
+        self.balances = {}
+        self._sleep = sleep
+        self._orders = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+
+    def get_order_books(self, tickers):
+        return self.source.get_order_books(tickers = tickers)
+
+
+    def _match(self, order):
+        #Takes the levels of the current book within the limit price. A book already matched is not used twice.
+        book = self.get_order_books(tickers = [order.asset.ticker]).get(order.asset.ticker)
+        if book == None or book.timestamp == order.book_timestamp:
+            return
+        order.book_timestamp = book.timestamp
+
+        levels = book.asks if order.sign > 0 else book.bids
+        for price, size in levels:
+            remaining = order.amount - order.filled
+            if remaining <= 0 or (order.sign > 0 and price > order.limit) or (order.sign < 0 and price < order.limit):
+                break
+            take = min(size * self.participation, remaining)
+            order.filled += take
+            order.notional += take * price
+            order.fee += take * price * self.fee
+
+            self.balances[order.asset.ticker] = self.balances.get(order.asset.ticker, Decimal(0)) + take * order.sign
+            self.balances["BTC"] = self.balances.get("BTC", Decimal(0)) - take * price * order.sign - take * price * self.fee
+
+        if order.filled >= order.amount:
+            order.is_open = False
+
+
+    def _status(self, order):
+        if order.is_open:
+            return "open"
+        return "filled" if order.filled >= order.amount else "cancelled"
+
+
+    def place_order(self, asset, amount, order_type):
+
+        """
+        Simulates an order: waits the latency and matches it against the book at that time.
+
+        Args:
+            asset (alchemist_lib.database.asset.Asset): The asset we want exchange for BTC.
+            amount (decimal.Decimal): The amount we want to exchange.
+            order_type (str): Type of order.
+
+        Return:
+            order_id (str): Order identifier, if some errors occur it returns int(-1).
+        """
+
+        if amount == 0:
+            return -1
+
+        if order_type == "MKT":
+            rate = self.get_best_rate(asset = asset, amount = abs(amount), field = "ask" if amount > 0 else "bid")
+        else:
+            logging.critical("Unknown order type. NotImplemented raised.")
+            raise NotImplemented("Unknown order type. NotImplemented raised.")
+
+        if rate == 0:
+            logging.warning("No price for {}, simulated order not placed.".format(asset.ticker))
+            return -1
+
+        if self.markets != None:
+            rate = self.markets.round_price(ticker = asset.ticker, price = rate, amount = amount)
+            amount = self.markets.round_amount(ticker = asset.ticker, amount = amount, price = rate)
+            if amount == 0:
+                logging.warning("Simulated order of {} below the minimum size of the market, not placed.".format(asset.ticker))
+                return -1
+
+        with self._lock:
+            self._count += 1
+            order_id = "sim-{}-{}".format(int(time.time() * 1000), self._count)
+
+        order = _SimulatedOrder(order_id = order_id, asset = asset, amount = Decimal(amount), limit = rate)
+        self._orders[order_id] = order
+
+        self._sleep(self.latency)
+        self._match(order = order)
+
+        operation = "buy" if amount > 0 else "sell"
+        logging.info("Simulated {} of {}. Amount: {}. Filled: {} at {}. Fee: {}.".format(operation.upper(), asset.ticker, amount, order.filled, order.price, order.fee))
+
+        if self.session != None:
+            if self.session.query(Broker).filter(Broker.broker_name == self.name).count() == 0:
+                self.session.add(Broker(broker_name = self.name))
+            self.session.add(ExecutedOrder(order_id = order_id,
+                                           order_datetime = dt.datetime.utcnow(),
+                                           ticker = asset.ticker,
+                                           instrument_id = asset.instrument_id,
+                                           amount = amount,
+                                           operation = operation,
+                                           order_type = order_type,
+                                           broker_name = self.name,
+                                           exchange_name = self.exchange_name,
+                                           price = order.price if order.filled > 0 else None,
+                                           paid_fee = order.fee,
+                                           status = self._status(order = order),
+                                           filled = order.filled * order.sign,
+                                           ts_name = self.ts_name))
+            self.session.commit()
+
+        return order_id
+
+
+    def send_orders(self, allocs, orders_type = "MKT"):
+
+        """
+        See ``BrokerBaseClass.send_orders()``. Without an execution algorithm the allocations returned have the simulated fill:
+        the amount filled and its value in BTC, fee included. Orders with nothing filled return -1.
+        """
+
+        results = BrokerBaseClass.send_orders(self, allocs = allocs, orders_type = orders_type)
+        if self.algorithm != None:
+            return results
+
+        executed = []
+        for alloc, order_id in results:
+            order = self._orders.get(order_id)
+            if order == None or order.filled == 0:
+                executed.append((alloc, -1))
+                continue
+            executed_alloc = alloc.deepcopy()
+            executed_alloc.asset = alloc.asset
+            executed_alloc.amount = order.filled * order.sign
+            #Buys cost the fee more, sells return the fee less.
+            executed_alloc.base_currency_amount = (order.notional + order.fee * order.sign) * order.sign
+            executed.append((executed_alloc, order_id))
+
+        return executed
+
+
+    def get_order_status(self, order_id, asset):
+
+        """
+        Matches an open order against the current book and returns its state. Nothing is saved, it can be called from any thread.
+
+        Args:
+            order_id (str): Order identifier.
+            asset (alchemist_lib.database.asset.Asset): The asset of the order.
+
+        Return:
+            status (alchemist_lib.broker.execution.OrderStatus): State of the order, the fee is in BTC.
+        """
+
+        order = self._orders.get(str(order_id))
+        if order == None:
+            #Placed by another process, nothing is known about it.
+            return OrderStatus(order_id = order_id, filled = Decimal(0), price = Decimal(0), fee = Decimal(0), is_open = False)
+
+        if order.is_open:
+            self._match(order = order)
+
+        return OrderStatus(order_id = order_id, filled = order.filled, price = order.price, fee = order.fee, is_open = order.is_open)
+
+
+    def cancel_order(self, order_id, asset):
+
+        """
+        Removes an open order from the simulated book.
+
+        Args:
+            order_id (str): Order identifier.
+            asset (alchemist_lib.database.asset.Asset): The asset of the order.
+        """
+
+        order = self._orders.get(str(order_id))
+        if order != None and order.is_open:
+            order.is_open = False
+            logging.info("Simulated order {} of {} cancelled.".format(order_id, asset.ticker))
+
+
+    def get_traded_volume(self, asset, since):
+
+        """
+        Returns the volume traded on the market according to the source, 0 if it doesn't know it.
+        """
+
+        if hasattr(self.source, "get_traded_volume"):
+            return self.source.get_traded_volume(asset = asset, since = since)
+        return Decimal(0)
+
+
+    def get_balances(self):
+
+        """
+        Return:
+            balances (dict): Dictionary {ticker : decimal.Decimal}, changes of the balances caused by the simulated fills.
+        """
+
+        return dict(self.balances)
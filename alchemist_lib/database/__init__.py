@@ -1,56 +1,294 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import StaticPool
 
-#import sqlalchemy_utils
+from contextlib import contextmanager
 
 import configparser
 
+import threading
+
 import os
 
+import sys
+
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config.ini")
+
+#Environment variable that overrides config.ini, useful for tests. Example: sqlite:// (in-memory).
+URI_ENV_VAR = "ALCHEMIST_DATABASE_URI"
+
+_engine = None
+_uri = None
+_engine_kwargs = {}
+_lock = threading.RLock()
+
+#Default pool settings for server databases. MySQL closes connections idle for more than wait_timeout (8 hours by default)
+#and proxies or firewalls often do it much sooner, so connections are recycled and tested before being used.
+POOL_DEFAULTS = {"pool_size" : 5,
+                 "max_overflow" : 10,
+                 "pool_recycle" : 3600,
+                 "pool_pre_ping" : True
+                 }
+
+DEFAULT_DRIVER = "mysqlconnector"
+
+
+Base = declarative_base()
+
+
+def read_config(path = CONFIG_PATH):
+
+    """
+    Reads the DATABASE section of the configuration file written by ``alchemist populate``.
+
+    Args:
+        path (str, optional): Path of the configuration file.
+
+    Return:
+        db_config (dict): The DATABASE section. Empty if the file or the section doesn't exist.
+    """
+
+    config = configparser.ConfigParser()
+    config.read(path)
+
+    if "DATABASE" in config.sections():
+        return dict(config["DATABASE"])
+    return {}
+
+
+def get_uri():
+
+    """
+    Returns the URI of the database the library will connect to.
+    The order of precedence is: ``configure()``, the ALCHEMIST_DATABASE_URI environment variable, config.ini.
+
+    Return:
+        uri (str): SQLAlchemy database URI.
+    """
+
+    if _uri != None:
+        return _uri
+
+    if os.environ.get(URI_ENV_VAR):
+        return os.environ[URI_ENV_VAR]
+
+    db_config = read_config()
+    if len(db_config) == 0:
+        raise Exception("The database is not configured. Run 'alchemist populate' or call alchemist_lib.database.configure().")
+
+    return "mysql+{}://{}:{}@{}:3306/{}".format(db_config.get("driver", DEFAULT_DRIVER),
+                                               db_config["user"],
+                                               db_config["pass"],
+                                               db_config["hostname"],
+                                               db_config["db"])
+
+
+def get_pool_options():
+
+    """
+    Returns the pool settings for server databases: the defaults overridden by config.ini.
+
+    Return:
+        options (dict): Keyword arguments for ``sqlalchemy.create_engine()``: pool_size, max_overflow, pool_recycle and pool_pre_ping.
+    """
+
+    db_config = read_config()
+
+    options = dict(POOL_DEFAULTS)
+    for key in ["pool_size", "max_overflow", "pool_recycle"]:
+        if key in db_config:
+            options[key] = int(db_config[key])
+    if "pool_pre_ping" in db_config:
+        options["pool_pre_ping"] = db_config["pool_pre_ping"].lower() in ["1", "true", "yes", "on"]
+
+    return options
+
+
+def configure(uri = None, **engine_kwargs):
+
+    """
+    Sets the database explicitly. Nothing is opened until the first session is requested.
+    The current engine, if any, is disposed.
+
+    Args:
+        uri (str, optional): SQLAlchemy database URI. ``sqlite://`` is an in-memory database, ``sqlite:///path`` a file one. None means config.ini.
+        engine_kwargs (dict): Keyword arguments passed to ``sqlalchemy.create_engine()``. For server databases they override the pool settings, for example ``pool_size = 20``.
 
+    Note:
+        A faster driver can be chosen through the URI, for example ``mysql+mysqldb://`` (mysqlclient, written in C) instead of ``mysql+mysqlconnector://``.
+    """
 
-HOSTNAME = None
-USERNAME = None
-PASSWORD = None
-DB_NAME = None
-    
-config = configparser.ConfigParser()
-path = os.path.join(os.path.dirname(__file__), "..")
-filename = config.read(path + "/config.ini")
+    global _engine, _uri, _engine_kwargs
 
-sections = config.sections()
+    with _lock:
+        if _engine != None:
+            _engine.dispose()
+        Session.remove()
 
-if "DATABASE" in sections:
-    db_config = config["DATABASE"]
-    
-    HOSTNAME = db_config["hostname"]
-    USERNAME = db_config["user"]
-    PASSWORD = db_config["pass"]
-    DB_NAME = db_config["db"]
+        _engine = None
+        _uri = uri
+        _engine_kwargs = engine_kwargs
 
-#DATABASE_URI = "mysql+mysqlconnector://{}:{}@{}:3306/{}".format(USERNAME, PASSWORD, HOSTNAME, DB_NAME)
-#Engine = create_engine(DATABASE_URI)
 
-URI = "mysql+mysqlconnector://{}:{}@{}:3306".format(USERNAME, PASSWORD, HOSTNAME)
-mysql_engine = create_engine(URI)
+def _create_engine(uri, engine_kwargs):
+    url = make_url(uri)
+    kwargs = dict(engine_kwargs)
 
-#https://stackoverflow.com/questions/6506578/how-to-create-a-new-database-using-sqlalchemy
-#if not sqlalchemy_utils.database_exists(Engine.url):
-#    sqlalchemy_utils.create_database(Engine.url)
+    if url.drivername.startswith("sqlite"):
+        if url.database in (None, "", ":memory:"):
+            #Every connection to an in-memory database is a new database, so share just one.
+            kwargs.setdefault("poolclass", StaticPool)
+            kwargs.setdefault("connect_args", {"check_same_thread" : False})
 
-mysql_engine.execute("CREATE DATABASE IF NOT EXISTS {};".format(DB_NAME))
+    else:
+        for key, value in get_pool_options().items():
+            kwargs.setdefault(key, value)
+
+        if url.drivername.startswith("mysql") and url.database != None:
+            #https://stackoverflow.com/questions/6506578/how-to-create-a-new-database-using-sqlalchemy
+            db_name = url.database
+            url.database = None
+            mysql_engine = create_engine(url)
+            mysql_engine.execute("CREATE DATABASE IF NOT EXISTS {};".format(db_name))
+            mysql_engine.dispose()
+
+    return create_engine(uri, **kwargs)
+
+
+def get_engine():
+
+    """
+    Returns the engine, creating it on the first call.
+
+    Return:
+        engine (sqlalchemy.engine.Engine): The engine of the configured database.
+    """
+
+    global _engine
+
+    if _engine == None:
+        with _lock:
+            if _engine == None:
+                _engine = _create_engine(uri = get_uri(), engine_kwargs = _engine_kwargs)
+    return _engine
+
+
+def create_all():
+
+    """
+    Creates every table of the library on the configured database.
+    """
+
+    from . import asset, aum_history, broker, price_data_source, exchange, instrument, ohlcv, ptf_allocation, timeframe, timetable, ts, executed_order, schema_version, ohlcv_watermark, market, asset_dictionary
+
+    Base.metadata.create_all(get_engine())
 
-DATABASE_URI = "mysql+mysqlconnector://{}:{}@{}:3306/{}".format(USERNAME, PASSWORD, HOSTNAME, DB_NAME)
-Engine = create_engine(DATABASE_URI)
 
 #https://stackoverflow.com/questions/3039567/sqlalchemy-detachedinstanceerror-with-regular-attribute-not-a-relation
-session_factory = sessionmaker(bind = Engine, expire_on_commit = False)
+session_factory = sessionmaker(expire_on_commit = False)
+
+
+def _new_session():
+    return session_factory(bind = get_engine())
+
 
 #https://stackoverflow.com/questions/32328354/facing-issues-with-sqlalchemypostgresql-session-management
 #http://docs.sqlalchemy.org/en/latest/orm/contextual.html
-Session = scoped_session(session_factory)
+Session = scoped_session(_new_session)
+
+
+@contextmanager
+def session_scope():
+
+    """
+    Provides a short-lived session for a unit of work: it's committed at the end of the block,
+    rolled back if an exception is raised and always closed, so its connection goes back to the pool.
+
+    Example:
+        with session_scope() as session:
+            session.add(obj)
+    """
+
+    session = _new_session()
+    try:
+        yield session
+        session.commit()
+    except:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def trim_session(session, max_objects = 5000):
+
+    """
+    Expunges the objects loaded by a long-lived session when they are more than max_objects, so its identity map can't grow forever
+    (the sessions don't expire their objects on commit, so nothing else removes them). Objects with changes not flushed yet are kept.
+    The objects expunged keep their loaded attributes and can be merged into a session again.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): The session to trim.
+        max_objects (int, optional): Objects the identity map can hold before it's trimmed. Default is 5000.
+
+    Return:
+        expunged (int): Number of objects removed from the session.
+    """
+
+    if len(session.identity_map) <= max_objects:
+        return 0
+
+    changed = set([id(obj) for obj in list(session.dirty) + list(session.deleted)])
+    objs = [obj for obj in list(session.identity_map.values()) if id(obj) not in changed]
+    for obj in objs:
+        session.expunge(obj)
+    return len(objs)
+
+
+def _rss():
+    #Resident memory of the process in bytes, None if the platform can't tell.
+    try:
+        import resource
+    except ImportError:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (IOError, OSError):
+        #Peak, not current, where /proc is missing. Kilobytes on Linux, bytes on macOS.
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def memory_report(session = None):
+
+    """
+    Returns how much memory the process uses and what a session is holding.
+
+    Args:
+        session (sqlalchemy.orm.session.Session, optional): The session to inspect. Default is None, only the memory of the process is reported.
+
+    Return:
+        report (dict): Dictionary with keys "rss" (resident memory in bytes, None if unknown), "identity_map" (number of objects in the session)
+            and "objects" (dictionary {class name : number of objects in the session}).
+    """
+
+    report = {"rss" : _rss(), "identity_map" : 0, "objects" : {}}
+    if session != None:
+        for obj in list(session.identity_map.values()):
+            name = type(obj).__name__
+            report["objects"][name] = report["objects"].get(name, 0) + 1
+        report["identity_map"] = len(session.identity_map)
+    return report
 
-Base = declarative_base()
 
+def __getattr__(name):
+    #Backward compatibility, ``Engine`` was a module attribute created at import time.
+    if name == "Engine":
+        return get_engine()
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
 
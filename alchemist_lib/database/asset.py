@@ -1,6 +1,8 @@
-from sqlalchemy import Table, String, ForeignKey, Integer, Column, ForeignKeyConstraint
+from sqlalchemy import Table, String, ForeignKey, Integer, Column, ForeignKeyConstraint, event
 from sqlalchemy.orm import relationship, backref
 
+import sys
+
 from . import Base
 
 
@@ -14,6 +16,30 @@ asset_exchange_association = Table(
 )
 
 
+#Keys already built, every asset with the same ticker and instrument id shares the same tuple.
+_keys = {}
+
+
+def asset_key(ticker, instrument_id):
+
+    """
+    Returns the interned key of an asset: the same (ticker, instrument_id) tuple for every call with the same values,
+    so keys are compared by identity before their items and live only once in memory.
+
+    Args:
+        ticker (str): Ticker code of the asset.
+        instrument_id (int): Integer that identify tha type of financial instrument.
+
+    Return:
+        key (tuple): Tuple (ticker, instrument_id).
+    """
+
+    if isinstance(ticker, str):
+        ticker = sys.intern(ticker)
+    key = (ticker, instrument_id)
+    return _keys.setdefault(key, key)
+
+
 class Asset(Base):
 
     """
@@ -30,6 +56,9 @@ class Asset(Base):
 
     Note:
         https://rszalski.github.io/magicmethods/
+
+        Assets are the index of most of the dataframes of the library, so they are hashed and compared very often:
+        the key and its hash are computed once, the first time they are needed, and reset only if ticker or instrument id change.
     
     """
     
@@ -81,6 +110,25 @@ class Asset(Base):
                 }
 
 
+    @property
+    def key(self):
+
+        """
+        Immutable key of the asset, the one used by hashing and comparisons.
+
+        Return:
+            key (tuple): Interned tuple (ticker, instrument_id), see asset_key().
+        """
+
+        #Not a mapped attribute: it's kept in the instance dict and survives expiration.
+        key = self.__dict__.get("_key")
+        if key == None:
+            key = asset_key(ticker = self.ticker, instrument_id = self.instrument_id)
+            self.__dict__["_key"] = key
+            self.__dict__["_hash"] = hash(key)
+        return key
+
+
     def __eq__(self, other):
 
         """
@@ -88,7 +136,7 @@ class Asset(Base):
         """
         
         if isinstance(self, other.__class__):
-            return ((self.ticker, self.instrument_id) == (other.ticker, other.instrument_id))
+            return self.key is other.key or self.key == other.key
         return NotImplemented
 
 
@@ -99,7 +147,7 @@ class Asset(Base):
         """
         
         if isinstance(self, other.__class__):
-            return ((self.ticker, self.instrument_id) != (other.ticker, other.instrument_id))
+            return self.key != other.key
         return NotImplemented
 
 
@@ -110,7 +158,7 @@ class Asset(Base):
         """
         
         if isinstance(self, other.__class__):
-            return ((self.ticker, self.instrument_id) < (other.ticker, other.instrument_id))
+            return self.key < other.key
         return NotImplemented
 
 
@@ -121,7 +169,7 @@ class Asset(Base):
         """
         
         if isinstance(self, other.__class__):
-            return ((self.ticker, self.instrument_id) <= (other.ticker, other.instrument_id))
+            return self.key <= other.key
         return NotImplemented
 
 
@@ -132,7 +180,7 @@ class Asset(Base):
         """
         
         if isinstance(self, other.__class__):
-            return ((self.ticker, self.instrument_id) > (other.ticker, other.instrument_id))
+            return self.key > other.key
         return NotImplemented
 
 
@@ -143,7 +191,7 @@ class Asset(Base):
         """
         
         if isinstance(self, other.__class__):
-            return ((self.ticker, self.instrument_id) >= (other.ticker, other.instrument_id))
+            return self.key >= other.key
         return NotImplemented
 
 
@@ -153,15 +201,17 @@ class Asset(Base):
         Overrides the default implementation.
         """
         
-        return hash(tuple(sorted(self.to_dict().items())))
-
-
-
-
-
-
-
-
-    
-            
-            
+        #Consistent with __eq__: the name is not part of the hash.
+        h = self.__dict__.get("_hash")
+        if h == None:
+            self.key
+            h = self.__dict__["_hash"]
+        return h
+
+
+@event.listens_for(Asset.ticker, "set")
+@event.listens_for(Asset.instrument_id, "set")
+def _reset_key(target, value, oldvalue, initiator):
+    #The key is built again from the new values the next time it's needed.
+    target.__dict__.pop("_key", None)
+    target.__dict__.pop("_hash", None)
@@ -0,0 +1,191 @@
+from sqlalchemy import String, Integer, Column, UniqueConstraint, select
+
+import threading
+
+import weakref
+
+from . import Base
+from .asset import asset_key
+
+
+
+class AssetDictionary(Base):
+
+    """
+    Map class for table asset_dictionary. Every row gives an asset a surrogate integer id,
+    so tables and arrays with many rows per asset can store a small integer instead of (ticker, instrument_id).
+
+        - **asset_id**: Integer, primary_key.
+        - **ticker**: String(16), not null.
+        - **instrument_id**: Integer, not null.
+
+    Indexes:
+        - **uq_asset_dictionary_asset**: Unique(ticker, instrument_id).
+
+    Note:
+        There is no foreign key to asset: an id is never reused, also if its asset is deleted.
+    """
+
+    __tablename__ = "asset_dictionary"
+    #On SQLite too the ids of deleted rows are not given again.
+    __table_args__ = (UniqueConstraint("ticker", "instrument_id", name = "uq_asset_dictionary_asset"), {"sqlite_autoincrement" : True})
+
+    asset_id = Column(Integer, primary_key = True)
+    ticker = Column(String(16), nullable = False)
+    instrument_id = Column(Integer, nullable = False)
+
+
+    def __init__(self, ticker, instrument_id):
+
+        """
+        Costructor method.
+
+        Args:
+            ticker (str): Ticker code of the asset.
+            instrument_id (int): Integer that identify tha type of financial instrument.
+        """
+
+        self.ticker = ticker
+        self.instrument_id = instrument_id
+
+
+    def __repr__(self):
+        return "<AssetDictionary(asset_id={}, ticker={}, instrument_id={})>".format(self.asset_id, self.ticker, self.instrument_id)
+
+
+class AssetIdCache():
+
+    """
+    Process-local, bidirectional cache of the asset dictionary: (ticker, instrument_id) to asset id and back.
+    Ids never change once assigned, so entries are never invalidated. Every engine has its own entries, dropped with it.
+
+    Example:
+        ids = asset_ids.get_ids(session = session, assets = universe)
+        key = asset_ids.get_key(session = session, asset_id = ids[universe[0].key])
+    """
+
+    def __init__(self):
+
+        """
+        Costructor method.
+        """
+
+        self._ids = weakref.WeakKeyDictionary()
+        self._keys = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+
+    def _maps(self, executor):
+        #Sessions and connections of the same engine share the entries. Not the URL: every sqlite:// engine is a different database.
+        engine = executor.get_bind() if hasattr(executor, "get_bind") else executor.engine
+        with self._lock:
+            if engine not in self._ids:
+                self._ids[engine] = {}
+                self._keys[engine] = {}
+            return self._ids[engine], self._keys[engine]
+
+
+    def _remember(self, ids, keys, rows):
+        with self._lock:
+            for asset_id, ticker, instrument_id in rows:
+                key = asset_key(ticker = ticker, instrument_id = instrument_id)
+                ids[key] = asset_id
+                keys[asset_id] = key
+
+
+    def get_ids(self, session, assets, create = True):
+
+        """
+        Returns the id of every asset, reading the dictionary only for the ones not cached and adding the ones missing.
+
+        Args:
+            session (sqlalchemy.orm.session.Session, sqlalchemy.engine.Connection): Where the dictionary is read and written.
+            assets (list): Assets, allocations or (ticker, instrument_id) tuples.
+            create (bool, optional): Add the assets missing from the dictionary. Default is True.
+
+        Return:
+            ids (dict): Dictionary {(ticker, instrument_id) : asset_id}. Without create the assets missing are not in it.
+
+        Note:
+            New ids are written in the transaction of the session, so they are visible to other processes after its commit.
+        """
+
+        ids, keys = self._maps(executor = session)
+        wanted = []
+        for asset in assets:
+            key = asset if isinstance(asset, tuple) else asset_key(ticker = asset.ticker, instrument_id = asset.instrument_id)
+            if key not in ids and key not in wanted:
+                wanted.append(key)
+
+        if len(wanted) > 0:
+            table = AssetDictionary.__table__
+            tickers = list(set([ticker for ticker, instrument_id in wanted]))
+            rows = session.execute(select([table.c.asset_id, table.c.ticker, table.c.instrument_id]).where(table.c.ticker.in_(tickers))).fetchall()
+            self._remember(ids = ids, keys = keys, rows = rows)
+
+            missing = [key for key in wanted if key not in ids]
+            if create and len(missing) > 0:
+                session.execute(table.insert(), [{"ticker" : ticker, "instrument_id" : instrument_id} for ticker, instrument_id in missing])
+                rows = session.execute(select([table.c.asset_id, table.c.ticker, table.c.instrument_id]).where(table.c.ticker.in_([ticker for ticker, instrument_id in missing]))).fetchall()
+                self._remember(ids = ids, keys = keys, rows = rows)
+
+        result = {}
+        for asset in assets:
+            key = asset if isinstance(asset, tuple) else asset_key(ticker = asset.ticker, instrument_id = asset.instrument_id)
+            if key in ids:
+                result[key] = ids[key]
+        return result
+
+
+    def get_id(self, session, ticker, instrument_id, create = True):
+
+        """
+        Args:
+            session (sqlalchemy.orm.session.Session, sqlalchemy.engine.Connection): Where the dictionary is read and written.
+            ticker (str): Ticker code of the asset.
+            instrument_id (int): Integer that identify tha type of financial instrument.
+            create (bool, optional): Add the asset if it's missing from the dictionary. Default is True.
+
+        Return:
+            asset_id (int): Id of the asset, None if it's missing and create is False.
+        """
+
+        key = asset_key(ticker = ticker, instrument_id = instrument_id)
+        ids, keys = self._maps(executor = session)
+        if key in ids:
+            return ids[key]
+        return self.get_ids(session = session, assets = [key], create = create).get(key)
+
+
+    def get_key(self, session, asset_id):
+
+        """
+        Args:
+            session (sqlalchemy.orm.session.Session, sqlalchemy.engine.Connection): Where the dictionary is read.
+            asset_id (int): Id of the asset.
+
+        Return:
+            key (tuple): Tuple (ticker, instrument_id), None if the id doesn't exist.
+        """
+
+        ids, keys = self._maps(executor = session)
+        if asset_id not in keys:
+            table = AssetDictionary.__table__
+            rows = session.execute(select([table.c.asset_id, table.c.ticker, table.c.instrument_id]).where(table.c.asset_id == asset_id)).fetchall()
+            self._remember(ids = ids, keys = keys, rows = rows)
+        return keys.get(asset_id)
+
+
+    def clear(self):
+
+        """
+        Forgets every entry, for example after the dictionary is rebuilt.
+        """
+
+        with self._lock:
+            self._ids = weakref.WeakKeyDictionary()
+            self._keys = weakref.WeakKeyDictionary()
+
+
+#Cache shared by the whole process.
+asset_ids = AssetIdCache()
@@ -23,6 +23,10 @@ class ExecutedOrder(Base):
         - **amount**: Float(20, 8), not null.
         - **price**: Float(20, 8), null.
         - **paid_fee**: Float(20, 8), null.
+        - **status**: String(9), null. "open", "filled" or "cancelled", null for orders placed before fills were tracked.
+        - **filled**: Float(20, 8), null. Amount executed, with the sign of amount.
+        - **updated_datetime**: DateTime, null. Last time the state of the order was read from the exchange.
+        - **ts_name**: String(150), null. Trading system that placed the order, its fill tracker follows only its orders. Null for orders placed outside a trading system.
 
     Relationships:
     
@@ -46,13 +50,17 @@ class ExecutedOrder(Base):
     amount = Column(Float(precision = 20, scale = 8, asdecimal = True), nullable = False)
     price = Column(Float(precision = 20, scale = 8, asdecimal = True), nullable = True)
     paid_fee = Column(Float(precision = 20, scale = 8, asdecimal = True), nullable = True)
+    status = Column(String(9), nullable = True)
+    filled = Column(Float(precision = 20, scale = 8, asdecimal = True), nullable = True)
+    updated_datetime = Column(DateTime, nullable = True)
+    ts_name = Column(String(150), nullable = True)
 
     exchange = relationship("Exchange")
     asset = relationship("Asset")
     broker = relationship("Broker")
     
 
-    def __init__(self, order_id, ticker, instrument_id, exchange_name, broker_name, order_type, operation, amount, price = None, paid_fee = 0, order_datetime = dt.datetime.utcnow()):
+    def __init__(self, order_id, ticker, instrument_id, exchange_name, broker_name, order_type, operation, amount, price = None, paid_fee = 0, order_datetime = dt.datetime.utcnow(), status = "open", filled = 0, ts_name = None):
         
         """
         Costructor method.
@@ -69,6 +77,9 @@ class ExecutedOrder(Base):
             amount (decimal.Decimal): Order amount.
             price (decimal.Decimal, optional): Price of order execution. None if order_type is market.
             paid_fee (decimal.Decimal): Fee amount, in the base currency or in the quote one.
+            status (str, optional): "open", "filled" or "cancelled". Default is "open".
+            filled (decimal.Decimal, optional): Amount executed, with the sign of amount. Default is 0.
+            ts_name (str, optional): Trading system that placed the order. Default is None.
         """
         
         self.order_datetime = order_datetime
@@ -82,6 +93,10 @@ class ExecutedOrder(Base):
         self.amount = amount
         self.price = price
         self.paid_fee = paid_fee
+        self.status = status
+        self.filled = filled
+        self.updated_datetime = None
+        self.ts_name = ts_name
         
 
     def __repr__(self):
@@ -117,7 +132,10 @@ class ExecutedOrder(Base):
                 "operation" : self.operation,
                 "amount" : self.amount,
                 "price" : self.price,
-                "paid_fee" : self.paid_fee
+                "paid_fee" : self.paid_fee,
+                "status" : self.status,
+                "filled" : self.filled,
+                "ts_name" : self.ts_name
                 }
 
 
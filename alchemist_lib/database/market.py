@@ -0,0 +1,76 @@
+from sqlalchemy import String, DateTime, Float, Boolean, Column, ForeignKey
+from sqlalchemy.orm import relationship
+
+from . import Base
+
+import datetime as dt
+
+
+
+class Market(Base):
+
+    """
+    Map class for table market. Every row is the trading rules of the BTC market of an asset on an exchange,
+    downloaded by alchemist_lib.exchange.markets.MarketStore and used when the exchange can't be reached.
+
+        - **exchange_name**: String(150), primary_key, foreign_key(exchange.exchange_name).
+        - **ticker**: String(16), primary_key.
+        - **min_size**: Float, not null. Minimum amount of an order, in units of the asset.
+        - **min_notional**: Float, not null. Minimum value of an order, in BTC.
+        - **step_size**: Float, not null. The amount of an order must be a multiple of it.
+        - **price_tick**: Float, not null. The price of an order must be a multiple of it.
+        - **is_active**: Boolean, not null. False if the market is frozen or delisted.
+        - **updated_datetime**: DateTime, not null.
+
+    Relationship:
+        - **exchange**: Exchange instance. (Many-to-One)
+    """
+
+    __tablename__ = "market"
+
+    exchange_name = Column(String(150), ForeignKey("exchange.exchange_name", ondelete = "cascade"), primary_key = True)
+    ticker = Column(String(16), primary_key = True)
+    min_size = Column(Float, nullable = False)
+    min_notional = Column(Float, nullable = False)
+    step_size = Column(Float, nullable = False)
+    price_tick = Column(Float, nullable = False)
+    is_active = Column(Boolean, nullable = False)
+    updated_datetime = Column(DateTime, nullable = False)
+
+    exchange = relationship("Exchange")
+
+
+    def __init__(self, exchange_name, ticker, min_size, min_notional, step_size, price_tick, is_active, updated_datetime = None):
+
+        """
+        Costructor method.
+
+        Args:
+            exchange_name (str): Name of the exchange.
+            ticker (str): Ticker code of the asset traded against BTC.
+            min_size (decimal.Decimal): Minimum amount of an order.
+            min_notional (decimal.Decimal): Minimum value of an order, in BTC.
+            step_size (decimal.Decimal): Increment of the amount.
+            price_tick (decimal.Decimal): Increment of the price.
+            is_active (bool): True if the market is open to trading.
+            updated_datetime (datetime.datetime, optional): Default is utcnow().
+        """
+
+        self.exchange_name = exchange_name
+        self.ticker = ticker
+        self.min_size = min_size
+        self.min_notional = min_notional
+        self.step_size = step_size
+        self.price_tick = price_tick
+        self.is_active = is_active
+        self.updated_datetime = updated_datetime if updated_datetime != None else dt.datetime.utcnow()
+
+
+    def __repr__(self):
+        return "<Market(exchange_name={}, ticker={}, min_size={}, min_notional={}, step_size={}, is_active={})>".format(self.exchange_name,
+                                                                                                                      self.ticker,
+                                                                                                                      self.min_size,
+                                                                                                                      self.min_notional,
+                                                                                                                      self.step_size,
+                                                                                                                      self.is_active
+                                                                                                                      )
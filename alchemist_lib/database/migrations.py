@@ -0,0 +1,187 @@
+from sqlalchemy import inspect, select
+
+from . import get_engine
+from .schema_version import SchemaVersion
+from .ohlcv import Ohlcv
+from .ohlcv_watermark import OhlcvWatermark
+from .executed_order import ExecutedOrder
+from .market import Market
+from .asset import Asset
+from .asset_dictionary import AssetDictionary
+
+import datetime as dt
+
+import logging
+
+
+
+#List of (version, description, function). Append new migrations with the ``migration`` decorator, never change old ones.
+MIGRATIONS = []
+
+
+def migration(version, description):
+
+    """
+    Decorator that registers a migration. The function receives a connection inside a transaction
+    and must be idempotent: on new databases ``create_all()`` already created what it adds.
+
+    Args:
+        version (int): Number of the migration, migrations are applied in ascending order.
+        description (str): What the migration does.
+    """
+
+    def decorator(func):
+        assert version not in [v for v, d, f in MIGRATIONS], "Migration {} already registered.".format(version)
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key = lambda item : item[0])
+        return func
+
+    return decorator
+
+
+def _index_names(connection, table_name):
+    insp = inspect(connection)
+    names = [index["name"] for index in insp.get_indexes(table_name)]
+    names += [constraint["name"] for constraint in insp.get_unique_constraints(table_name)]
+    return names
+
+
+def _create_index(connection, table, index_name):
+    if index_name in _index_names(connection = connection, table_name = table.name):
+        logging.debug("Index {} already exists.".format(index_name))
+        return
+
+    for index in table.indexes:
+        if index.name == index_name:
+            index.create(bind = connection)
+            logging.info("Index {} created.".format(index_name))
+
+
+@migration(1, "Unique key of ohlcv led by (ticker, instrument_id, timeframe_id) instead of ohlcv_datetime")
+def _ohlcv_asset_unique_key(connection):
+    _create_index(connection = connection, table = Ohlcv.__table__, index_name = "uq_ohlcv_asset_timeframe_datetime")
+
+    old_columns = ["ohlcv_datetime", "timeframe_id", "ticker", "instrument_id"]
+    if connection.dialect.name == "sqlite":
+        #SQLite can't drop a constraint without rebuilding the table, the old key just stays.
+        return
+
+    for constraint in inspect(connection).get_unique_constraints(Ohlcv.__tablename__):
+        if constraint["column_names"] == old_columns:
+            if connection.dialect.name == "mysql":
+                connection.execute("ALTER TABLE ohlcv DROP INDEX {}".format(constraint["name"]))
+            else:
+                connection.execute("ALTER TABLE ohlcv DROP CONSTRAINT {}".format(constraint["name"]))
+            logging.info("Old unique key {} of ohlcv dropped.".format(constraint["name"]))
+
+
+@migration(2, "Covering index of ohlcv for the recent-window reads of Factor.history")
+def _ohlcv_recent_window_index(connection):
+    _create_index(connection = connection, table = Ohlcv.__table__, index_name = "ix_ohlcv_recent_window")
+
+
+@migration(3, "Table ohlcv_watermark with the range of candles already downloaded")
+def _ohlcv_watermark_table(connection):
+    OhlcvWatermark.__table__.create(bind = connection, checkfirst = True)
+
+
+def _add_column(connection, table, column_name):
+    if column_name in [column["name"] for column in inspect(connection).get_columns(table.name)]:
+        logging.debug("Column {}.{} already exists.".format(table.name, column_name))
+        return
+
+    column = table.columns[column_name]
+    column_type = column.type.compile(dialect = connection.dialect)
+    connection.execute("ALTER TABLE {} ADD COLUMN {} {}".format(table.name, column_name, column_type))
+    logging.info("Column {}.{} added.".format(table.name, column_name))
+
+
+@migration(4, "Columns status, filled and updated_datetime of executed_order for fill tracking")
+def _executed_order_fills(connection):
+    for column_name in ["status", "filled", "updated_datetime"]:
+        _add_column(connection = connection, table = ExecutedOrder.__table__, column_name = column_name)
+
+
+@migration(5, "Table market with the trading rules of every market")
+def _market_table(connection):
+    Market.__table__.create(bind = connection, checkfirst = True)
+
+
+@migration(6, "Table asset_dictionary with an integer id for every asset, column and index asset_id of ohlcv")
+def _asset_dictionary(connection):
+    AssetDictionary.__table__.create(bind = connection, checkfirst = True)
+    _add_column(connection = connection, table = Ohlcv.__table__, column_name = "asset_id")
+
+    dictionary = AssetDictionary.__table__
+    known = set([(row[0], row[1]) for row in connection.execute(select([dictionary.c.ticker, dictionary.c.instrument_id]))])
+    assets = [(row[0], row[1]) for row in connection.execute(select([Asset.__table__.c.ticker, Asset.__table__.c.instrument_id]))]
+    missing = [key for key in assets if key not in known]
+    if len(missing) > 0:
+        connection.execute(dictionary.insert(), [{"ticker" : ticker, "instrument_id" : instrument_id} for ticker, instrument_id in missing])
+        logging.info("{} assets added to asset_dictionary.".format(len(missing)))
+
+    #One statement for the whole table, the candles already saved get the id of their asset.
+    ohlcv = Ohlcv.__table__
+    asset_id = select([dictionary.c.asset_id]).where(dictionary.c.ticker == ohlcv.c.ticker).where(dictionary.c.instrument_id == ohlcv.c.instrument_id).as_scalar()
+    result = connection.execute(ohlcv.update().where(ohlcv.c.asset_id == None).values(asset_id = asset_id))
+    logging.info("asset_id set on {} candles.".format(result.rowcount))
+
+    _create_index(connection = connection, table = ohlcv, index_name = "ix_ohlcv_asset_id")
+
+
+@migration(7, "Column ts_name of executed_order, the trading system that placed the order")
+def _executed_order_ts_name(connection):
+    _add_column(connection = connection, table = ExecutedOrder.__table__, column_name = "ts_name")
+
+
+def current_version(engine = None):
+
+    """
+    Returns the last migration applied to the database.
+
+    Args:
+        engine (sqlalchemy.engine.Engine, optional): Default is the configured engine.
+
+    Return:
+        version (int): Number of the last migration applied, 0 if none.
+    """
+
+    engine = engine if engine != None else get_engine()
+    SchemaVersion.__table__.create(bind = engine, checkfirst = True)
+
+    versions = [row[0] for row in engine.execute(SchemaVersion.__table__.select())]
+    return max(versions) if len(versions) > 0 else 0
+
+
+def upgrade(engine = None):
+
+    """
+    Applies every migration not applied yet, each in its own transaction.
+
+    Args:
+        engine (sqlalchemy.engine.Engine, optional): Default is the configured engine.
+
+    Return:
+        applied (list[int]): Versions of the migrations applied now.
+    """
+
+    engine = engine if engine != None else get_engine()
+    SchemaVersion.__table__.create(bind = engine, checkfirst = True)
+
+    done = [row[0] for row in engine.execute(SchemaVersion.__table__.select())]
+
+    applied = []
+    for version, description, func in MIGRATIONS:
+        if version in done:
+            continue
+
+        logging.info("Applying migration {}: {}".format(version, description))
+        with engine.begin() as connection:
+            func(connection)
+            connection.execute(SchemaVersion.__table__.insert(), {"version" : version,
+                                                                  "description" : description,
+                                                                  "applied_datetime" : dt.datetime.utcnow()
+                                                                  })
+        applied.append(version)
+
+    return applied
@@ -1,7 +1,8 @@
-from sqlalchemy import String, ForeignKey, DateTime, Float, Integer, Column, ForeignKeyConstraint, UniqueConstraint
+from sqlalchemy import String, ForeignKey, DateTime, Float, Integer, Column, ForeignKeyConstraint, Index, event
 from sqlalchemy.orm import relationship
 
 from . import Base
+from .asset_dictionary import asset_ids
 
 
 
@@ -15,27 +16,37 @@ class Ohlcv(Base):
         - **timeframe_id**: String(4), not null.
         - **ticker**: String(16), not null, foreign_key(asset.ticker).
         - **instrument_id**: Integer, not null, foreign_key(asset.instrument_id).
+        - **asset_id**: Integer, null. Id of the asset in asset_dictionary, set when the candle is inserted.
         - **open**: Float(20, 8), not null.
         - **high**: Float(20, 8), not null.
         - **low**: Float(20, 8), not null.
         - **close**: Float(20, 8), not null.
         - **volume**: Float(20, 8), not null.
 
+    Indexes:
+        - **uq_ohlcv_asset_timeframe_datetime**: Unique(ticker, instrument_id, timeframe_id, ohlcv_datetime).
+        - **ix_ohlcv_recent_window**: (ticker, instrument_id, timeframe_id, ohlcv_datetime, open, high, low, close, volume).
+        - **ix_ohlcv_asset_id**: (asset_id, timeframe_id, ohlcv_datetime).
+
+        All lead with the asset, so the last n candles of an asset are a backward range scan with no sort.
+        The second one covers every column read by ``Factor.history()``, the third one is the small integer key used to read many assets at once.
+
     Relationship:
         - **asset**: Asset instance. (Many-to-One)
     """
     
     __tablename__ = "ohlcv"
-    __table_args__ = (ForeignKeyConstraint(["ticker", "instrument_id"], ["asset.ticker", "asset.instrument_id"], ondelete = "cascade"), UniqueConstraint("ohlcv_datetime",
-                                                                                                                                                         "timeframe_id",
-                                                                                                                                                         "ticker",
-                                                                                                                                                         "instrument_id"), )
+    __table_args__ = (ForeignKeyConstraint(["ticker", "instrument_id"], ["asset.ticker", "asset.instrument_id"], ondelete = "cascade"),
+                      Index("uq_ohlcv_asset_timeframe_datetime", "ticker", "instrument_id", "timeframe_id", "ohlcv_datetime", unique = True),
+                      Index("ix_ohlcv_recent_window", "ticker", "instrument_id", "timeframe_id", "ohlcv_datetime", "open", "high", "low", "close", "volume"),
+                      Index("ix_ohlcv_asset_id", "asset_id", "timeframe_id", "ohlcv_datetime"), )
 
     ohlcv_id = Column(Integer, primary_key = True)
     ohlcv_datetime = Column(DateTime)
     timeframe_id = Column(String(4), nullable = False)
     ticker = Column(String(16), nullable = False)
     instrument_id = Column(Integer, nullable = False)
+    asset_id = Column(Integer, nullable = True)
     
     open = Column(Float(precision = 20, scale = 8, asdecimal = True), nullable = True)
     high = Column(Float(precision = 20, scale = 8, asdecimal = True), nullable = True)
@@ -135,3 +146,10 @@ class Ohlcv(Base):
         """
         
         return hash(tuple(sorted(self.to_dict().items())))
+
+
+@event.listens_for(Ohlcv, "before_insert")
+def _set_asset_id(mapper, connection, target):
+    #Every path that saves candles goes through here, the id comes from the process cache after the first candle of an asset.
+    if target.asset_id == None:
+        target.asset_id = asset_ids.get_id(session = connection, ticker = target.ticker, instrument_id = target.instrument_id)
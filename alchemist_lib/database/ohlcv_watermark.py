@@ -0,0 +1,71 @@
+from sqlalchemy import String, DateTime, Integer, Column, ForeignKeyConstraint
+from sqlalchemy.orm import relationship
+
+from . import Base
+
+import datetime as dt
+
+
+
+class OhlcvWatermark(Base):
+
+    """
+    Map class for table ohlcv_watermark. Every row is the range of candles of an asset already downloaded,
+    so a restart resumes from where the download stopped.
+
+        - **ticker**: String(16), primary_key, foreign_key(asset.ticker).
+        - **instrument_id**: Integer, primary_key, foreign_key(asset.instrument_id).
+        - **timeframe_id**: String(4), primary_key.
+        - **first_datetime**: DateTime, not null. Open datetime of the first candle of the range.
+        - **last_datetime**: DateTime, not null. Open datetime of the last closed candle of the range.
+        - **updated_datetime**: DateTime, not null.
+
+    Relationship:
+        - **asset**: Asset instance. (Many-to-One)
+
+    Note:
+        Every candle between first_datetime and last_datetime was asked to the data source, the ones missing don't exist.
+    """
+
+    __tablename__ = "ohlcv_watermark"
+    __table_args__ = (ForeignKeyConstraint(["ticker", "instrument_id"], ["asset.ticker", "asset.instrument_id"], ondelete = "cascade"), )
+
+    ticker = Column(String(16), primary_key = True)
+    instrument_id = Column(Integer, primary_key = True, autoincrement = False)
+    timeframe_id = Column(String(4), primary_key = True)
+    first_datetime = Column(DateTime, nullable = False)
+    last_datetime = Column(DateTime, nullable = False)
+    updated_datetime = Column(DateTime, nullable = False)
+
+    asset = relationship("Asset")
+
+
+    def __init__(self, ticker, instrument_id, timeframe_id, first_datetime, last_datetime, updated_datetime = None):
+
+        """
+        Costructor method.
+
+        Args:
+            ticker (str): Ticker code of the asset.
+            instrument_id (int): Integer that identify tha type of financial instrument.
+            timeframe_id (str): Timeframe identifier.
+            first_datetime (datetime.datetime): Open datetime of the first candle downloaded.
+            last_datetime (datetime.datetime): Open datetime of the last closed candle downloaded.
+            updated_datetime (datetime.datetime, optional): Default is utcnow().
+        """
+
+        self.ticker = ticker
+        self.instrument_id = instrument_id
+        self.timeframe_id = timeframe_id
+        self.first_datetime = first_datetime
+        self.last_datetime = last_datetime
+        self.updated_datetime = updated_datetime if updated_datetime != None else dt.datetime.utcnow()
+
+
+    def __repr__(self):
+        return "<OhlcvWatermark(ticker={}, instrument_id={}, timeframe_id={}, first_datetime={}, last_datetime={})>".format(self.ticker,
+                                                                                                                           self.instrument_id,
+                                                                                                                           self.timeframe_id,
+                                                                                                                           self.first_datetime,
+                                                                                                                           self.last_datetime
+                                                                                                                           )
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, DateTime
+
+from . import Base
+
+import datetime as dt
+
+
+
+class SchemaVersion(Base):
+
+    """
+    Map class for table schema_version. Every row is a migration applied to the database.
+
+        - **version**: Integer, primary_key.
+        - **description**: String(250), not null.
+        - **applied_datetime**: DateTime, not null.
+    """
+
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key = True, autoincrement = False)
+    description = Column(String(250), nullable = False)
+    applied_datetime = Column(DateTime, nullable = False)
+
+
+    def __init__(self, version, description, applied_datetime = None):
+
+        """
+        Costructor method.
+
+        Args:
+            version (int): Number of the migration.
+            description (str): What the migration does.
+            applied_datetime (datetime.datetime, optional): When the migration was applied. Default is utcnow().
+        """
+
+        self.version = version
+        self.description = description
+        self.applied_datetime = applied_datetime if applied_datetime != None else dt.datetime.utcnow()
+
+
+    def __repr__(self):
+        return "<SchemaVersion(version={}, description={}, applied_datetime={})>".format(self.version,
+                                                                                         self.description,
+                                                                                         self.applied_datetime
+                                                                                         )
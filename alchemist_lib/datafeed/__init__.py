@@ -144,20 +144,23 @@ def check_ohlcv_data(session, assets, timeframe, window_length):
     """
     
     assets_toret = []
-    tf, tf_unit = utils.get_timeframe_data(timeframe = timeframe)
+    if window_length <= 0:
+        return assets_toret
+
     start_date = utils.get_last_date_checkpoint(timeframe = timeframe)
+    seconds = utils.timeframe_to_seconds(timeframe = timeframe)
+    steps = set([start_date - dt.timedelta(seconds = seconds * i) for i in range(window_length)])
 
     for asset in assets:
-        for i in range(window_length):
-            step = start_date - dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe) * i)
-            
-            res = session.query(Ohlcv).filter(Ohlcv.ohlcv_datetime == step,
-                                              Ohlcv.asset == asset,
-                                              Ohlcv.timeframe_id == timeframe).all()
-            
-            if len(res) <= 0:
-                assets_toret.append(asset)
-                break
+        #One read-only query for every asset, instead of loading a candle for every step.
+        saved = session.query(Ohlcv.ohlcv_datetime).filter(Ohlcv.ticker == asset.ticker,
+                                                           Ohlcv.instrument_id == asset.instrument_id,
+                                                           Ohlcv.timeframe_id == timeframe,
+                                                           Ohlcv.ohlcv_datetime >= min(steps),
+                                                           Ohlcv.ohlcv_datetime <= start_date).all()
+        
+        if steps.issubset(set([row[0] for row in saved])) == False:
+            assets_toret.append(asset)
 
     return assets_toret
     
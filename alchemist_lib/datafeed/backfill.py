@@ -0,0 +1,212 @@
+from collections import namedtuple
+
+import datetime as dt
+
+from ..database.ohlcv import Ohlcv
+from ..database.ohlcv_watermark import OhlcvWatermark
+
+from .resample import bucket_start
+
+from .. import utils
+
+
+
+#A request to a data source: candles of an asset with open datetime from start_date to end_date, both included.
+BackfillRequest = namedtuple("BackfillRequest", ["asset", "timeframe", "start_date", "end_date"])
+
+
+def get_watermark(session, asset, timeframe):
+
+    """
+    Returns the range of candles of the asset already downloaded.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        asset (alchemist_lib.database.asset.Asset): The asset.
+        timeframe (str): Timeframe identifier.
+
+    Return:
+        watermark (alchemist_lib.database.ohlcv_watermark.OhlcvWatermark): None if nothing was downloaded.
+    """
+
+    return session.query(OhlcvWatermark).filter(OhlcvWatermark.ticker == asset.ticker,
+                                                OhlcvWatermark.instrument_id == asset.instrument_id,
+                                                OhlcvWatermark.timeframe_id == timeframe).one_or_none()
+
+
+def missing_ranges(session, asset, timeframe, start_date, end_date = None):
+
+    """
+    Returns the ranges of candles of the asset that are neither saved nor inside the downloaded range.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        asset (alchemist_lib.database.asset.Asset): The asset.
+        timeframe (str): Timeframe identifier.
+        start_date (datetime.datetime): Datetime of the first candle needed.
+        end_date (datetime.datetime, optional): Datetime of the last candle needed. Default is utcnow(), so the candle still open is included.
+
+    Return:
+        ranges (list[tuple]): List of (first, last) open datetimes of missing candles, both included, in ascending order.
+    """
+
+    end_date = end_date if end_date != None else dt.datetime.utcnow()
+    step = dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe))
+    first = bucket_start(date = start_date, timeframe = timeframe)
+    last = bucket_start(date = end_date, timeframe = timeframe)
+
+    watermark = get_watermark(session = session, asset = asset, timeframe = timeframe)
+
+    saved = session.query(Ohlcv.ohlcv_datetime).filter(Ohlcv.ticker == asset.ticker,
+                                                       Ohlcv.instrument_id == asset.instrument_id,
+                                                       Ohlcv.timeframe_id == timeframe,
+                                                       Ohlcv.ohlcv_datetime >= first,
+                                                       Ohlcv.ohlcv_datetime <= last).all()
+    saved = set([row[0] for row in saved])
+
+    ranges = []
+    date = first
+    while date <= last:
+        downloaded = watermark != None and watermark.first_datetime <= date <= watermark.last_datetime
+        if not downloaded and date not in saved:
+            if len(ranges) > 0 and ranges[-1][1] == date - step:
+                ranges[-1] = (ranges[-1][0], date)
+            else:
+                ranges.append((date, date))
+        date += step
+
+    return ranges
+
+
+def merge_ranges(ranges, timeframe, max_gap = 0):
+
+    """
+    Merges ranges separated by a few candles, downloading them again costs less than another request.
+
+    Args:
+        ranges (list[tuple]): List of (first, last) open datetimes in ascending order.
+        timeframe (str): Timeframe identifier.
+        max_gap (int, optional): Maximum number of candles between two ranges that are merged. None merges everything. Default is 0.
+
+    Return:
+        merged (list[tuple]): List of (first, last) open datetimes.
+    """
+
+    step = dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe))
+
+    merged = []
+    for first, last in ranges:
+        if len(merged) > 0 and (max_gap == None or first - merged[-1][1] <= step * (max_gap + 1)):
+            merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+
+    return merged
+
+
+def paginate(ranges, timeframe, page_size = None):
+
+    """
+    Splits ranges longer than the number of candles a data source returns in one request.
+
+    Args:
+        ranges (list[tuple]): List of (first, last) open datetimes.
+        timeframe (str): Timeframe identifier.
+        page_size (int, optional): Maximum number of candles in a range. None means no limit.
+
+    Return:
+        pages (list[tuple]): List of (first, last) open datetimes.
+    """
+
+    if page_size == None:
+        return list(ranges)
+
+    step = dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe))
+
+    pages = []
+    for first, last in ranges:
+        while first <= last:
+            page_last = min(first + step * (page_size - 1), last)
+            pages.append((first, page_last))
+            first = page_last + step
+
+    return pages
+
+
+def plan(session, assets, timeframe, start_date, end_date = None, max_gap = 0, page_size = None):
+
+    """
+    Works out the minimal list of requests needed to have every candle from start_date to end_date.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        assets (alchemist_lib.database.asset.Asset, list[Asset]): List of assets.
+        timeframe (str): Timeframe identifier.
+        start_date (datetime.datetime): Datetime of the first candle needed.
+        end_date (datetime.datetime, optional): Datetime of the last candle needed. Default is utcnow().
+        max_gap (int, optional): Maximum number of saved candles between two missing ranges merged in a request. None means one request per asset.
+        page_size (int, optional): Maximum number of candles in a request. None means no limit.
+
+    Return:
+        requests (list[BackfillRequest]): Requests to do, nothing is missing if empty.
+    """
+
+    assets = utils.to_list(assets)
+    timeframe = timeframe.upper()
+
+    requests = []
+    for asset in assets:
+        ranges = missing_ranges(session = session, asset = asset, timeframe = timeframe, start_date = start_date, end_date = end_date)
+        ranges = merge_ranges(ranges = ranges, timeframe = timeframe, max_gap = max_gap)
+
+        for first, last in paginate(ranges = ranges, timeframe = timeframe, page_size = page_size):
+            requests.append(BackfillRequest(asset = asset, timeframe = timeframe, start_date = first, end_date = last))
+
+    return requests
+
+
+def mark_downloaded(session, request, now = None):
+
+    """
+    Extends the downloaded range of the asset with the candles of a request.
+    The candle still open is left out, so it's downloaded again.
+    A range that doesn't touch the current one replaces it if it's more recent.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        request (BackfillRequest): A request done.
+        now (datetime.datetime, optional): Current datetime. Default is utcnow().
+
+    Return:
+        watermark (alchemist_lib.database.ohlcv_watermark.OhlcvWatermark): The updated range, None if the request had only the candle still open.
+    """
+
+    now = now if now != None else dt.datetime.utcnow()
+    step = dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = request.timeframe))
+
+    first = request.start_date
+    last = min(request.end_date, bucket_start(date = now, timeframe = request.timeframe) - step)
+    if last < first:
+        return get_watermark(session = session, asset = request.asset, timeframe = request.timeframe)
+
+    watermark = get_watermark(session = session, asset = request.asset, timeframe = request.timeframe)
+    if watermark == None:
+        watermark = OhlcvWatermark(ticker = request.asset.ticker,
+                                   instrument_id = request.asset.instrument_id,
+                                   timeframe_id = request.timeframe,
+                                   first_datetime = first,
+                                   last_datetime = last)
+        session.add(watermark)
+
+    elif first <= watermark.last_datetime + step and last >= watermark.first_datetime - step:
+        watermark.first_datetime = min(first, watermark.first_datetime)
+        watermark.last_datetime = max(last, watermark.last_datetime)
+        watermark.updated_datetime = dt.datetime.utcnow()
+
+    elif first > watermark.last_datetime:
+        watermark.first_datetime = first
+        watermark.last_datetime = last
+        watermark.updated_datetime = dt.datetime.utcnow()
+
+    session.commit()
+    return watermark
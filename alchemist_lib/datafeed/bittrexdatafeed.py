@@ -8,19 +8,18 @@ import json
 
 import datetime as dt
 
-import time
-
 from decimal import Decimal
 
 from .ohlcv import OhlcvBaseClass
 
-from ..database.ohlcv import Ohlcv
+from ..values import Candle, Price, prices_to_frame
 from ..database.price_data_source import PriceDataSource
 from ..database.timeframe import Timeframe
 from ..database.asset import Asset
 from ..database.instrument import Instrument
 
 from .. import utils
+from .. import resilience
 
 import logging
 
@@ -43,13 +42,15 @@ class BittrexDataFeed(OhlcvBaseClass):
         bittrex (bittrex.bittrex.Bittrex): Communication object.
     """
 
-    sleep_seconds = 0.4
     available_timeframe = {"1M" : "oneMin",
                            "5M" : "fiveMin",
                            "30M" : "thirtyMin",
                            "1H" : "hour",
                            "1D" : "day"
                            }
+    http_timeout = 30
+    #GetTicks ignores the range and returns the last candles of the market, so one request per asset is enough.
+    max_gap = None
     
     def __init__(self, session):
 
@@ -77,9 +78,10 @@ class BittrexDataFeed(OhlcvBaseClass):
             Returns only pairs with bitcoin as base currency.
         """
         
-        markets = self.bittrex.get_markets()
-        if markets["result"] == None:
-            logging.warning("Bittrex api result is None. get_assets() method.")
+        try:
+            markets = resilience.call(func = self.bittrex.get_markets, exchange = "bittrex", endpoint = "getmarkets", is_failure = resilience.bittrex_failed)
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Bittrex markets not retrieved. get_assets() method. {}".format(e))
             return []
         
         cryptocurrency_id = self.session.query(Instrument.instrument_id).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
@@ -110,38 +112,35 @@ class BittrexDataFeed(OhlcvBaseClass):
         
         assets = utils.to_list(assets)
         
-        market_summaries = self.bittrex2.get_market_summaries()
-
-        while(True):
-            if market_summaries["result"] == None or market_summaries["success"] == False:
-                logging.warning("Bittrex api result is None or success is False. get_last_price() method.")
-                time.sleep(60)
-                
-                #return pd.DataFrame(data = {"asset" : assets, "last_price" : Decimal(0)}, columns = ["asset", "last_price"]).set_index("asset")
-            else:
-                break
-                
-        market_summaries = market_summaries["result"]
+        try:
+            market_summaries = resilience.call(func = self.bittrex2.get_market_summaries, exchange = "bittrex", endpoint = "getmarketsummaries", is_failure = resilience.bittrex_failed)
+            market_summaries = market_summaries["result"]
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Bittrex market summaries not retrieved, every last price will be 0. get_last_price() method. {}".format(e))
+            market_summaries = []
         
-        df = pd.DataFrame(data = {"asset" : assets}, columns = ["asset", "last_price"]).set_index("asset")
+        last = {market["Summary"]["MarketName"] : market["Summary"]["Last"] for market in market_summaries}
+
+        prices = []
         for asset in assets:
             pair = "BTC-{}".format(asset.ticker)
 
-            found = False
-            for market in market_summaries:
-                if market["Summary"]["MarketName"] == pair:
-                    df.loc[asset, "last_price"] = Decimal(market["Summary"]["Last"])
-                    found = True
-
-            if found == False:
+            if pair not in last:
                 logging.debug("{} market not found. last_price will be 0.".format(pair))
-                df.loc[asset, "last_price"] = Decimal(0)
+                prices.append(Price(asset = asset, price = Decimal(0)))
             else:        
-                logging.debug("{} last price: {}".format(asset.ticker, df.loc[asset, "last_price"]))
+                logging.debug("{} last price: {}".format(asset.ticker, last[pair]))
+                prices.append(Price(asset = asset, price = Decimal(last[pair])))
 
-        return df
+        return prices_to_frame(prices = prices)
     
         
+    def _get_json(self, url):
+        #urlopen waits forever without a timeout.
+        json_data = req.urlopen(url, timeout = resilience.timeout(default = BittrexDataFeed.http_timeout))
+        return json.loads(json_data.read().decode("UTF-8"))
+
+
     def get_ohlcv(self, assets, start_date, timeframe, end_date = dt.datetime.utcnow()):
         
         """
@@ -154,7 +153,7 @@ class BittrexDataFeed(OhlcvBaseClass):
             timeframe (str): Timeframe identifier.
 
         Return:
-            candles (list[alchemist_lib.database.ohlcv.Ohlcv]): List of ohlcv data.
+            candles (list[alchemist_lib.values.Candle]): List of ohlcv data.
             
         """
         
@@ -169,32 +168,27 @@ class BittrexDataFeed(OhlcvBaseClass):
         for asset in assets:
             url = end_point + "?marketName=BTC-{}&tickInterval={}".format(asset.ticker, BittrexDataFeed.available_timeframe[timeframe])
             
-            json_data = req.urlopen(url)
-            data = json.loads(json_data.read().decode("UTF-8"))
-            results = data["result"]
-
-            if results == None:
-                logging.warning("Bittrex api result is None. get_ohlcv() method. Asset: {}".format(asset.ticker))
+            try:
+                data = resilience.call(func = lambda : self._get_json(url = url), exchange = "bittrex", endpoint = "GetTicks.BTC-{}".format(asset.ticker),
+                                       is_failure = resilience.bittrex_failed)
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Bittrex candles not retrieved. get_ohlcv() method. Asset: {}. {}".format(asset.ticker, e))
                 continue
+
+            results = data["result"]
             
             results = [item for item in results if dt.datetime.strptime(item["T"], '%Y-%m-%dT%H:%M:%S') < end_date and dt.datetime.strptime(item["T"], '%Y-%m-%dT%H:%M:%S') > start_date]
 
             for row in results:
-                candle = Ohlcv()
-                
-                candle.ohlcv_datetime = dt.datetime.strptime(row["T"], '%Y-%m-%dT%H:%M:%S')
-                candle.timeframe_id = timeframe
-                candle.open = Decimal(row["O"])
-                candle.high = Decimal(row["H"])
-                candle.low = Decimal(row["L"])
-                candle.close = Decimal(row["C"])
-                candle.volume = Decimal(row["V"])
-                candle.ticker = asset.ticker
-                candle.instrument_id = asset.instrument_id
-
-                candles.append(candle)
-
-            time.sleep(BittrexDataFeed.sleep_seconds)
+                candles.append(Candle(ticker = asset.ticker,
+                                      instrument_id = asset.instrument_id,
+                                      timeframe_id = timeframe,
+                                      ohlcv_datetime = dt.datetime.strptime(row["T"], '%Y-%m-%dT%H:%M:%S'),
+                                      open = Decimal(row["O"]),
+                                      high = Decimal(row["H"]),
+                                      low = Decimal(row["L"]),
+                                      close = Decimal(row["C"]),
+                                      volume = Decimal(row["V"])))
             
         return candles
 		
@@ -4,7 +4,11 @@ import datetime as dt
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import FlushError
 
+from . import resample
+from . import backfill
+
 from .. import utils
+from .. import values
 
 import logging
 
@@ -19,12 +23,22 @@ class OhlcvBaseClass(ABC):
         - get_last_price(assets): It has to return a dataframe (pandas.DataFrame) with the following columns:
             * asset (alchemist_lib.database.asset.Asset): Must be the index.
             * last_price (decimal.Decimal): The last trade price of the asset.
-        - get_ohlcv(assets, start_date, end_date, timeframe): It has to return a list of Ohlcv (alchemist_lib.database.ohlcv.Ohlcv).
+        - get_ohlcv(assets, start_date, end_date, timeframe): It has to return a list of candles (alchemist_lib.values.Candle or alchemist_lib.database.ohlcv.Ohlcv).
+
+    Timeframes not in ``available_timeframe`` are built from the coarsest finer timeframe the data source offers,
+    for example 4H candles from 1H candles.
 
     Attributes:
         session (sqlalchemy.orm.session.Session): Database connection.
+        available_timeframe (dict): Class attribute. Timeframe identifiers offered by the data source as keys, the value used by its api as values.
+        page_size (int): Class attribute. Maximum number of candles asked in a request, None means no limit.
+        max_gap (int): Class attribute. Maximum number of saved candles downloaded again to join two missing ranges in a request, None means one request per asset.
     """
 
+    available_timeframe = {}
+    page_size = None
+    max_gap = 0
+
     def __init__(self, session):
 
         """
@@ -57,23 +71,25 @@ class OhlcvBaseClass(ABC):
         Save an object per time allow us to pass away IntegrityError.
 
         Args:
-            data (list[obj]): List of map class instances.
+            data (list[obj]): List of map class instances or value types (alchemist_lib.values.Candle).
 
         """
         
         for obj in data:
             try:
-                self.session.add(obj)
+                #Candles become mapped instances only here.
+                self.session.add(values.to_mapped(obj = obj))
                 self.session.commit()
             except (IntegrityError, FlushError) as e:
                 self.session.rollback()
                 #logging.debug("An object can't be saved. Obj: {}. Exception: {}".format(obj, e))
                 
 
-    def save_ohlcv(self, assets, start_date, timeframe, end_date = dt.datetime.utcnow()):
+    def save_ohlcv(self, assets, start_date, timeframe, end_date = None):
 
         """
         This method collects and saves OHLCV data from the data source.
+        Only the candles not saved yet are requested, see ``alchemist_lib.datafeed.backfill.plan()``.
 
         Args:
             assets (alchemist_lib.database.asset.Asset, list[Asset]): List of assets which we want informations of.
@@ -82,8 +98,40 @@ class OhlcvBaseClass(ABC):
             timeframe (str): Timeframe identifier.
         """
         
-        candles = self.get_ohlcv(assets = assets, start_date = start_date, end_date = end_date, timeframe = timeframe)
-        self._save(data = candles)
+        assets = utils.to_list(assets)
+        timeframe = timeframe.upper()
+        end_date = end_date if end_date != None else dt.datetime.utcnow()
+        source = self._source_timeframe(timeframe = timeframe)
+        if source != timeframe:
+            start_date = resample.bucket_start(date = start_date, timeframe = timeframe)
+
+        requests = backfill.plan(session = self.session, assets = assets, timeframe = source, start_date = start_date, end_date = end_date,
+                                 max_gap = self.max_gap, page_size = self.page_size)
+        logging.debug("{} requests to {} for {} candles.".format(len(requests), self.__class__.__name__, source))
+
+        for request in requests:
+            #Some data sources return only candles strictly before end_date.
+            candles = self._get_source_ohlcv(assets = [request.asset], start_date = request.start_date, end_date = request.end_date + dt.timedelta(seconds = 1), source = source)
+            self._save(data = candles)
+            if len(candles) > 0:
+                backfill.mark_downloaded(session = self.session, request = request, now = min(end_date, dt.datetime.utcnow()))
+
+        if source != timeframe:
+            #Candles of exchanges have gaps, so what the data source returned is used even if some finer candles are missing.
+            resample.derive_ohlcv(session = self.session, assets = assets, timeframe = timeframe, start_date = start_date, now = end_date, complete_only = False)
+
+
+    def _source_timeframe(self, timeframe):
+        source = resample.source_timeframe(timeframe = timeframe, native = list(self.available_timeframe.keys()))
+        if source == None:
+            raise Exception("Timeframe {} not available for {} and it can't be built from the available ones.".format(timeframe, self.__class__.__name__))
+        return source
+
+
+    def _get_source_ohlcv(self, assets, start_date, end_date, source):
+        #Some data sources return only candles strictly after start_date.
+        candles = self.get_ohlcv(assets = assets, start_date = start_date - dt.timedelta(seconds = 1), end_date = end_date, timeframe = source)
+        return [candle for candle in candles if candle.ohlcv_datetime >= start_date]
 
 
     def get_last_ohlcv(self, assets, timeframe):
@@ -96,9 +144,12 @@ class OhlcvBaseClass(ABC):
             timeframe (str): Timeframe identifier.
 
         Return:
-            candles (list[alchemist_lib.database.ohlcv.Ohlcv]): List of candles. 
+            candles (list[alchemist_lib.values.Candle]): List of candles. 
         """
         
+        timeframe = timeframe.upper()
+        source = self._source_timeframe(timeframe = timeframe)
+
         candles = []
         for asset in assets:
             now = dt.datetime.utcnow()
@@ -107,7 +158,12 @@ class OhlcvBaseClass(ABC):
                 delta = dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe))
                 past = now - delta
 
-                candles += self.get_ohlcv(assets = asset, start_date = past, end_date = now, timeframe = timeframe)
+                if source == timeframe:
+                    candles += self.get_ohlcv(assets = asset, start_date = past, end_date = now, timeframe = timeframe)
+                else:
+                    past = resample.bucket_start(date = past, timeframe = timeframe)
+                    fine_candles = self._get_source_ohlcv(assets = asset, start_date = past, end_date = now, source = source)
+                    candles += resample.aggregate_ohlcv(candles = fine_candles, timeframe = timeframe, complete_only = False)
                 
             else:
                 logging.critical("The instrument is not a cryptocurrency. NotImplemented raised.")
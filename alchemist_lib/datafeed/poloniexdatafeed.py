@@ -1,4 +1,4 @@
-from poloniex import Poloniex, PoloniexError
+from poloniex import Poloniex
 
 import pandas as pd
 
@@ -10,13 +10,14 @@ from decimal import Decimal
 
 from .ohlcv import OhlcvBaseClass
 
-from ..database.ohlcv import Ohlcv
+from ..values import Candle, Price, prices_to_frame
 from ..database.price_data_source import PriceDataSource
 from ..database.timeframe import Timeframe
 from ..database.asset import Asset
 from ..database.instrument import Instrument
 
 from .. import utils
+from .. import resilience
 
 import logging
 
@@ -40,7 +41,15 @@ class PoloniexDataFeed(OhlcvBaseClass):
         polo (poloniex.Poloniex): Communication object.
     """
     
-    sleep_seconds = 0.5
+    available_timeframe = {"5M" : 300,
+                           "15M" : 900,
+                           "30M" : 1800,
+                           "2H" : 7200,
+                           "4H" : 14400,
+                           "1D" : 86400
+                           }
+    page_size = 1000
+    max_gap = 10
 
     
     def __init__(self, session):
@@ -73,15 +82,20 @@ class PoloniexDataFeed(OhlcvBaseClass):
         
         assets = utils.to_list(assets)
 
-        tickers = self.polo.returnTicker()
+        try:
+            tickers = resilience.call(func = self.polo.returnTicker, exchange = "poloniex", endpoint = "returnTicker")
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Poloniex tickers not retrieved, every last price will be 0. get_last_price() method. {}".format(e))
+            tickers = {}
         
-        df = pd.DataFrame(data = {"asset" : assets, "last_price" : Decimal(0)}, columns = ["asset", "last_price"]).set_index("asset")
+        prices = []
         for asset in assets:
-            if "BTC_{}".format(asset.ticker) in tickers:
-                df.loc[asset, "last_price"] = Decimal(tickers["BTC_{}".format(asset.ticker)]["last"])
-                logging.debug("{} last price: {}".format(asset.ticker, df.loc[asset, "last_price"]))
+            pair = "BTC_{}".format(asset.ticker)
+            price = Decimal(tickers[pair]["last"]) if pair in tickers else Decimal(0)
+            logging.debug("{} last price: {}".format(asset.ticker, price))
+            prices.append(Price(asset = asset, price = price))
 
-        return df
+        return prices_to_frame(prices = prices)
 
 
     def get_assets(self):
@@ -96,7 +110,11 @@ class PoloniexDataFeed(OhlcvBaseClass):
             Return only pairs with bitcoin as base currency.
         """
         
-        tickers = self.polo.returnTicker()
+        try:
+            tickers = resilience.call(func = self.polo.returnTicker, exchange = "poloniex", endpoint = "returnTicker")
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Poloniex tickers not retrieved. get_assets() method. {}".format(e))
+            return []
 
         cryptocurrency_id = self.session.query(Instrument.instrument_id).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
         
@@ -123,7 +141,7 @@ class PoloniexDataFeed(OhlcvBaseClass):
             timeframe (str): Timeframe identifier.
 
         Return:
-            candles (list[alchemist_lib.database.ohlcv.Ohlcv]): List of ohlcv data.
+            candles (list[alchemist_lib.values.Candle]): List of ohlcv data.
             
         """
         
@@ -137,39 +155,37 @@ class PoloniexDataFeed(OhlcvBaseClass):
         
         candles = []
         for asset in assets:
+            pair = "BTC_{}".format(asset.ticker)
             try:
-                chart_data = self.polo.returnChartData(currencyPair = "BTC_{}".format(asset.ticker),
-                                                       period = utils.timeframe_to_seconds(timeframe = timeframe),
-                                                       start = start,
-                                                       end = end)
-            except PoloniexError:
+                chart_data = resilience.call(func = lambda : self.polo.returnChartData(currencyPair = pair,
+                                                                                       period = PoloniexDataFeed.available_timeframe[timeframe],
+                                                                                       start = start,
+                                                                                       end = end),
+                                             exchange = "poloniex", endpoint = "returnChartData.{}".format(pair))
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Poloniex candles not retrieved. get_ohlcv() method. Asset: {}. {}".format(asset.ticker, e))
                 continue
 
             for row in chart_data:
-                candle = Ohlcv()
-
                 if row["date"] == 0:
                     continue
                 
                 if timeframe == "1D":
-                    candle.ohlcv_datetime = dt.datetime.fromtimestamp(row["date"]).strftime("%Y-%m-%d")
+                    ohlcv_datetime = dt.datetime.fromtimestamp(row["date"]).replace(hour = 0, minute = 0, second = 0)
                 else:
-                    candle.ohlcv_datetime = dt.datetime.fromtimestamp(row["date"]).strftime("%Y-%m-%d %H:%M:%S")
+                    ohlcv_datetime = dt.datetime.fromtimestamp(row["date"])
 
-                #logging.debug("OHLCV candle date: {}".format(candle.ohlcv_datetime))
+                #logging.debug("OHLCV candle date: {}".format(ohlcv_datetime))
                 
-                candle.timeframe_id = timeframe
-                candle.open = Decimal(row["open"])
-                candle.high = Decimal(row["high"])
-                candle.low = Decimal(row["low"])
-                candle.close = Decimal(row["close"])
-                candle.volume = Decimal(row["volume"])
-                candle.ticker = asset.ticker
-                candle.instrument_id = asset.instrument_id
-
-                candles.append(candle)
-
-            time.sleep(PoloniexDataFeed.sleep_seconds)
+                candles.append(Candle(ticker = asset.ticker,
+                                      instrument_id = asset.instrument_id,
+                                      timeframe_id = timeframe,
+                                      ohlcv_datetime = ohlcv_datetime,
+                                      open = Decimal(row["open"]),
+                                      high = Decimal(row["high"]),
+                                      low = Decimal(row["low"]),
+                                      close = Decimal(row["close"]),
+                                      volume = Decimal(row["volume"])))
             
         return candles
 	
@@ -0,0 +1,195 @@
+import datetime as dt
+
+from ..database.ohlcv import Ohlcv
+
+from .. import utils
+
+from ..values import Candle
+
+
+
+EPOCH = dt.datetime(1970, 1, 1)
+
+
+def bucket_start(date, timeframe):
+
+    """
+    Returns the start of the candle of the specified timeframe that contains the date.
+    Candles are aligned to the Unix epoch, so hours and days start at midnight UTC.
+
+    Args:
+        date (datetime.datetime): A date.
+        timeframe (str): Timeframe identifier.
+
+    Return:
+        start (datetime.datetime): Open datetime of the candle.
+    """
+
+    seconds = utils.timeframe_to_seconds(timeframe = timeframe)
+    elapsed = int((date - EPOCH).total_seconds())
+    return EPOCH + dt.timedelta(seconds = elapsed - (elapsed % seconds))
+
+
+def is_finer(timeframe, target):
+
+    """
+    Checks if candles of the timeframe can be aggregated into candles of the target timeframe.
+
+    Args:
+        timeframe (str): Timeframe identifier of the finer candles.
+        target (str): Timeframe identifier of the coarser candles.
+
+    Return:
+        finer (bool): True if the target is a multiple of the timeframe (and not the same).
+    """
+
+    seconds = utils.timeframe_to_seconds(timeframe = timeframe)
+    target_seconds = utils.timeframe_to_seconds(timeframe = target)
+    return target_seconds > seconds and target_seconds % seconds == 0
+
+
+def aggregate_ohlcv(candles, timeframe, complete_only = True):
+
+    """
+    Builds candles of a coarser timeframe from finer ones.
+    Open is the first open, high the highest high, low the lowest low, close the last close and volume the sum of the volumes.
+
+    Args:
+        candles (list[alchemist_lib.database.ohlcv.Ohlcv]): Finer candles of one timeframe, of one or more assets, in any order. Rows of a query of the Ohlcv columns work too.
+        timeframe (str): Timeframe identifier of the candles to build.
+        complete_only (bool, optional): If True a candle is built only if every finer candle it's made of is present. Default is True.
+
+    Return:
+        aggregated (list[alchemist_lib.values.Candle]): Coarser candles, ordered by asset and datetime. They are not saved.
+    """
+
+    timeframe = timeframe.upper()
+
+    buckets = {}
+    for candle in candles:
+        assert is_finer(timeframe = candle.timeframe_id, target = timeframe), "Can't build {} candles from {} candles.".format(timeframe, candle.timeframe_id)
+        key = (candle.ticker, candle.instrument_id, bucket_start(date = candle.ohlcv_datetime, timeframe = timeframe))
+        buckets.setdefault(key, []).append(candle)
+
+    aggregated = []
+    for key in sorted(buckets.keys()):
+        bucket = sorted(buckets[key], key = lambda c : c.ohlcv_datetime)
+        expected = utils.timeframe_to_seconds(timeframe = timeframe) // utils.timeframe_to_seconds(timeframe = bucket[0].timeframe_id)
+        if complete_only and len(set([c.ohlcv_datetime for c in bucket])) < expected:
+            continue
+
+        aggregated.append(Candle(ticker = key[0],
+                                 instrument_id = key[1],
+                                 timeframe_id = timeframe,
+                                 ohlcv_datetime = key[2],
+                                 open = bucket[0].open,
+                                 high = max([c.high for c in bucket]),
+                                 low = min([c.low for c in bucket]),
+                                 close = bucket[-1].close,
+                                 volume = sum([c.volume for c in bucket])))
+
+    return aggregated
+
+
+def source_timeframe(timeframe, native):
+
+    """
+    Returns the timeframe to download in order to have candles of the specified timeframe.
+
+    Args:
+        timeframe (str): Timeframe identifier of the candles needed.
+        native (list[str]): Timeframe identifiers offered by the data source.
+
+    Return:
+        source (str): The timeframe itself if it's offered, otherwise the coarsest offered timeframe the candles can be built from. None if there isn't one.
+    """
+
+    timeframe = timeframe.upper()
+    if timeframe in native:
+        return timeframe
+
+    candidates = [tf for tf in native if is_finer(timeframe = tf, target = timeframe)]
+    if len(candidates) == 0:
+        return None
+    return max(candidates, key = lambda tf : utils.timeframe_to_seconds(timeframe = tf))
+
+
+def derive_ohlcv(session, assets, timeframe, start_date, now = None, complete_only = True):
+
+    """
+    Builds and saves candles of the specified timeframe from the finer candles already in the database,
+    so coarser timeframes don't need to be downloaded again.
+    Stored finer timeframes are tried from the coarsest, each one fills only the candles still missing.
+
+    Closed candles are built only if every finer candle they are made of is stored.
+    The candle still open is built with the finer candles available and updated on every call, like the exchanges do.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        assets (alchemist_lib.database.asset.Asset, list[Asset]): List of assets.
+        timeframe (str): Timeframe identifier of the candles to build.
+        start_date (datetime.datetime): Datetime to start building candles from.
+        now (datetime.datetime, optional): Current datetime. Default is utcnow().
+        complete_only (bool, optional): If False closed candles are built even if some finer candles are missing. Default is True.
+
+    Return:
+        candles (list[alchemist_lib.database.ohlcv.Ohlcv]): Candles saved or updated.
+    """
+
+    assets = utils.to_list(assets)
+    timeframe = timeframe.upper()
+    now = now if now != None else dt.datetime.utcnow()
+    start = bucket_start(date = start_date, timeframe = timeframe)
+    current = bucket_start(date = now, timeframe = timeframe)
+
+    saved = []
+    for asset in assets:
+        stored = session.query(Ohlcv.timeframe_id).filter(Ohlcv.ticker == asset.ticker,
+                                                          Ohlcv.instrument_id == asset.instrument_id,
+                                                          Ohlcv.ohlcv_datetime >= start).distinct().all()
+        sources = [row[0] for row in stored if is_finer(timeframe = row[0], target = timeframe)]
+        sources.sort(key = lambda tf : utils.timeframe_to_seconds(timeframe = tf), reverse = True)
+
+        existing = session.query(Ohlcv.ohlcv_datetime).filter(Ohlcv.ticker == asset.ticker,
+                                                              Ohlcv.instrument_id == asset.instrument_id,
+                                                              Ohlcv.timeframe_id == timeframe,
+                                                              Ohlcv.ohlcv_datetime >= start).all()
+        existing = set([row[0] for row in existing])
+        done = set()
+
+        for source in sources:
+            #Read-only column tuples, the finer candles don't go in the identity map of the session.
+            candles = session.query(Ohlcv.ticker, Ohlcv.instrument_id, Ohlcv.timeframe_id, Ohlcv.ohlcv_datetime,
+                                    Ohlcv.open, Ohlcv.high, Ohlcv.low, Ohlcv.close, Ohlcv.volume).filter(Ohlcv.ticker == asset.ticker,
+                                                                                                        Ohlcv.instrument_id == asset.instrument_id,
+                                                                                                        Ohlcv.timeframe_id == source,
+                                                                                                        Ohlcv.ohlcv_datetime >= start).all()
+
+            closed = aggregate_ohlcv(candles = [c for c in candles if c.ohlcv_datetime < current], timeframe = timeframe, complete_only = complete_only)
+            last = aggregate_ohlcv(candles = [c for c in candles if c.ohlcv_datetime >= current], timeframe = timeframe, complete_only = False)
+
+            for candle in closed + last:
+                if candle.ohlcv_datetime in done:
+                    continue
+
+                if candle.ohlcv_datetime not in existing:
+                    candle = candle.to_ohlcv()
+                    session.add(candle)
+                    saved.append(candle)
+
+                elif candle.ohlcv_datetime == current:
+                    old = session.query(Ohlcv).filter(Ohlcv.ticker == asset.ticker,
+                                                      Ohlcv.instrument_id == asset.instrument_id,
+                                                      Ohlcv.timeframe_id == timeframe,
+                                                      Ohlcv.ohlcv_datetime == current).one()
+                    old.open, old.high, old.low, old.close, old.volume = candle.open, candle.high, candle.low, candle.close, candle.volume
+                    saved.append(old)
+
+                else:
+                    continue
+
+                done.add(candle.ohlcv_datetime)
+
+        session.commit()
+
+    return saved
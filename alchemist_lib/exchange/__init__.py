@@ -1,13 +1,18 @@
 from .poloniexexchange import PoloniexExchange
 from .bittrexexchange import BittrexExchange
+from .universe import UniverseService
 
-from ..database.asset import Asset
 from ..database.exchange import Exchange
 
-from .. import populate
-
 from .. import utils
 
+import threading
+
+
+
+#Universe services shared by the strategies of the process, one for every exchange.
+_universes = {}
+_universes_lock = threading.Lock()
 
 
 def get_exchanges_dict():
@@ -52,48 +57,48 @@ def are_tradable(assets, exchange_name):
     return []
 
 
-def get_assets(session, exchange_name):
+def get_universe(exchange_name, period = 3600):
 
     """
-    Returns all assets traded in a specified exchange.
+    Returns the universe service of an exchange, created at the first call.
 
     Args:
-        session (sqlalchemy.orm.session.Session): Database connection.
-        exchange_name (str): Name of the exchange.
+        exchange_name (str): Name of the exchange, as saved in the database.
+        period (float, optional): Seconds between two refreshes of the universe, used only when the service is created. Default is 3600.
 
     Return:
-        universe (list[alchemist_lib.database.asset.Asset]): List of Asset instances.
+        service (alchemist_lib.exchange.universe.UniverseService): The universe of the exchange, refreshed in a background thread.
     """
-    
-    exchange_name = exchange_name.lower()
-    available_exchanges = session.query(Exchange).all()
-    assert exchange_name in [exchange.exchange_name for exchange in available_exchanges], "Unknown exchange name."
-    
-    populate.update_asset_list(session = session, exchange_name = exchange_name)
-    
-    universe = session.query(Asset).join(Exchange, Asset.exchanges).filter(Exchange.exchange_name == exchange_name).all()
-    universe = are_tradable(assets = universe, exchange_name = exchange_name)
-
-    return universe
-
-
-
-
-
-
-
-
-
-
-
-
-
 
+    exchange_name = exchange_name.lower()
 
+    with _universes_lock:
+        if exchange_name not in _universes:
+            exchs = get_exchanges_dict()
+            assert exchange_name in list(exchs.keys()), "Unknown exchange name."
+            _universes[exchange_name] = UniverseService(exchange = exchs[exchange_name], exchange_name = exchange_name, period = period)
+        return _universes[exchange_name]
 
 
+def get_assets(session, exchange_name, period = 3600):
 
+    """
+    Returns all assets traded in a specified exchange.
+    The list is downloaded at the first call and refreshed every period seconds in a background thread, the calls in between return the last one downloaded.
 
+    Args:
+        session (sqlalchemy.orm.session.Session): Database connection.
+        exchange_name (str): Name of the exchange.
+        period (float, optional): Seconds between two refreshes of the list. Default is 3600.
 
+    Return:
+        universe (list[alchemist_lib.database.asset.Asset]): List of Asset instances, detached from the session.
+    """
+    
+    exchange_name = exchange_name.lower()
 
+    if exchange_name not in _universes:
+        available_exchanges = session.query(Exchange).all()
+        assert exchange_name in [exchange.exchange_name for exchange in available_exchanges], "Unknown exchange name."
     
+    return get_universe(exchange_name = exchange_name, period = period).get()
@@ -1,8 +1,10 @@
 from bittrex.bittrex import Bittrex
 
 from .exchange import ExchangeBaseClass
+from .markets import MarketInfo
 
 from .. import utils
+from .. import resilience
 
 from decimal import Decimal
 
@@ -24,9 +26,14 @@ class BittrexExchange(ExchangeBaseClass):
 
     Attributes:
         bittrex (bittrex.bittrex.Bittrex): Communication object.
+        min_notional (decimal.Decimal): Class attribute. Minimum value of an order in BTC, Bittrex rejects smaller orders (DUST_TRADE_DISALLOWED_MIN_VALUE).
+        increment (decimal.Decimal): Class attribute. Amounts and prices have 8 decimals.
     
     """
 
+    min_notional = Decimal("0.0005")
+    increment = Decimal("0.00000001")
+
     def __init__(self):
 
         """
@@ -54,30 +61,52 @@ class BittrexExchange(ExchangeBaseClass):
         
         assets = utils.to_list(assets)
         
-        markets = self.bittrex.get_markets()
-
-        if markets["result"] == None:
-            logging.warning("Bittrex api result is None. are_tradable() method.")
+        try:
+            markets = resilience.call(func = self.bittrex.get_markets, exchange = "bittrex", endpoint = "getmarkets", is_failure = resilience.bittrex_failed)
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Bittrex markets not retrieved. are_tradable() method. {}".format(e))
             return assets
 
         markets = markets["result"]
 
-        markets_name = [m["MarketName"] for m in markets]
+        #Markets by name, every asset is checked once.
+        markets = {m["MarketName"] : m for m in markets}
         
         tradable = []
-        for asset in assets:
-            pair = "BTC-{}".format(asset.ticker)
-            if pair in markets_name:
-                for m in markets:
-                    if m["MarketName"] == pair:
-                        if m["IsActive"] == True:
-                            tradable.append(asset)
-                        else:
-                            logging.debug("{} is not tradable.".format(asset.ticker))
+        for asset in utils.KeyedCollection(items = assets):
+            m = markets.get("BTC-{}".format(asset.ticker))
+            if m != None:
+                if m["IsActive"] == True:
+                    tradable.append(asset)
+                else:
+                    logging.debug("{} is not tradable.".format(asset.ticker))
         
         return tradable
 
 	
+    def get_markets(self):
+
+        """
+        Downloads the trading rules of every BTC market with a single call.
+
+        Return:
+            markets (list[alchemist_lib.exchange.markets.MarketInfo]): Rules of the markets.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the markets can't be retrieved.
+        """
+
+        markets = resilience.call(func = self.bittrex.get_markets, exchange = "bittrex", endpoint = "getmarkets", is_failure = resilience.bittrex_failed)
+
+        return [MarketInfo(exchange_name = "bittrex",
+                           ticker = market["MarketCurrency"],
+                           min_size = Decimal(str(market["MinTradeSize"])),
+                           min_notional = BittrexExchange.min_notional,
+                           step_size = BittrexExchange.increment,
+                           price_tick = BittrexExchange.increment,
+                           is_active = market["IsActive"] == True) for market in markets["result"] if market["BaseCurrency"] == "BTC"]
+
+
     def get_min_order_size(self, asset):
 
         """
@@ -90,17 +119,14 @@ class BittrexExchange(ExchangeBaseClass):
             size (decimal.Decimal): Minimum order size. Default is 0.
         """
 
-        pair = "BTC-{}".format(asset.ticker)
-        markets = self.bittrex.get_markets()
-            
-        if markets["result"] == None or markets["success"] == False:
-            logging.warning("Bittrex api result is None or success is False. get_min_trade_size() method.")
+        try:
+            markets = self.get_markets()
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Bittrex markets not retrieved. get_min_order_size() method. {}".format(e))
             return Decimal(0)
-            
-        markets = markets["result"]
-            
+
         for market in markets:
-            if market["MarketName"] == pair:
-                return Decimal(market["MinTradeSize"])
-            
+            if market.ticker == asset.ticker:
+                return market.min_size
+
         return Decimal(0)
@@ -10,6 +10,7 @@ class ExchangeBaseClass(ABC):
     Abstract methods:
         - are_tradable(assets): It has to filter the args and returns just assets that are tradable.
         - get_min_trade_size(asset): It has to returns the minimum order size based on the specified market.
+        - get_markets(): It has to return the trading rules of every BTC market (list[alchemist_lib.exchange.markets.MarketInfo]), with a single call if the exchange allows it.
     """
 
     def __init__(self):
@@ -29,3 +30,8 @@ class ExchangeBaseClass(ABC):
     @abstractmethod
     def get_min_order_size(self, asset):
         pass
+
+
+    @abstractmethod
+    def get_markets(self):
+        pass
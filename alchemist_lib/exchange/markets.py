@@ -0,0 +1,193 @@
+from collections import namedtuple
+
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+
+import threading
+
+import time
+
+import logging
+
+from ..database import session_scope
+from ..database.market import Market
+
+from .. import resilience
+
+
+
+#Trading rules of the BTC market of an asset.
+#    exchange_name (str): Name of the exchange.
+#    ticker (str): Ticker code of the asset.
+#    min_size (decimal.Decimal): Minimum amount of an order, in units of the asset.
+#    min_notional (decimal.Decimal): Minimum value of an order, in BTC.
+#    step_size (decimal.Decimal): The amount of an order must be a multiple of it.
+#    price_tick (decimal.Decimal): The price of an order must be a multiple of it.
+#    is_active (bool): False if the market is frozen or delisted.
+MarketInfo = namedtuple("MarketInfo", ["exchange_name", "ticker", "min_size", "min_notional", "step_size", "price_tick", "is_active"])
+
+
+class MarketStore():
+
+    """
+    Trading rules of every market of an exchange, downloaded with a single call and kept in memory for ttl seconds.
+    Every download is saved in the market table, so if the exchange can't be reached the last rules known are used.
+
+    Attributes:
+        exchange (alchemist_lib.exchange.*): The exchange the rules are downloaded from.
+        exchange_name (str): Name of the exchange, as saved in the database.
+        ttl (float): Seconds the rules are valid for.
+        persist (bool): If True the rules are saved in and loaded from the database.
+    """
+
+    def __init__(self, exchange, exchange_name, ttl = 3600, persist = True, clock = time.time):
+
+        """
+        Costructor method.
+
+        Args:
+            exchange (alchemist_lib.exchange.*): The exchange the rules are downloaded from.
+            exchange_name (str): Name of the exchange, as saved in the database.
+            ttl (float, optional): Seconds the rules are valid for. Default is 3600.
+            persist (bool, optional): Save the rules in the database. Default is True.
+            clock (callable, optional): Returns the current time in seconds. Default is time.time.
+        """
+
+        self.exchange = exchange
+        self.exchange_name = exchange_name
+        self.ttl = ttl
+        self.persist = persist
+        self._clock = clock
+        self._markets = {}
+        self._updated_at = None
+        self._lock = threading.Lock()
+
+
+    def _save(self, markets):
+        try:
+            with session_scope() as session:
+                for market in markets.values():
+                    session.merge(Market(exchange_name = market.exchange_name, ticker = market.ticker, min_size = market.min_size, min_notional = market.min_notional,
+                                         step_size = market.step_size, price_tick = market.price_tick, is_active = market.is_active))
+        except Exception as e:
+            logging.warning("Markets of {} not saved. {}".format(self.exchange_name, e))
+
+
+    def load(self):
+
+        """
+        Loads the rules saved in the database by the last download.
+
+        Return:
+            markets (dict): Dictionary {ticker : MarketInfo}. Empty if nothing is saved.
+        """
+
+        try:
+            with session_scope() as session:
+                rows = session.query(Market).filter(Market.exchange_name == self.exchange_name).all()
+                return {row.ticker : MarketInfo(exchange_name = row.exchange_name, ticker = row.ticker, min_size = Decimal(str(row.min_size)),
+                                                min_notional = Decimal(str(row.min_notional)), step_size = Decimal(str(row.step_size)),
+                                                price_tick = Decimal(str(row.price_tick)), is_active = row.is_active) for row in rows}
+        except Exception as e:
+            logging.warning("Markets of {} not loaded. {}".format(self.exchange_name, e))
+            return {}
+
+
+    def refresh(self):
+
+        """
+        Downloads the rules of every market. If the exchange can't be reached and nothing is in memory, the rules saved in the database are loaded.
+
+        Return:
+            markets (dict): Dictionary {ticker : MarketInfo}.
+        """
+
+        with self._lock:
+            try:
+                markets = {market.ticker : market for market in self.exchange.get_markets()}
+            except resilience.ExchangeUnavailable as e:
+                logging.warning("Markets of {} not retrieved. {}".format(self.exchange_name, e))
+                if len(self._markets) == 0 and self.persist:
+                    self._markets = self.load()
+                #Tried again at the next ttl, not at every order.
+                self._updated_at = self._clock()
+                return self._markets
+
+            if self.persist:
+                self._save(markets = markets)
+            self._markets = markets
+            self._updated_at = self._clock()
+            logging.debug("{} markets of {} refreshed.".format(len(markets), self.exchange_name))
+            return markets
+
+
+    def get(self, ticker):
+
+        """
+        Args:
+            ticker (str): Ticker code of the asset.
+
+        Return:
+            market (MarketInfo): Rules of the BTC market of the asset, None if the market is unknown.
+        """
+
+        if self._updated_at == None or self._clock() - self._updated_at > self.ttl:
+            self.refresh()
+        return self._markets.get(ticker)
+
+
+    def round_price(self, ticker, price, amount):
+
+        """
+        Rounds the limit price of an order to the price tick of the market, away from the book: buys up and sells down, so a marketable order stays marketable.
+
+        Args:
+            ticker (str): Ticker code of the asset.
+            price (decimal.Decimal): Limit price, in BTC.
+            amount (decimal.Decimal): Amount of the order, positive to buy and negative to sell.
+
+        Return:
+            price (decimal.Decimal): The price rounded. Unchanged if the market is unknown or has no tick.
+        """
+
+        price = Decimal(price)
+        market = self.get(ticker = ticker)
+        if market == None or market.price_tick <= 0:
+            return price
+
+        rounding = ROUND_UP if amount > 0 else ROUND_DOWN
+        return (price / market.price_tick).quantize(Decimal(1), rounding = rounding) * market.price_tick
+
+
+    def round_amount(self, ticker, amount, price = None):
+
+        """
+        Rounds the amount of an order towards zero to the step size of the market and checks the minimums.
+
+        Args:
+            ticker (str): Ticker code of the asset.
+            amount (decimal.Decimal): Amount of the order, positive to buy and negative to sell.
+            price (decimal.Decimal, optional): Expected price, in BTC. If None the minimum value of the order isn't checked.
+
+        Return:
+            amount (decimal.Decimal): The amount rounded, 0 if the order can't be placed. Unchanged if the market is unknown.
+        """
+
+        amount = Decimal(amount)
+        market = self.get(ticker = ticker)
+        if market == None:
+            return amount
+
+        if market.is_active == False:
+            logging.debug("The market of {} is not active.".format(ticker))
+            return Decimal(0)
+
+        size = abs(amount)
+        if market.step_size > 0:
+            size = (size / market.step_size).quantize(Decimal(1), rounding = ROUND_DOWN) * market.step_size
+
+        if size < market.min_size or size == 0:
+            return Decimal(0)
+        if price != None and size * Decimal(price) < market.min_notional:
+            return Decimal(0)
+
+        return size if amount > 0 else -size
@@ -1,8 +1,10 @@
 from poloniex import Poloniex
 
 from .exchange import ExchangeBaseClass
+from .markets import MarketInfo
 
 from .. import utils
+from .. import resilience
 
 from decimal import Decimal
 
@@ -24,9 +26,14 @@ class PoloniexExchange(ExchangeBaseClass):
 
     Attributes:
         polo (poloniex.Poloniex): Communication object.
+        min_notional (decimal.Decimal): Class attribute. Minimum value of an order in BTC ("Total must be at least 0.0001."), Poloniex has no minimum amount.
+        increment (decimal.Decimal): Class attribute. Amounts and prices have 8 decimals.
     
     """
 
+    min_notional = Decimal("0.0001")
+    increment = Decimal("0.00000001")
+
     def __init__(self):
 
         """
@@ -37,20 +44,53 @@ class PoloniexExchange(ExchangeBaseClass):
         self.polo = Poloniex()
 
 
+    def get_markets(self):
+
+        """
+        Downloads the trading rules of every BTC market with a single call.
+        They aren't in the Poloniex documentation (https://poloniex.com/support/api/), the values are the ones enforced by the exchange.
+
+        Return:
+            markets (list[alchemist_lib.exchange.markets.MarketInfo]): Rules of the markets.
+
+        Raises:
+            alchemist_lib.resilience.ExchangeUnavailable: If the markets can't be retrieved.
+        """
+
+        pairs = resilience.call(func = self.polo.returnTicker, exchange = "poloniex", endpoint = "returnTicker")
+
+        return [MarketInfo(exchange_name = "poloniex",
+                           ticker = pair.split("_")[1],
+                           min_size = Decimal(0),
+                           min_notional = PoloniexExchange.min_notional,
+                           step_size = PoloniexExchange.increment,
+                           price_tick = PoloniexExchange.increment,
+                           is_active = str(values["isFrozen"]) == "0") for pair, values in pairs.items() if pair.startswith("BTC_")]
+
+
     def get_min_order_size(self, asset):
 
         """
-        This method would return the minimum order size for a specific market, but It's not specified in the Poloniex documentation.
-        https://poloniex.com/support/api/
+        Poloniex has a minimum value of the order (0.0001 BTC), so the minimum size is that value at the last price.
 
         Args:
             asset (alchemist_lib.database.asset.Asset): The asset traded again BTC.
             
         Return:
-            size (decimal.Decimal): Minimum order size. Default is 0.
+            size (decimal.Decimal): Minimum order size. 0 if the last price can't be retrieved.
         """
-        
-        return Decimal(0)
+
+        try:
+            pairs = resilience.call(func = self.polo.returnTicker, exchange = "poloniex", endpoint = "returnTicker")
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Poloniex tickers not retrieved. get_min_order_size() method. {}".format(e))
+            return Decimal(0)
+
+        pair = "BTC_{}".format(asset.ticker)
+        if pair not in pairs or Decimal(str(pairs[pair]["last"])) == 0:
+            return Decimal(0)
+
+        return PoloniexExchange.min_notional / Decimal(str(pairs[pair]["last"]))
     
 
     def are_tradable(self, assets):
@@ -70,12 +110,16 @@ class PoloniexExchange(ExchangeBaseClass):
         
         assets = utils.to_list(assets)
         
-        pairs = self.polo.returnTicker()
+        try:
+            pairs = resilience.call(func = self.polo.returnTicker, exchange = "poloniex", endpoint = "returnTicker")
+        except resilience.ExchangeUnavailable as e:
+            logging.warning("Poloniex tickers not retrieved. are_tradable() method. {}".format(e))
+            return assets
         
         tradable = []
-        for asset in assets:
+        for asset in utils.KeyedCollection(items = assets):
             pair = "BTC_{}".format(asset.ticker)
-            if pair in list(pairs.keys()):
+            if pair in pairs:
                 if pairs[pair]["isFrozen"] == "0":
                     tradable.append(asset)
                 else:
@@ -0,0 +1,172 @@
+from collections import namedtuple
+
+import threading
+
+import time
+
+import logging
+
+from ..database import session_scope
+from ..database.asset import Asset
+from ..database.exchange import Exchange
+
+from .. import populate
+
+
+
+#Tradable assets of an exchange at a point in time.
+#    assets (tuple[alchemist_lib.database.asset.Asset]): The assets, detached from any session.
+#    updated_at (float): Time of the download, in seconds.
+UniverseSnapshot = namedtuple("UniverseSnapshot", ["assets", "updated_at"])
+
+
+class UniverseService():
+
+    """
+    Tradable assets of an exchange, kept in memory and downloaded again every period seconds.
+    A download syncs the asset list of the database and filters the assets that can't be traded, the result replaces the previous snapshot in a single assignment:
+    readers never wait for a download in progress and never see half of it, they get the old snapshot until the new one is ready.
+
+    Example:
+        universe = UniverseService(exchange = BittrexExchange(), exchange_name = "bittrex", period = 3600)
+        universe.start()
+        assets = universe.get()
+
+    Attributes:
+        exchange (alchemist_lib.exchange.*): The exchange used to filter the tradable assets.
+        exchange_name (str): Name of the exchange, as saved in the database.
+        period (float): Seconds between two downloads.
+        background (bool): If True the downloads after the first one are made by a background thread, otherwise by the get() that finds the snapshot expired.
+    """
+
+    def __init__(self, exchange, exchange_name, period = 3600, background = True, loader = None, clock = time.time):
+
+        """
+        Costructor method.
+
+        Args:
+            exchange (alchemist_lib.exchange.*): The exchange used to filter the tradable assets.
+            exchange_name (str): Name of the exchange, as saved in the database.
+            period (float, optional): Seconds between two downloads. Default is 3600.
+            background (bool, optional): Refresh the universe in a background thread, started by the first get(). Default is True.
+            loader (callable, optional): Returns the list of tradable assets. Default downloads them from the exchange.
+            clock (callable, optional): Returns the current time in seconds. Default is time.time.
+        """
+
+        assert period > 0, "The period must be greater than 0."
+
+        self.exchange = exchange
+        self.exchange_name = exchange_name
+        self.period = period
+        self.background = background
+        self._loader = loader if loader != None else self.download
+        self._clock = clock
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def download(self):
+
+        """
+        Updates the asset list of the exchange in the database and filters the assets that can be traded now.
+
+        Return:
+            universe (list[alchemist_lib.database.asset.Asset]): Tradable assets, detached from the session.
+        """
+
+        with session_scope() as session:
+            populate.update_asset_list(session = session, exchange_name = self.exchange_name)
+            assets = session.query(Asset).join(Exchange, Asset.exchanges).filter(Exchange.exchange_name == self.exchange_name).all()
+            #Detached before the commit, so their attributes are not expired.
+            session.expunge_all()
+
+        return self.exchange.are_tradable(assets = assets)
+
+
+    def refresh(self):
+
+        """
+        Downloads the universe and swaps it with the current snapshot. If the download fails or is empty the current snapshot is kept.
+
+        Return:
+            snapshot (UniverseSnapshot): The snapshot in use after the refresh.
+
+        Raises:
+            Exception: If the first download fails.
+        """
+
+        #One download at a time, the readers don't take the lock.
+        with self._lock:
+            try:
+                assets = self._loader()
+            except Exception as e:
+                if self._snapshot == None:
+                    raise
+                logging.warning("Universe of {} not refreshed. {}".format(self.exchange_name, e))
+                #Tried again at the next period, not at every call.
+                self._snapshot = self._snapshot._replace(updated_at = self._clock())
+                return self._snapshot
+
+            if len(assets) == 0 and self._snapshot != None:
+                logging.warning("Empty universe downloaded for {}, the previous one is kept.".format(self.exchange_name))
+                self._snapshot = self._snapshot._replace(updated_at = self._clock())
+                return self._snapshot
+
+            self._snapshot = UniverseSnapshot(assets = tuple(assets), updated_at = self._clock())
+            logging.debug("Universe of {} refreshed: {} assets.".format(self.exchange_name, len(assets)))
+            return self._snapshot
+
+
+    def get(self):
+
+        """
+        Returns the current universe. Only the first call waits for a download.
+
+        Return:
+            universe (list[alchemist_lib.database.asset.Asset]): Tradable assets, detached from any session.
+        """
+
+        snapshot = self._snapshot
+        if snapshot == None:
+            snapshot = self.refresh()
+            if self.background:
+                self.start()
+        elif self.background == False and self._clock() - snapshot.updated_at > self.period:
+            snapshot = self.refresh()
+
+        return list(snapshot.assets)
+
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.exception("Universe refresh of {} failed: {}".format(self.exchange_name, e))
+
+
+    def start(self):
+
+        """
+        Starts refreshing the universe every period seconds in a background thread.
+        """
+
+        if self._thread != None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run, name = "Universe-{}".format(self.exchange_name), daemon = True)
+        self._thread.start()
+
+
+    def stop(self):
+
+        """
+        Stops the background thread and waits for it.
+        """
+
+        self._stop.set()
+        if self._thread != None:
+            self._thread.join()
+            self._thread = None
@@ -2,8 +2,6 @@ import pandas as pd
 
 import numpy as np
 
-import pandas_talib
-
 from sqlalchemy import desc
 
 from decimal import Decimal
@@ -11,8 +9,10 @@ from decimal import Decimal
 import datetime as dt
 
 from . import datafeed
+from .datafeed import resample
 
 from . import utils
+from .panel import load_panel
 
 from .database.timeframe import Timeframe
 from .database.ohlcv import Ohlcv
@@ -24,6 +24,12 @@ import warnings
 warnings.filterwarnings("ignore")
 
 
+def _talib():
+    #pandas_talib is slow to import and only a few indicators need it, so it's imported on first use.
+    import pandas_talib
+    return pandas_talib
+
+
 def lin_reg(vals, index):
     # y = mx + q
     #https://docs.scipy.org/doc/numpy-1.14.0/reference/generated/numpy.linalg.lstsq.html
@@ -41,39 +47,80 @@ class Factor():
 
     def __init__(self, session):
         self.session = session
+        #Last panel loaded by panel(), history() slices it when it can.
+        self.last_panel = None
+
+
+    def _update_ohlcv(self, universe, timeframe, window_length):
+        #Saves the candles of the window that are missing, deriving them from finer ones or downloading them.
+        assets_to_update_ohlcv = datafeed.check_ohlcv_data(session = self.session, assets = universe, timeframe = timeframe, window_length = window_length)
+        if len(assets_to_update_ohlcv) > 0:
+            start = utils.get_last_date_checkpoint(timeframe = timeframe) - dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe) * window_length)
+
+            #Candles built from the finer ones already saved don't need to be downloaded.
+            resample.derive_ohlcv(session = self.session, assets = assets_to_update_ohlcv, timeframe = timeframe, start_date = start)
+            assets_to_update_ohlcv = datafeed.check_ohlcv_data(session = self.session, assets = assets_to_update_ohlcv, timeframe = timeframe, window_length = window_length)
+
+        if len(assets_to_update_ohlcv) > 0:
+            logging.debug("Assets OHLCV not updated: {}".format(assets_to_update_ohlcv))
+            datafeed.save_ohlcv(session = self.session, assets = assets_to_update_ohlcv, start_date = start, timeframe = timeframe)
+
+
+    def panel(self, universe, fields, timeframe, window_length):
+
+        """
+        Loads the candles of the whole universe once: the freshness check, the download of the missing candles and the read are done here,
+        then every slice is taken from memory. The panel is kept and history() answers from it the requests it covers.
+
+        Args:
+            universe (list[alchemist_lib.database.asset.Asset]): Assets of the panel.
+            fields (list[str], str): Fields of the panel, * means open, high, low, close and volume.
+            timeframe (str): Timeframe identifier.
+            window_length (int): Number of steps.
+
+        Return:
+            panel (alchemist_lib.panel.Panel): Candles of the last window_length steps, NaN where missing.
+        """
+
+        timeframe = timeframe.upper()
+        assert window_length > 0, "The window_length param must be > 0."
+        universe = list(universe)
+
+        self._update_ohlcv(universe = universe, timeframe = timeframe, window_length = window_length)
+        self.last_panel = load_panel(session = self.session, universe = universe, fields = fields, timeframe = timeframe, window_length = window_length)
+        return self.last_panel
 
 
     def history(self, universe, field, timeframe, window_length):
         field = field.lower()
         timeframe = timeframe.upper()
-        available_timeframe = self.session.query(Timeframe).all()
         assert window_length > 0, "The window_length param must be > 0."
         assert field in ["open", "high", "low", "close", "volume", "*"], "Incorrect field. Supported: open, high, low, close, volume, *."
+
+        universe = utils.to_list(universe)
+        fields = ["open", "high", "low", "close", "volume"] if field == "*" else [field]
+        if self.last_panel != None and self.last_panel.covers(assets = universe, fields = fields, timeframe = timeframe, window_length = window_length):
+            return self.last_panel.history(assets = universe, field = field, window_length = window_length)
+
+        available_timeframe = self.session.query(Timeframe).all()
         assert timeframe not in available_timeframe, "Not supported timeframe."
 
+        #The session belongs to the caller: only the candles added to it by this call are expunged at the end.
+        known = set(self.session.identity_map.keys())
+        self._update_ohlcv(universe = universe, timeframe = timeframe, window_length = window_length)
         
-        assets_to_update_ohlcv = datafeed.check_ohlcv_data(session = self.session, assets = universe, timeframe = timeframe, window_length = window_length)
-        if len(assets_to_update_ohlcv) > 0:
-            logging.debug("Assets OHLCV not updated: {}".format(assets_to_update_ohlcv))
-            start = utils.get_last_date_checkpoint(timeframe = timeframe) - dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe) * window_length)
-            datafeed.save_ohlcv(session = self.session, assets = assets_to_update_ohlcv, start_date = start, timeframe = timeframe)
-        
-        df = pd.DataFrame(columns = ["asset", "datetime", "open", "high", "low", "close", "volume"])
+        records = []
         for asset in universe:
-            ohlcvs = self.session.query(Ohlcv).filter(Ohlcv.asset == asset,
-                                                      Ohlcv.timeframe_id == timeframe).order_by(desc(Ohlcv.ohlcv_datetime)).limit(window_length).all()
-
-            for row in ohlcvs:
-                d = {"asset" : asset,
-                     "datetime" : row.ohlcv_datetime,
-                     "open" : row.open,
-                     "high" : row.high,
-                     "low" : row.low,
-                     "close" : row.close,
-                     "volume" : row.volume
-                     }
+            #Read-only column tuples: the candles don't go in the identity map of the session.
+            rows = self.session.query(Ohlcv.ohlcv_datetime, Ohlcv.open, Ohlcv.high, Ohlcv.low, Ohlcv.close, Ohlcv.volume).filter(Ohlcv.ticker == asset.ticker,
+                                                                                                                                  Ohlcv.instrument_id == asset.instrument_id,
+                                                                                                                                  Ohlcv.timeframe_id == timeframe).order_by(desc(Ohlcv.ohlcv_datetime)).limit(window_length).all()
+            records += [(asset, ) + tuple(row) for row in rows]
 
-                df = df.append(other = d, ignore_index = True)
+        df = pd.DataFrame.from_records(records, columns = ["asset", "datetime", "open", "high", "low", "close", "volume"])
+        for key, obj in list(self.session.identity_map.items()):
+            if key not in known and isinstance(obj, Ohlcv) and obj not in self.session.dirty:
+                self.session.expunge(obj)
 
         df.set_index(keys = ["asset", "datetime"], inplace = True)
         
@@ -131,7 +178,7 @@ class Factor():
             vals = df.loc[asset]
             vals = vals.sort_index(level = 0, ascending = True)
             
-            ma = pandas_talib.MA(df = vals, n = window_length, price = field)
+            ma = _talib().MA(df = vals, n = window_length, price = field)
             
             main_df.loc[asset, "MovingAverage"] = ma.tail(1)["MA_{}".format(window_length)].values[0]
             
@@ -175,7 +222,7 @@ class Factor():
             vals = df.loc[asset]
             vals = vals.sort_index(level = 0, ascending = True)
             logging.debug("vals: {}".format(vals))
-            ema = pandas_talib.EMA(df = vals, n = window_length, price = field)
+            ema = _talib().EMA(df = vals, n = window_length, price = field)
             logging.debug("ema: {}".format(ema))
             main_df.loc[asset, "ExponentialMovingAverage"] = ema.tail(1)["EMA_{}".format(window_length)].values[0]
             
@@ -195,7 +242,7 @@ class Factor():
         for asset in df.index.levels[0]:
             vals = df.loc[asset]
             vals = vals.sort_index(level = 0, ascending = True)
-            mom = pandas_talib.MOM(df = vals, n = delta, price = field)
+            mom = _talib().MOM(df = vals, n = delta, price = field)
             main_df.loc[asset, "Momentum"] = mom.tail(1)["Momentum_{}".format(delta)].values[0]
             
         return main_df
@@ -214,7 +261,7 @@ class Factor():
         for asset in df.index.levels[0]:
             vals = df.loc[asset]
             vals = vals.sort_index(level = 0, ascending = True)
-            roc = pandas_talib.ROC(df = vals, n = window_length, price = field)
+            roc = _talib().ROC(df = vals, n = window_length, price = field)
             main_df.loc[asset, "RateOfChange"] = roc.tail(1)["ROC_{}".format(window_length)].values[0]
             
         return main_df
@@ -0,0 +1,394 @@
+from .database import CONFIG_PATH, get_engine, session_factory
+from .database.ohlcv import Ohlcv
+from .database.ohlcv_watermark import OhlcvWatermark
+
+from .datafeed.resample import aggregate_ohlcv, bucket_start, is_finer
+
+from . import utils
+
+import configparser
+
+import datetime as dt
+
+import logging
+
+
+
+#Days of candles kept for every timeframe. Timeframes not listed are kept forever.
+RETENTION_DEFAULTS = {"1M" : 7,
+                      "5M" : 30,
+                      "15M" : 90,
+                      "30M" : 180,
+                      "1H" : 365,
+                      "2H" : 365,
+                      "4H" : 730
+                      }
+
+#Timeframe the candles are rolled up into before being deleted.
+ROLLUP_DEFAULTS = {"1M" : "1H",
+                   "5M" : "1H",
+                   "15M" : "1H",
+                   "30M" : "1H",
+                   "1H" : "1D",
+                   "2H" : "1D",
+                   "4H" : "1D"
+                   }
+
+PURGE_BATCH_SIZE = 10000
+
+
+def _read_section(section, path):
+    config = configparser.ConfigParser()
+    config.optionxform = str.upper
+    config.read(path)
+
+    if section in config.sections():
+        return dict(config[section])
+    return {}
+
+
+def get_retention(path = CONFIG_PATH):
+
+    """
+    Returns the retention of every timeframe: the defaults overridden by the RETENTION section of config.ini.
+    A value of 0 or "forever" means the candles of that timeframe are never deleted.
+
+    Example of config.ini:
+        [RETENTION]
+        15M = 30
+        1H = forever
+
+    Args:
+        path (str, optional): Path of the configuration file.
+
+    Return:
+        retention (dict): Timeframe identifier as key and number of days as value. Timeframes kept forever are not in it.
+    """
+
+    retention = dict(RETENTION_DEFAULTS)
+    for timeframe, days in _read_section(section = "RETENTION", path = path).items():
+        if days.lower() in ["0", "forever", "none", ""]:
+            retention.pop(timeframe, None)
+        else:
+            retention[timeframe] = int(days)
+
+    return retention
+
+
+def get_rollup(path = CONFIG_PATH):
+
+    """
+    Returns the timeframe every timeframe is rolled up into: the defaults overridden by the ROLLUP section of config.ini.
+    A value of "none" disables the rollup of that timeframe.
+
+    Args:
+        path (str, optional): Path of the configuration file.
+
+    Return:
+        rollup (dict): Timeframe identifier of the fine candles as key and of the coarse ones as value.
+    """
+
+    rollup = dict(ROLLUP_DEFAULTS)
+    for timeframe, target in _read_section(section = "ROLLUP", path = path).items():
+        if target.lower() in ["none", ""]:
+            rollup.pop(timeframe, None)
+        else:
+            target = target.upper()
+            assert is_finer(timeframe = timeframe, target = target), "Can't roll up {} candles into {} candles.".format(timeframe, target)
+            rollup[timeframe] = target
+
+    return rollup
+
+
+def rollup(session, timeframe, target, before):
+
+    """
+    Builds the candles of the target timeframe from the candles of the timeframe older than a date.
+    Only the candles not already in the database are saved, so candles downloaded from the exchange win.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        timeframe (str): Timeframe identifier of the fine candles.
+        target (str): Timeframe identifier of the coarse candles.
+        before (datetime.datetime): Only fine candles older than this date are rolled up. It's moved back to the start of a coarse candle.
+
+    Return:
+        saved (int): Number of coarse candles saved.
+    """
+
+    before = bucket_start(date = before, timeframe = target)
+
+    assets = session.query(Ohlcv.ticker, Ohlcv.instrument_id).filter(Ohlcv.timeframe_id == timeframe,
+                                                                     Ohlcv.ohlcv_datetime < before).distinct().all()
+
+    saved = 0
+    for ticker, instrument_id in assets:
+        candles = session.query(Ohlcv).filter(Ohlcv.ticker == ticker,
+                                              Ohlcv.instrument_id == instrument_id,
+                                              Ohlcv.timeframe_id == timeframe,
+                                              Ohlcv.ohlcv_datetime < before).all()
+
+        #Gaps are frequent on exchanges, a partial candle is better than nothing once the fine candles are gone.
+        aggregated = aggregate_ohlcv(candles = candles, timeframe = target, complete_only = False)
+        if len(aggregated) == 0:
+            continue
+
+        existing = session.query(Ohlcv.ohlcv_datetime).filter(Ohlcv.ticker == ticker,
+                                                              Ohlcv.instrument_id == instrument_id,
+                                                              Ohlcv.timeframe_id == target,
+                                                              Ohlcv.ohlcv_datetime >= aggregated[0].ohlcv_datetime,
+                                                              Ohlcv.ohlcv_datetime < before).all()
+        existing = set([row[0] for row in existing])
+
+        missing = [candle.to_ohlcv() for candle in aggregated if candle.ohlcv_datetime not in existing]
+        session.add_all(missing)
+        session.commit()
+
+        #The fine candles are going to be deleted, there's no need to keep them in the identity map. The other objects of the caller are left alone.
+        for candle in candles + missing:
+            session.expunge(candle)
+        saved += len(missing)
+
+    logging.info("{} {} candles rolled up from {} candles older than {}.".format(saved, target, timeframe, before))
+    return saved
+
+
+def _advance_watermarks(session, timeframe, before):
+    #The candles older than before are gone: the downloaded ranges start after them, so backfill can download them again if they are asked.
+    watermarks = session.query(OhlcvWatermark).filter(OhlcvWatermark.timeframe_id == timeframe,
+                                                      OhlcvWatermark.first_datetime < before).all()
+    for watermark in watermarks:
+        if watermark.last_datetime < before:
+            session.delete(watermark)
+        else:
+            watermark.first_datetime = before
+    session.commit()
+
+
+def purge(session, timeframe, before, batch_size = PURGE_BATCH_SIZE):
+
+    """
+    Deletes the candles of a timeframe older than a date.
+    The rows are deleted in batches, each in its own transaction, to keep locks and undo logs small.
+    The download watermarks of the timeframe are moved forward to the date, or deleted if their whole range is gone.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        timeframe (str): Timeframe identifier.
+        before (datetime.datetime): Candles older than this date are deleted.
+        batch_size (int, optional): Maximum number of rows deleted in a transaction.
+
+    Return:
+        deleted (int): Number of candles deleted.
+    """
+
+    deleted = 0
+    while True:
+        ids = session.query(Ohlcv.ohlcv_id).filter(Ohlcv.timeframe_id == timeframe,
+                                                   Ohlcv.ohlcv_datetime < before).limit(batch_size).all()
+        if len(ids) == 0:
+            break
+
+        session.query(Ohlcv).filter(Ohlcv.ohlcv_id.in_([row[0] for row in ids])).delete(synchronize_session = False)
+        session.commit()
+        deleted += len(ids)
+
+    _advance_watermarks(session = session, timeframe = timeframe, before = before)
+
+    logging.info("{} {} candles older than {} deleted.".format(deleted, timeframe, before))
+    return deleted
+
+
+def run(session, now = None, retention = None, rollups = None):
+
+    """
+    Applies the retention policy: for every timeframe with a retention the expiring candles are rolled up, then deleted.
+    Timeframes are processed from the finest, so a rolled up candle can be rolled up again in the same run.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Connection to the database.
+        now (datetime.datetime, optional): Reference date. Default is the current UTC date.
+        retention (dict, optional): Days of candles kept for every timeframe. Default is ``get_retention()``.
+        rollups (dict, optional): Timeframe the candles are rolled up into. Default is ``get_rollup()``.
+
+    Return:
+        report (dict): Timeframe identifier as key and a dict with "rolled_up" and "deleted" as value.
+    """
+
+    now = now if now != None else dt.datetime.utcnow()
+    retention = retention if retention != None else get_retention()
+    rollups = rollups if rollups != None else get_rollup()
+
+    report = {}
+    for timeframe in sorted(retention.keys(), key = lambda tf : utils.timeframe_to_seconds(timeframe = tf)):
+        before = now - dt.timedelta(days = retention[timeframe])
+
+        rolled_up = 0
+        if timeframe in rollups:
+            rolled_up = rollup(session = session, timeframe = timeframe, target = rollups[timeframe], before = before)
+            #Fine candles of a coarse candle still open are kept, they are needed to complete it.
+            before = bucket_start(date = before, timeframe = rollups[timeframe])
+
+        deleted = purge(session = session, timeframe = timeframe, before = before)
+        report[timeframe] = {"rolled_up" : rolled_up, "deleted" : deleted}
+
+    return report
+
+
+def _partition_name(month):
+    return "p{}".format(month.strftime("%Y%m"))
+
+
+def _next_month(month):
+    return (month.replace(day = 1) + dt.timedelta(days = 32)).replace(day = 1)
+
+
+def _partition_definitions(first, last):
+    definitions = []
+    month = first
+    while month <= last:
+        definitions.append("PARTITION {} VALUES LESS THAN (TO_DAYS('{}'))".format(_partition_name(month = month),
+                                                                                 _next_month(month = month).strftime("%Y-%m-%d")))
+        month = _next_month(month = month)
+    return definitions
+
+
+def _existing_partitions(connection):
+    rows = connection.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS \
+                               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ohlcv' AND PARTITION_NAME IS NOT NULL")
+    return [row[0] for row in rows]
+
+
+def partition(engine = None, months_ahead = 3, now = None):
+
+    """
+    Partitions the ohlcv table by month of ohlcv_datetime (MySQL only) and adds the partitions of the next months.
+    It can be run as often as needed, the partitions that already exist are left alone.
+
+    MySQL requires the partitioning column in every unique key and doesn't support foreign keys on partitioned tables,
+    so the first run drops the foreign key to asset and makes the primary key (ohlcv_id, ohlcv_datetime).
+    Deleting an asset doesn't delete its candles anymore.
+
+    Args:
+        engine (sqlalchemy.engine.Engine, optional): Default is the configured engine.
+        months_ahead (int, optional): Number of future months that must have a partition. Default is 3.
+        now (datetime.datetime, optional): Reference date. Default is the current UTC date.
+
+    Return:
+        created (list[str]): Names of the partitions created.
+    """
+
+    engine = engine if engine != None else get_engine()
+    if engine.dialect.name != "mysql":
+        raise Exception("Partitioning is supported on MySQL only, the {} database is left as it is.".format(engine.dialect.name))
+
+    now = now if now != None else dt.datetime.utcnow()
+    last = now.replace(day = 1, hour = 0, minute = 0, second = 0, microsecond = 0)
+    for i in range(months_ahead):
+        last = _next_month(month = last)
+
+    with engine.begin() as connection:
+        existing = _existing_partitions(connection = connection)
+
+        if len(existing) == 0:
+            first = connection.execute("SELECT MIN(ohlcv_datetime) FROM ohlcv").scalar()
+            first = (first if first != None else now).replace(day = 1, hour = 0, minute = 0, second = 0, microsecond = 0)
+
+            for fk in connection.execute("SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS \
+                                          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ohlcv' AND CONSTRAINT_TYPE = 'FOREIGN KEY'").fetchall():
+                connection.execute("ALTER TABLE ohlcv DROP FOREIGN KEY {}".format(fk[0]))
+
+            connection.execute("ALTER TABLE ohlcv MODIFY ohlcv_datetime DATETIME NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (ohlcv_id, ohlcv_datetime)")
+
+            definitions = _partition_definitions(first = first, last = last)
+            definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+            connection.execute("ALTER TABLE ohlcv PARTITION BY RANGE (TO_DAYS(ohlcv_datetime)) ({})".format(", ".join(definitions)))
+
+            created = [definition.split(" ")[1] for definition in definitions]
+
+        else:
+            first = dt.datetime.strptime(max([name for name in existing if name != "pmax"]), "p%Y%m")
+            first = _next_month(month = first)
+            definitions = _partition_definitions(first = first, last = last)
+            if len(definitions) == 0:
+                return []
+
+            definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+            connection.execute("ALTER TABLE ohlcv REORGANIZE PARTITION pmax INTO ({})".format(", ".join(definitions)))
+
+            created = [definition.split(" ")[1] for definition in definitions[:-1]]
+
+    logging.info("Partitions of ohlcv created: {}.".format(created))
+    return created
+
+
+def drop_partitions(engine = None, retention = None, rollups = None, now = None):
+
+    """
+    Drops the monthly partitions of ohlcv whose candles are all expired for the timeframes with a retention. It's much faster than deleting the rows.
+    The expiring candles are rolled up first, as ``run()`` does. The candles of the timeframes kept forever are copied aside
+    and saved again after the drop, they are few compared to the fine candles.
+
+    Args:
+        engine (sqlalchemy.engine.Engine, optional): Default is the configured engine.
+        retention (dict, optional): Days of candles kept for every timeframe. Default is ``get_retention()``.
+        rollups (dict, optional): Timeframe the candles are rolled up into. Default is ``get_rollup()``.
+        now (datetime.datetime, optional): Reference date. Default is the current UTC date.
+
+    Return:
+        dropped (list[str]): Names of the partitions dropped.
+    """
+
+    engine = engine if engine != None else get_engine()
+    retention = retention if retention != None else get_retention()
+    rollups = rollups if rollups != None else get_rollup()
+    now = now if now != None else dt.datetime.utcnow()
+
+    with engine.begin() as connection:
+        timeframes = [row[0] for row in connection.execute("SELECT DISTINCT timeframe_id FROM timeframe")]
+    expiring = sorted([tf for tf in timeframes if tf in retention], key = lambda tf : utils.timeframe_to_seconds(timeframe = tf))
+    if len(expiring) == 0:
+        return []
+
+    before = now - dt.timedelta(days = max([retention[tf] for tf in expiring]))
+    #Fine candles of a coarse candle still open are kept, they are needed to complete it.
+    before = min([before] + [bucket_start(date = before, timeframe = rollups[tf]) for tf in expiring if tf in rollups])
+
+    session = session_factory(bind = engine)
+    try:
+        for timeframe in expiring:
+            if timeframe in rollups:
+                rollup(session = session, timeframe = timeframe, target = rollups[timeframe], before = before)
+    finally:
+        session.close()
+
+    kept = ", ".join(["'{}'".format(tf) for tf in timeframes if tf not in retention])
+    with engine.begin() as connection:
+        dropped = []
+        for name in _existing_partitions(connection = connection):
+            if name == "pmax":
+                continue
+            if _next_month(month = dt.datetime.strptime(name, "p%Y%m")) <= before:
+                dropped.append(name)
+
+        if len(dropped) > 0:
+            if kept != "":
+                connection.execute("CREATE TEMPORARY TABLE ohlcv_kept SELECT * FROM ohlcv PARTITION ({}) WHERE timeframe_id IN ({})".format(", ".join(dropped), kept))
+            connection.execute("ALTER TABLE ohlcv DROP PARTITION {}".format(", ".join(dropped)))
+            if kept != "":
+                #The range of a dropped partition is taken by the next one.
+                connection.execute("INSERT INTO ohlcv SELECT * FROM ohlcv_kept")
+                connection.execute("DROP TEMPORARY TABLE ohlcv_kept")
+
+    if len(dropped) > 0:
+        #Every candle of the timeframes with a retention older than the first partition left is gone.
+        first = _next_month(month = dt.datetime.strptime(max(dropped), "p%Y%m"))
+        session = session_factory(bind = engine)
+        try:
+            for timeframe in expiring:
+                _advance_watermarks(session = session, timeframe = timeframe, before = first)
+        finally:
+            session.close()
+
+    logging.info("Partitions of ohlcv dropped: {}.".format(dropped))
+    return dropped
@@ -0,0 +1,244 @@
+from decimal import Decimal
+
+import numpy as np
+
+import pandas as pd
+
+import datetime as dt
+
+from . import utils
+
+from .database.ohlcv import Ohlcv
+from .database.asset_dictionary import asset_ids
+
+
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+class Panel():
+
+    """
+    OHLCV candles of a universe on a regular time grid, loaded from the database with a single query.
+    Every slice is taken from the arrays in memory, the database is never read again.
+
+    Example:
+        panel = load_panel(session = session, universe = universe, fields = ["close", "volume"], timeframe = "1H", window_length = 21)
+        closes = panel.field(name = "close")
+        prices = panel.history(field = "close")
+        volume = panel.history(assets = survivors, field = "volume", window_length = 1)
+
+    Attributes:
+        values (numpy.ndarray): Array of float64 with shape (time, asset, field), NaN where a candle is missing.
+        datetimes (list[datetime.datetime]): Datetime of every step of the grid, ascending.
+        assets (list[alchemist_lib.database.asset.Asset]): Asset of every column.
+        asset_ids (numpy.ndarray): Array of int32, id of every asset in alchemist_lib.database.asset_dictionary, -1 if it has none.
+        fields (list[str]): Name of every field.
+        timeframe (str): Timeframe identifier.
+    """
+
+    def __init__(self, values, datetimes, assets, fields, timeframe, asset_ids = None):
+
+        """
+        Costructor method.
+
+        Args:
+            values (numpy.ndarray): Array with shape (time, asset, field).
+            datetimes (list[datetime.datetime]): Datetime of every step, ascending.
+            assets (list[alchemist_lib.database.asset.Asset]): Asset of every column.
+            fields (list[str]): Name of every field.
+            timeframe (str): Timeframe identifier.
+            asset_ids (numpy.ndarray, optional): Id of every asset. Default is -1 for all.
+        """
+
+        assert values.shape == (len(datetimes), len(assets), len(fields)), "The shape of values doesn't match datetimes, assets and fields."
+
+        self.values = values
+        self.datetimes = list(datetimes)
+        self.assets = list(assets)
+        self.asset_ids = asset_ids if asset_ids is not None else np.full(len(assets), -1, dtype = np.int32)
+        self.fields = list(fields)
+        self.timeframe = timeframe
+        self._columns = {utils.entity_key(asset) : i for i, asset in enumerate(self.assets)}
+
+
+    def __repr__(self):
+        return "<Panel(timeframe={}, steps={}, assets={}, fields={})>".format(self.timeframe, len(self.datetimes), len(self.assets), self.fields)
+
+
+    def __len__(self):
+        return len(self.datetimes)
+
+
+    def __contains__(self, asset):
+        return utils.entity_key(asset) in self._columns
+
+
+    def covers(self, assets, fields, timeframe, window_length):
+
+        """
+        Checks if a request can be answered by this panel: same timeframe, fields and assets loaded, window not longer, no new candle closed since the load
+        and no candle missing in the window. With a missing candle the last window_length candles saved go further back than the panel.
+
+        Args:
+            assets (list[alchemist_lib.database.asset.Asset]): Assets requested.
+            fields (list[str]): Fields requested.
+            timeframe (str): Timeframe identifier.
+            window_length (int): Number of steps requested.
+
+        Return:
+            covered (bool): True if the request can be sliced from the panel.
+        """
+
+        if timeframe.upper() != self.timeframe or window_length > len(self.datetimes) or len(self.datetimes) == 0:
+            return False
+        if any([field not in self.fields for field in fields]) or any([asset not in self for asset in assets]):
+            return False
+        if self.datetimes[-1] != utils.get_last_date_checkpoint(timeframe = self.timeframe):
+            return False
+        return not np.isnan(self.slice(assets = assets, fields = fields, window_length = window_length).values).any()
+
+
+    def slice(self, assets = None, fields = None, window_length = None):
+
+        """
+        Args:
+            assets (list[alchemist_lib.database.asset.Asset], optional): Assets wanted, in this order. Default is all.
+            fields (list[str], optional): Fields wanted, in this order. Default is all.
+            window_length (int, optional): Number of most recent steps wanted. Default is all.
+
+        Return:
+            panel (Panel): The part of this panel requested. The time axis is a view, a subset of assets or fields is a copy.
+        """
+
+        values = self.values
+        datetimes = self.datetimes
+        if window_length != None:
+            assert 0 < window_length <= len(self.datetimes), "The window_length param must be > 0 and not longer than the panel."
+            values = values[len(self.datetimes) - window_length:]
+            datetimes = datetimes[len(self.datetimes) - window_length:]
+
+        panel_assets = self.assets
+        ids = self.asset_ids
+        if assets is not None:
+            assets = utils.to_list(assets)
+            assert all([asset in self for asset in assets]), "Some assets are not in the panel."
+            columns = [self._columns[utils.entity_key(asset)] for asset in assets]
+            values = values[:, columns]
+            panel_assets = [self.assets[i] for i in columns]
+            ids = ids[columns]
+
+        panel_fields = self.fields
+        if fields is not None:
+            fields = [field.lower() for field in utils.to_list(fields)]
+            assert all([field in self.fields for field in fields]), "Some fields are not in the panel."
+            values = values[:, :, [self.fields.index(field) for field in fields]]
+            panel_fields = fields
+
+        return Panel(values = values, datetimes = datetimes, assets = panel_assets, fields = panel_fields, timeframe = self.timeframe, asset_ids = ids)
+
+
+    def field(self, name, window_length = None):
+
+        """
+        Args:
+            name (str): Name of the field.
+            window_length (int, optional): Number of most recent steps wanted. Default is all.
+
+        Return:
+            values (numpy.ndarray): View with shape (time, asset).
+        """
+
+        name = name.lower()
+        assert name in self.fields, "The field {} is not in the panel.".format(name)
+        start = len(self.datetimes) - window_length if window_length != None else 0
+        return self.values[start:, :, self.fields.index(name)]
+
+
+    def history(self, assets = None, field = "*", window_length = None):
+
+        """
+        Returns a slice of the panel as the dataframe of ``Factor.history()``, so it can be passed to the methods of Factor.
+        Missing candles have no row. Values are decimal.Decimal as the ones read from the database, use field() for the float arrays.
+
+        Args:
+            assets (list[alchemist_lib.database.asset.Asset], optional): Assets wanted. Default is all.
+            field (str, optional): One of the fields or * for all. Default is *.
+            window_length (int, optional): Number of most recent steps wanted. Default is all.
+
+        Return:
+            df (pandas.DataFrame): Multi-index (asset, datetime) dataframe with a decimal.Decimal column for every field, most recent candle first.
+                                   With a window_length of 1 the index is just the asset.
+        """
+
+        panel = self.slice(assets = assets, fields = None if field == "*" else [field], window_length = window_length)
+        steps, count, width = panel.values.shape
+
+        #Asset by asset, most recent first, as history() returns them.
+        values = panel.values[::-1].transpose(1, 0, 2).reshape(steps * count, width)
+        assets_col = np.empty(count, dtype = object)
+        assets_col[:] = panel.assets
+        datetimes_col = np.empty(steps, dtype = object)
+        datetimes_col[:] = panel.datetimes[::-1]
+        keep = ~np.isnan(values).all(axis = 1)
+
+        index = pd.MultiIndex.from_arrays([np.repeat(assets_col, steps)[keep], np.tile(datetimes_col, count)[keep]], names = ["asset", "datetime"])
+        #The shortest repr of a float gives back the decimal saved, NULL fields are None.
+        data = [[Decimal(str(float(value))) if not np.isnan(value) else None for value in row] for row in values[keep]]
+        df = pd.DataFrame(data = data, index = index, columns = panel.fields, dtype = object)
+
+        if steps == 1:
+            df.index = df.index.droplevel(level = 1)
+
+        return df
+
+
+def load_panel(session, universe, fields, timeframe, window_length, end_date = None):
+
+    """
+    Reads the candles of the universe for the last window_length steps with one query on the asset ids of ``ohlcv``.
+    It doesn't download anything: candles not saved are NaN.
+
+    Args:
+        session (sqlalchemy.orm.session.Session): Database connection.
+        universe (list[alchemist_lib.database.asset.Asset]): Assets of the panel, duplicates are dropped.
+        fields (list[str], str): Fields of the panel, * means open, high, low, close and volume.
+        timeframe (str): Timeframe identifier.
+        window_length (int): Number of steps.
+        end_date (datetime.datetime, optional): Datetime of the last step. Default is the last closed candle.
+
+    Return:
+        panel (Panel): The candles loaded.
+    """
+
+    assert window_length > 0, "The window_length param must be > 0."
+    fields = FIELDS if fields == "*" else [field.lower() for field in utils.to_list(fields)]
+    assert all([field in FIELDS for field in fields]), "Incorrect field. Supported: open, high, low, close, volume, *."
+
+    timeframe = timeframe.upper()
+    assets = list(utils.KeyedCollection(items = list(universe)))
+    end_date = end_date if end_date != None else utils.get_last_date_checkpoint(timeframe = timeframe)
+    seconds = utils.timeframe_to_seconds(timeframe = timeframe)
+    datetimes = [end_date - dt.timedelta(seconds = seconds * i) for i in range(window_length - 1, -1, -1)]
+
+    values = np.full((len(datetimes), len(assets), len(fields)), np.nan)
+
+    #Assets without an id have never had a candle saved.
+    ids = asset_ids.get_ids(session = session, assets = assets, create = False)
+    panel_ids = np.array([ids.get(utils.entity_key(asset), -1) for asset in assets], dtype = np.int32)
+    #Plain ints: some drivers bind numpy integers as blobs.
+    columns = {int(asset_id) : i for i, asset_id in enumerate(panel_ids) if asset_id >= 0}
+
+    if len(columns) > 0:
+        rows = session.query(Ohlcv.asset_id, Ohlcv.ohlcv_datetime, *[getattr(Ohlcv, field) for field in fields]).filter(Ohlcv.asset_id.in_(list(columns.keys())),
+                                                                                                                        Ohlcv.timeframe_id == timeframe,
+                                                                                                                        Ohlcv.ohlcv_datetime >= datetimes[0],
+                                                                                                                        Ohlcv.ohlcv_datetime <= datetimes[-1]).all()
+        steps = {datetime : i for i, datetime in enumerate(datetimes)}
+        positions = [(steps.get(row[1]), columns.get(row[0])) for row in rows]
+        found = [i for i, (step, column) in enumerate(positions) if step != None and column != None]
+        if len(found) > 0:
+            data = np.array([[float(value) if value != None else np.nan for value in rows[i][2:]] for i in found])
+            values[[positions[i][0] for i in found], [positions[i][1] for i in found]] = data
+
+    return Panel(values = values, datetimes = datetimes, assets = assets, fields = fields, timeframe = timeframe, asset_ids = panel_ids)
@@ -0,0 +1,512 @@
+from abc import ABC, abstractmethod
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import pandas as pd
+
+import operator
+
+import logging
+
+from .panel import FIELDS
+
+
+
+class Node(ABC):
+
+    """
+    Abstract class of the nodes of a pipeline. A node is a computation over a panel: it receives the values of its inputs,
+    arrays with shape (time, asset), and returns an array with the same shape. Nothing is computed when a node is built.
+
+    Two nodes with the same class, parameters and inputs have the same key: a pipeline computes them once.
+    Nodes must not change the arrays they receive, they can be views on the panel or shared with other nodes.
+
+    Attributes:
+        inputs (tuple[Node]): Nodes whose values are passed to compute().
+        params (tuple): Parameters of the node, part of its key.
+        key (tuple): Identity of the computation, (class name, params, keys of the inputs).
+        lookback (int): Steps before the current one needed by this node alone.
+    """
+
+    lookback = 0
+
+    def __init__(self, inputs = (), params = ()):
+
+        """
+        Costructor method.
+
+        Args:
+            inputs (tuple[Node], optional): Input nodes. Default is none.
+            params (tuple, optional): Hashable parameters. Default is none.
+        """
+
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.key = (type(self).__name__, self.params, tuple([node.key for node in self.inputs]))
+
+
+    def __repr__(self):
+        return "<{}(params={}, inputs={})>".format(type(self).__name__, self.params, list(self.inputs))
+
+
+    @property
+    def window_length(self):
+
+        """
+        Return:
+            window_length (int): Steps of the panel needed to compute the last value of this node.
+        """
+
+        return self.lookback + max([node.window_length for node in self.inputs] + [1])
+
+
+    @abstractmethod
+    def compute(self, panel, *values):
+
+        """
+        Args:
+            panel (alchemist_lib.panel.Panel): The panel of the tick.
+            values (numpy.ndarray): Values of the inputs, in order.
+
+        Return:
+            values (numpy.ndarray): Array with shape (time, asset).
+        """
+
+        pass
+
+
+    def _binary(self, other, op, reflected = False):
+        return BinaryOp(op = op, left = other if reflected else self, right = self if reflected else other)
+
+    def __add__(self, other):
+        return self._binary(other = other, op = "add")
+
+    def __radd__(self, other):
+        return self._binary(other = other, op = "add", reflected = True)
+
+    def __sub__(self, other):
+        return self._binary(other = other, op = "sub")
+
+    def __rsub__(self, other):
+        return self._binary(other = other, op = "sub", reflected = True)
+
+    def __mul__(self, other):
+        return self._binary(other = other, op = "mul")
+
+    def __rmul__(self, other):
+        return self._binary(other = other, op = "mul", reflected = True)
+
+    def __truediv__(self, other):
+        return self._binary(other = other, op = "truediv")
+
+    def __rtruediv__(self, other):
+        return self._binary(other = other, op = "truediv", reflected = True)
+
+    def __gt__(self, other):
+        return self._binary(other = other, op = "gt")
+
+    def __lt__(self, other):
+        return self._binary(other = other, op = "lt")
+
+
+class Field(Node):
+
+    """
+    A field of the panel: open, high, low, close or volume.
+    """
+
+    def __init__(self, name):
+
+        """
+        Costructor method.
+
+        Args:
+            name (str): Name of the field.
+        """
+
+        name = name.lower()
+        assert name in FIELDS, "Incorrect field. Supported: {}.".format(", ".join(FIELDS))
+        Node.__init__(self, params = (name, ))
+        self.name = name
+
+
+    def compute(self, panel):
+        return panel.field(name = self.name)
+
+
+class BinaryOp(Node):
+
+    """
+    Element-wise operation between two nodes, or a node and a number. Comparisons give 1.0 or 0.0, NaN if a side is NaN.
+    """
+
+    _operators = {"add" : operator.add, "sub" : operator.sub, "mul" : operator.mul, "truediv" : operator.truediv, "gt" : operator.gt, "lt" : operator.lt}
+
+    def __init__(self, op, left, right):
+
+        """
+        Costructor method.
+
+        Args:
+            op (str): One of add, sub, mul, truediv, gt, lt.
+            left (Node, float): Left operand.
+            right (Node, float): Right operand.
+        """
+
+        assert op in BinaryOp._operators, "Unknown operation {}.".format(op)
+        assert isinstance(left, Node) or isinstance(right, Node), "At least an operand must be a node."
+
+        #Numbers are parameters, nodes are inputs.
+        inputs = [side for side in [left, right] if isinstance(side, Node)]
+        constants = [None if isinstance(side, Node) else float(side) for side in [left, right]]
+        Node.__init__(self, inputs = inputs, params = (op, ) + tuple(constants))
+        self.op = op
+        self.constants = constants
+
+
+    def compute(self, panel, *values):
+        values = list(values)
+        left, right = [values.pop(0) if constant == None else constant for constant in self.constants]
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            result = BinaryOp._operators[self.op](left, right)
+        if self.op in ["gt", "lt"]:
+            result = np.where(np.isnan(left) | np.isnan(right), np.nan, result.astype(float))
+        return result
+
+
+class ExponentialMovingAverage(Node):
+
+    """
+    Exponential moving average of every asset, as pandas_talib.EMA: span of window_length and window_length - 1 minimum periods.
+    """
+
+    def __init__(self, input, window_length):
+
+        """
+        Costructor method.
+
+        Args:
+            input (Node): Values to average.
+            window_length (int): Span of the average.
+        """
+
+        assert window_length > 0, "The window_length param must be > 0."
+        Node.__init__(self, inputs = (input, ), params = (window_length, ))
+        self.lookback = window_length - 1
+
+
+    def compute(self, panel, values):
+        window_length = self.params[0]
+        return pd.DataFrame(values).ewm(span = window_length, min_periods = window_length - 1).mean().to_numpy()
+
+
+class SimpleMovingAverage(Node):
+
+    """
+    Simple moving average of every asset over window_length steps.
+    """
+
+    def __init__(self, input, window_length):
+
+        """
+        Costructor method.
+
+        Args:
+            input (Node): Values to average.
+            window_length (int): Number of steps of the average.
+        """
+
+        assert window_length > 0, "The window_length param must be > 0."
+        Node.__init__(self, inputs = (input, ), params = (window_length, ))
+        self.lookback = window_length - 1
+
+
+    def compute(self, panel, values):
+        window_length = self.params[0]
+        return pd.DataFrame(values).rolling(window = window_length, min_periods = window_length).mean().to_numpy()
+
+
+class Momentum(Node):
+
+    """
+    Difference between the value of every asset and the one delta steps before, as pandas_talib.MOM.
+    """
+
+    def __init__(self, input, delta):
+
+        """
+        Costructor method.
+
+        Args:
+            input (Node): Values.
+            delta (int): Number of steps.
+        """
+
+        assert delta > 0, "The delta param must be > 0."
+        Node.__init__(self, inputs = (input, ), params = (delta, ))
+        self.lookback = delta
+
+
+    def compute(self, panel, values):
+        delta = self.params[0]
+        result = np.full(values.shape, np.nan)
+        result[delta:] = values[delta:] - values[:-delta]
+        return result
+
+
+class RateOfChange(Node):
+
+    """
+    Rate of change of every asset over window_length steps, as pandas_talib.ROC.
+    """
+
+    def __init__(self, input, window_length):
+
+        """
+        Costructor method.
+
+        Args:
+            input (Node): Values.
+            window_length (int): Number of steps.
+        """
+
+        assert window_length > 1, "The window_length param must be > 1."
+        Node.__init__(self, inputs = (input, ), params = (window_length, ))
+        self.lookback = window_length - 1
+
+
+    def compute(self, panel, values):
+        delta = self.params[0] - 1
+        result = np.full(values.shape, np.nan)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            result[delta:] = (values[delta:] - values[:-delta]) / values[:-delta]
+        return result
+
+
+class TrueRange(Node):
+
+    """
+    True range of every asset: the largest of high - low, |high - previous close| and |low - previous close|.
+    """
+
+    lookback = 1
+
+    def __init__(self):
+
+        """
+        Costructor method.
+        """
+
+        Node.__init__(self, inputs = (Field(name = "high"), Field(name = "low"), Field(name = "close")))
+
+
+    def compute(self, panel, high, low, close):
+        previous_close = np.full(close.shape, np.nan)
+        previous_close[1:] = close[:-1]
+        #fmax ignores the NaN of the first step, as the max of Factor.AverageTrueRange().
+        return np.fmax(np.fmax(np.abs(high - low), np.abs(high - previous_close)), np.abs(low - previous_close))
+
+
+class AverageTrueRange(Node):
+
+    """
+    Exponential moving average of the true range. The average is an ExponentialMovingAverage node, shared with any other node that needs it.
+    """
+
+    def __init__(self, window_length):
+
+        """
+        Costructor method.
+
+        Args:
+            window_length (int): Span of the average.
+        """
+
+        Node.__init__(self, inputs = (ExponentialMovingAverage(input = TrueRange(), window_length = window_length), ))
+
+
+    def compute(self, panel, values):
+        return values
+
+
+class LinearRegression(Node):
+
+    """
+    Slope of the least squares line of every asset over the last window_length steps, as Factor.LinearRegression().
+    """
+
+    def __init__(self, input, window_length):
+
+        """
+        Costructor method.
+
+        Args:
+            input (Node): Values.
+            window_length (int): Number of steps of the regression.
+        """
+
+        assert window_length > 1, "The window_length param must be > 1."
+        Node.__init__(self, inputs = (input, ), params = (window_length, ))
+        self.lookback = window_length - 1
+
+
+    def compute(self, panel, values):
+        n = self.params[0]
+        #slope = (n * sum(x * y) - sum(x) * sum(y)) / (n * sum(x^2) - sum(x)^2), with x = 0 .. n - 1 in every window.
+        steps = np.arange(values.shape[0], dtype = float).reshape(-1, 1)
+        sum_y = pd.DataFrame(values).rolling(window = n, min_periods = n).sum().to_numpy()
+        sum_ty = pd.DataFrame(values * steps).rolling(window = n, min_periods = n).sum().to_numpy()
+        #x of a window starts from 0: sum(x * y) = sum(t * y) - t0 * sum(y).
+        sum_xy = sum_ty - (steps - n + 1) * sum_y
+        sum_x = n * (n - 1) / 2
+        sum_x2 = (n - 1) * n * (2 * n - 1) / 6
+        return (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x ** 2)
+
+
+class Pipeline():
+
+    """
+    Named factors evaluated together over the panel of a tick. The nodes form a graph evaluated lazily, only the nodes the columns depend on are computed,
+    every distinct computation once (equal nodes built in different places are merged by key) and independent nodes in parallel.
+
+    Example:
+        close = Field(name = "close")
+        pipeline = Pipeline(columns = {"ema10" : ExponentialMovingAverage(input = close, window_length = 10),
+                                       "ema21" : ExponentialMovingAverage(input = close, window_length = 21),
+                                       "volume" : Field(name = "volume")})
+        df = pipeline.run(factor = Factor(session = session), universe = universe, timeframe = "1H")
+        df = df.loc[df["ema10"] > df["ema21"], :]
+
+    Attributes:
+        columns (dict): Dictionary {name : Node}, the output columns.
+        max_workers (int): Threads used for independent nodes, 1 evaluates everything in the calling thread.
+        computed (int): Nodes computed by the last evaluation.
+    """
+
+    def __init__(self, columns, max_workers = 4):
+
+        """
+        Costructor method.
+
+        Args:
+            columns (dict): Dictionary {name : Node}.
+            max_workers (int, optional): Threads used for independent nodes. Default is 4.
+        """
+
+        assert len(columns) > 0, "A pipeline needs at least a column."
+        assert max_workers > 0, "The max_workers param must be > 0."
+
+        self.columns = dict(columns)
+        self.max_workers = max_workers
+        self.computed = 0
+
+
+    def _graph(self):
+        #Distinct nodes grouped by depth: every node only depends on nodes of the previous levels.
+        nodes = {}
+        depth = {}
+
+        def visit(node):
+            if node.key in depth:
+                return depth[node.key]
+            nodes[node.key] = node
+            depth[node.key] = 1 + max([visit(child) for child in node.inputs] + [-1])
+            return depth[node.key]
+
+        for node in self.columns.values():
+            visit(node)
+
+        levels = [[] for i in range(max(depth.values()) + 1)]
+        for key, level in depth.items():
+            levels[level].append(nodes[key])
+        return levels
+
+
+    @property
+    def window_length(self):
+
+        """
+        Return:
+            window_length (int): Steps of the panel needed by the longest column.
+        """
+
+        return max([node.window_length for node in self.columns.values()])
+
+
+    @property
+    def fields(self):
+
+        """
+        Return:
+            fields (list[str]): Fields of the panel used by the pipeline.
+        """
+
+        return [field for field in FIELDS if any([node.params == (field, ) for level in self._graph() for node in level if isinstance(node, Field)])]
+
+
+    def evaluate(self, panel, latest = True):
+
+        """
+        Computes the columns on a panel already loaded.
+
+        Args:
+            panel (alchemist_lib.panel.Panel): Panel with the fields used by the pipeline.
+            latest (bool, optional): Return only the last value of every column. Default is True.
+
+        Return:
+            df (pandas.DataFrame, dict): With latest, a dataframe with the assets as index and a column for every name.
+                                         Otherwise a dictionary {name : numpy.ndarray} with arrays of shape (time, asset).
+        """
+
+        levels = self._graph()
+        values = {}
+
+        def compute(node):
+            return node.compute(panel, *[values[child.key] for child in node.inputs])
+
+        executor = ThreadPoolExecutor(max_workers = self.max_workers) if self.max_workers > 1 else None
+        try:
+            for level in levels:
+                if executor != None and len(level) > 1:
+                    results = list(executor.map(compute, level))
+                else:
+                    results = [compute(node) for node in level]
+                for node, result in zip(level, results):
+                    values[node.key] = result
+        finally:
+            if executor != None:
+                executor.shutdown()
+
+        self.computed = len(values)
+        logging.debug("Pipeline evaluated: {} nodes for {} columns.".format(self.computed, len(self.columns)))
+
+        if latest == False:
+            return {name : values[node.key] for name, node in self.columns.items()}
+
+        df = pd.DataFrame(data = {name : values[node.key][-1] for name, node in self.columns.items()}, columns = list(self.columns.keys()))
+        df.index = pd.Index(panel.assets, dtype = object, name = "asset")
+        return df
+
+
+    def run(self, factor, universe, timeframe, window_length = None):
+
+        """
+        Loads the panel of the universe with ``Factor.panel()`` and evaluates the columns on it.
+
+        Args:
+            factor (alchemist_lib.factor.Factor): The factor used to load the panel, it keeps it for later history() calls.
+            universe (list[alchemist_lib.database.asset.Asset]): Assets.
+            timeframe (str): Timeframe identifier.
+            window_length (int, optional): Steps of the panel, more than needed make the exponential averages closer to their limit. Default is window_length.
+
+        Return:
+            df (pandas.DataFrame): The last value of every column, with the assets as index.
+        """
+
+        window_length = window_length if window_length != None else self.window_length
+        assert window_length >= self.window_length, "The window_length param must be at least {}.".format(self.window_length)
+
+        panel = factor.panel(universe = universe, fields = self.fields, timeframe = timeframe, window_length = window_length)
+        return self.evaluate(panel = panel)
@@ -8,6 +8,8 @@ from ..database.exchange import Exchange
 
 from .. import utils
 
+import logging
+
 
 
 class BittrexPopulate(PopulateBaseClass):
@@ -44,9 +46,10 @@ class BittrexPopulate(PopulateBaseClass):
         instrument = self.saver.instrument(kind = "cryptocurrency")
         m30 = self.saver.timeframe(id = "30M", description = "thirty minutes")
         h1 = self.saver.timeframe(id = "1H", description = "one hour")
+        h4 = self.saver.timeframe(id = "4H", description = "four hours")
         d1 = self.saver.timeframe(id = "1D", description = "one day")
         broker = self.saver.broker(name = "bittrex", site = "www.bittrex.com")
-        datasource = self.saver.data_source(name = "bittrex", site = "www.bittrex.com", timeframes = [m30, h1, d1])
+        datasource = self.saver.data_source(name = "bittrex", site = "www.bittrex.com", timeframes = [m30, h1, h4, d1])
         timetable = None
         exchange = self.saver.exchange(name = "bittrex", website = "www.bittrex.com", data_source = datasource, timetable = timetable, brokers = [broker])
             
@@ -62,12 +65,11 @@ class BittrexPopulate(PopulateBaseClass):
         exchange = self.get_exchange_instance()
             
         assets = BittrexDataFeed(session = self.saver.session).get_assets()
-        
-        for asset in assets:
-            self.saver.asset(ticker = asset.ticker, instrument_id = asset.instrument_id, name = asset.name, exchanges = exchange)
 
         cryptocurrency_id = self.saver.session.query(Instrument).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
-        self.saver.asset(ticker = "BTC", instrument_id = cryptocurrency_id, name = "Bitcoin", exchanges = exchange)
+        assets.append(Asset(ticker = "BTC", instrument_id = cryptocurrency_id, name = "Bitcoin"))
+
+        self.saver.sync_assets(assets = assets, exchange_name = exchange.exchange_name)
         
 		
     def update_asset_list(self):
@@ -76,20 +78,18 @@ class BittrexPopulate(PopulateBaseClass):
         Update the list of assets traded on Bittrex.
         """
         
-        db_assets = self.saver.session.query(Asset).join(Exchange, Asset.exchanges).filter(Exchange.exchange_name == "bittrex").all()
+        #The metadata of the exchange is saved just the first time.
+        exchange = self.saver.session.query(Exchange).filter(Exchange.exchange_name == "bittrex").one_or_none()
+        if exchange == None:
+            exchange = self.get_exchange_instance()
+
         bittrex_assets = BittrexDataFeed(session = self.saver.session).get_assets()
+        if len(bittrex_assets) == 0:
+            logging.warning("No asset retrieved from Bittrex, the asset list is not updated.")
+            return
 
         cryptocurrency_id = self.saver.session.query(Instrument).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
         bittrex_assets.append(Asset(ticker = "BTC", instrument_id = cryptocurrency_id, name = "Bitcoin"))
-                               
-        assets_to_save = utils.subtract_list(first = bittrex_assets, second = db_assets)
-        assets_to_remove = utils.subtract_list(first = db_assets, second = bittrex_assets)
-
-        for asset in assets_to_save:
-            exchange = self.get_exchange_instance()
-            self.saver.asset(ticker = asset.ticker, instrument_id = asset.instrument_id, name = asset.name, exchanges = [exchange])
 
-        for asset in assets_to_remove:
-            self.saver.session.delete(asset)
-            self.saver.session.commit()
+        self.saver.sync_assets(assets = bittrex_assets, exchange_name = exchange.exchange_name)
 	
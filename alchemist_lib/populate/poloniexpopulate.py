@@ -8,6 +8,8 @@ from ..database.exchange import Exchange
 
 from .. import utils
 
+import logging
+
 
 
 class PoloniexPopulate(PopulateBaseClass):
@@ -44,11 +46,12 @@ class PoloniexPopulate(PopulateBaseClass):
         instrument = self.saver.instrument(kind = "cryptocurrency")
         m15 = self.saver.timeframe(id = "15M", description = "fifteen minutes")
         m30 = self.saver.timeframe(id = "30M", description = "thirty minutes")
+        h1 = self.saver.timeframe(id = "1H", description = "one hour")
         h2 = self.saver.timeframe(id = "2H", description = "two hours")
         h4 = self.saver.timeframe(id = "4H", description = "four hours")
         d1 = self.saver.timeframe(id = "1D", description = "one day")
         broker = self.saver.broker(name = "poloniex", site = "www.poloniex.com")
-        datasource = self.saver.data_source(name = "poloniex", site = "www.poloniex.com", timeframes = [m15, m30, h2, h4, d1])
+        datasource = self.saver.data_source(name = "poloniex", site = "www.poloniex.com", timeframes = [m15, m30, h1, h2, h4, d1])
         timetable = None
         exchange = self.saver.exchange(name = "poloniex", website = "www.poloniex.com", data_source = datasource, timetable = timetable, brokers = [broker])
             
@@ -64,12 +67,11 @@ class PoloniexPopulate(PopulateBaseClass):
         exchange = self.get_exchange_instance()
             
         assets = PoloniexDataFeed(session = self.saver.session).get_assets()
-        
-        for asset in assets:
-            self.saver.asset(ticker = asset.ticker, instrument_id = asset.instrument_id, name = asset.name, exchanges = exchange)
 
         cryptocurrency_id = self.saver.session.query(Instrument).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
-        self.saver.asset(ticker = "BTC", instrument_id = cryptocurrency_id, name = "Bitcoin", exchanges = exchange)
+        assets.append(Asset(ticker = "BTC", instrument_id = cryptocurrency_id, name = "Bitcoin"))
+
+        self.saver.sync_assets(assets = assets, exchange_name = exchange.exchange_name)
         
 		
     def update_asset_list(self):
@@ -78,20 +80,18 @@ class PoloniexPopulate(PopulateBaseClass):
         Update the list of assets traded on Poloniex.
         """
         
-        db_assets = self.saver.session.query(Asset).join(Exchange, Asset.exchanges).filter(Exchange.exchange_name == "poloniex").all()
+        #The metadata of the exchange is saved just the first time.
+        exchange = self.saver.session.query(Exchange).filter(Exchange.exchange_name == "poloniex").one_or_none()
+        if exchange == None:
+            exchange = self.get_exchange_instance()
+
         poloniex_assets = PoloniexDataFeed(session = self.saver.session).get_assets()
+        if len(poloniex_assets) == 0:
+            logging.warning("No asset retrieved from Poloniex, the asset list is not updated.")
+            return
 
         cryptocurrency_id = self.saver.session.query(Instrument).filter(Instrument.instrument_type == "cryptocurrency").one().instrument_id
         poloniex_assets.append(Asset(ticker = "BTC", instrument_id = cryptocurrency_id, name = "Bitcoin"))
-            
-        assets_to_save = utils.subtract_list(first = poloniex_assets, second = db_assets)
-        assets_to_remove = utils.subtract_list(first = db_assets, second = poloniex_assets)
-
-        for asset in assets_to_save:
-            exchange = self.get_exchange_instance()
-            self.saver.asset(ticker = asset.ticker, instrument_id = asset.instrument_id, name = asset.name, exchanges = [exchange])
 
-        for asset in assets_to_remove:
-            self.saver.session.delete(asset)
-            self.saver.session.commit()
+        self.saver.sync_assets(assets = poloniex_assets, exchange_name = exchange.exchange_name)
 	
@@ -1,3 +1,4 @@
+from sqlalchemy import and_, bindparam
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import FlushError
 
@@ -8,9 +9,11 @@ from ..database.timeframe import Timeframe
 from ..database.broker import Broker
 from ..database.price_data_source import PriceDataSource
 from ..database.exchange import Exchange
-from ..database.asset import Asset
+from ..database.asset import Asset, asset_exchange_association
 from ..database.timetable import Timetable
 
+import logging
+
 
 
 class Saver():
@@ -237,24 +240,61 @@ class Saver():
                 self.session.rollback()
             
         return asset
-        
-
-
-
-
-
-
-
 
 
+    def sync_assets(self, assets, exchange_name):
 
+        """
+        Makes the assets linked to an exchange equal to the list, in a single transaction.
+        The list is compared by key (ticker, instrument_id) with the database: the new assets and the missing links are inserted in bulk,
+        the links of the assets not in the list are removed and the assets left without exchanges are deleted.
 
+        Args:
+            assets (list[alchemist_lib.database.asset.Asset]): Every asset traded on the exchange. They don't need to be in the session.
+            exchange_name (str): Name of the exchange, it must be already saved.
 
+        Return:
+            added (list[tuple]): Keys (ticker, instrument_id) linked to the exchange now.
+            removed (list[tuple]): Keys unlinked from the exchange.
+        """
 
+        assets = utils.KeyedCollection(items = assets)
+        links = asset_exchange_association
 
+        try:
+            saved = set(self.session.query(Asset.ticker, Asset.instrument_id).filter(Asset.ticker.in_([ticker for ticker, instrument_id in assets.keys()])).all())
+            linked = set(self.session.query(links.c.ticker, links.c.instrument_id).filter(links.c.exchange_name == exchange_name).all())
+
+            new_assets = [key for key in assets.keys() if key not in saved]
+            added = [key for key in assets.keys() if key not in linked]
+            removed = [key for key in linked if key not in assets]
+
+            if len(new_assets) > 0:
+                self.session.execute(Asset.__table__.insert(), [{"ticker" : ticker, "instrument_id" : instrument_id, "name" : assets.get((ticker, instrument_id)).name}
+                                                                for ticker, instrument_id in new_assets])
+            if len(added) > 0:
+                self.session.execute(links.insert(), [{"ticker" : ticker, "instrument_id" : instrument_id, "exchange_name" : exchange_name} for ticker, instrument_id in added])
+
+            if len(removed) > 0:
+                self.session.execute(links.delete().where(and_(links.c.ticker == bindparam("key_ticker"),
+                                                               links.c.instrument_id == bindparam("key_instrument_id"),
+                                                               links.c.exchange_name == exchange_name)),
+                                     [{"key_ticker" : ticker, "key_instrument_id" : instrument_id} for ticker, instrument_id in removed])
+
+                still_linked = set(self.session.query(links.c.ticker, links.c.instrument_id).filter(links.c.ticker.in_([ticker for ticker, instrument_id in removed])).all())
+                for ticker, instrument_id in removed:
+                    if (ticker, instrument_id) not in still_linked:
+                        asset = self.session.query(Asset).get((ticker, instrument_id))
+                        if asset != None:
+                            self.session.delete(asset)
 
+            self.session.commit()
+        except:
+            self.session.rollback()
+            raise
 
-        
-    
+        #The exchanges collections loaded before the bulk statements are stale.
+        self.session.expire_all()
 
-        
+        logging.info("Assets of {}: {} new, {} linked, {} removed.".format(exchange_name, len(new_assets), len(added), len(removed)))
+        return added, removed
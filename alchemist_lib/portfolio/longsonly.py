@@ -17,18 +17,24 @@ class LongsOnlyPortfolio(PortfolioBaseClass):
 
     Attributes:
         capital (decimal.Decimal): Capital allocated for the portfolio.
+        band_abs (decimal.Decimal): Adjustments smaller than this amount of base currency are not traded.
+        band_position (decimal.Decimal): Adjustments smaller than this fraction of the current position are not traded.
+        band_aum (decimal.Decimal): Adjustments smaller than this fraction of the capital are not traded.
     """
 
-    def __init__(self, capital):
+    def __init__(self, capital, band_abs = 0, band_position = 0, band_aum = 0):
 
         """
         Costructor method.
 
         Args:
             capital (int, float, str, decimal.Decimal): Capital allocated for the portfolio.
+            band_abs (int, float, str, decimal.Decimal, optional): Minimum adjustment in base currency. Default is 0.
+            band_position (int, float, str, decimal.Decimal, optional): Minimum adjustment as a fraction of the current position. Default is 0.
+            band_aum (int, float, str, decimal.Decimal, optional): Minimum adjustment as a fraction of the capital. Default is 0.
         """
         
-        PortfolioBaseClass.__init__(self, capital = capital)
+        PortfolioBaseClass.__init__(self, capital = capital, band_abs = band_abs, band_position = band_position, band_aum = band_aum)
         
 
     def set_allocation(self, session, name, df):
@@ -2,11 +2,17 @@ from abc import ABC, abstractmethod
 
 from decimal import Decimal
 
+import pandas as pd
+
+import logging
+
 from ..database.ptf_allocation import PtfAllocation
 from ..database.instrument import Instrument
 
 from .. import utils
 
+from ..values import AllocationDelta
+
 from .. import datafeed
 
 
@@ -24,18 +30,33 @@ class PortfolioBaseClass(ABC):
         
     Attributes:
         capital (decimal.Decimal): Capital allocated for the portfolio.
+        band_abs (decimal.Decimal): Adjustments smaller than this amount of base currency are not traded.
+        band_position (decimal.Decimal): Adjustments smaller than this fraction of the current position are not traded.
+        band_aum (decimal.Decimal): Adjustments smaller than this fraction of the capital are not traded.
+        skipped (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): Adjustments suppressed by the last rebalance(), inside the no-trade band.
     """
 
-    def __init__(self, capital):
+    def __init__(self, capital, band_abs = 0, band_position = 0, band_aum = 0):
 
         """
         Costructor method.
 
         Args:
             capital (int, float, str, decimal.Decimal): Capital allocated for the portfolio.
+            band_abs (int, float, str, decimal.Decimal, optional): Minimum adjustment in base currency. Default is 0.
+            band_position (int, float, str, decimal.Decimal, optional): Minimum adjustment as a fraction of the current position, 0.05 is 5%. Default is 0.
+            band_aum (int, float, str, decimal.Decimal, optional): Minimum adjustment as a fraction of the capital. Default is 0.
+
+        Note:
+            The no-trade band of an asset is the widest of the three. New positions are checked against band_abs and band_aum,
+            positions closed entirely are always traded.
         """
         
         self.capital = Decimal(capital)
+        self.band_abs = Decimal(str(band_abs))
+        self.band_position = Decimal(str(band_position))
+        self.band_aum = Decimal(str(band_aum))
+        self.skipped = []
 
 
     @abstractmethod
@@ -43,69 +64,171 @@ class PortfolioBaseClass(ABC):
         pass
 
 
-    def rebalance(self, curr_ptf, target_ptf):
+    def rebalance(self, curr_ptf, target_ptf, markets = None):
 
         """
-        This method returns a list of PtfAllocation (alchemist_lib.database.ptf_allocation.PtfAllocation) that will be executed in order to mantain the portfolio rebalanced.
+        This method returns a list of allocations (alchemist_lib.values.AllocationDelta) that will be executed in order to mantain the portfolio rebalanced.
 
         Args:
             curr_ptf (alchemist_lib.database.ptf_allocation.PtfAllocation, list[PtfAllocation]): Current portfolio, loaded from the database.
             target_ptf (alchemist_lib.database.ptf_allocation.PtfAllocation, list[PtfAllocation]): Ideal portfolio.
+            markets (alchemist_lib.exchange.markets.MarketStore, optional): Trading rules of the exchange. If present the allocations are passed to apply_market_rules().
 
         Return:
-            new_ptf (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): List of PtfAllocation to execute in order to get the ideal portfolio.
+            new_ptf (list[alchemist_lib.values.AllocationDelta]): List of allocations to execute in order to get the ideal portfolio. They are not mapped, see ``AllocationDelta.to_allocation()``.
 
         """
 
         curr_ptf = utils.to_list(curr_ptf)
         target_ptf = utils.to_list(target_ptf)
         
+        #Allocations indexed by (ticker, instrument_id), the diff doesn't compare every pair of assets.
+        curr = utils.KeyedCollection(items = curr_ptf)
+        target = utils.KeyedCollection(items = target_ptf)
+
         new_ptf = []
-        found = False
-        
-        for new_alloc in target_ptf:
-            found = False
-            for old_alloc in curr_ptf:
-                if new_alloc.asset == old_alloc.asset:
-                    allocation = PtfAllocation(amount = new_alloc.amount - old_alloc.amount,
-                                               base_currency_amount = new_alloc.base_currency_amount - old_alloc.base_currency_amount,
-                                               ticker = new_alloc.ticker,
-                                               instrument_id = new_alloc.instrument_id,
-                                               ts_name = new_alloc.ts_name)
-                    allocation.asset = new_alloc.asset
-                    allocation.ts = new_alloc.ts
-                    new_ptf.append(allocation)
-                    found = True
-            if found == False:
-                allocation = new_alloc.deepcopy()
-                """PtfAllocation(amount = new_alloc.amount,
-                                           base_currency_amount = new_alloc.base_currency_amount,
-                                           ticker = new_alloc.ticker,
-                                           instrument_id = new_alloc.instrument_id,
-                                           ts_name = new_alloc.ts_name)
-                """
-                allocation.asset = new_alloc.asset
-                allocation.ts = new_alloc.ts
-                new_ptf.append(allocation)
-        
-        for old_alloc in curr_ptf:
-            found = False
-            for new_alloc in target_ptf:
-                if old_alloc.asset == new_alloc.asset:
-                    found = True
-            if found == False:
-                allocation = PtfAllocation(amount = old_alloc.amount * Decimal(-1),
-                                           base_currency_amount = old_alloc.base_currency_amount * Decimal(-1),
-                                           ticker = old_alloc.ticker,
-                                           instrument_id = old_alloc.instrument_id,
-                                           ts_name = old_alloc.ts_name)
-                allocation.asset = old_alloc.asset
-                allocation.ts = old_alloc.ts
-                new_ptf.append(allocation)
+
+        for new_alloc in target:
+            old_alloc = curr.get(new_alloc)
+            if old_alloc != None:
+                allocation = AllocationDelta(amount = new_alloc.amount - old_alloc.amount,
+                                             base_currency_amount = new_alloc.base_currency_amount - old_alloc.base_currency_amount,
+                                             ticker = new_alloc.ticker,
+                                             instrument_id = new_alloc.instrument_id,
+                                             ts_name = new_alloc.ts_name,
+                                             asset = new_alloc.asset,
+                                             ts = new_alloc.ts)
+            else:
+                allocation = AllocationDelta.from_allocation(allocation = new_alloc)
+            new_ptf.append(allocation)
+
+        for old_alloc in curr.subtract(target):
+            allocation = AllocationDelta(amount = old_alloc.amount * Decimal(-1),
+                                         base_currency_amount = old_alloc.base_currency_amount * Decimal(-1),
+                                         ticker = old_alloc.ticker,
+                                         instrument_id = old_alloc.instrument_id,
+                                         ts_name = old_alloc.ts_name,
+                                         asset = old_alloc.asset,
+                                         ts = old_alloc.ts)
+            new_ptf.append(allocation)
+
+        new_ptf = self.apply_band(allocs = new_ptf, curr_ptf = curr_ptf)
+
+        if markets != None:
+            new_ptf = self.apply_market_rules(allocs = new_ptf, markets = markets)
 
         return new_ptf
 
 
+    def apply_band(self, allocs, curr_ptf):
+
+        """
+        Removes the adjustments inside the no-trade band and saves them in the skipped attribute.
+
+        Args:
+            allocs (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): Allocations to execute, differences between target and current portfolio.
+            curr_ptf (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): Current portfolio.
+
+        Return:
+            allocs (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): The allocations outside the band.
+        """
+
+        self.skipped = []
+        if self.band_abs == 0 and self.band_position == 0 and self.band_aum == 0:
+            return allocs
+
+        positions = {(alloc.ticker, alloc.instrument_id) : alloc for alloc in utils.to_list(curr_ptf)}
+
+        traded = []
+        for alloc in utils.to_list(allocs):
+            position = positions.get((alloc.ticker, alloc.instrument_id))
+            if alloc.ticker == "BTC" or (position != None and Decimal(alloc.amount) + Decimal(position.amount) == 0):
+                traded.append(alloc)
+                continue
+
+            band = max(self.band_abs, self.band_aum * self.capital)
+            if position != None:
+                band = max(band, self.band_position * abs(Decimal(position.base_currency_amount)))
+
+            if abs(Decimal(alloc.base_currency_amount)) < band:
+                self.skipped.append(alloc)
+            else:
+                traded.append(alloc)
+
+        if len(self.skipped) > 0:
+            logging.info("{} adjustments inside the no-trade band not traded: {}".format(len(self.skipped), ", ".join([alloc.ticker for alloc in self.skipped])))
+
+        return traded
+
+
+    def apply_market_rules(self, allocs, markets):
+
+        """
+        Rounds the amount of every allocation to the step size of its market and removes the ones that can't be traded:
+        markets not active and orders below the minimum size or value. Nothing is sent to the exchange.
+
+        Args:
+            allocs (alchemist_lib.database.ptf_allocation.PtfAllocation, list[PtfAllocation]): Allocations to execute.
+            markets (alchemist_lib.exchange.markets.MarketStore): Trading rules of the exchange.
+
+        Return:
+            allocs (list[alchemist_lib.database.ptf_allocation.PtfAllocation]): The allocations that can be traded. The base currency amount follows the rounded amount.
+        """
+
+        tradable = []
+        for alloc in utils.to_list(allocs):
+            if alloc.ticker == "BTC" or alloc.amount == 0:
+                tradable.append(alloc)
+                continue
+
+            amount = Decimal(alloc.amount)
+            price = abs(Decimal(alloc.base_currency_amount) / amount)
+            rounded = markets.round_amount(ticker = alloc.ticker, amount = amount, price = price)
+            if rounded == 0:
+                logging.info("Order of {} {} removed, it can't be traded.".format(amount, alloc.ticker))
+                continue
+
+            alloc.base_currency_amount = Decimal(alloc.base_currency_amount) * rounded / amount
+            alloc.amount = rounded
+            tradable.append(alloc)
+
+        return tradable
+
+
+    def estimate_cost(self, allocs, broker):
+
+        """
+        Estimates the cost of executing the allocations as market orders, walking the order books of the broker.
+
+        Args:
+            allocs (alchemist_lib.database.ptf_allocation.PtfAllocation, list[PtfAllocation]): Allocations to execute, usually returned by rebalance().
+            broker (alchemist_lib.broker.*): The broker that will execute them.
+
+        Return:
+            df (pandas.DataFrame): A dataframe with the following columns:
+                * asset (alchemist_lib.database.asset.Asset): Must be the index.
+                * amount (decimal.Decimal): Amount to exchange.
+                * filled (decimal.Decimal): Amount the visible book can fill.
+                * vwap (decimal.Decimal): Expected average execution price.
+                * slippage (decimal.Decimal): Relative distance between vwap and mid price.
+                * cost (decimal.Decimal): Slippage in base currency.
+            Assets whose book can't be downloaded are missing.
+        """
+
+        allocs = [alloc for alloc in utils.to_list(allocs) if alloc.ticker != "BTC" and alloc.amount != 0]
+
+        broker.order_books.get_many(tickers = [alloc.ticker for alloc in allocs])
+
+        rows = []
+        for alloc in allocs:
+            estimate = broker.estimate_execution(asset = alloc.asset, amount = Decimal(alloc.amount))
+            if estimate != None:
+                rows.append({"asset" : alloc.asset, "amount" : Decimal(alloc.amount), "filled" : estimate.filled,
+                             "vwap" : estimate.vwap, "slippage" : estimate.slippage, "cost" : estimate.cost})
+
+        return pd.DataFrame(data = rows, columns = ["asset", "amount", "filled", "vwap", "slippage", "cost"]).set_index("asset")
+
+
     def load_ptf(self, session, name):
 
         """
@@ -0,0 +1,246 @@
+from .database import CONFIG_PATH
+
+import configparser
+
+import tempfile
+
+import threading
+
+import time
+
+import os
+
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    #Windows
+    fcntl = None
+    import msvcrt
+
+
+
+PUBLIC = "public"
+PRIVATE = "private"
+
+#Directory of the state files shared by every process of the machine.
+STATE_DIR_ENV_VAR = "ALCHEMIST_RATELIMIT_DIR"
+
+#(requests per second, burst) for every exchange and endpoint class.
+#https://poloniex.com/support/api/ "making more than 6 calls per second to the API may result in an IP ban"
+#Bittrex doesn't publish its limits, one call per second is what its support suggests.
+DEFAULT_LIMITS = {("poloniex", PUBLIC) : (6, 6),
+                  ("poloniex", PRIVATE) : (6, 6),
+                  ("bittrex", PUBLIC) : (1, 5),
+                  ("bittrex", PRIVATE) : (1, 5)
+                  }
+
+#Used for exchanges not listed above.
+FALLBACK_LIMIT = (1, 1)
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_state_dir():
+
+    """
+    Returns the directory of the state files, creating it if needed.
+
+    Return:
+        path (str): The ALCHEMIST_RATELIMIT_DIR environment variable or a directory in the temporary directory of the system.
+    """
+
+    path = os.environ.get(STATE_DIR_ENV_VAR) or os.path.join(tempfile.gettempdir(), "alchemist_lib_ratelimit")
+    os.makedirs(path, exist_ok = True)
+    return path
+
+
+def get_limit(exchange, endpoint_class, path = CONFIG_PATH):
+
+    """
+    Returns the limit of an exchange and endpoint class: the default overridden by the RATELIMIT section of config.ini.
+
+    Example of config.ini:
+        [RATELIMIT]
+        poloniex.public = 4
+        poloniex.public.burst = 4
+
+    Args:
+        exchange (str): Name of the exchange.
+        endpoint_class (str): PUBLIC (market data) or PRIVATE (trading and balances).
+        path (str, optional): Path of the configuration file.
+
+    Return:
+        limit (tuple): (requests per second, burst).
+    """
+
+    rate, burst = DEFAULT_LIMITS.get((exchange, endpoint_class), FALLBACK_LIMIT)
+
+    config = configparser.ConfigParser()
+    config.read(path)
+    if "RATELIMIT" in config.sections():
+        section = config["RATELIMIT"]
+        key = "{}.{}".format(exchange, endpoint_class)
+        rate = float(section.get(key, rate))
+        burst = float(section.get(key + ".burst", burst))
+
+    return rate, burst
+
+
+def _lock_file(f):
+    if fcntl != None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                #LK_LOCK gives up after 10 seconds.
+                continue
+
+
+def _unlock_file(f):
+    if fcntl != None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TokenBucket():
+
+    """
+    Token bucket whose state is kept in a file, so every process of the machine draws from the same bucket.
+    The file is locked while the bucket is read and updated.
+
+    Attributes:
+        name (str): Name of the bucket, for example "poloniex.public".
+        rate (float): Tokens added every second.
+        burst (float): Maximum number of tokens.
+        path (str): Path of the state file.
+    """
+
+    def __init__(self, name, rate, burst, state_dir = None):
+
+        """
+        Costructor method.
+
+        Args:
+            name (str): Name of the bucket.
+            rate (float): Requests per second.
+            burst (float): Requests that can be done at once after a pause.
+            state_dir (str, optional): Directory of the state file. Default is ``get_state_dir()``.
+        """
+
+        assert rate > 0, "The rate must be > 0."
+        assert burst >= 1, "The burst must be >= 1."
+
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.path = os.path.join(state_dir if state_dir != None else get_state_dir(), "{}.bucket".format(name))
+        self._thread_lock = threading.Lock()
+
+
+    def _take(self, tokens):
+        #Returns the seconds to wait, 0 if the tokens were taken.
+        with self._thread_lock:
+            with open(self.path, "a+") as f:
+                _lock_file(f)
+                try:
+                    f.seek(0)
+                    content = f.read().split()
+                    now = time.time()
+
+                    if len(content) == 2:
+                        available = min(self.burst, float(content[0]) + (now - float(content[1])) * self.rate)
+                    else:
+                        available = self.burst
+
+                    wait = 0
+                    if available >= tokens:
+                        available -= tokens
+                    else:
+                        wait = (tokens - available) / self.rate
+
+                    f.seek(0)
+                    f.truncate()
+                    f.write("{} {}".format(available, now))
+                    f.flush()
+                finally:
+                    _unlock_file(f)
+
+        return wait
+
+
+    def acquire(self, tokens = 1, timeout = None):
+
+        """
+        Blocks until the tokens are available and takes them.
+
+        Args:
+            tokens (int, optional): Number of requests, not more than the burst. Default is 1.
+            timeout (float, optional): Maximum number of seconds to wait. None means no limit.
+
+        Return:
+            acquired (bool): False if the timeout expired before the tokens were available.
+        """
+
+        #The bucket never holds more than burst tokens, it would wait forever.
+        assert 0 < tokens <= self.burst, "The tokens must be > 0 and not more than the burst of {}.".format(self.name)
+
+        deadline = time.time() + timeout if timeout != None else None
+
+        while True:
+            wait = self._take(tokens = tokens)
+            if wait == 0:
+                return True
+
+            if deadline != None and time.time() + wait > deadline:
+                logging.debug("Rate limit of {} not acquired in {} seconds.".format(self.name, timeout))
+                return False
+
+            time.sleep(wait)
+
+
+def get_bucket(exchange, endpoint_class = PUBLIC):
+
+    """
+    Returns the bucket of an exchange and endpoint class, it's created on the first call.
+
+    Args:
+        exchange (str): Name of the exchange, as saved in the database.
+        endpoint_class (str, optional): PUBLIC or PRIVATE. Default is PUBLIC.
+
+    Return:
+        bucket (TokenBucket): The bucket.
+    """
+
+    key = (exchange, endpoint_class)
+    with _lock:
+        if key not in _buckets:
+            rate, burst = get_limit(exchange = exchange, endpoint_class = endpoint_class)
+            _buckets[key] = TokenBucket(name = "{}.{}".format(exchange, endpoint_class), rate = rate, burst = burst)
+        return _buckets[key]
+
+
+def acquire(exchange, endpoint_class = PUBLIC, tokens = 1, timeout = None):
+
+    """
+    Waits for the permission to call an exchange api. Every http call of the library goes through this function.
+
+    Args:
+        exchange (str): Name of the exchange, as saved in the database.
+        endpoint_class (str, optional): PUBLIC (market data) or PRIVATE (trading and balances). Default is PUBLIC.
+        tokens (int, optional): Number of requests. Default is 1.
+        timeout (float, optional): Maximum number of seconds to wait. None means no limit.
+
+    Return:
+        acquired (bool): False if the timeout expired.
+    """
+
+    return get_bucket(exchange = exchange, endpoint_class = endpoint_class).acquire(tokens = tokens, timeout = timeout)
@@ -0,0 +1,308 @@
+from contextlib import contextmanager
+
+import random
+
+import threading
+
+import time
+
+import logging
+
+from . import ratelimit
+
+
+
+class ExchangeUnavailable(Exception):
+
+    """
+    Raised when an exchange api can't be called or keeps failing. The caller should skip what needs it.
+    """
+
+    pass
+
+
+class CircuitOpen(ExchangeUnavailable):
+
+    """
+    Raised without calling the api because it failed too many times recently.
+    """
+
+    pass
+
+
+class DeadlineExceeded(ExchangeUnavailable):
+
+    """
+    Raised when there is no time left to call the api.
+    """
+
+    pass
+
+
+class BadResponse(ExchangeUnavailable):
+
+    """
+    Raised when the api answered but the answer says the call failed.
+    """
+
+    pass
+
+
+class CircuitBreaker():
+
+    """
+    Stops calling an endpoint after some consecutive failures, so a broken endpoint costs nothing until it's tried again.
+
+    States:
+        - **closed**: Calls go through.
+        - **open**: Calls are refused until reset_timeout seconds have passed since the last failure.
+        - **half-open**: A single call goes through, its result closes or opens the circuit again.
+
+    Attributes:
+        name (str): Name of the endpoint.
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open.
+        failures (int): Consecutive failures.
+        opened_at (float): When the circuit was opened, None if closed.
+    """
+
+    def __init__(self, name, failure_threshold = 5, reset_timeout = 60, clock = time.time):
+
+        """
+        Costructor method.
+
+        Args:
+            name (str): Name of the endpoint.
+            failure_threshold (int, optional): Consecutive failures that open the circuit. Default is 5.
+            reset_timeout (float, optional): Seconds the circuit stays open. Default is 60.
+            clock (callable, optional): Returns the current time in seconds. Default is time.time.
+        """
+
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._clock = clock
+        self._trial = False
+        self._lock = threading.Lock()
+
+
+    @property
+    def state(self):
+        if self.opened_at == None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+
+    def allow(self):
+
+        """
+        Return:
+            allowed (bool): True if the endpoint can be called now.
+        """
+
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and self._trial == False:
+                self._trial = True
+                return True
+            return False
+
+
+    def release(self):
+        #The trial call was not made: the next call can be the trial.
+        with self._lock:
+            self._trial = False
+
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.failure_threshold or self.opened_at != None:
+                if self.opened_at == None:
+                    logging.warning("Circuit of {} opened after {} failures.".format(self.name, self.failures))
+                self.opened_at = self._clock()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+
+    """
+    Returns the circuit breaker of an endpoint, it's created on the first call.
+
+    Args:
+        name (str): Name of the endpoint, for example "poloniex.returnChartData.BTC_ETH".
+
+    Return:
+        breaker (CircuitBreaker): The circuit breaker.
+    """
+
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name = name)
+        return _breakers[name]
+
+
+_local = threading.local()
+
+
+@contextmanager
+def deadline(seconds):
+
+    """
+    Sets the time every api call made inside the block must end within, in the current thread.
+    Nested blocks can only shorten it.
+
+    Example:
+        with deadline(60):
+            datafeed.save_last_ohlcv(...)
+
+    Args:
+        seconds (float): Seconds from now.
+    """
+
+    previous = getattr(_local, "deadline", None)
+    new = time.time() + seconds
+    _local.deadline = new if previous == None else min(previous, new)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def remaining():
+
+    """
+    Return:
+        seconds (float): Seconds left before the deadline of the current thread, None if there isn't a deadline.
+    """
+
+    current = getattr(_local, "deadline", None)
+    if current == None:
+        return None
+    return max(0, current - time.time())
+
+
+def timeout(default):
+
+    """
+    Returns the timeout to use for a network call.
+
+    Args:
+        default (float): Timeout without a deadline.
+
+    Return:
+        seconds (float): The smaller between the default and the time left before the deadline.
+    """
+
+    left = remaining()
+    return default if left == None else min(default, left)
+
+
+def backoff(attempt, base_delay = 0.5, max_delay = 10):
+
+    """
+    Returns the seconds to wait before a retry: exponential backoff with full jitter.
+    https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+
+    Args:
+        attempt (int): Number of the failed attempt, starting from 0.
+        base_delay (float, optional): Delay after the first failure. Default is 0.5.
+        max_delay (float, optional): Maximum delay. Default is 10.
+
+    Return:
+        seconds (float): Random number between 0 and min(max_delay, base_delay * 2^attempt).
+    """
+
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call(func, exchange, endpoint, endpoint_class = ratelimit.PUBLIC, attempts = 3, is_failure = None,
+         base_delay = 0.5, max_delay = 10, sleep = time.sleep):
+
+    """
+    Calls an exchange api: waits for the rate limit, retries with backoff and respects the circuit breaker of the endpoint and the deadline of the thread.
+
+    Args:
+        func (callable): Function without args that calls the api, for example ``lambda : polo.returnTicker()``.
+        exchange (str): Name of the exchange.
+        endpoint (str): Name of the endpoint, it identifies the circuit breaker. Add the market for per-market endpoints, so a broken market doesn't stop the others.
+        endpoint_class (str, optional): ratelimit.PUBLIC or ratelimit.PRIVATE. Default is PUBLIC.
+        attempts (int, optional): Maximum number of calls. Use 1 for calls that must not be repeated, like placing an order. Default is 3.
+        is_failure (callable, optional): Takes the result and returns True if it means the call failed.
+        base_delay (float, optional): See ``backoff()``.
+        max_delay (float, optional): See ``backoff()``.
+        sleep (callable, optional): Function used to wait. Default is time.sleep.
+
+    Return:
+        result (obj): What func returned.
+
+    Raises:
+        ExchangeUnavailable: If the call didn't succeed. The last exception of func is the cause.
+    """
+
+    breaker = get_breaker(name = "{}.{}".format(exchange, endpoint))
+
+    last_error = None
+    for attempt in range(attempts):
+        if breaker.allow() == False:
+            raise CircuitOpen("Circuit of {}.{} is open.".format(exchange, endpoint)) from last_error
+
+        left = remaining()
+        if (left != None and left <= 0) or ratelimit.acquire(exchange = exchange, endpoint_class = endpoint_class, timeout = left) == False:
+            #allow() can have taken the trial slot of a half-open circuit, it's given back since the endpoint is not called.
+            breaker.release()
+            raise DeadlineExceeded("No time left to call {}.{}.".format(exchange, endpoint)) from last_error
+
+        try:
+            result = func()
+            if is_failure != None and is_failure(result):
+                raise BadResponse("Bad response from {}.{}: {}".format(exchange, endpoint, str(result)[:200]))
+
+            breaker.record_success()
+            return result
+
+        except Exception as e:
+            breaker.record_failure()
+            last_error = e
+            logging.debug("Attempt {} of {}.{} failed: {}".format(attempt + 1, exchange, endpoint, repr(e)))
+
+        if attempt < attempts - 1:
+            delay = backoff(attempt = attempt, base_delay = base_delay, max_delay = max_delay)
+            left = remaining()
+            if left != None and delay >= left:
+                break
+            sleep(delay)
+
+    raise ExchangeUnavailable("{}.{} failed: {}".format(exchange, endpoint, repr(last_error))) from last_error
+
+
+def bittrex_failed(response):
+
+    """
+    The Bittrex api answers with success False or a None result instead of an http error.
+
+    Args:
+        response (dict): Answer of the Bittrex api.
+
+    Return:
+        failed (bool): True if the call failed.
+    """
+
+    return response == None or response.get("success") == False or response.get("result") == None
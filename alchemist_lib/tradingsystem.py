@@ -10,8 +10,6 @@ from decimal import Decimal
 
 import time
 
-from apscheduler.schedulers.blocking import  BlockingScheduler
-
 from sqlalchemy import exc
 
 from . import datafeed
@@ -20,7 +18,12 @@ from . import utils
 
 from . import order
 
-from .database import Session
+from . import resilience
+
+from .broker.fills import FillTracker
+from .broker.simulatedbroker import SimulatedBroker
+
+from .database import session_scope, memory_report
 from .database.asset import Asset
 from .database.instrument import Instrument
 from .database.timetable import Timetable
@@ -43,10 +46,16 @@ class TradingSystem():
         _set_weights (callable): The function to set the weights of every asset in the portfolio.
         _select_universe (callable): The function to select the universe of asset.
         _handle_data (callable): The function to manage the trading logic.
-        paper_trading (boolean): If this arg is True no orders will be executed, they will be just printed and saved.
+        paper_trading (boolean): If this arg is True no orders are sent to the exchange, they are simulated against its order books by a SimulatedBroker.
+        fill_tracker (alchemist_lib.broker.fills.FillTracker): Follows the orders placed by the broker. None if the broker can't read the state of its orders.
         rebalance_time (int): Autoincrement number, used to manage the frequency of rebalancing.
-        session (sqlalchemy.orm.session.Session): Connection to the database.
+        universe (list[alchemist_lib.database.asset.Asset]): Universe of the last selection, None before the first one.
+        universe_time (int): Autoincrement number, used to manage the frequency of the universe selection.
+        session (sqlalchemy.orm.session.Session): Connection to the database. Every tick gets a new short-lived session, None between ticks.
+        tick_deadline_ratio (float): Class attribute. Fraction of the time between two ticks the exchange calls of a tick must end within, so a slow exchange can't overlap ticks.
     """
+
+    tick_deadline_ratio = 0.8
     
     def __init__(self, name, portfolio, set_weights, select_universe, handle_data, broker, paper_trading = False):
 
@@ -61,7 +70,8 @@ class TradingSystem():
             set_weights (callable): The function to set the weights of every asset in the portfolio.
             select_universe (callable): The function to select the universe of asset.
             handle_data (callable): The function to manage the trading logic.
-            paper_trading (boolean, optional): Specify if the trading system has to execute orders or just simulate.
+            paper_trading (boolean, optional): Specify if the trading system has to execute orders or just simulate. If True the broker is wrapped
+                in a SimulatedBroker (alchemist_lib.broker.simulatedbroker), unless it's one already.
         """
         
         assert isinstance(name, str), "The name of the trading system must be a string (str)."
@@ -93,14 +103,26 @@ class TradingSystem():
         self._handle_data = handle_data
 
         self.paper_trading = paper_trading
+        if paper_trading and isinstance(self.broker, SimulatedBroker) == False:
+            self.broker = SimulatedBroker(source = self.broker)
+
+        #Brokers that can't read the state of their orders place them and forget them, as before fills were tracked.
+        self.fill_tracker = None
+        if self.broker.tracks_orders():
+            self.fill_tracker = FillTracker(broker = self.broker, ts_name = self.name)
+        else:
+            logging.warning("{} can't follow its orders, fills and balances are not tracked.".format(type(self.broker).__name__))
         
         self.rebalance_time = 0
 
-        self.session = Session()
+        self.universe = None
+        self.universe_time = 0
 
-        self.broker.set_session(session = self.session)
+        self.session = None
+        #True once the broker has been told about the tick, with execute() or idle().
+        self._broker_joined = False
 
-        self.scheduler = BlockingScheduler()
+        self.scheduler = None
         
         ts = Ts(ts_name = self.name,
                 datetime_added = dt.datetime.utcnow(),
@@ -109,18 +131,18 @@ class TradingSystem():
                 )
 
         logging.debug("Saving the trading system {}.".format(self.name))
-        try:
-            self.session.add(ts)
-            self.session.commit()
-        except exc.IntegrityError:
-            self.session.rollback()
-            logging.warning("Trading system already present.")
-            print(utils.now(), ": Trading system already present.")
-
-            self.session.query(Ts).filter(Ts.ts_name == self.name).update({"datetime_added" : ts.datetime_added,
-                                                                           "ptf_type" : ts.ptf_type
-                                                                           })
-            self.session.commit()
+        with session_scope() as session:
+            try:
+                session.add(ts)
+                session.commit()
+            except exc.IntegrityError:
+                session.rollback()
+                logging.warning("Trading system already present.")
+                print(utils.now(), ": Trading system already present.")
+
+                session.query(Ts).filter(Ts.ts_name == self.name).update({"datetime_added" : ts.datetime_added,
+                                                                          "ptf_type" : ts.ptf_type
+                                                                          })
             
 
 
@@ -156,30 +178,65 @@ class TradingSystem():
         return weights
 
     
-    def on_market_open(self, timeframe, frequency, universe):
+    def on_market_open(self, timeframe, frequency, universe_frequency = 1, window_length = 0):
 
         """
         Save new data and call the rebalance function.
+        Every call is a unit of work with its own session, closed at the end of the tick.
+        Before that the orders of the previous tick still open are cancelled and the portfolio is reconciled with the balances of the account.
+        Exchange calls made after the tick deadline fail at once, the assets they were for are skipped.
+        If the tick fails before the orders are sent, the broker is told that this trading system is idle, so a shared broker doesn't wait for it.
 
         Args:
             timeframe (str): The timeframe we want to collect informations about for every asset in the universe.
             frequency (int): Frequency of rebalancing.
+            universe_frequency (int, optional): The universe is selected again every universe_frequency ticks. Default is 1.
+            window_length (int, optional): Candles of history downloaded for the assets added to the universe. Default is 0.
         """
 
         
         
         logging.info("--------------------------------------------------")
         print("--------------------------------------------------")
-        
-        start_time = time.time()
-        datafeed.save_last_ohlcv(session = self.session, assets = universe, timeframe = timeframe)
-        end_time = time.time()
 
-        delta_time = round(end_time - start_time, 2)
-        logging.info("Last OHLCV data retrived in {} seconds.".format(delta_time))
-        print(utils.now(), ": Last OHLCV data retrived in {} seconds.".format(delta_time))
-        
-        self.rebalance(alphas = self.handle_data(universe = universe), orders_type = order.MARKET, frequency = frequency)
+        seconds = utils.timeframe_to_seconds(timeframe = timeframe) * TradingSystem.tick_deadline_ratio
+
+        with session_scope() as session, resilience.deadline(seconds = seconds):
+            self.session = session
+            self.broker.set_session(session = session)
+            self.broker.set_ts_name(ts_name = self.name)
+            self._broker_joined = False
+            try:
+                universe = self.update_universe(timeframe = timeframe, universe_frequency = universe_frequency, window_length = window_length)
+
+                #Orders of the previous tick still open are cancelled and the portfolio is aligned to the balances.
+                if self.fill_tracker != None:
+                    self.fill_tracker.settle(session = session)
+                    #The simulated account has no real balances.
+                    if self.paper_trading == False:
+                        self.fill_tracker.reconcile(session = session, ts_names = self.broker.get_account_ts_names(ts_name = self.name))
+
+                start_time = time.time()
+                datafeed.save_last_ohlcv(session = self.session, assets = universe, timeframe = timeframe)
+                end_time = time.time()
+
+                delta_time = round(end_time - start_time, 2)
+                logging.info("Last OHLCV data retrived in {} seconds.".format(delta_time))
+                print(utils.now(), ": Last OHLCV data retrived in {} seconds.".format(delta_time))
+                
+                self.rebalance(alphas = self.handle_data(universe = universe), orders_type = order.MARKET, frequency = frequency)
+            except:
+                if self._broker_joined == False:
+                    try:
+                        self.broker.idle(ts_name = self.name)
+                    except Exception as e:
+                        logging.exception("The broker can't be told that {} is idle: {}".format(self.name, e))
+                raise
+            finally:
+                logging.debug("Memory at the end of the tick: {}".format(memory_report(session = session)))
+                self.session = None
+                self.broker.set_session(session = None)
+                self.broker.set_ts_name(ts_name = None)
 
 
     def select_universe(self):
@@ -211,6 +268,52 @@ class TradingSystem():
         return utils.to_list(universe)
     
 
+    def update_universe(self, timeframe, universe_frequency = 1, window_length = 0, tick = True):
+
+        """
+        Calls select_universe() every universe_frequency ticks and compares the new universe with the previous one by (ticker, instrument_id).
+        Only the assets added are new work: their history is downloaded here, so the first tick they are part of finds it saved.
+        Between two selections the previous universe is used again.
+
+        Args:
+            timeframe (str): Timeframe identifier.
+            universe_frequency (int, optional): The universe is selected again every universe_frequency calls. Default is 1.
+            window_length (int, optional): Candles of history downloaded for the assets added. If 0 nothing is downloaded in advance. Default is 0.
+            tick (bool, optional): False for a selection outside the ticks, as the one of run() at start-up: it's not counted, so the selections fall on the same ticks. Default is True.
+
+        Return:
+            universe (list[alchemist_lib.database.asset.Asset]): The current universe, attached to the session of the tick.
+        """
+
+        assert universe_frequency > 0, "The universe_frequency must be > 0."
+
+        if self.universe == None or self.universe_time % universe_frequency == 0:
+            previous = utils.KeyedCollection(items = self.universe)
+            selected = utils.KeyedCollection(items = self._attach(assets = self.select_universe()))
+
+            added = selected.subtract(previous)
+            removed = previous.subtract(selected)
+            if self.universe != None and (len(added) > 0 or len(removed) > 0):
+                logging.info("Universe changed. Added: {}. Removed: {}.".format([asset.ticker for asset in added], [asset.ticker for asset in removed]))
+                print(utils.now(), ": Universe changed. {} assets added, {} removed.".format(len(added), len(removed)))
+
+            if window_length > 0 and len(added) > 0:
+                start = utils.get_last_date_checkpoint(timeframe = timeframe) - dt.timedelta(seconds = utils.timeframe_to_seconds(timeframe = timeframe) * window_length)
+                datafeed.save_ohlcv(session = self.session, assets = added, start_date = start, timeframe = timeframe)
+
+            self.universe = list(selected)
+
+        if tick:
+            self.universe_time += 1
+
+        #The assets of the previous selections were loaded by another session.
+        return self._attach(assets = self.universe)
+
+
+    def _attach(self, assets):
+        return [asset if asset in self.session else self.session.merge(asset, load = False) for asset in assets]
+
+
     def handle_data(self, universe):
 
         """
@@ -292,16 +395,17 @@ class TradingSystem():
             logging.info("Target portfolio: {}".format(utils.print_list(target_ptf)))
             print(utils.now(), ": Target portfolio: {}".format(utils.print_list(target_ptf)))
             
-            orders_allocs = self.portfolio.rebalance(curr_ptf = curr_ptf, target_ptf = target_ptf)
+            orders_allocs = self.portfolio.rebalance(curr_ptf = curr_ptf, target_ptf = target_ptf, markets = self.broker.markets)
 
             logging.debug("Orders to execute to get the ideal portfolio: {}".format(utils.print_list(orders_allocs)))
 
-            if self.paper_trading:
-                new_target_ptf = target_ptf
-            else:
-                new_target_ptf = self.broker.execute(allocs = orders_allocs, orders_type = orders_type, ts_name = self.name, curr_ptf = curr_ptf)
-                logging.info("Result of orders execution: {}".format(utils.print_list(new_target_ptf)))
-                print(utils.now(), ": Result of orders execution: {}".format(utils.print_list(new_target_ptf)))
+            costs = self.portfolio.estimate_cost(allocs = orders_allocs, broker = self.broker)
+            logging.info("Estimated execution cost: {} BTC.".format(sum(costs["cost"], Decimal(0))))
+
+            self._broker_joined = True
+            new_target_ptf = self.broker.execute(allocs = orders_allocs, orders_type = orders_type, ts_name = self.name, curr_ptf = curr_ptf)
+            logging.info("Result of orders execution: {}".format(utils.print_list(new_target_ptf)))
+            print(utils.now(), ": Result of orders execution: {}".format(utils.print_list(new_target_ptf)))
             
             try:
                 self.session.query(PtfAllocation).filter(PtfAllocation.ts_name == self.name).delete()
@@ -316,6 +420,10 @@ class TradingSystem():
             
             curr_ptf = new_target_ptf
 
+        else:
+            self._broker_joined = True
+            self.broker.idle(ts_name = self.name)
+
 
         last_price = datafeed.get_last_price(assets = [alloc.asset for alloc in curr_ptf])
         new_aum = Decimal(0)
@@ -341,7 +449,7 @@ class TradingSystem():
         print(utils.now(), ": The rebalance function was executed in {} seconds.".format(delta_time))
 
 
-    def run(self, delay, frequency = 1):
+    def run(self, delay, frequency = 1, universe_frequency = 1, window_length = 0):
         
         """
         This method manages the "event-driven" interface. Start every method at the right time.
@@ -349,27 +457,43 @@ class TradingSystem():
         Args:
             delay (str): Timeframe identifier. Every delay time the on_market_open is executed.
             frequency (int): Frequency of rebalancing.
+            universe_frequency (int, optional): The universe is selected again every universe_frequency ticks, so new listings and delistings are seen. Default is 1.
+            window_length (int, optional): Candles of history downloaded for the assets added to the universe, including the first selection. Default is 0.
 
         """
         
         assert frequency > 0, "The frequency must be > 0."
+        assert universe_frequency > 0, "The universe_frequency must be > 0."
 
-        universe = self.select_universe()
+        from apscheduler.schedulers.blocking import BlockingScheduler
+        self.scheduler = BlockingScheduler()
+
+        with session_scope() as session:
+            self.session = session
+            universe = self.update_universe(timeframe = delay, universe_frequency = universe_frequency, window_length = window_length, tick = False)
         
-        instrument_timetable = {}
-        for asset in universe:
-            if asset.instrument not in list(instrument_timetable.keys()):
-                instrument_timetable[asset.instrument] = asset.exchanges[0].timetable
+            instrument_timetable = {}
+            for asset in universe:
+                if asset.instrument not in list(instrument_timetable.keys()):
+                    instrument_timetable[asset.instrument] = asset.exchanges[0].timetable
+            self.session = None
         
         for instrument, timetable in instrument_timetable.items():
             if timetable == None:
                 time_expression = utils.execution_time_str(timetable = timetable, delay = delay)
                 logging.debug("Time expressione for add_job(): {}".format(time_expression))
-                self.scheduler.add_job(func = self.on_market_open, kwargs = {"timeframe" : delay, "frequency" : frequency, "universe" : universe}, max_instances = 10, **time_expression)
+                self.scheduler.add_job(func = self.on_market_open, kwargs = {"timeframe" : delay, "frequency" : frequency, "universe_frequency" : universe_frequency, "window_length" : window_length}, max_instances = 10, **time_expression)
             else:
                 logging.critical("Timetable is not None. NotImplemented raised.")
                 raise NotImplemented("Timetable is not None. NotImplemented raised.")
-        self.scheduler.start()
+        if self.fill_tracker != None:
+            self.fill_tracker.start()
+
+        try:
+            self.scheduler.start()
+        finally:
+            if self.fill_tracker != None:
+                self.fill_tracker.stop()
         
         """
         self.on_market_open(timeframe = delay, frequency = frequency)
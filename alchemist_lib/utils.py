@@ -19,17 +19,124 @@ def to_list(item):
     return l
 
 
-def subtract_list(first, second):
-    new_list = []
-    
+def entity_key(item):
+    #Assets and allocations are identified by (ticker, instrument_id), anything else by itself. Assets have it precomputed.
+    key = getattr(item, "key", None)
+    if isinstance(key, tuple):
+        return key
+    if hasattr(item, "ticker") and hasattr(item, "instrument_id"):
+        return (item.ticker, item.instrument_id)
+    return item
+
+
+class KeyedCollection():
+
+    """
+    Entities indexed by key, in insertion order. Lookups, membership tests and differences cost O(1) per item
+    and the key of every item is computed once, instead of comparing the items of two lists with __eq__.
+
+    Example:
+        curr = KeyedCollection(items = curr_ptf)
+        for alloc in target_ptf:
+            old_alloc = curr.get(alloc)
+
+    Attributes:
+        key (callable): Returns the key of an item. Default is entity_key, (ticker, instrument_id) for assets and allocations.
+    """
+
+    def __init__(self, items = [], key = entity_key):
+
+        """
+        Costructor method.
+
+        Args:
+            items (list, optional): Items of the collection. If many items have the same key the first one is kept.
+            key (callable, optional): Returns the key of an item. Default is entity_key.
+        """
+
+        self.key = key
+        self._items = {}
+        for item in to_list(items) if items != None else []:
+            self._items.setdefault(key(item), item)
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+
+    def __contains__(self, item):
+        return self.key(item) in self._items
+
+
+    def __repr__(self):
+        return "<KeyedCollection({})>".format(list(self._items.values()))
+
+
+    def keys(self):
+        return list(self._items.keys())
+
+
+    def get(self, item, default = None):
+
+        """
+        Args:
+            item (obj): An item with the same key of the one wanted, or the key itself (with entity_key a key is its own key).
+
+        Return:
+            item (obj): The item of the collection with that key, default if missing.
+        """
+
+        return self._items.get(self.key(item), default)
+
+
+    def add(self, item):
+        self._items.setdefault(self.key(item), item)
+
+
+    def subtract(self, other):
+
+        """
+        Args:
+            other (KeyedCollection, list): Items to remove.
+
+        Return:
+            items (list): Items of this collection whose key is not in other, in order.
+        """
+
+        other_keys = set(other.keys()) if isinstance(other, KeyedCollection) else set([self.key(item) for item in to_list(other)])
+        return [item for key, item in self._items.items() if key not in other_keys]
+
+
+    def intersect(self, other):
+
+        """
+        Args:
+            other (KeyedCollection, list): Items to keep.
+
+        Return:
+            items (list): Items of this collection whose key is in other, in order.
+        """
+
+        other_keys = set(other.keys()) if isinstance(other, KeyedCollection) else set([self.key(item) for item in to_list(other)])
+        return [item for key, item in self._items.items() if key in other_keys]
+
+
+def subtract_list(first, second, key = entity_key):
+    #Items of first not in second, duplicates of first are kept. Compared by key, with a set.
     if isinstance(first, list) == False or isinstance(second, list) == False:
         return []
-    
-    for item in first:
-        if item not in second:
-            new_list.append(item)
-            
-    return new_list
+
+    try:
+        second_keys = set([key(item) for item in second])
+    except TypeError:
+        #Unhashable items.
+        return [item for item in first if item not in second]
+
+    return [item for item in first if key(item) not in second_keys]
 
 
 def to_frame(serie):
@@ -0,0 +1,209 @@
+from collections import namedtuple
+
+import pandas as pd
+
+from .database.ohlcv import Ohlcv
+from .database.ptf_allocation import PtfAllocation
+
+
+
+class Candle(namedtuple("Candle", ["ticker", "instrument_id", "timeframe_id", "ohlcv_datetime", "open", "high", "low", "close", "volume"])):
+
+    """
+    OHLCV candle as an immutable tuple, with the same attributes of alchemist_lib.database.ohlcv.Ohlcv.
+    The data feeds build candles of this type, they become Ohlcv instances only when they are saved.
+
+    Attributes:
+        ticker (str): Ticker code of the asset.
+        instrument_id (int): Integer number that identify the financial instrument of the asset.
+        timeframe_id (str): Timeframe identifier.
+        ohlcv_datetime (datetime.datetime): Datetime of the candle.
+        open (decimal.Decimal): Open price.
+        high (decimal.Decimal): High price.
+        low (decimal.Decimal): Low price.
+        close (decimal.Decimal): Close price.
+        volume (decimal.Decimal): Volume of assets exchanged in the timeframe.
+    """
+
+    __slots__ = ()
+
+
+    def to_ohlcv(self):
+
+        """
+        Return:
+            candle (alchemist_lib.database.ohlcv.Ohlcv): A new mapped instance with the same values, ready to be saved.
+        """
+
+        candle = Ohlcv()
+        candle.ticker = self.ticker
+        candle.instrument_id = self.instrument_id
+        candle.timeframe_id = self.timeframe_id
+        candle.ohlcv_datetime = self.ohlcv_datetime
+        candle.open = self.open
+        candle.high = self.high
+        candle.low = self.low
+        candle.close = self.close
+        candle.volume = self.volume
+        return candle
+
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv):
+
+        """
+        Args:
+            ohlcv (alchemist_lib.database.ohlcv.Ohlcv): A mapped candle, or a row of a query of the same columns.
+
+        Return:
+            candle (Candle): The same values.
+        """
+
+        return cls(ticker = ohlcv.ticker, instrument_id = ohlcv.instrument_id, timeframe_id = ohlcv.timeframe_id, ohlcv_datetime = ohlcv.ohlcv_datetime,
+                   open = ohlcv.open, high = ohlcv.high, low = ohlcv.low, close = ohlcv.close, volume = ohlcv.volume)
+
+
+def to_mapped(obj):
+    #Value types become mapped instances only when they are saved, anything else is already one.
+    if isinstance(obj, Candle):
+        return obj.to_ohlcv()
+    if isinstance(obj, AllocationDelta):
+        return obj.to_allocation()
+    return obj
+
+
+#Last trade price of an asset.
+#    asset (alchemist_lib.database.asset.Asset): The asset.
+#    price (decimal.Decimal): Last trade price, in BTC.
+Price = namedtuple("Price", ["asset", "price"])
+
+
+def prices_to_frame(prices):
+
+    """
+    Builds the dataframe returned by the get_last_price() methods of the data feeds in one step, instead of a .loc assignment for every asset.
+
+    Args:
+        prices (list[Price]): The prices.
+
+    Return:
+        df (pandas.DataFrame): A dataframe with the column last_price and the asset as index.
+    """
+
+    return pd.DataFrame(data = {"asset" : [price.asset for price in prices], "last_price" : [price.price for price in prices]},
+                        columns = ["asset", "last_price"]).set_index("asset")
+
+
+class AllocationDelta():
+
+    """
+    Difference between two allocations of an asset, the order that moves a portfolio towards its target.
+    It has the attributes of alchemist_lib.database.ptf_allocation.PtfAllocation that the portfolios and the brokers use, but it isn't mapped:
+    rebalance() returns deltas and they become PtfAllocation instances only if they are saved as positions.
+
+    Attributes:
+        ticker (str): Ticker code of the asset.
+        instrument_id (int): Integer that identify tha type of financial instrument.
+        amount (decimal.Decimal): Amount of the asset to exchange, negative to sell.
+        base_currency_amount (decimal.Decimal): Amount of the base currency, negative for sells.
+        ts_name (str): Name of the trading system that manages this allocation.
+        asset (alchemist_lib.database.asset.Asset): The asset, can be None.
+        ts (alchemist_lib.database.ts.Ts): The trading system, can be None.
+    """
+
+    __slots__ = ("ticker", "instrument_id", "amount", "base_currency_amount", "ts_name", "asset", "ts")
+
+    def __init__(self, amount, base_currency_amount, ts_name, ticker, instrument_id, asset = None, ts = None):
+
+        """
+        Costructor method.
+
+        Args:
+            amount (decimal.Decimal): Amount of the asset to exchange, negative to sell.
+            base_currency_amount (decimal.Decimal): Amount of the base currency.
+            ts_name (str): Name of the trading system that manages this allocation.
+            ticker (str): Ticker code of the asset.
+            instrument_id (int): Integer that identify tha type of financial instrument.
+            asset (alchemist_lib.database.asset.Asset, optional): The asset. Default is None.
+            ts (alchemist_lib.database.ts.Ts, optional): The trading system. Default is None.
+        """
+
+        self.amount = amount
+        self.base_currency_amount = base_currency_amount
+        self.ts_name = ts_name
+        self.ticker = ticker
+        self.instrument_id = instrument_id
+        self.asset = asset
+        self.ts = ts
+
+
+    def __repr__(self):
+        return "<AllocationDelta(amount={}, base_currency_amount={}, ticker={}, instrument_id={}, ts_name={})>".format(self.amount,
+                                                                                                                        self.base_currency_amount,
+                                                                                                                        self.ticker,
+                                                                                                                        self.instrument_id,
+                                                                                                                        self.ts_name)
+
+
+    def __str__(self):
+        return "{} {}".format(round(self.amount, 8), self.ticker)
+
+
+    def to_dict(self):
+        return {"amount" : self.amount,
+                "base_currency_amount" : self.base_currency_amount,
+                "ts_name" : self.ts_name,
+                "ticker" : self.ticker,
+                "instrument_id" : self.instrument_id
+                }
+
+
+    def __eq__(self, other):
+        if isinstance(other, (AllocationDelta, PtfAllocation)):
+            return self.to_dict() == other.to_dict()
+        return False
+
+
+    __hash__ = None
+
+
+    def deepcopy(self):
+
+        """
+        Return:
+            delta (AllocationDelta): A copy with the same values. Asset and trading system are not copied, like PtfAllocation.deepcopy().
+        """
+
+        return AllocationDelta(amount = self.amount, base_currency_amount = self.base_currency_amount, ts_name = self.ts_name,
+                               ticker = self.ticker, instrument_id = self.instrument_id)
+
+
+    def to_allocation(self):
+
+        """
+        Return:
+            allocation (alchemist_lib.database.ptf_allocation.PtfAllocation): A new mapped instance with the same values, ready to be saved.
+        """
+
+        allocation = PtfAllocation(amount = self.amount, base_currency_amount = self.base_currency_amount, ts_name = self.ts_name,
+                                   ticker = self.ticker, instrument_id = self.instrument_id)
+        if self.asset != None:
+            allocation.asset = self.asset
+        if self.ts != None:
+            allocation.ts = self.ts
+        return allocation
+
+
+    @classmethod
+    def from_allocation(cls, allocation):
+
+        """
+        Args:
+            allocation (alchemist_lib.database.ptf_allocation.PtfAllocation): A mapped allocation.
+
+        Return:
+            delta (AllocationDelta): The same values, with the same asset and trading system.
+        """
+
+        return cls(amount = allocation.amount, base_currency_amount = allocation.base_currency_amount, ts_name = allocation.ts_name,
+                   ticker = allocation.ticker, instrument_id = allocation.instrument_id, asset = allocation.asset, ts = allocation.ts)
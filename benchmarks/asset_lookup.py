@@ -0,0 +1,88 @@
+
+"""
+Asset lookup benchmark.
+
+Assets are the index of the dataframes of the library and the keys of many dictionaries. This benchmark looks up every asset of a universe
+in a dictionary, in a dataframe indexed by asset (like the last prices in LongsOnlyPortfolio) and in a KeyedCollection,
+first with the previous Asset.__hash__ (a sorted tuple of to_dict() at every call), then with the cached key.
+
+Usage:
+    $ python3 benchmarks/asset_lookup.py
+    $ python3 benchmarks/asset_lookup.py --assets 1000 --rounds 20
+"""
+
+import argparse
+
+import time
+
+import pandas as pd
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+
+from alchemist_lib import utils
+
+
+
+def legacy_hash(self):
+    return hash(tuple(sorted(self.to_dict().items())))
+
+
+def legacy_eq(self, other):
+    if isinstance(self, other.__class__):
+        return ((self.ticker, self.instrument_id) == (other.ticker, other.instrument_id))
+    return NotImplemented
+
+
+def run(universe, lookups, rounds):
+    timings = {}
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        prices = {asset : 1 for asset in universe}
+        for asset in lookups:
+            prices[asset]
+    timings["dict"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        df = pd.DataFrame(data = {"asset" : universe, "last_price" : [1.0] * len(universe)}).set_index("asset")
+        for asset in lookups:
+            df.loc[asset, "last_price"]
+    timings["dataframe .loc"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        positions = utils.KeyedCollection(items = universe)
+        for asset in lookups:
+            positions.get(asset)
+    timings["KeyedCollection"] = time.perf_counter() - start
+
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Asset lookups with the previous and the cached hash.")
+    parser.add_argument("--assets", type = int, default = 300)
+    parser.add_argument("--rounds", type = int, default = 10)
+    args = parser.parse_args()
+
+    universe = [Asset(ticker = "T{}".format(i), instrument_id = 1, name = "Token {}".format(i)) for i in range(args.assets)]
+    #Other instances equal to the ones of the universe, as returned by another query. Same name: the previous hash included it.
+    lookups = [Asset(ticker = "T{}".format(i), instrument_id = 1, name = "Token {}".format(i)) for i in range(args.assets)]
+
+    cached_hash, cached_eq = Asset.__hash__, Asset.__eq__
+    Asset.__hash__, Asset.__eq__ = legacy_hash, legacy_eq
+    legacy = run(universe = universe, lookups = lookups, rounds = args.rounds)
+    Asset.__hash__, Asset.__eq__ = cached_hash, cached_eq
+    cached = run(universe = universe, lookups = lookups, rounds = args.rounds)
+
+    print("{} assets, {} rounds.".format(args.assets, args.rounds))
+    print("{:<18} {:>12} {:>12} {:>10}".format("lookup", "legacy (ms)", "cached (ms)", "speedup"))
+    for name in legacy.keys():
+        print("{:<18} {:>12.1f} {:>12.1f} {:>9.1f}x".format(name, legacy[name] * 1000, cached[name] * 1000, legacy[name] / cached[name]))
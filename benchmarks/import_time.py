@@ -0,0 +1,55 @@
+
+"""
+Import-time benchmark.
+
+Every module is imported in a fresh interpreter, so nothing is cached between runs.
+The database is an in-memory SQLite one: importing must not open any connection, so the DBMS doesn't matter.
+
+Usage:
+    $ python3 benchmarks/import_time.py [repetitions]
+"""
+
+import os
+
+import subprocess
+
+import sys
+
+import statistics
+
+
+MODULES = ["alchemist_lib.database",
+           "alchemist_lib.database.ohlcv",
+           "alchemist_lib.datafeed",
+           "alchemist_lib.factor",
+           "alchemist_lib.tradingsystem"
+           ]
+
+CODE = "import time; start = time.perf_counter(); import {}; print(time.perf_counter() - start)"
+
+
+def measure(module, repetitions):
+    env = dict(os.environ, ALCHEMIST_DATABASE_URI = "sqlite://")
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+    timings = []
+    for i in range(repetitions):
+        out = subprocess.run([sys.executable, "-c", CODE.format(module)], env = env, cwd = root,
+                             stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        timings.append(float(out.stdout.strip()))
+
+    return statistics.median(timings), None
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("{:<35} {:>12}".format("module", "median (ms)"))
+    for module in MODULES:
+        median, error = measure(module = module, repetitions = repetitions)
+        if median == None:
+            print("{:<35} {:>12}   ({})".format(module, "error", error))
+        else:
+            print("{:<35} {:>12.1f}".format(module, median * 1000))
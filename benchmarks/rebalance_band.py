@@ -0,0 +1,109 @@
+
+"""
+No-trade band benchmark.
+
+A backtest of an equally weighted portfolio rebalanced at every 15M tick, on random walk prices.
+The same prices are replayed without band and with the bands given on the command line, for every run it prints the number of orders,
+the turnover (sum of the orders in BTC) and how far the portfolio drifts from the target weights.
+Nothing is sent to an exchange and no database is needed.
+
+Usage:
+    $ python3 benchmarks/rebalance_band.py
+    $ python3 benchmarks/rebalance_band.py --assets 30 --ticks 2000 --band-position 0.05 --band-aum 0.002
+"""
+
+import argparse
+
+import random
+
+from decimal import Decimal
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+from alchemist_lib.portfolio.longsonly import LongsOnlyPortfolio
+
+
+
+def random_walks(assets, ticks, volatility, seed):
+    rnd = random.Random(seed)
+    prices = [[Decimal("0.01")] * assets]
+    for tick in range(ticks - 1):
+        prices.append([price * Decimal(str(1 + rnd.gauss(0, volatility))) for price in prices[-1]])
+    return prices
+
+
+def alloc(asset, amount, price):
+    allocation = PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = amount, base_currency_amount = amount * price, ts_name = "bench")
+    allocation.asset = asset
+    return allocation
+
+
+def backtest(assets, prices, capital, **bands):
+    ptf = LongsOnlyPortfolio(capital = capital, **bands)
+
+    #Equally weighted at the first price.
+    positions = {asset.ticker : ptf.capital / len(assets) / prices[0][i] for i, asset in enumerate(assets)}
+
+    orders = 0
+    skipped = 0
+    turnover = Decimal(0)
+    max_drift = Decimal(0)
+
+    for tick_prices in prices[1:]:
+        curr_ptf = [alloc(asset, positions[asset.ticker], tick_prices[i]) for i, asset in enumerate(assets)]
+        aum = sum([a.base_currency_amount for a in curr_ptf], Decimal(0))
+        ptf.capital = aum
+        target_ptf = [alloc(asset, aum / len(assets) / tick_prices[i], tick_prices[i]) for i, asset in enumerate(assets)]
+
+        deltas = [delta for delta in ptf.rebalance(curr_ptf = curr_ptf, target_ptf = target_ptf) if delta.amount != 0]
+
+        #Every order is filled at the price of the tick.
+        for delta in deltas:
+            positions[delta.ticker] += delta.amount
+            turnover += abs(delta.base_currency_amount)
+        orders += len(deltas)
+        skipped += len(ptf.skipped)
+
+        weights = [positions[asset.ticker] * tick_prices[i] / aum for i, asset in enumerate(assets)]
+        max_drift = max(max_drift, max([abs(weight - Decimal(1) / len(assets)) for weight in weights]))
+
+    return orders, skipped, turnover, max_drift
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Orders and turnover of the rebalance with and without no-trade band.")
+    parser.add_argument("--assets", type = int, default = 20)
+    parser.add_argument("--ticks", type = int, default = 96 * 7, help = "Number of 15M ticks. Default is a week.")
+    parser.add_argument("--volatility", type = float, default = 0.004, help = "Standard deviation of the return of a tick.")
+    parser.add_argument("--capital", type = str, default = "1")
+    parser.add_argument("--band-abs", type = str, default = "0.0005", help = "Minimum adjustment in BTC.")
+    parser.add_argument("--band-position", type = str, default = "0.02", help = "Minimum adjustment as a fraction of the position.")
+    parser.add_argument("--band-aum", type = str, default = "0.001", help = "Minimum adjustment as a fraction of the capital.")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+
+    assets = [Asset(ticker = "A{}".format(i), instrument_id = 1) for i in range(args.assets)]
+    prices = random_walks(assets = args.assets, ticks = args.ticks, volatility = args.volatility, seed = args.seed)
+
+    runs = [("no band", {}),
+            ("band_abs", {"band_abs" : args.band_abs}),
+            ("band_position", {"band_position" : args.band_position}),
+            ("band_aum", {"band_aum" : args.band_aum}),
+            ("all bands", {"band_abs" : args.band_abs, "band_position" : args.band_position, "band_aum" : args.band_aum})]
+
+    print("{} assets, {} ticks.".format(args.assets, args.ticks))
+    print("{:<15} {:>8} {:>8} {:>14} {:>10}".format("run", "orders", "skipped", "turnover (BTC)", "max drift"))
+
+    base_orders = base_turnover = None
+    for name, bands in runs:
+        orders, skipped, turnover, max_drift = backtest(assets = assets, prices = prices, capital = args.capital, **bands)
+        if base_orders == None:
+            base_orders, base_turnover = orders, turnover
+        print("{:<15} {:>8} {:>8} {:>14.6f} {:>9.2%}   orders {:+.1%}, turnover {:+.1%}".format(name, orders, skipped, turnover, max_drift,
+                                                                                               orders / base_orders - 1 if base_orders > 0 else 0,
+                                                                                               turnover / base_turnover - 1 if base_turnover > 0 else 0))
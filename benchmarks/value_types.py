@@ -0,0 +1,103 @@
+
+"""
+Value types benchmark.
+
+Builds the same candles and allocation deltas as mapped instances (Ohlcv, PtfAllocation) and as value types (Candle, AllocationDelta),
+the way the data feeds and rebalance() do, and prints for every kind the time, the number of memory blocks allocated and the peak memory.
+Nothing is saved and no database is needed.
+
+Usage:
+    $ python3 benchmarks/value_types.py
+    $ python3 benchmarks/value_types.py --count 100000
+"""
+
+import argparse
+
+import datetime as dt
+
+import gc
+
+import time
+
+import tracemalloc
+
+from decimal import Decimal
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ohlcv import Ohlcv
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+from alchemist_lib.values import Candle, AllocationDelta
+
+
+
+def mapped_candles(rows):
+    candles = []
+    for row in rows:
+        candle = Ohlcv()
+        candle.ohlcv_datetime = row[0]
+        candle.timeframe_id = "1H"
+        candle.open, candle.high, candle.low, candle.close, candle.volume = row[1], row[1], row[1], row[1], row[2]
+        candle.ticker = "ETH"
+        candle.instrument_id = 1
+        candles.append(candle)
+    return candles
+
+
+def value_candles(rows):
+    return [Candle(ticker = "ETH", instrument_id = 1, timeframe_id = "1H", ohlcv_datetime = row[0],
+                   open = row[1], high = row[1], low = row[1], close = row[1], volume = row[2]) for row in rows]
+
+
+def mapped_deltas(rows):
+    deltas = []
+    for row in rows:
+        delta = PtfAllocation(amount = row[1], base_currency_amount = row[2], ts_name = "bench", ticker = "ETH", instrument_id = 1)
+        deltas.append(delta.deepcopy())
+    return deltas
+
+
+def value_deltas(rows):
+    return [AllocationDelta(amount = row[1], base_currency_amount = row[2], ts_name = "bench", ticker = "ETH", instrument_id = 1).deepcopy() for row in rows]
+
+
+def measure(func, rows):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(rows)
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum([stat.count for stat in snapshot.statistics("filename")])
+    del result
+    return elapsed, blocks, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Time and memory of mapped instances and value types.")
+    parser.add_argument("--count", type = int, default = 20000)
+    args = parser.parse_args()
+
+    #The first mapped instance configures the mappers, it's not part of the measure.
+    Ohlcv()
+    PtfAllocation(amount = 0, base_currency_amount = 0, ts_name = "bench", ticker = "ETH", instrument_id = 1)
+
+    start = dt.datetime(2018, 1, 1)
+    rows = [(start + dt.timedelta(hours = i), Decimal("0.05") + Decimal(i) / 10 ** 6, Decimal(i)) for i in range(args.count)]
+
+    print("{} objects.".format(args.count))
+    print("{:<22} {:>10} {:>12} {:>12}".format("kind", "time (ms)", "blocks", "peak (KB)"))
+    for name, mapped, value in [("candles", mapped_candles, value_candles), ("allocation deltas", mapped_deltas, value_deltas)]:
+        mapped_time, mapped_blocks, mapped_peak = measure(func = mapped, rows = rows)
+        value_time, value_blocks, value_peak = measure(func = value, rows = rows)
+        print("{:<22} {:>10.1f} {:>12} {:>12.0f}".format(name + " (mapped)", mapped_time * 1000, mapped_blocks, mapped_peak / 1024))
+        print("{:<22} {:>10.1f} {:>12} {:>12.0f}   time {:+.0%}, peak {:+.0%}".format(name + " (value)", value_time * 1000, value_blocks, value_peak / 1024,
+                                                                                     value_time / mapped_time - 1, value_peak / mapped_peak - 1))
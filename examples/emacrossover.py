@@ -27,6 +27,8 @@ def select_universe(session):
 
 def handle_data(session, universe):
     fct = Factor(session = session)
+    #Closes and volumes of the whole universe are read once, the two history() calls slice them.
+    fct.panel(universe = universe, fields = ["close", "volume"], timeframe = "1H", window_length = 21)
     prices = fct.history(universe = universe, field = "close", timeframe = "1H", window_length = 21)
     
     ema10 = fct.ExponentialMovingAverage(values = prices, window_length = 10, field = "close").rename(columns = {"ExponentialMovingAverage" : "ema10"})
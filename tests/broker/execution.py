@@ -0,0 +1,178 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from alchemist_lib import database
+from alchemist_lib import resilience
+
+from alchemist_lib.broker.broker import BrokerBaseClass
+from alchemist_lib.broker.execution import OrderStatus, TWAP, Iceberg, POV
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.executed_order import ExecutedOrder
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+
+
+class Clock():
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+sent_orders = [0]
+
+
+class FakeExchangeBroker(BrokerBaseClass):
+
+    """
+    Every check of an order fills fill_step of it at the price of the market, until fill_limit is reached.
+    """
+
+    def __init__(self, clock, price = Decimal("0.01"), fill_step = Decimal(1), fill_limit = Decimal(1), volume_per_second = Decimal(0)):
+        BrokerBaseClass.__init__(self)
+        self.clock = clock
+        self.price = price
+        self.fill_step = fill_step
+        self.fill_limit = fill_limit
+        self.volume_per_second = volume_per_second
+        self.orders = {}
+        self.sent_at = []
+
+    def get_order_books(self, tickers):
+        return {}
+
+    def place_order(self, asset, amount, order_type):
+        order_id = str(sent_orders[0] + 1)
+        self.orders[order_id] = {"amount" : abs(amount), "filled" : Decimal(0), "open" : True}
+        self.sent_at.append((self.clock() - 1000, abs(amount)))
+        sent_orders[0] += 1
+        self.session.add(ExecutedOrder(order_id = order_id,
+                                       order_datetime = dt.datetime(2018, 1, 1) + dt.timedelta(seconds = sent_orders[0]),
+                                       ticker = asset.ticker,
+                                       instrument_id = asset.instrument_id,
+                                       amount = amount,
+                                       operation = "buy" if amount > 0 else "sell",
+                                       order_type = order_type,
+                                       broker_name = "fake",
+                                       exchange_name = "fake"))
+        self.session.commit()
+        return order_id
+
+    def get_order_status(self, order_id, asset):
+        order = self.orders[order_id]
+        if order["open"]:
+            order["filled"] = min(order["filled"] + order["amount"] * self.fill_step, order["amount"] * self.fill_limit)
+            if order["filled"] == order["amount"]:
+                order["open"] = False
+        return OrderStatus(order_id = order_id, filled = order["filled"], price = self.price, fee = order["filled"] * self.price * Decimal("0.0025"), is_open = order["open"])
+
+    def cancel_order(self, order_id, asset):
+        self.orders[order_id]["open"] = False
+
+    def get_traded_volume(self, asset, since):
+        return self.volume_per_second * Decimal(self.clock() - 1000)
+
+    def get_balances(self):
+        return {}
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+
+
+#TWAP: four equal slices, one every 25 seconds.
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock)
+broker.set_session(session = session)
+twap = TWAP(duration = 100, slices = 4, sleep = clock.sleep, clock = clock)
+report = twap.run(broker = broker, orders = [(ETH, Decimal(8))])[0]
+print("TWAP: ", report, broker.sent_at)
+assert broker.sent_at == [(0, 2), (25, 2), (50, 2), (75, 2)]
+assert report.filled == 8 and report.price == Decimal("0.01") and report.fee > 0
+
+#The realized price is saved in executed_order.
+prices = [order.price for order in session.query(ExecutedOrder).filter(ExecutedOrder.order_id.in_(report.order_ids)).all()]
+print("Prices saved: ", prices)
+assert len(prices) == 4 and all([price == Decimal("0.01") for price in prices])
+
+#The schedule is compressed to end before the deadline of the tick.
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock)
+broker.set_session(session = session)
+twap = TWAP(duration = 100, slices = 4, sleep = clock.sleep, clock = clock)
+with resilience.deadline(seconds = 30):
+    report = twap.run(broker = broker, orders = [(ETH, Decimal(8))])[0]
+print("TWAP with a deadline: ", broker.sent_at)
+assert [round(t, 2) for t, amount in broker.sent_at] == [0, 6.25, 12.5, 18.75] and report.filled == 8 and clock.now - 1000 < 30 - 5 + 1
+
+#Without the time to cancel the child orders before the deadline nothing is sent.
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock)
+broker.set_session(session = session)
+twap = TWAP(duration = 60, slices = 2, sleep = clock.sleep, clock = clock)
+with resilience.deadline(seconds = 0.5):
+    report = twap.run(broker = broker, orders = [(ETH, Decimal(8))])[0]
+assert broker.sent_at == [] and report.filled == 0 and report.order_ids == []
+
+
+#Iceberg: the next part is shown when the previous one is filled.
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock, fill_step = Decimal("0.5"))
+broker.set_session(session = session)
+iceberg = Iceberg(duration = 100, visible_amount = 1, poll_interval = 5, sleep = clock.sleep, clock = clock)
+report = iceberg.run(broker = broker, orders = [(LTC, Decimal("-3.5"))])[0]
+print("Iceberg: ", report, broker.sent_at)
+assert [amount for t, amount in broker.sent_at] == [1, 1, 1, Decimal("0.5")]
+assert report.filled == Decimal("-3.5")
+
+
+#Partial fills: what is still open at the end is cancelled.
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock, fill_step = Decimal("0.25"), fill_limit = Decimal("0.5"))
+broker.set_session(session = session)
+iceberg = Iceberg(duration = 20, visible_amount = 10, poll_interval = 5, sleep = clock.sleep, clock = clock)
+report = iceberg.run(broker = broker, orders = [(ETH, Decimal(10))])[0]
+print("Partial fill: ", report)
+assert report.filled == 5 and all([order["open"] == False for order in broker.orders.values()])
+
+
+#POV: follows half of the volume of the others.
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock, volume_per_second = Decimal(1))
+broker.set_session(session = session)
+pov = POV(duration = 60, participation = 0.5, poll_interval = 10, sleep = clock.sleep, clock = clock)
+report = pov.run(broker = broker, orders = [(ETH, Decimal(20))])[0]
+print("POV: ", report, broker.sent_at)
+assert broker.sent_at[0] == (10, 10) and report.filled == 20
+
+
+#execute() with an algorithm updates the portfolio with the executed amounts.
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.commit()
+
+clock = Clock()
+broker = FakeExchangeBroker(clock = clock, fill_step = Decimal("0.5"), fill_limit = Decimal("0.5"))
+broker.set_session(session = session)
+broker.set_algorithm(algorithm = TWAP(duration = 10, slices = 1, sleep = clock.sleep, clock = clock))
+
+alloc = PtfAllocation(ticker = "ETH", instrument_id = 1, amount = Decimal(4), base_currency_amount = Decimal("0.04"), ts_name = "test")
+alloc.asset = ETH
+new_ptf = broker.execute(allocs = [alloc], ts_name = "test", curr_ptf = [])
+print("Portfolio after execute(): ", new_ptf)
+assert len(new_ptf) == 1 and new_ptf[0].amount == 2 and new_ptf[0].base_currency_amount == Decimal("0.02")
+
+session.close()
@@ -0,0 +1,148 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from sqlalchemy import create_engine, inspect
+
+from alchemist_lib import database
+
+from alchemist_lib.broker.broker import BrokerBaseClass
+from alchemist_lib.broker.execution import OrderStatus
+from alchemist_lib.broker.fills import FillTracker
+
+from alchemist_lib.database import migrations
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.executed_order import ExecutedOrder
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+from alchemist_lib.database.ts import Ts
+
+
+
+class FakeAccountBroker(BrokerBaseClass):
+
+    """
+    The state of the orders and the balances are set by the test, batched calls are counted.
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        BrokerBaseClass.__init__(self)
+        self.statuses = {}
+        self.balances = {}
+        self.calls = {"get_orders_status" : 0, "get_balances" : 0, "cancel_order" : 0}
+        self.placed = []
+
+    def get_order_books(self, tickers):
+        return {}
+
+    def get_order_status(self, order_id, asset):
+        return self.statuses[str(order_id)]
+
+    def get_orders_status(self, orders):
+        self.calls["get_orders_status"] += 1
+        return {str(order.order_id) : self.statuses[str(order.order_id)] for order in orders if str(order.order_id) in self.statuses}
+
+    def cancel_order(self, order_id, asset):
+        self.calls["cancel_order"] += 1
+        status = self.statuses[str(order_id)]
+        self.statuses[str(order_id)] = status._replace(is_open = False)
+
+    def get_traded_volume(self, asset, since):
+        return Decimal(0)
+
+    def get_balances(self):
+        self.calls["get_balances"] += 1
+        return self.balances
+
+    def place_order(self, asset, amount, order_type):
+        self.placed.append((asset.ticker, amount))
+        return "new"
+
+
+#The migration adds the columns to a table created before fill tracking.
+engine = create_engine("sqlite://")
+engine.execute("CREATE TABLE executed_order (order_datetime DATETIME, ticker VARCHAR(16), instrument_id INTEGER, order_id VARCHAR(150), exchange_name VARCHAR(150), broker_name VARCHAR(150), order_type VARCHAR(3), operation VARCHAR(4), amount FLOAT, price FLOAT, paid_fee FLOAT)")
+with engine.begin() as connection:
+    migrations._executed_order_fills(connection)
+    migrations._executed_order_fills(connection)
+    migrations._executed_order_ts_name(connection)
+    migrations._executed_order_ts_name(connection)
+columns = [column["name"] for column in inspect(engine).get_columns("executed_order")]
+print("Columns after the migration: ", columns)
+assert "status" in columns and "filled" in columns and "updated_datetime" in columns and "ts_name" in columns
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+
+session.add(Instrument(instrument_type = "cryptocurrency"))
+ETH = Asset(ticker = "ETH", instrument_id = 1, name = "Ethereum")
+LTC = Asset(ticker = "LTC", instrument_id = 1, name = "Litecoin")
+session.add_all([ETH, LTC])
+session.add_all([Ts(ts_name = name, aum = 1, ptf_type = "LongsOnlyPortfolio") for name in ["A", "B"]])
+session.commit()
+
+def order(order_id, asset, amount, seconds, ts_name = "A"):
+    return ExecutedOrder(order_id = order_id, order_datetime = dt.datetime(2018, 1, 1, 0, 0, seconds), ticker = asset.ticker, instrument_id = asset.instrument_id,
+                         amount = amount, operation = "buy" if amount > 0 else "sell", order_type = "MKT", broker_name = "fake", exchange_name = "fake", ts_name = ts_name)
+
+#The order of B, on another account of the same exchange, isn't followed by the tracker of A.
+session.add_all([order("1", ETH, Decimal(2), 1), order("2", LTC, Decimal(-5), 2), order("3", ETH, Decimal(4), 3), order("4", LTC, Decimal(1), 4, ts_name = "B")])
+session.commit()
+
+broker = FakeAccountBroker()
+broker.set_session(session = session)
+broker.statuses = {"1" : OrderStatus(order_id = "1", filled = Decimal(2), price = Decimal("0.05"), fee = Decimal("0.00025"), is_open = False),
+                   "2" : OrderStatus(order_id = "2", filled = Decimal(3), price = Decimal("0.01"), fee = Decimal("0.000075"), is_open = True),
+                   "3" : OrderStatus(order_id = "3", filled = Decimal(0), price = Decimal(0), fee = Decimal(0), is_open = True)}
+
+tracker = FillTracker(broker = broker, ts_name = "A", reprice = True)
+
+#One batched call for every open order.
+updated = tracker.poll(session = session)
+print("Updated: ", updated)
+assert broker.calls["get_orders_status"] == 1 and len(updated) == 3
+first = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == "1").one()
+assert first.status == "filled" and first.filled == 2 and first.price == Decimal("0.05") and first.paid_fee == Decimal("0.00025")
+assert [o.order_id for o in tracker.open_orders(session = session)] == ["2", "3"]
+
+#Before the next tick the open orders are cancelled and the rest is sent again.
+cancelled = tracker.settle(session = session)
+print("Cancelled: ", cancelled, "Placed again: ", broker.placed)
+assert [o.order_id for o in cancelled] == ["2", "3"] and broker.calls["cancel_order"] == 2
+assert broker.placed == [("LTC", Decimal(-2)), ("ETH", Decimal(4))]
+second = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == "2").one()
+assert second.status == "cancelled" and second.filled == -3
+
+#Nothing is left to poll.
+calls = broker.calls["get_orders_status"]
+tracker.poll(session = session)
+assert broker.calls["get_orders_status"] == calls
+
+other = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == "4").one()
+assert other.status == "open" and other.filled == 0 and other.updated_datetime == None
+
+
+#Reconciliation: two trading systems share ETH, the balance is split pro rata.
+def alloc(ts_name, asset, amount, base_currency_amount):
+    return PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = Decimal(amount), base_currency_amount = Decimal(base_currency_amount), ts_name = ts_name)
+
+session.add_all([alloc("A", ETH, 3, "0.15"), alloc("B", ETH, 1, "0.05"), alloc("A", LTC, 10, "0.1")])
+session.commit()
+
+broker.balances = {"ETH" : Decimal(2), "LTC" : Decimal("10.005"), "XMR" : Decimal(7)}
+diff = tracker.reconcile(session = session)
+print(diff)
+assert broker.calls["get_balances"] == 1
+assert list(diff.index) == ["ETH"]
+
+amounts = {(a.ts_name, a.ticker) : a.amount for a in session.query(PtfAllocation).all()}
+print("Allocations after reconcile(): ", amounts)
+assert amounts[("A", "ETH")] == Decimal("1.5") and amounts[("B", "ETH")] == Decimal("0.5") and amounts[("A", "LTC")] == 10
+
+session.close()
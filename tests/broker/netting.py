@@ -0,0 +1,121 @@
+import threading
+
+from decimal import Decimal
+
+from alchemist_lib import database
+
+from alchemist_lib.broker.broker import BrokerBaseClass
+from alchemist_lib.broker.netting import NettingBroker, NETTED
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+
+
+class RecordingBroker(BrokerBaseClass):
+
+    """
+    Records the orders, fills the ones whose ticker is not in failing.
+    """
+
+    name = "fake"
+
+    def __init__(self, failing = []):
+        BrokerBaseClass.__init__(self)
+        self.orders = []
+        self.failing = failing
+
+    def place_order(self, asset, amount, order_type):
+        self.orders.append((asset.ticker, amount))
+        return -1 if asset.ticker in self.failing else str(len(self.orders))
+
+    def get_order_books(self, tickers):
+        return {}
+
+    def get_order_status(self, order_id, asset):
+        pass
+
+    def cancel_order(self, order_id, asset):
+        pass
+
+    def get_traded_volume(self, asset, since):
+        return Decimal(0)
+
+    def get_balances(self):
+        return {}
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.commit()
+
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+XMR = Asset(ticker = "XMR", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+
+def alloc(ts_name, asset, amount, price):
+    a = PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = Decimal(amount), base_currency_amount = Decimal(amount) * Decimal(price), ts_name = ts_name)
+    a.asset = asset
+    return a
+
+
+def run_tick(broker, orders, idle = []):
+    #Every trading system runs in its own thread, like the schedulers of TradingSystem.run().
+    results = {}
+
+    def target(ts_name, allocs):
+        broker.set_session(session = database.Session())
+        results[ts_name] = broker.execute(allocs = allocs, ts_name = ts_name, curr_ptf = [])
+
+    threads = [threading.Thread(target = target, args = (ts_name, allocs)) for ts_name, allocs in orders.items()]
+    threads += [threading.Thread(target = broker.idle, args = (ts_name, )) for ts_name in idle]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+#A sells 5 XMR and buys 1 LTC, B buys 3 XMR and 1 LTC, C doesn't trade: one sell of 2 XMR and one buy of 2 LTC.
+exchange = RecordingBroker()
+broker = NettingBroker(broker = exchange, participants = ["A", "B", "C"], window = 10)
+
+results = run_tick(broker = broker, orders = {"A" : [alloc("A", XMR, -5, "0.02"), alloc("A", LTC, 1, "0.01")],
+                                              "B" : [alloc("B", XMR, 3, "0.02"), alloc("B", LTC, 1, "0.01")]}, idle = ["C"])
+print("Orders sent: ", exchange.orders)
+print("A: ", results["A"])
+print("B: ", results["B"])
+assert sorted(exchange.orders) == [("LTC", Decimal(2)), ("XMR", Decimal(-2))]
+assert [(a.ticker, a.amount) for a in results["B"]] == [("XMR", Decimal(3)), ("LTC", Decimal(1))]
+assert [(a.ticker, a.amount) for a in results["A"]] == [("XMR", Decimal(-5)), ("LTC", Decimal(1)), ("BTC", Decimal("0.09"))]
+
+
+#Orders that cancel out never reach the exchange.
+exchange = RecordingBroker()
+broker = NettingBroker(broker = exchange, participants = ["A", "B"], window = 10)
+results = run_tick(broker = broker, orders = {"A" : [alloc("A", ETH, -2, "0.05")], "B" : [alloc("B", ETH, 2, "0.05")]})
+print("Crossed internally: ", exchange.orders, results)
+assert exchange.orders == [] and results["A"][0].amount == -2 and results["B"][0].amount == 2
+
+
+#If the residual isn't executed the side that sent it gets only what the other side gave.
+exchange = RecordingBroker(failing = ["XMR"])
+broker = NettingBroker(broker = exchange, participants = ["A", "B"], window = 10)
+results = run_tick(broker = broker, orders = {"A" : [alloc("A", XMR, -5, "0.02")], "B" : [alloc("B", XMR, 3, "0.02")]})
+print("Residual failed: ", results)
+assert results["A"][0].amount == -3 and results["B"][0].amount == 3
+
+
+#A trading system that never shows up doesn't block the others for more than the window.
+exchange = RecordingBroker()
+broker = NettingBroker(broker = exchange, participants = ["A", "B"], window = 0.5)
+results = run_tick(broker = broker, orders = {"A" : [alloc("A", ETH, 1, "0.05")]})
+print("Window expired: ", exchange.orders)
+assert exchange.orders == [("ETH", Decimal(1))] and results["A"][0].amount == 1
+
+session.close()
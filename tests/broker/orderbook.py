@@ -0,0 +1,100 @@
+import os
+
+import tempfile
+
+from decimal import Decimal
+
+os.environ["ALCHEMIST_RATELIMIT_DIR"] = tempfile.mkdtemp()
+
+from alchemist_lib.broker import PoloniexBroker
+from alchemist_lib.broker.orderbook import OrderBook, OrderBookCache
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+from alchemist_lib.portfolio import LongsOnlyPortfolio
+
+
+
+book = OrderBook(ticker = "ETH",
+                 asks = [("0.0102", 1), ("0.0101", 2), ("0.0105", 10)],
+                 bids = [("0.0099", 3), ("0.0098", 5)])
+
+print(book)
+assert book.asks[0][0] == Decimal("0.0101") and book.bids[0][0] == Decimal("0.0099")
+assert book.mid_price == Decimal("0.0100")
+
+#Walks three levels: 2 @ 0.0101, 1 @ 0.0102, 1 @ 0.0105.
+estimate = book.estimate(amount = Decimal(4))
+print("Buy 4: ", estimate)
+assert estimate.side == "buy" and estimate.filled == 4
+assert estimate.vwap == (2 * Decimal("0.0101") + Decimal("0.0102") + Decimal("0.0105")) / 4
+assert estimate.worst_price == Decimal("0.0105") and estimate.best_price == Decimal("0.0101")
+assert estimate.slippage > 0 and estimate.cost == 4 * (estimate.vwap - Decimal("0.0100"))
+
+#Larger than the book: what is visible is filled.
+estimate = book.estimate(amount = Decimal(-10))
+print("Sell 10: ", estimate)
+assert estimate.side == "sell" and estimate.filled == 8 and estimate.worst_price == Decimal("0.0098")
+
+estimate = OrderBook(ticker = "XXX", asks = [], bids = []).estimate(amount = Decimal(1))
+assert estimate.filled == 0 and estimate.vwap == 0 and estimate.worst_price == 0
+
+
+#The cache downloads only missing or expired books.
+now = [1000.0]
+calls = []
+def fetch(tickers):
+    calls.append(list(tickers))
+    return {ticker : OrderBook(ticker = ticker, asks = [(1, 1)], bids = []) for ticker in tickers}
+
+cache = OrderBookCache(fetch = fetch, ttl = 2, clock = lambda : now[0])
+cache.get_many(tickers = ["ETH", "LTC"])
+cache.get(ticker = "ETH")
+now[0] += 1
+cache.get_many(tickers = ["ETH", "XMR"])
+now[0] += 1.5
+cache.get(ticker = "ETH")
+print("Cache downloads: ", calls)
+assert calls == [["ETH", "LTC"], ["XMR"], ["ETH"]]
+
+
+#Poloniex downloads every book with a single call.
+class FakePolo():
+
+    def __init__(self):
+        self.calls = []
+
+    def returnOrderBook(self, currencyPair, depth):
+        self.calls.append(currencyPair)
+        book = {"asks" : [["0.0101", 2], ["0.0103", 5]], "bids" : [["0.0099", 3]], "isFrozen" : "0"}
+        if currencyPair == "all":
+            return {"BTC_ETH" : book, "BTC_LTC" : book, "USDT_BTC" : book}
+        return book
+
+polo = PoloniexBroker()
+polo.polo = FakePolo()
+
+books = polo.order_books.get_many(tickers = ["ETH", "LTC"])
+rate = polo.get_best_rate(asset = Asset(ticker = "LTC", instrument_id = 1), amount = Decimal(3), field = "ask")
+print("Poloniex books: ", books, "Calls: ", polo.polo.calls, "Rate: ", rate)
+assert polo.polo.calls == ["all"] and rate == Decimal("0.0103")
+
+
+#Pre-trade cost of a rebalance.
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+allocs = []
+for asset, amount in [(ETH, Decimal(4)), (LTC, Decimal(-2))]:
+    alloc = PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = amount, base_currency_amount = 0, ts_name = "test")
+    alloc.asset = asset
+    allocs.append(alloc)
+
+costs = LongsOnlyPortfolio(capital = 1).estimate_cost(allocs = allocs, broker = polo)
+print(costs)
+assert len(costs) == 2 and costs.loc[LTC, "filled"] == 2 and costs.loc[ETH, "cost"] > 0
+assert polo.polo.calls == ["all"]
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from alchemist_lib import database
+
+from alchemist_lib.broker.orderbook import OrderBook
+from alchemist_lib.broker.simulatedbroker import SimulatedBroker, BookReplay
+from alchemist_lib.broker.fills import FillTracker
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.executed_order import ExecutedOrder
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+
+
+class Clock():
+
+    """
+    Time of the replay, the latency moves it forward.
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.add(Exchange(exchange_name = "replay"))
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+session.add_all([ETH, LTC])
+session.commit()
+
+#The ETH book moves against us while the order travels, then it comes back.
+clock = Clock()
+books = [OrderBook(ticker = "ETH", asks = [("0.050", 1), ("0.051", 1), ("0.052", 5)], bids = [("0.049", 10)], timestamp = 0),
+         OrderBook(ticker = "ETH", asks = [("0.051", 1), ("0.053", 5)], bids = [("0.048", 10)], timestamp = 1),
+         OrderBook(ticker = "ETH", asks = [("0.052", 10)], bids = [("0.048", 10)], timestamp = 2),
+         OrderBook(ticker = "LTC", asks = [("0.010", 4)], bids = [("0.009", 4), ("0.008", 100)], timestamp = 0)]
+
+broker = SimulatedBroker(source = BookReplay(books = books, name = "replay", clock = clock), latency = 1, fee = "0.002", sleep = clock.sleep)
+broker.set_session(session = session)
+broker.set_ts_name(ts_name = "paper")
+
+#Decided at 0.052 (the level that fills 3 at t=0), on the book at t=1 only 1 unit is within the limit.
+order_id = broker.place_order(asset = ETH, amount = Decimal(3), order_type = "MKT")
+order = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == order_id).one()
+print("After the latency: ", order.status, order.filled, order.price, order.paid_fee)
+assert order.status == "open" and order.filled == 1 and order.price == Decimal("0.051") and order.broker_name == "simulated" and order.exchange_name == "replay"
+
+#The rest is filled by the next book, the fill tracker sees it like a real order.
+#Reading the status doesn't write anything, the fill is saved by the tracker.
+clock.now = 2
+assert broker.get_order_status(order_id = order_id, asset = ETH).filled == 3
+session.expire_all()
+order = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == order_id).one()
+assert order.status == "open" and order.filled == 1
+tracker = FillTracker(broker = broker, ts_name = "paper")
+tracker.poll(session = session)
+order = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == order_id).one()
+print("Next book: ", order.status, order.filled, order.price, order.paid_fee)
+assert order.status == "filled" and order.filled == 3
+assert abs(order.price - Decimal("0.155") / 3) < Decimal("1e-8")
+assert broker.get_balances()["ETH"] == 3
+
+
+#Other traders take half of every level.
+clock.now = 0
+broker = SimulatedBroker(source = BookReplay(books = books, name = "replay", clock = clock), latency = 0, fee = "0.002", participation = 0.5, sleep = clock.sleep)
+broker.set_session(session = session)
+broker.set_ts_name(ts_name = "paper")
+
+def alloc(asset, amount, price):
+    a = PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = Decimal(amount), base_currency_amount = Decimal(amount) * Decimal(price), ts_name = "A")
+    a.asset = asset
+    return a
+
+#The allocations returned have the simulated fill, fee included. Nothing is sent for ETH.
+results = broker.send_orders(allocs = [alloc(LTC, "-2", "0.009"), alloc(ETH, "0", "0.05")])
+print("Executed: ", [(a.ticker, a.amount, a.base_currency_amount, order_id) for a, order_id in results])
+assert results[0][0].amount == -2 and results[0][0].base_currency_amount == -(Decimal("0.018") - Decimal("0.000036"))
+assert results[1][1] == -1
+
+#Only 5 of the 10 ETH on the book at t=2 are ours, the rest of the order waits.
+clock.now = 2
+order_id = broker.place_order(asset = ETH, amount = Decimal(20), order_type = "MKT")
+status = broker.get_order_status(order_id = order_id, asset = ETH)
+print("Half of the book: ", status)
+assert status.filled == 5 and status.is_open
+
+#Cancelled before the next tick: saved as cancelled with the partial fill.
+tracker = FillTracker(broker = broker, ts_name = "paper")
+tracker.settle(session = session)
+order = session.query(ExecutedOrder).filter(ExecutedOrder.order_id == order_id).one()
+assert order.status == "cancelled" and order.filled == 5
+
+session.close()
@@ -0,0 +1,72 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from sqlalchemy import create_engine, inspect
+
+from alchemist_lib import database
+
+from alchemist_lib.database import migrations
+from alchemist_lib.database.asset_dictionary import AssetDictionary, asset_ids
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ohlcv import Ohlcv
+
+from alchemist_lib.values import Candle
+
+
+
+def candle(ticker, i):
+    return Candle(ticker = ticker, instrument_id = 1, timeframe_id = "1H", ohlcv_datetime = dt.datetime(2018, 1, 1) + dt.timedelta(hours = i),
+                  open = Decimal(1), high = Decimal(1), low = Decimal(1), close = Decimal(1), volume = Decimal(1)).to_ohlcv()
+
+
+#The migration adds table, column and ids to a database created before the dictionary, twice without harm.
+engine = create_engine("sqlite://")
+engine.execute("CREATE TABLE asset (ticker VARCHAR(16), instrument_id INTEGER, name VARCHAR(150), PRIMARY KEY (ticker, instrument_id))")
+engine.execute("CREATE TABLE ohlcv (ohlcv_id INTEGER PRIMARY KEY, ohlcv_datetime DATETIME, timeframe_id VARCHAR(4), ticker VARCHAR(16), instrument_id INTEGER, open FLOAT, high FLOAT, low FLOAT, close FLOAT, volume FLOAT)")
+engine.execute("INSERT INTO asset VALUES ('ETH', 1, NULL), ('LTC', 1, NULL)")
+engine.execute("INSERT INTO ohlcv (ohlcv_datetime, timeframe_id, ticker, instrument_id) VALUES ('2018-01-01 00:00:00', '1H', 'ETH', 1), ('2018-01-01 00:00:00', '1H', 'LTC', 1)")
+with engine.begin() as connection:
+    migrations._asset_dictionary(connection)
+    migrations._asset_dictionary(connection)
+ids = dict([(row[1], row[0]) for row in engine.execute("SELECT asset_id, ticker FROM asset_dictionary")])
+candles = engine.execute("SELECT ticker, asset_id FROM ohlcv").fetchall()
+print("Dictionary after the migration: ", ids, "Candles: ", candles)
+assert len(ids) == 2 and all([asset_id == ids[ticker] for ticker, asset_id in candles])
+assert "ix_ohlcv_asset_id" in [index["name"] for index in inspect(engine).get_indexes("ohlcv")]
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+eth = Asset(ticker = "ETH", instrument_id = 1)
+ltc = Asset(ticker = "LTC", instrument_id = 1)
+session.add_all([eth, ltc])
+session.commit()
+
+#Saved candles get the id of their asset, the dictionary grows with the first candle of every asset.
+session.add_all([candle(ticker = "ETH", i = i) for i in range(3)] + [candle(ticker = "LTC", i = 0)])
+session.commit()
+rows = session.query(Ohlcv.ticker, Ohlcv.asset_id).distinct().all()
+print("Candles: ", rows)
+assert len(set([asset_id for ticker, asset_id in rows])) == 2 and all([asset_id != None for ticker, asset_id in rows])
+assert session.query(AssetDictionary).count() == 2
+
+#Both directions come from the cache, the database is not read again.
+ids = asset_ids.get_ids(session = session, assets = [eth, ltc, ("XMR", 1)], create = False)
+assert ("XMR", 1) not in ids and asset_ids.get_key(session = session, asset_id = ids[eth.key]) is eth.key
+session.query(AssetDictionary).delete()
+assert asset_ids.get_id(session = session, ticker = "LTC", instrument_id = 1) == ids[ltc.key]
+
+#New assets get a new id.
+xmr_id = asset_ids.get_id(session = session, ticker = "XMR", instrument_id = 1)
+assert xmr_id not in ids.values() and asset_ids.get_key(session = session, asset_id = xmr_id) == ("XMR", 1)
+
+session.close()
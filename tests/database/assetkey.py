@@ -0,0 +1,48 @@
+import pandas as pd
+
+from alchemist_lib import database
+
+from alchemist_lib.database.asset import Asset, asset_key
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+
+from alchemist_lib import utils
+
+
+
+#Equal assets have the same key object and the same hash, whatever their name.
+eth = Asset(ticker = "ETH", instrument_id = 1)
+named_eth = Asset(ticker = "ETH", instrument_id = 1, name = "Ethereum")
+assert eth == named_eth and hash(eth) == hash(named_eth)
+assert eth.key is named_eth.key and eth.key is asset_key(ticker = "ETH", instrument_id = 1)
+assert utils.entity_key(eth) is eth.key
+
+#A new ticker means a new key.
+ltc = Asset(ticker = "ETH", instrument_id = 1)
+hash(ltc)
+ltc.ticker = "LTC"
+assert ltc.key == ("LTC", 1) and ltc != eth and ltc > eth and hash(ltc) == hash(("LTC", 1))
+
+#Assets loaded from the database have the same key of the ones built by hand, also once expired.
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.add_all([Asset(ticker = "ETH", instrument_id = 1, name = "Ethereum"), Asset(ticker = "LTC", instrument_id = 1)])
+session.commit()
+
+loaded = session.query(Asset).order_by(Asset.ticker).all()
+assert loaded[0].key is eth.key
+session.expire_all()
+assert loaded[0] == eth and hash(loaded[0]) == hash(eth)
+
+#Assets as the index of a dataframe.
+df = pd.DataFrame(data = {"asset" : loaded, "last_price" : [0.05, 0.01]}).set_index("asset")
+print("Prices: ", df.loc[eth, "last_price"], df.loc[ltc, "last_price"])
+assert df.loc[eth, "last_price"] == 0.05 and df.loc[ltc, "last_price"] == 0.01
+
+session.close()
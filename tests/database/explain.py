@@ -0,0 +1,83 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from sqlalchemy import desc
+
+from alchemist_lib import database
+
+from alchemist_lib.database import Session
+from alchemist_lib.database import migrations
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.ohlcv import Ohlcv
+
+
+
+#Regression test on the query plans of the hottest ohlcv queries.
+#It runs on the database set by ALCHEMIST_DATABASE_URI (MySQL or SQLite), in-memory SQLite by default.
+
+def explain(session, query):
+    statement = query.statement.compile(dialect = session.bind.dialect)
+    params = tuple([statement.params[name] for name in statement.positiontup])
+    cursor = session.connection().connection.cursor()
+
+    if session.bind.dialect.name == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + str(statement), params)
+        return [row[-1] for row in cursor.fetchall()]
+
+    cursor.execute("EXPLAIN " + str(statement), params)
+    columns = [column[0] for column in cursor.description]
+    return ["key={} Extra={}".format(row[columns.index("key")], row[columns.index("Extra")]) for row in cursor.fetchall()]
+
+
+if database._uri == None and not database.os.environ.get(database.URI_ENV_VAR):
+    database.configure(uri = "sqlite://")
+database.create_all()
+print("Migrations applied: ", migrations.upgrade())
+print("Schema version: ", migrations.current_version())
+
+session = Session()
+
+instrument = Instrument(instrument_type = "cryptocurrency")
+session.add(instrument)
+session.commit()
+
+for ticker in ["ETH", "LTC", "XMR"]:
+    session.add(Asset(ticker = ticker, instrument_id = instrument.instrument_id))
+session.commit()
+
+for ticker in ["ETH", "LTC", "XMR"]:
+    for i in range(200):
+        candle = Ohlcv()
+        candle.ohlcv_datetime = dt.datetime(2018, 1, 1) + dt.timedelta(minutes = 15 * i)
+        candle.timeframe_id = "15M"
+        candle.open = candle.high = candle.low = candle.close = Decimal("0.01")
+        candle.volume = Decimal(1)
+        candle.ticker = ticker
+        candle.instrument_id = instrument.instrument_id
+        session.add(candle)
+session.commit()
+
+if session.bind.dialect.name == "sqlite":
+    session.execute("ANALYZE")
+
+eth = session.query(Asset).filter(Asset.ticker == "ETH").one()
+
+#Factor.history()
+history = session.query(Ohlcv).filter(Ohlcv.asset == eth,
+                                      Ohlcv.timeframe_id == "15M").order_by(desc(Ohlcv.ohlcv_datetime)).limit(30)
+plan = explain(session = session, query = history)
+print("History plan: ", plan)
+assert any("ix_ohlcv_recent_window" in step or "uq_ohlcv_asset_timeframe_datetime" in step for step in plan), "The recent-window read doesn't use an asset-led index."
+assert not any("TEMP B-TREE" in step or "filesort" in step for step in plan), "The recent-window read sorts the candles instead of scanning the index."
+
+#datafeed.check_ohlcv_data()
+check = session.query(Ohlcv).filter(Ohlcv.ohlcv_datetime == dt.datetime(2018, 1, 2),
+                                    Ohlcv.asset == eth,
+                                    Ohlcv.timeframe_id == "15M")
+plan = explain(session = session, query = check)
+print("Check plan: ", plan)
+assert any("ix_ohlcv_recent_window" in step or "uq_ohlcv_asset_timeframe_datetime" in step for step in plan), "The candle lookup doesn't use an asset-led index."
+
+session.close()
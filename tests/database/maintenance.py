@@ -0,0 +1,83 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from alchemist_lib import database
+from alchemist_lib import maintenance
+
+from alchemist_lib.database import Session
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.ohlcv import Ohlcv
+from alchemist_lib.database.ohlcv_watermark import OhlcvWatermark
+
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+
+session = Session()
+
+instrument = Instrument(instrument_type = "cryptocurrency")
+session.add(instrument)
+session.commit()
+
+eth = Asset(ticker = "ETH", instrument_id = instrument.instrument_id, name = "Ethereum")
+session.add(eth)
+session.commit()
+
+#Three days of 15M candles.
+start = dt.datetime(2018, 1, 1)
+for i in range(3 * 24 * 4):
+    candle = Ohlcv()
+    candle.ohlcv_datetime = start + dt.timedelta(minutes = 15 * i)
+    candle.timeframe_id = "15M"
+    candle.open = Decimal(i)
+    candle.high = Decimal(i + 2)
+    candle.low = Decimal(i - 1)
+    candle.close = Decimal(i + 1)
+    candle.volume = Decimal(10)
+    candle.ticker = eth.ticker
+    candle.instrument_id = eth.instrument_id
+    session.add(candle)
+session.commit()
+
+#All of them were downloaded, an older 5M download is expired too.
+session.add(OhlcvWatermark(ticker = eth.ticker, instrument_id = eth.instrument_id, timeframe_id = "15M", first_datetime = start, last_datetime = start + dt.timedelta(days = 3, minutes = -15)))
+session.add(OhlcvWatermark(ticker = eth.ticker, instrument_id = eth.instrument_id, timeframe_id = "5M", first_datetime = start, last_datetime = start + dt.timedelta(hours = 1)))
+session.commit()
+
+#Keep one day of 15M candles, roll them up into 1H candles.
+now = dt.datetime(2018, 1, 4)
+report = maintenance.run(session = session, now = now, retention = {"15M" : 1}, rollups = {"15M" : "1H"})
+print("Report: ", report)
+
+assert report["15M"] == {"rolled_up" : 48, "deleted" : 192}
+assert session.query(Ohlcv).filter(Ohlcv.timeframe_id == "15M").count() == 96
+
+#The objects of the caller are still in its session.
+assert eth in session
+
+#The purged candles are not downloaded anymore.
+watermark = session.query(OhlcvWatermark).filter(OhlcvWatermark.timeframe_id == "15M").one()
+print("Watermark after the purge: ", watermark.first_datetime, watermark.last_datetime)
+assert watermark.first_datetime == dt.datetime(2018, 1, 3) and watermark.last_datetime == start + dt.timedelta(days = 3, minutes = -15)
+
+maintenance.purge(session = session, timeframe = "5M", before = now)
+assert session.query(OhlcvWatermark).filter(OhlcvWatermark.timeframe_id == "5M").count() == 0
+
+first = session.query(Ohlcv).filter(Ohlcv.timeframe_id == "1H").order_by(Ohlcv.ohlcv_datetime).first()
+print("First 1H candle: ", first)
+assert first.ohlcv_datetime == start
+assert first.open == 0 and first.high == 5 and first.low == -1 and first.close == 4 and first.volume == 40
+
+#A second run finds nothing to do.
+report = maintenance.run(session = session, now = now, retention = {"15M" : 1}, rollups = {"15M" : "1H"})
+print("Report: ", report)
+assert report["15M"] == {"rolled_up" : 0, "deleted" : 0}
+
+print("Default retention: ", maintenance.get_retention())
+print("Default rollup: ", maintenance.get_rollup())
+
+session.close()
+Session.remove()
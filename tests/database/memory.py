@@ -0,0 +1,67 @@
+import datetime as dt
+
+import os
+
+import tempfile
+
+from decimal import Decimal
+
+from alchemist_lib import database
+
+from alchemist_lib.database import Session
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.ohlcv import Ohlcv
+
+
+
+#Nothing must be opened before the first session is requested.
+database.configure(uri = "sqlite://")
+assert database._engine == None, "The engine must be created lazily."
+
+database.create_all()
+
+session = Session()
+
+instrument = Instrument(instrument_type = "cryptocurrency")
+session.add(instrument)
+session.commit()
+
+eth = Asset(ticker = "ETH", instrument_id = instrument.instrument_id, name = "Ethereum")
+session.add(eth)
+session.commit()
+
+candle = Ohlcv()
+candle.ohlcv_datetime = dt.datetime(2018, 2, 1)
+candle.timeframe_id = "1D"
+candle.open = Decimal("0.1")
+candle.high = Decimal("0.12")
+candle.low = Decimal("0.09")
+candle.close = Decimal("0.11")
+candle.volume = Decimal("1000")
+candle.ticker = eth.ticker
+candle.instrument_id = eth.instrument_id
+session.add(candle)
+session.commit()
+
+print("All assets: ", session.query(Asset).all())
+print("All ohlcv: ", session.query(Ohlcv).all())
+
+#Other threads share the same in-memory database.
+session.close()
+Session.remove()
+
+assert len(Session().query(Ohlcv).all()) == 1, "The in-memory database must be shared between sessions."
+
+Session.remove()
+
+#A file database, in a temporary file deleted at the end.
+handle, path = tempfile.mkstemp(suffix = ".db")
+os.close(handle)
+try:
+    database.configure(uri = "sqlite:///{}".format(path))
+    database.create_all()
+    print("Tables on sqlite file: ", database.get_engine().table_names())
+    database.configure(uri = None)
+finally:
+    os.remove(path)
@@ -0,0 +1,87 @@
+import datetime as dt
+
+import gc
+
+import time
+
+from decimal import Decimal
+
+from alchemist_lib import database
+from alchemist_lib import utils
+
+from alchemist_lib.factor import Factor
+
+from alchemist_lib.database import Session
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ohlcv import Ohlcv
+
+
+
+TICKS = 10000
+WINDOW = 24
+
+database.configure(uri = "sqlite://")
+database.create_all()
+
+#A single session for the whole run, like a strategy that keeps the scoped session for weeks.
+session = Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.add(Timeframe(timeframe_id = "1H", description = "1 hour"))
+universe = [Asset(ticker = ticker, instrument_id = 1) for ticker in ["ETH", "LTC", "XMR", "ZEC"]]
+session.add_all(universe)
+
+#Two candles more than needed, in case the hour changes during the run.
+last = utils.get_last_date_checkpoint(timeframe = "1H")
+for asset in universe:
+    for i in range(-2, WINDOW * 2):
+        price = Decimal("0.01") + Decimal(i) / 10000
+        candle = Ohlcv()
+        candle.ticker, candle.instrument_id, candle.timeframe_id = asset.ticker, 1, "1H"
+        candle.ohlcv_datetime = last - dt.timedelta(hours = i)
+        candle.open = candle.high = candle.low = candle.close = price
+        candle.volume = Decimal(100)
+        session.add(candle)
+session.commit()
+del candle
+
+factor = Factor(session = session)
+
+def tick():
+    prices = factor.history(universe = universe, field = "close", timeframe = "1H", window_length = WINDOW)
+    assert len(prices) == len(universe) * WINDOW
+
+start = time.time()
+for i in range(TICKS // 10):
+    tick()
+gc.collect()
+warm = database.memory_report(session = session)
+
+for i in range(TICKS - TICKS // 10):
+    tick()
+gc.collect()
+report = database.memory_report(session = session)
+
+print("{} ticks in {:.0f} seconds.".format(TICKS, time.time() - start))
+print("After warm-up: ", warm)
+print("At the end: ", report)
+
+#The candles read don't stay in the session, the memory doesn't grow with the ticks.
+assert report["objects"] == warm["objects"] and report["objects"].get("Ohlcv", 0) == 0
+assert report["identity_map"] == warm["identity_map"]
+if report["rss"] != None:
+    assert report["rss"] - warm["rss"] < 8 * 1024 * 1024, "RSS grew by {} bytes.".format(report["rss"] - warm["rss"])
+
+#Objects beyond the limit are expunged, the ones with changes are kept.
+universe[0].name = "Ethereum"
+loaded = len(session.identity_map)
+assert database.trim_session(session = session, max_objects = 2) == loaded - 1
+assert list(session.identity_map.values()) == [universe[0]]
+session.commit()
+
+session.close()
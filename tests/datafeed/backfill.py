@@ -0,0 +1,107 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from alchemist_lib import database
+
+from alchemist_lib.database import Session
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.ohlcv import Ohlcv
+
+from alchemist_lib.datafeed import backfill
+from alchemist_lib.datafeed.ohlcv import OhlcvBaseClass
+
+
+
+START = dt.datetime(2018, 1, 1)
+NOW = START + dt.timedelta(hours = 48, minutes = 10)
+
+
+class CountingDataFeed(OhlcvBaseClass):
+
+    #A data source with 1H candles that remembers the requests.
+    available_timeframe = {"1H" : "hour"}
+    page_size = 10
+    max_gap = 2
+
+    def __init__(self, session):
+        OhlcvBaseClass.__init__(self, session = session)
+        self.requests = []
+
+    def get_last_price(self, assets):
+        pass
+
+    def get_ohlcv(self, assets, start_date, timeframe, end_date = dt.datetime.utcnow()):
+        self.requests.append((start_date, end_date))
+        candles = []
+        for asset in assets:
+            for i in range(49):
+                date = START + dt.timedelta(hours = i)
+                if date > start_date and date < end_date:
+                    candle = Ohlcv()
+                    candle.ohlcv_datetime = date
+                    candle.timeframe_id = "1H"
+                    candle.open = candle.high = candle.low = candle.close = Decimal(i)
+                    candle.volume = Decimal(1)
+                    candle.ticker = asset.ticker
+                    candle.instrument_id = asset.instrument_id
+                    candles.append(candle)
+        return candles
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+
+session = Session()
+
+instrument = Instrument(instrument_type = "cryptocurrency")
+session.add(instrument)
+session.commit()
+
+eth = Asset(ticker = "ETH", instrument_id = instrument.instrument_id, name = "Ethereum")
+session.add(eth)
+session.commit()
+
+ranges = [(START, START), (START + dt.timedelta(hours = 2), START + dt.timedelta(hours = 3)), (START + dt.timedelta(hours = 10), START + dt.timedelta(hours = 10))]
+print("Merged ranges: ", backfill.merge_ranges(ranges = ranges, timeframe = "1H", max_gap = 1))
+assert backfill.merge_ranges(ranges = ranges, timeframe = "1H", max_gap = 1) == [(START, START + dt.timedelta(hours = 3)), ranges[2]]
+assert backfill.merge_ranges(ranges = ranges, timeframe = "1H", max_gap = None) == [(START, START + dt.timedelta(hours = 10))]
+assert len(backfill.paginate(ranges = [(START, START + dt.timedelta(hours = 24))], timeframe = "1H", page_size = 10)) == 3
+
+feed = CountingDataFeed(session = session)
+
+#Nothing saved: 49 candles in pages of 10.
+feed.save_ohlcv(assets = eth, start_date = START, timeframe = "1H", end_date = NOW)
+print("Requests: ", feed.requests)
+assert len(feed.requests) == 5
+assert session.query(Ohlcv).count() == 49
+
+watermark = backfill.get_watermark(session = session, asset = eth, timeframe = "1H")
+print("Watermark: ", watermark)
+#The last candle is still open at NOW.
+assert watermark.first_datetime == START and watermark.last_datetime == START + dt.timedelta(hours = 47)
+
+#Everything is saved: no requests.
+feed.requests = []
+feed.save_ohlcv(assets = eth, start_date = START, timeframe = "1H", end_date = NOW)
+assert feed.requests == []
+
+#Two holes close to each other and one far away: two requests.
+for hour in [5, 7, 30]:
+    session.query(Ohlcv).filter(Ohlcv.ohlcv_datetime == START + dt.timedelta(hours = hour)).delete()
+session.commit()
+session.query(backfill.OhlcvWatermark).delete()
+session.commit()
+
+requests = backfill.plan(session = session, assets = eth, timeframe = "1H", start_date = START, end_date = NOW, max_gap = 2)
+print("Plan: ", requests)
+assert [(r.start_date.hour, r.end_date.hour) for r in requests] == [(5, 7), (6, 6)]
+
+feed.requests = []
+feed.save_ohlcv(assets = eth, start_date = START, timeframe = "1H", end_date = NOW)
+assert len(feed.requests) == 2
+assert session.query(Ohlcv).count() == 49
+
+session.close()
+Session.remove()
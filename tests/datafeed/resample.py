@@ -0,0 +1,104 @@
+import datetime as dt
+
+from decimal import Decimal
+
+from alchemist_lib import database
+
+from alchemist_lib.database import Session
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.ohlcv import Ohlcv
+
+from alchemist_lib.datafeed import resample
+from alchemist_lib.datafeed.ohlcv import OhlcvBaseClass
+
+
+
+def make_candle(date, timeframe, price, asset):
+    candle = Ohlcv()
+    candle.ohlcv_datetime = date
+    candle.timeframe_id = timeframe
+    candle.open = Decimal(price)
+    candle.high = Decimal(price + 2)
+    candle.low = Decimal(price - 1)
+    candle.close = Decimal(price + 1)
+    candle.volume = Decimal(10)
+    candle.ticker = asset.ticker
+    candle.instrument_id = asset.instrument_id
+    return candle
+
+
+class OneHourDataFeed(OhlcvBaseClass):
+
+    #A data source that offers only 1H candles.
+    available_timeframe = {"1H" : "hour"}
+
+    def get_last_price(self, assets):
+        pass
+
+    def get_ohlcv(self, assets, start_date, timeframe, end_date = dt.datetime.utcnow()):
+        assert timeframe == "1H"
+        start = dt.datetime(2018, 1, 1)
+        candles = []
+        for asset in assets:
+            for i in range(24):
+                date = start + dt.timedelta(hours = i)
+                if date > start_date and date < end_date:
+                    candles.append(make_candle(date = date, timeframe = "1H", price = i, asset = asset))
+        return candles
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+
+session = Session()
+
+instrument = Instrument(instrument_type = "cryptocurrency")
+session.add(instrument)
+session.commit()
+
+eth = Asset(ticker = "ETH", instrument_id = instrument.instrument_id, name = "Ethereum")
+ltc = Asset(ticker = "LTC", instrument_id = instrument.instrument_id, name = "Litecoin")
+session.add_all([eth, ltc])
+session.commit()
+
+print("Source of 4H on Bittrex: ", resample.source_timeframe(timeframe = "4H", native = ["1M", "5M", "30M", "1H", "1D"]))
+assert resample.source_timeframe(timeframe = "4H", native = ["1M", "5M", "30M", "1H", "1D"]) == "1H"
+assert resample.source_timeframe(timeframe = "1H", native = ["1H", "1D"]) == "1H"
+assert resample.source_timeframe(timeframe = "1H", native = ["1D"]) == None
+
+#Two hours and a quarter of 15M candles already saved.
+start = dt.datetime(2018, 1, 1)
+for i in range(9):
+    session.add(make_candle(date = start + dt.timedelta(minutes = 15 * i), timeframe = "15M", price = i, asset = eth))
+session.commit()
+
+now = start + dt.timedelta(minutes = 15 * 8 + 5)
+derived = resample.derive_ohlcv(session = session, assets = eth, timeframe = "1H", start_date = start, now = now)
+print("1H candles derived: ", derived)
+
+assert len(derived) == 3
+assert derived[0].open == 0 and derived[0].high == 5 and derived[0].low == -1 and derived[0].close == 4 and derived[0].volume == 40
+#The candle still open is built with what is available.
+assert derived[2].ohlcv_datetime == start + dt.timedelta(hours = 2) and derived[2].volume == 10
+
+#The open candle is updated when a new finer candle arrives.
+session.add(make_candle(date = start + dt.timedelta(minutes = 15 * 9), timeframe = "15M", price = 9, asset = eth))
+session.commit()
+derived = resample.derive_ohlcv(session = session, assets = eth, timeframe = "1H", start_date = start, now = now + dt.timedelta(minutes = 15))
+print("1H candles updated: ", derived)
+assert len(derived) == 1 and derived[0].volume == 20 and derived[0].close == 10
+assert session.query(Ohlcv).filter(Ohlcv.timeframe_id == "1H").count() == 3
+
+#4H candles on a data source that offers only 1H candles.
+feed = OneHourDataFeed(session = session)
+feed.save_ohlcv(assets = [ltc], start_date = start + dt.timedelta(hours = 1), timeframe = "4H", end_date = start + dt.timedelta(hours = 24))
+four_hours = session.query(Ohlcv).filter(Ohlcv.ticker == "LTC", Ohlcv.timeframe_id == "4H").order_by(Ohlcv.ohlcv_datetime).all()
+print("4H candles: ", four_hours)
+
+assert len(four_hours) == 6
+assert four_hours[0].open == 0 and four_hours[0].close == 4 and four_hours[0].volume == 40
+assert session.query(Ohlcv).filter(Ohlcv.ticker == "LTC", Ohlcv.timeframe_id == "1H").count() == 24
+
+session.close()
+Session.remove()
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from sqlalchemy import create_engine, inspect
+
+from alchemist_lib import database
+from alchemist_lib import resilience
+
+from alchemist_lib.exchange.markets import MarketStore, MarketInfo
+from alchemist_lib.portfolio.longsonly import LongsOnlyPortfolio
+
+from alchemist_lib.database import migrations
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.market import Market
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+
+
+class FakeExchange():
+
+    """
+    Returns the markets set by the test and counts the downloads. If down is True the exchange can't be reached.
+    """
+
+    def __init__(self, markets):
+        self.markets = markets
+        self.calls = 0
+        self.down = False
+
+    def get_markets(self):
+        self.calls += 1
+        if self.down:
+            raise resilience.ExchangeUnavailable("fake is down.")
+        return self.markets
+
+
+class Clock():
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+#The migration creates the table on databases created before it.
+engine = create_engine("sqlite://")
+with engine.begin() as connection:
+    migrations._market_table(connection)
+    migrations._market_table(connection)
+assert "market" in inspect(engine).get_table_names()
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.add(Exchange(exchange_name = "fake"))
+session.commit()
+
+def market(ticker, min_size = "0", is_active = True):
+    return MarketInfo(exchange_name = "fake", ticker = ticker, min_size = Decimal(min_size), min_notional = Decimal("0.0005"),
+                      step_size = Decimal("0.001"), price_tick = Decimal("0.00000001"), is_active = is_active)
+
+exchange = FakeExchange(markets = [market("ETH", min_size = "0.01"), market("LTC"), market("XMR", is_active = False)])
+clock = Clock()
+markets = MarketStore(exchange = exchange, exchange_name = "fake", ttl = 60, clock = clock)
+
+#One download for every ttl, not for every order.
+for i in range(10):
+    markets.get(ticker = "ETH")
+assert exchange.calls == 1
+clock.now = 61
+markets.get(ticker = "ETH")
+assert exchange.calls == 2
+
+#Rounded towards zero to the step size, 0 below the minimums or on inactive markets. Unknown markets are left to the exchange.
+print("Rounded: ", markets.round_amount(ticker = "ETH", amount = Decimal("1.23456"), price = Decimal("0.05")))
+assert markets.round_amount(ticker = "ETH", amount = Decimal("1.23456"), price = Decimal("0.05")) == Decimal("1.234")
+assert markets.round_amount(ticker = "ETH", amount = Decimal("-1.23456"), price = Decimal("0.05")) == Decimal("-1.234")
+assert markets.round_amount(ticker = "ETH", amount = Decimal("0.009"), price = Decimal("0.05")) == 0
+assert markets.round_amount(ticker = "LTC", amount = Decimal("0.04"), price = Decimal("0.01")) == 0
+assert markets.round_amount(ticker = "XMR", amount = Decimal(100), price = Decimal("0.02")) == 0
+assert markets.round_amount(ticker = "DOGE", amount = Decimal("12.3456789")) == Decimal("12.3456789")
+
+#Limit prices on the tick of the market, buys rounded up and sells down.
+assert markets.round_price(ticker = "ETH", price = Decimal("0.050000004"), amount = Decimal(1)) == Decimal("0.05000001")
+assert markets.round_price(ticker = "ETH", price = Decimal("0.050000004"), amount = Decimal(-1)) == Decimal("0.05000000")
+assert markets.round_price(ticker = "DOGE", price = Decimal("0.000000123"), amount = Decimal(1)) == Decimal("0.000000123")
+
+#The rules are saved, a new process finds them if the exchange is down.
+rows = session.query(Market).all()
+print("Saved: ", rows)
+assert len(rows) == 3
+
+exchange.down = True
+restarted = MarketStore(exchange = exchange, exchange_name = "fake", ttl = 60, clock = clock)
+assert restarted.get(ticker = "ETH").min_size == Decimal("0.01") and restarted.get(ticker = "XMR").is_active == False
+
+
+#rebalance() removes and rounds the orders before they reach the broker.
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+XMR = Asset(ticker = "XMR", instrument_id = 1)
+
+def alloc(asset, amount, price):
+    a = PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = Decimal(amount), base_currency_amount = Decimal(amount) * Decimal(price), ts_name = "A")
+    a.asset = asset
+    return a
+
+ptf = LongsOnlyPortfolio(capital = 1)
+orders = ptf.rebalance(curr_ptf = [alloc(ETH, "2", "0.05"), alloc(LTC, "1", "0.01")],
+                       target_ptf = [alloc(ETH, "3.00042", "0.05"), alloc(LTC, "1.02", "0.01"), alloc(XMR, "5", "0.02")],
+                       markets = markets)
+print("Orders: ", [(a.ticker, a.amount, a.base_currency_amount) for a in orders])
+assert [(a.ticker, a.amount) for a in orders] == [("ETH", Decimal("1.000"))]
+assert orders[0].base_currency_amount == Decimal("0.05")
+
+#Without the rules nothing changes.
+assert len(ptf.rebalance(curr_ptf = [], target_ptf = [alloc(XMR, "5", "0.02")])) == 1
+
+session.close()
@@ -0,0 +1,103 @@
+import threading
+
+import time
+
+from alchemist_lib.exchange.universe import UniverseService
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+
+
+
+class FakeLoader():
+
+    """
+    Returns the universe set by the test and counts the downloads. If gate is set the download waits for it.
+    """
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.calls = 0
+        self.gate = None
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate != None:
+            self.gate.wait()
+        if self.fail:
+            raise Exception("exchange down.")
+        return list(self.assets)
+
+
+class Clock():
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+XMR = Asset(ticker = "XMR", instrument_id = 1)
+
+#Without the background thread the universe is downloaded again by the first call after the period.
+loader = FakeLoader(assets = [ETH, LTC])
+clock = Clock()
+universe = UniverseService(exchange = None, exchange_name = "fake", period = 60, background = False, loader = loader, clock = clock)
+for i in range(1000):
+    assert universe.get() == [ETH, LTC]
+assert loader.calls == 1
+
+loader.assets = [ETH, XMR]
+clock.now = 61
+assert universe.get() == [ETH, XMR] and loader.calls == 2
+
+#A failed or empty download keeps the last universe.
+loader.fail = True
+clock.now = 122
+assert universe.get() == [ETH, XMR]
+loader.fail = False
+loader.assets = []
+clock.now = 183
+assert universe.get() == [ETH, XMR]
+
+#The callers can change the list they receive.
+assets = universe.get()
+assets.append(LTC)
+assert universe.get() == [ETH, XMR]
+
+start = time.perf_counter()
+for i in range(10000):
+    universe.get()
+print("get(): {:.2f} us".format((time.perf_counter() - start) / 10000 * 1e6))
+
+
+#With the background thread the readers never wait for a download: they get the old universe until the new one is swapped in.
+loader = FakeLoader(assets = [ETH, LTC])
+universe = UniverseService(exchange = None, exchange_name = "fake", period = 0.05, loader = loader)
+assert universe.get() == [ETH, LTC]
+
+loader.gate = threading.Event()
+loader.assets = [XMR]
+time.sleep(0.2)
+assert loader.calls >= 2
+
+start = time.perf_counter()
+assert universe.get() == [ETH, LTC]
+assert time.perf_counter() - start < 0.01
+
+loader.gate.set()
+deadline = time.time() + 5
+while universe.get() != [XMR] and time.time() < deadline:
+    time.sleep(0.01)
+assert universe.get() == [XMR]
+
+universe.stop()
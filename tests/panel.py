@@ -0,0 +1,87 @@
+import datetime as dt
+
+from decimal import Decimal
+
+import numpy as np
+
+from sqlalchemy import event
+
+from alchemist_lib import database
+from alchemist_lib import datafeed
+from alchemist_lib import utils
+
+from alchemist_lib.factor import Factor
+from alchemist_lib.values import Candle
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+
+
+
+#Nothing is downloaded, the missing candle stays missing.
+downloads = []
+datafeed.save_ohlcv = lambda session, assets, start_date, timeframe : downloads.append(sorted([asset.ticker for asset in assets]))
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+XMR = Asset(ticker = "XMR", instrument_id = 1)
+session.add_all([ETH, LTC, XMR])
+session.commit()
+
+#21 hourly candles up to the last closed one. LTC misses the one of 5 hours ago, XMR has none.
+last = utils.get_last_date_checkpoint(timeframe = "1H")
+for ticker, base in [("ETH", 100), ("LTC", 10)]:
+    for i in range(21):
+        if ticker == "LTC" and i == 5:
+            continue
+        price = Decimal(base + i)
+        session.add(Candle(ticker = ticker, instrument_id = 1, timeframe_id = "1H", ohlcv_datetime = last - dt.timedelta(hours = i),
+                           open = price, high = price + 1, low = price - 1, close = price, volume = Decimal(i + 1)).to_ohlcv())
+session.commit()
+
+fct = Factor(session = session)
+panel = fct.panel(universe = [ETH, LTC, XMR, ETH], fields = ["close", "volume"], timeframe = "1h", window_length = 21)
+print("Panel: ", panel, "Downloads: ", downloads)
+assert panel.values.shape == (21, 3, 2) and panel.datetimes[-1] == last and downloads == [["LTC", "XMR"]]
+
+closes = panel.field(name = "close")
+assert closes[-1, 0] == 100 and closes[0, 0] == 120 and closes[-1, 1] == 10
+assert np.isnan(closes[-6, 1]) and np.isnan(closes[:, 2]).all()
+assert panel.asset_ids[2] == -1 and panel.asset_ids[0] != panel.asset_ids[1]
+
+#The same frame of history(), read from the database.
+prices = panel.history(field = "close")
+fct_db = Factor(session = session)
+db_prices = fct_db.history(universe = [ETH, LTC], field = "close", timeframe = "1H", window_length = 21)
+assert len(prices) == len(db_prices) == 41
+#The objects of the caller stay in its session.
+assert ETH in session and LTC in session and XMR in session
+assert list(db_prices["close"]) == list(prices["close"]) and isinstance(prices["close"].iloc[0], Decimal)
+
+#Later requests covered by the panel don't touch the database.
+statements = []
+event.listen(database.get_engine(), "before_cursor_execute", lambda *args : statements.append(args[2]))
+vol = fct.history(universe = np.array([LTC, ETH]), field = "volume", timeframe = "1H", window_length = 1)
+window = fct.history(universe = [ETH], field = "close", timeframe = "1H", window_length = 10)
+print("Last volume: ", vol.to_dict(), "Statements: ", len(statements))
+assert statements == [] and vol.loc[ETH, "volume"] == 1 and vol.loc[LTC, "volume"] == 1 and len(window) == 10
+
+#A field not loaded goes to the database.
+fct.history(universe = [ETH], field = "high", timeframe = "1H", window_length = 1)
+assert len(statements) > 0
+
+#So does a window with a missing candle: the last 10 candles of LTC go back 11 hours.
+statements.clear()
+gap = fct.history(universe = [LTC], field = "close", timeframe = "1H", window_length = 10)
+assert len(statements) > 0 and len(gap) == 10 and gap.index[-1][1] == last - dt.timedelta(hours = 10)
+
+session.close()
@@ -0,0 +1,109 @@
+import datetime as dt
+
+import numpy as np
+
+import pandas as pd
+
+from alchemist_lib.panel import Panel
+from alchemist_lib.pipeline import Pipeline, Node, Field, ExponentialMovingAverage, SimpleMovingAverage, Momentum, RateOfChange, AverageTrueRange, TrueRange, LinearRegression
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+
+
+
+class Counted(Node):
+
+    """
+    Passes its input through and counts how many times it's computed.
+    """
+
+    calls = 0
+
+    def __init__(self, input):
+        Node.__init__(self, inputs = (input, ))
+
+    def compute(self, panel, values):
+        Counted.calls += 1
+        return values
+
+
+#A node must implement compute().
+try:
+    Node()
+    assert False, "Node is abstract."
+except TypeError:
+    pass
+
+#30 hourly steps of 3 assets, the second one misses a candle.
+steps, assets = 30, [Asset(ticker = ticker, instrument_id = 1) for ticker in ["ETH", "LTC", "XMR"]]
+rng = np.random.RandomState(7)
+close = 10 + np.cumsum(rng.randn(steps, len(assets)), axis = 0)
+values = np.stack([close - 0.2, close + 0.5, close - 0.5, close, rng.rand(steps, len(assets)) * 100], axis = 2)
+values[12, 1, :] = np.nan
+datetimes = [dt.datetime(2018, 1, 1) + dt.timedelta(hours = i) for i in range(steps)]
+panel = Panel(values = values, datetimes = datetimes, assets = assets, fields = ["open", "high", "low", "close", "volume"], timeframe = "1H")
+
+#The same EMA built twice, and an ATR whose EMA of the true range is also asked directly: computed once each.
+Counted.calls = 0
+pipeline = Pipeline(columns = {"ema10" : ExponentialMovingAverage(input = Counted(input = Field(name = "close")), window_length = 10),
+                               "ema10_again" : ExponentialMovingAverage(input = Counted(input = Field(name = "close")), window_length = 10),
+                               "ema21" : ExponentialMovingAverage(input = Field(name = "close"), window_length = 21),
+                               "atr" : AverageTrueRange(window_length = 14),
+                               "ema_tr" : ExponentialMovingAverage(input = TrueRange(), window_length = 14),
+                               "cross" : ExponentialMovingAverage(input = Field(name = "close"), window_length = 10) > ExponentialMovingAverage(input = Field(name = "close"), window_length = 21)})
+df = pipeline.evaluate(panel = panel)
+print(df)
+print("Nodes computed: ", pipeline.computed, "Window: ", pipeline.window_length, "Fields: ", pipeline.fields)
+#close, counted, ema10 of counted, ema10 and ema21 of close, high, low, tr, ema_tr, atr, cross
+assert Counted.calls == 1 and pipeline.computed == 11
+assert pipeline.window_length == 21 and pipeline.fields == ["high", "low", "close"]
+assert list(df.index) == assets and (df["ema10"] == df["ema10_again"]).all() and (df["atr"] == df["ema_tr"]).all()
+assert list(df["cross"]) == [float(a > b) for a, b in zip(df["ema10"], df["ema21"])]
+
+#Same numbers of the per-asset computations.
+for i, asset in enumerate(assets):
+    serie = pd.Series(close[:, i])
+    serie[12] = np.nan if i == 1 else serie[12]
+    assert np.isclose(df.loc[asset, "ema10"], serie.ewm(span = 10, min_periods = 9).mean().iloc[-1])
+    assert np.isclose(df.loc[asset, "ema21"], serie.ewm(span = 21, min_periods = 20).mean().iloc[-1])
+
+#Only what the columns need is computed, in parallel or not the result is the same.
+other = Pipeline(columns = {"sma" : SimpleMovingAverage(input = Field(name = "close"), window_length = 5),
+                            "mom" : Momentum(input = Field(name = "close"), delta = 3),
+                            "roc" : RateOfChange(input = Field(name = "close"), window_length = 4),
+                            "slope" : LinearRegression(input = Field(name = "close"), window_length = 8)}, max_workers = 1)
+sequential = other.evaluate(panel = panel)
+other.max_workers = 4
+parallel = other.evaluate(panel = panel)
+assert other.computed == 5 and sequential.equals(parallel)
+assert np.allclose(sequential["sma"], close[-5:].mean(axis = 0))
+assert np.allclose(sequential["mom"], close[-1] - close[-4])
+assert np.allclose(sequential["roc"], (close[-1] - close[-4]) / close[-4])
+assert np.allclose(sequential["slope"], [np.polyfit(np.arange(8), close[-8:, i], 1)[0] for i in range(len(assets))])
+
+#Whole columns on request, with shape (time, asset).
+arrays = other.evaluate(panel = panel, latest = False)
+assert arrays["sma"].shape == (steps, len(assets)) and np.isnan(arrays["sma"][:4]).all()
+
+
+class FakeFactor():
+
+    """
+    Returns the panel of the test, with the arguments it was asked.
+    """
+
+    def panel(self, universe, fields, timeframe, window_length):
+        self.asked = (fields, timeframe, window_length)
+        return panel.slice(assets = universe, fields = fields, window_length = window_length)
+
+
+factor = FakeFactor()
+df = pipeline.run(factor = factor, universe = assets[:2], timeframe = "1H", window_length = 25)
+print("Asked: ", factor.asked)
+assert factor.asked == (["high", "low", "close"], "1H", 25) and list(df.index) == assets[:2]
@@ -0,0 +1,62 @@
+from sqlalchemy import event
+
+from alchemist_lib import database
+
+from alchemist_lib.populate.saver import Saver
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.broker import Broker
+
+
+
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.add_all([Exchange(exchange_name = "poloniex"), Exchange(exchange_name = "bittrex")])
+session.commit()
+
+statements = []
+commits = []
+event.listen(database.get_engine(), "before_cursor_execute", lambda conn, cursor, statement, parameters, context, executemany : statements.append(statement))
+event.listen(database.get_engine(), "commit", lambda conn : commits.append(1))
+
+saver = Saver(session = session)
+
+def listed(names):
+    return [Asset(ticker = ticker, instrument_id = 1, name = None) for ticker in names]
+
+def tickers(exchange_name):
+    return sorted([a.ticker for a in session.query(Asset).join(Exchange, Asset.exchanges).filter(Exchange.exchange_name == exchange_name).all()])
+
+#Hundreds of new assets: a handful of statements and one commit, not a few for every asset.
+names = ["A{}".format(i) for i in range(300)] + ["BTC"]
+added, removed = saver.sync_assets(assets = listed(names), exchange_name = "poloniex")
+print("First sync: {} added, {} statements, {} commits.".format(len(added), len(statements), len(commits)))
+assert len(added) == 301 and removed == [] and len(statements) <= 5 and len(commits) == 1
+assert len(tickers("poloniex")) == 301
+
+#BTC is on both exchanges, the asset is saved once.
+saver.sync_assets(assets = listed(["A0", "A1", "BTC"]), exchange_name = "bittrex")
+assert session.query(Asset).count() == 301
+
+#Delisted from poloniex: A0 and BTC stay because bittrex still lists them, A299 is deleted.
+del statements[:]
+added, removed = saver.sync_assets(assets = listed(["A{}".format(i) for i in range(299)] + ["NEW"]), exchange_name = "poloniex")
+print("Second sync: added {}, removed {}, {} statements.".format(added, sorted(removed), len(statements)))
+assert added == [("NEW", 1)] and sorted(removed) == [("A299", 1), ("BTC", 1)]
+assert session.query(Asset).filter(Asset.ticker == "A299").count() == 0
+assert session.query(Asset).filter(Asset.ticker == "BTC").count() == 1
+assert tickers("bittrex") == ["A0", "A1", "BTC"]
+assert "BTC" not in tickers("poloniex") and "NEW" in tickers("poloniex")
+
+#Nothing changed, nothing written.
+del statements[:]
+saver.sync_assets(assets = listed(["A0", "A1", "BTC"]), exchange_name = "bittrex")
+assert len([s for s in statements if not s.strip().upper().startswith("SELECT")]) == 0
+
+session.close()
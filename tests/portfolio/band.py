@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from alchemist_lib import database
+
+from alchemist_lib.broker.broker import BrokerBaseClass
+from alchemist_lib.portfolio.longsonly import LongsOnlyPortfolio
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+
+
+class FillingBroker(BrokerBaseClass):
+
+    """
+    Fills every order.
+    """
+
+    name = "fake"
+
+    def place_order(self, asset, amount, order_type):
+        return "1"
+
+    def get_order_books(self, tickers):
+        return {}
+
+    def get_order_status(self, order_id, asset):
+        pass
+
+    def cancel_order(self, order_id, asset):
+        pass
+
+    def get_traded_volume(self, asset, since):
+        return Decimal(0)
+
+    def get_balances(self):
+        return {}
+
+
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+XMR = Asset(ticker = "XMR", instrument_id = 1)
+ZEC = Asset(ticker = "ZEC", instrument_id = 1)
+
+def alloc(asset, amount, price):
+    a = PtfAllocation(ticker = asset.ticker, instrument_id = asset.instrument_id, amount = Decimal(amount), base_currency_amount = Decimal(amount) * Decimal(price), ts_name = "A")
+    a.asset = asset
+    return a
+
+curr_ptf = [alloc(ETH, "10", "0.05"), alloc(LTC, "20", "0.01"), alloc(XMR, "10", "0.02")]
+target_ptf = [alloc(ETH, "10.08", "0.05"), alloc(LTC, "30", "0.01"), alloc(ZEC, "0.01", "0.03")]
+
+#Without band every difference is an order.
+ptf = LongsOnlyPortfolio(capital = 1)
+assert len(ptf.rebalance(curr_ptf = curr_ptf, target_ptf = target_ptf)) == 4 and ptf.skipped == []
+
+#ETH moves by 0.8% of its position, ZEC is 0.03% of the capital: both inside the band. XMR is closed, so always traded.
+ptf = LongsOnlyPortfolio(capital = 1, band_position = "0.01", band_aum = "0.001")
+orders = ptf.rebalance(curr_ptf = curr_ptf, target_ptf = target_ptf)
+print("Orders: ", [(a.ticker, a.amount) for a in orders], "Skipped: ", [(a.ticker, a.amount) for a in ptf.skipped])
+assert [(a.ticker, a.amount) for a in orders] == [("LTC", Decimal(10)), ("XMR", Decimal(-10))]
+assert sorted([a.ticker for a in ptf.skipped]) == ["ETH", "ZEC"]
+
+#An absolute band of 0.005 BTC keeps the ETH adjustment (0.004) out too.
+ptf = LongsOnlyPortfolio(capital = 1, band_abs = "0.005")
+orders = ptf.rebalance(curr_ptf = curr_ptf, target_ptf = target_ptf)
+assert [a.ticker for a in orders] == ["LTC", "XMR"]
+
+
+#Positions without an order stay in the portfolio returned by execute().
+database.configure(uri = "sqlite://")
+database.create_all()
+session = database.Session()
+session.add(Instrument(instrument_type = "cryptocurrency"))
+session.commit()
+
+broker = FillingBroker()
+broker.set_session(session = session)
+new_ptf = broker.execute(allocs = orders, ts_name = "A", curr_ptf = curr_ptf)
+amounts = {a.ticker : a.amount for a in new_ptf}
+print("Portfolio after execute(): ", amounts)
+assert amounts["ETH"] == 10 and amounts["LTC"] == 30 and amounts["XMR"] == 0
+
+session.close()
@@ -0,0 +1,53 @@
+import multiprocessing
+
+import tempfile
+
+import time
+
+from alchemist_lib.ratelimit import TokenBucket
+
+
+
+STATE_DIR = tempfile.mkdtemp()
+RATE = 20
+BURST = 5
+CALLS = 20
+PROCESSES = 3
+
+
+def worker(state_dir):
+    bucket = TokenBucket(name = "test.public", rate = RATE, burst = BURST, state_dir = state_dir)
+    for i in range(CALLS):
+        bucket.acquire()
+
+
+if __name__ == "__main__":
+    bucket = TokenBucket(name = "test.public", rate = RATE, burst = BURST, state_dir = STATE_DIR)
+
+    #Once the burst is gone the caller waits.
+    assert bucket.acquire(tokens = BURST, timeout = 0) == True
+    assert bucket.acquire(timeout = 0) == False
+    time.sleep(1.0 / RATE)
+    assert bucket.acquire(timeout = 0.01) == True
+
+    #More tokens than the bucket can hold fail at once instead of waiting forever.
+    refused = False
+    try:
+        bucket.acquire(tokens = BURST + 1)
+    except AssertionError:
+        refused = True
+    assert refused
+
+    #Every process draws from the same bucket, so together they can't go faster than the rate.
+    time.sleep(float(BURST) / RATE)
+    start_time = time.time()
+    processes = [multiprocessing.Process(target = worker, args = (STATE_DIR, )) for i in range(PROCESSES)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    elapsed = time.time() - start_time
+
+    expected = float(CALLS * PROCESSES - BURST) / RATE
+    print("{} calls from {} processes in {:.2f} seconds. Expected at least {:.2f} seconds.".format(CALLS * PROCESSES, PROCESSES, elapsed, expected))
+    assert elapsed >= expected * 0.95
@@ -0,0 +1,129 @@
+import os
+
+import tempfile
+
+import time
+
+from decimal import Decimal
+
+os.environ["ALCHEMIST_RATELIMIT_DIR"] = tempfile.mkdtemp()
+
+from alchemist_lib import resilience
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.broker import Broker
+
+from alchemist_lib.datafeed.bittrexdatafeed import BittrexDataFeed
+
+
+
+class FakeTransport():
+
+    """
+    Plays a script of answers: an exception is raised, anything else is returned.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        answer = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+delays = []
+
+#Two failures, then an answer.
+transport = FakeTransport([IOError("timeout"), IOError("timeout"), {"ok" : True}])
+result = resilience.call(func = transport, exchange = "fake", endpoint = "retry", attempts = 3, sleep = delays.append)
+print("Result after retries: ", result, "Delays: ", delays)
+assert result == {"ok" : True} and transport.calls == 3
+assert len(delays) == 2 and delays[0] <= 0.5 and delays[1] <= 1.0
+
+#A bad answer is a failure too, and an order is never sent twice.
+transport = FakeTransport([{"success" : False, "result" : None}])
+try:
+    resilience.call(func = transport, exchange = "fake", endpoint = "order", attempts = 1, is_failure = resilience.bittrex_failed, sleep = delays.append)
+    assert False, "ExchangeUnavailable expected."
+except resilience.ExchangeUnavailable as e:
+    print("Bad answer: ", e)
+assert transport.calls == 1
+
+#The circuit opens after 5 consecutive failures and stops calling the endpoint.
+transport = FakeTransport([IOError("down")])
+for i in range(5):
+    try:
+        resilience.call(func = transport, exchange = "fake", endpoint = "broken", attempts = 1)
+    except resilience.ExchangeUnavailable:
+        pass
+try:
+    resilience.call(func = transport, exchange = "fake", endpoint = "broken", attempts = 1)
+    assert False, "CircuitOpen expected."
+except resilience.CircuitOpen as e:
+    print("Circuit: ", e)
+assert transport.calls == 5
+
+#Other endpoints are not affected.
+assert resilience.call(func = FakeTransport([1]), exchange = "fake", endpoint = "healthy") == 1
+
+#After the reset timeout one trial call goes through.
+now = [0]
+breaker = resilience.CircuitBreaker(name = "clocked", failure_threshold = 2, reset_timeout = 60, clock = lambda : now[0])
+breaker.record_failure()
+breaker.record_failure()
+assert breaker.state == "open" and breaker.allow() == False
+now[0] = 61
+assert breaker.state == "half-open" and breaker.allow() == True and breaker.allow() == False
+breaker.record_success()
+assert breaker.state == "closed"
+
+#A half-open circuit whose trial call doesn't start for the deadline keeps its trial for the next call.
+now[0] = 0
+breaker = resilience.get_breaker(name = "fake.halfopen")
+breaker._clock = lambda : now[0]
+breaker.failure_threshold = 1
+breaker.record_failure()
+now[0] = 61
+with resilience.deadline(seconds = 0):
+    try:
+        resilience.call(func = FakeTransport([1]), exchange = "fake", endpoint = "halfopen")
+        assert False, "DeadlineExceeded expected."
+    except resilience.DeadlineExceeded:
+        pass
+assert breaker.state == "half-open"
+assert resilience.call(func = FakeTransport([1]), exchange = "fake", endpoint = "halfopen") == 1 and breaker.state == "closed"
+
+#No retry is started if the backoff doesn't fit in the deadline.
+transport = FakeTransport([IOError("slow")])
+start_time = time.time()
+with resilience.deadline(seconds = 0.2):
+    try:
+        resilience.call(func = transport, exchange = "fake", endpoint = "deadline", attempts = 10, base_delay = 1, max_delay = 1)
+    except resilience.ExchangeUnavailable as e:
+        print("Deadline: ", e)
+assert time.time() - start_time < 1.0
+assert resilience.remaining() == None
+
+with resilience.deadline(seconds = 0):
+    try:
+        resilience.call(func = transport, exchange = "fake", endpoint = "expired")
+        assert False, "DeadlineExceeded expected."
+    except resilience.DeadlineExceeded:
+        pass
+
+#Bittrex down: last prices are 0 at once instead of waiting forever.
+feed = BittrexDataFeed(session = None)
+feed.bittrex2.get_market_summaries = FakeTransport([{"success" : False, "message" : "MAINTENANCE", "result" : None}])
+
+start_time = time.time()
+df = feed.get_last_price(assets = [Asset(ticker = "ETH", instrument_id = 1, name = "Ethereum")])
+print("Last prices with Bittrex down: ", df, "in {:.1f} seconds.".format(time.time() - start_time))
+assert df.iloc[0]["last_price"] == Decimal(0)
+assert time.time() - start_time < 30
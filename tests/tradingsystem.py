@@ -0,0 +1,145 @@
+import os
+
+import tempfile
+
+from decimal import Decimal
+
+from alchemist_lib import database
+from alchemist_lib import datafeed
+
+from alchemist_lib.tradingsystem import TradingSystem
+from alchemist_lib.broker.broker import BrokerBaseClass
+from alchemist_lib.portfolio.longsonly import LongsOnlyPortfolio
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+
+
+
+class FakeBroker(BrokerBaseClass):
+
+    """
+    Never called, the test doesn't trade.
+    """
+
+    name = "fake"
+
+    def place_order(self, asset, amount, order_type):
+        return -1
+
+    def get_order_books(self, tickers):
+        return {}
+
+    def get_order_status(self, order_id, asset):
+        pass
+
+    def cancel_order(self, order_id, asset):
+        pass
+
+    def get_traded_volume(self, asset, since):
+        return Decimal(0)
+
+    def get_balances(self):
+        return {}
+
+
+#The history downloads are recorded instead of sent to the exchanges.
+prefetched = []
+datafeed.save_ohlcv = lambda session, assets, start_date, timeframe : prefetched.append(sorted([asset.ticker for asset in assets]))
+
+database.configure(uri = "sqlite://")
+database.create_all()
+with database.session_scope() as session:
+    session.add(Instrument(instrument_type = "cryptocurrency"))
+    session.add_all([Asset(ticker = ticker, instrument_id = 1) for ticker in ["ETH", "LTC", "XMR", "ZEC"]])
+
+listed = ["ETH", "LTC"]
+selections = []
+
+def select_universe(session):
+    selections.append(list(listed))
+    return session.query(Asset).filter(Asset.ticker.in_(listed)).all()
+
+#The log file of the trading system goes in a temporary directory.
+os.chdir(tempfile.mkdtemp())
+ts = TradingSystem(name = "universe", portfolio = LongsOnlyPortfolio(capital = 1), set_weights = None, select_universe = select_universe, handle_data = None, broker = FakeBroker())
+
+def tick(universe_frequency, window_length = 10):
+    #Every tick has its own session, like on_market_open().
+    with database.session_scope() as session:
+        ts.session = session
+        universe = ts.update_universe(timeframe = "1H", universe_frequency = universe_frequency, window_length = window_length)
+        assert all([asset in session for asset in universe])
+        ts.session = None
+    return sorted([asset.ticker for asset in universe])
+
+#The first selection downloads the history of every asset.
+assert tick(universe_frequency = 3) == ["ETH", "LTC"] and prefetched == [["ETH", "LTC"]]
+
+#A delisting and a new listing are seen at the next selection, only the new asset is downloaded.
+listed = ["ETH", "XMR", "ZEC"]
+assert tick(universe_frequency = 3) == ["ETH", "LTC"]
+assert tick(universe_frequency = 3) == ["ETH", "LTC"]
+assert tick(universe_frequency = 3) == ["ETH", "XMR", "ZEC"]
+print("Selections: ", selections, "Prefetched: ", prefetched)
+assert len(selections) == 2 and prefetched == [["ETH", "LTC"], ["XMR", "ZEC"]]
+
+#Nothing changed, nothing downloaded.
+assert tick(universe_frequency = 1) == ["ETH", "XMR", "ZEC"]
+assert len(selections) == 3 and len(prefetched) == 2
+
+#The selection of run() at start-up isn't a tick: the refreshes fall on ticks 0, 3, 6, ... as without it.
+cadence = TradingSystem(name = "cadence", portfolio = LongsOnlyPortfolio(capital = 1), set_weights = None, select_universe = select_universe, handle_data = None, broker = FakeBroker())
+with database.session_scope() as session:
+    cadence.session = session
+    cadence.update_universe(timeframe = "1H", universe_frequency = 3, tick = False)
+selected_at = []
+for i in range(7):
+    count = len(selections)
+    with database.session_scope() as session:
+        cadence.session = session
+        cadence.update_universe(timeframe = "1H", universe_frequency = 3)
+    if len(selections) > count:
+        selected_at.append(i)
+cadence.session = None
+print("Universe selected at the ticks: ", selected_at)
+assert selected_at == [0, 3, 6]
+
+#A tick that fails before the orders are sent tells the broker not to wait for this trading system.
+class IdleBroker(FakeBroker):
+
+    def __init__(self):
+        FakeBroker.__init__(self)
+        self.idle_calls = []
+
+    def idle(self, ts_name):
+        self.idle_calls.append(ts_name)
+
+def failing_handle_data(session, universe):
+    raise Exception("No data.")
+
+datafeed.save_last_ohlcv = lambda session, assets, timeframe : None
+broker = IdleBroker()
+failing = TradingSystem(name = "failing", portfolio = LongsOnlyPortfolio(capital = 1), set_weights = None, select_universe = select_universe, handle_data = failing_handle_data, broker = broker)
+try:
+    failing.on_market_open(timeframe = "1H", frequency = 1)
+    assert False, "The tick must fail."
+except Exception as e:
+    assert str(e) == "No data."
+print("Idle calls: ", broker.idle_calls)
+assert broker.idle_calls == ["failing"]
+
+#A broker that only places orders still works, its orders are not followed.
+class PlaceOnlyBroker(BrokerBaseClass):
+
+    def place_order(self, asset, amount, order_type):
+        return -1
+
+place_only = TradingSystem(name = "place_only", portfolio = LongsOnlyPortfolio(capital = 1), set_weights = None, select_universe = select_universe, handle_data = None, broker = PlaceOnlyBroker())
+assert place_only.fill_tracker == None and ts.fill_tracker != None
+assert place_only.broker.get_order_status(order_id = "1", asset = None) == None and place_only.broker.get_balances() == None
@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from alchemist_lib import utils
+
+from alchemist_lib.database.asset import Asset
+from alchemist_lib.database.instrument import Instrument
+from alchemist_lib.database.exchange import Exchange
+from alchemist_lib.database.price_data_source import PriceDataSource
+from alchemist_lib.database.timetable import Timetable
+from alchemist_lib.database.timeframe import Timeframe
+from alchemist_lib.database.broker import Broker
+from alchemist_lib.database.ptf_allocation import PtfAllocation
+
+
+
+#Counts the comparisons between assets.
+comparisons = [0]
+asset_eq = Asset.__eq__
+
+def counting_eq(self, other):
+    comparisons[0] += 1
+    return asset_eq(self, other)
+
+first = [Asset(ticker = "A{}".format(i), instrument_id = 1) for i in range(2000)]
+second = [Asset(ticker = "A{}".format(i), instrument_id = 1) for i in range(1000, 3000)]
+
+#Same result of the comparison one by one, without comparing every pair.
+Asset.__eq__ = counting_eq
+diff = utils.subtract_list(first, second)
+Asset.__eq__ = asset_eq
+print("Comparisons: ", comparisons[0])
+assert [asset.ticker for asset in diff] == ["A{}".format(i) for i in range(1000)]
+assert comparisons[0] == 0
+
+assert utils.subtract_list(first, "not a list") == []
+assert utils.subtract_list([1, 2, 2, 3], [2]) == [1, 3]
+assert utils.subtract_list([{"a" : 1}, {"b" : 2}], [{"b" : 2}]) == [{"a" : 1}]
+
+#Allocations and assets with the same (ticker, instrument_id) have the same key.
+ETH = Asset(ticker = "ETH", instrument_id = 1)
+LTC = Asset(ticker = "LTC", instrument_id = 1)
+alloc = PtfAllocation(ticker = "ETH", instrument_id = 1, amount = Decimal(1), base_currency_amount = Decimal("0.05"), ts_name = "A")
+
+positions = utils.KeyedCollection(items = [alloc])
+assert ETH in positions and LTC not in positions
+assert positions.get(ETH) is alloc and positions.get(("ETH", 1)) is alloc and positions.get(LTC) == None
+
+assets = utils.KeyedCollection(items = [ETH, LTC, Asset(ticker = "ETH", instrument_id = 1)])
+assert len(assets) == 2 and [asset.ticker for asset in assets] == ["ETH", "LTC"]
+assert assets.subtract(positions) == [LTC] and assets.intersect([alloc]) == [ETH]